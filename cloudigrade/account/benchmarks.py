@@ -0,0 +1,381 @@
+"""Synthetic data and timed scenarios for benchmarking reports."""
+import collections
+import datetime
+import itertools
+import random
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from account import reports
+from account.models import (Account, AwsAccount, AwsInstance,
+                            AwsInstanceEvent, AwsMachineImage, ImageTag,
+                            Instance, InstanceEvent, MachineImage, User)
+from util.benchmark import measure
+
+BENCHMARK_USERNAME_PREFIX = 'benchmark-'
+BENCHMARK_INSTANCE_TYPES = ('t2.micro', 't2.large', 'm5.xlarge', 'c5.xlarge')
+BENCHMARK_REGIONS = ('us-east-1', 'us-east-2', 'eu-west-1', 'ap-northeast-1')
+
+REPORT_DAILY_USAGE = 'daily_usage'
+REPORT_DAILY_USAGE_BY_USER = 'daily_usage_by_user'
+REPORT_ACCOUNT_OVERVIEWS = 'account_overviews'
+REPORT_TYPES = (
+    REPORT_DAILY_USAGE,
+    REPORT_DAILY_USAGE_BY_USER,
+    REPORT_ACCOUNT_OVERVIEWS,
+)
+
+BenchmarkDataset = collections.namedtuple('BenchmarkDataset', [
+    'user_ids',
+    'account_count',
+    'image_count',
+    'instance_count',
+    'event_count',
+])
+
+
+def generate_benchmark_data(users=10, accounts_per_user=2,
+                            images_per_account=5, instances_per_account=10,
+                            events_per_instance=20, start=None, end=None,
+                            rhel_ratio=0.5, openshift_ratio=0.2,
+                            batch_size=5000, seed=None,
+                            using=DEFAULT_DB_ALIAS):
+    """
+    Bulk-load synthetic users, accounts, images, instances, and events.
+
+    Rows are generated lazily and inserted in batches with contiguous ids
+    that are allocated up front, so that even tens of millions of events can
+    be loaded without holding them all in memory. Model saves and signals are
+    bypassed entirely.
+
+    Each instance runs one of its account's images, and its events alternate
+    between power_on and power_off at random times between start and end.
+
+    Args:
+        users (int): number of users to create
+        accounts_per_user (int): number of AWS accounts for each user
+        images_per_account (int): number of images owned by each account
+        instances_per_account (int): number of instances in each account
+        events_per_instance (int): number of events for each instance
+        start (datetime.datetime): earliest event time. Defaults to 90 days
+            before end.
+        end (datetime.datetime): latest event time. Defaults to now.
+        rhel_ratio (float): fraction of images tagged as RHEL
+        openshift_ratio (float): fraction of images tagged as OpenShift
+        batch_size (int): maximum number of rows to insert at once
+        seed (int): optional seed for reproducible data
+        using (str): alias of the database to load
+
+    Returns:
+        BenchmarkDataset: the ids of the new users and the number of each
+            other kind of row created.
+
+    """
+    if end is None:
+        end = timezone.now()
+    if start is None:
+        start = end - datetime.timedelta(days=90)
+    rng = random.Random(seed)
+
+    account_count = users * accounts_per_user
+    image_count = account_count * images_per_account
+    instance_count = account_count * instances_per_account
+    event_count = instance_count * events_per_instance
+    first_user_id = _next_id(User, using)
+    first_account_id = _next_id(Account, using)
+    first_image_id = _next_id(MachineImage, using)
+    first_instance_id = _next_id(Instance, using)
+    first_event_id = _next_id(InstanceEvent, using)
+    user_ids = list(range(first_user_id, first_user_id + users))
+
+    _bulk_insert(
+        (
+            User(id=user_id,
+                 username='{0}{1}'.format(BENCHMARK_USERNAME_PREFIX, user_id))
+            for user_id in user_ids
+        ),
+        batch_size, using,
+    )
+
+    ctype_id = ContentType.objects.db_manager(using).get_for_model(
+        AwsAccount).id
+    _bulk_insert(
+        (
+            AwsAccount(
+                id=account_id,
+                account_ptr_id=account_id,
+                polymorphic_ctype_id=ctype_id,
+                user_id=first_user_id + index // accounts_per_user,
+                name='benchmark account {0}'.format(account_id),
+                aws_account_id='{0:012d}'.format(account_id),
+                account_arn='arn:aws:iam::{0:012d}:role/benchmark'.format(
+                    account_id),
+            )
+            for index, account_id in enumerate(
+                range(first_account_id, first_account_id + account_count)
+            )
+        ),
+        batch_size, using,
+    )
+
+    ctype_id = ContentType.objects.db_manager(using).get_for_model(
+        AwsMachineImage).id
+    _bulk_insert(
+        (
+            AwsMachineImage(
+                id=image_id,
+                machineimage_ptr_id=image_id,
+                polymorphic_ctype_id=ctype_id,
+                account_id=first_account_id + index // images_per_account,
+                status=MachineImage.INSPECTED,
+                ec2_ami_id='ami-b{0:016x}'.format(image_id),
+            )
+            for index, image_id in enumerate(
+                range(first_image_id, first_image_id + image_count)
+            )
+        ),
+        batch_size, using,
+    )
+    tags = dict(ImageTag.objects.using(using).values_list('description',
+                                                          'id'))
+    image_tag_ratios = ((tags['rhel'], rhel_ratio),
+                        (tags['openshift'], openshift_ratio))
+    image_tags = (
+        MachineImage.tags.through(machineimage_id=image_id, imagetag_id=tag_id)
+        for image_id in range(first_image_id, first_image_id + image_count)
+        for tag_id, ratio in image_tag_ratios
+        if rng.random() < ratio
+    )
+    for batch in _batches(image_tags, batch_size):
+        MachineImage.tags.through.objects.using(using).bulk_create(batch)
+
+    ctype_id = ContentType.objects.db_manager(using).get_for_model(
+        AwsInstance).id
+    _bulk_insert(
+        (
+            AwsInstance(
+                id=instance_id,
+                instance_ptr_id=instance_id,
+                polymorphic_ctype_id=ctype_id,
+                account_id=first_account_id + index // instances_per_account,
+                ec2_instance_id='i-b{0:016x}'.format(instance_id),
+                region=rng.choice(BENCHMARK_REGIONS),
+            )
+            for index, instance_id in enumerate(
+                range(first_instance_id, first_instance_id + instance_count)
+            )
+        ),
+        batch_size, using,
+    )
+
+    ctype_id = ContentType.objects.db_manager(using).get_for_model(
+        AwsInstanceEvent).id
+    event_ids = itertools.count(first_event_id)
+    span_seconds = (end - start).total_seconds()
+
+    def generate_events():
+        for index in range(instance_count):
+            account_index = index // instances_per_account
+            image_id = (first_image_id + account_index * images_per_account +
+                        rng.randrange(images_per_account))
+            instance_type = rng.choice(BENCHMARK_INSTANCE_TYPES)
+            offsets = sorted(
+                rng.uniform(0, span_seconds)
+                for __ in range(events_per_instance)
+            )
+            for event_index, offset in enumerate(offsets):
+                event_id = next(event_ids)
+                event_type = (InstanceEvent.TYPE.power_on
+                              if event_index % 2 == 0
+                              else InstanceEvent.TYPE.power_off)
+                yield AwsInstanceEvent(
+                    id=event_id,
+                    instanceevent_ptr_id=event_id,
+                    polymorphic_ctype_id=ctype_id,
+                    instance_id=first_instance_id + index,
+                    machineimage_id=image_id,
+                    event_type=event_type,
+                    occurred_at=start + datetime.timedelta(seconds=offset),
+                    subnet='subnet-benchmark',
+                    instance_type=instance_type,
+                )
+
+    _bulk_insert(generate_events(), batch_size, using)
+    _reset_sequences((User, Account, MachineImage, Instance, InstanceEvent),
+                     using)
+
+    return BenchmarkDataset(
+        user_ids=user_ids,
+        account_count=account_count,
+        image_count=image_count,
+        instance_count=instance_count,
+        event_count=event_count,
+    )
+
+
+def get_benchmark_user_ids(using=DEFAULT_DB_ALIAS):
+    """
+    Get the ids of users previously created by generate_benchmark_data.
+
+    Args:
+        using (str): alias of the database to query
+
+    Returns:
+        list[int]: the benchmark user ids in ascending order.
+
+    """
+    return list(
+        User.objects.using(using)
+        .filter(username__startswith=BENCHMARK_USERNAME_PREFIX)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+
+
+def run_report_benchmarks(user_ids, end=None, windows=(1, 7, 30),
+                          granularities=(reports.GRANULARITY_DAILY,),
+                          backends=('python',), report_types=REPORT_TYPES,
+                          repeat=1):
+    """
+    Time each report type for each window length.
+
+    The single-user reports are run for the first user. Since get_daily_usage
+    reuses stored usage for closed periods, each of its runs is measured
+    twice: once "cold" after the stored usage has been deleted, and once
+    "warm" immediately after.
+
+    Args:
+        user_ids (list[int]): ids of users with benchmark data
+        end (datetime.datetime): end of every report window. Defaults to now.
+        windows (iterable[int]): report window lengths in days
+        granularities (iterable[str]): daily usage granularities to run
+        backends (iterable[str]): REPORT_USAGE_BACKEND values to run
+        report_types (iterable[str]): which of REPORT_TYPES to run
+        repeat (int): number of times to run each scenario
+
+    Yields:
+        BenchmarkResult: the measurements of each scenario run.
+
+    """
+    if end is None:
+        end = timezone.now()
+    user_id = user_ids[0]
+    account_ids = list(
+        Account.objects.filter(user_id__in=user_ids)
+        .values_list('id', flat=True)
+    )
+
+    for days in windows:
+        start = end - datetime.timedelta(days=days)
+        for iteration in range(repeat):
+            parameters = {
+                'days': days,
+                'iteration': iteration,
+                'users': len(user_ids),
+            }
+            if REPORT_DAILY_USAGE in report_types:
+                yield from _run_daily_usage(user_id, account_ids, start, end,
+                                            granularities, backends,
+                                            parameters)
+            if REPORT_DAILY_USAGE_BY_USER in report_types:
+                yield from _run_daily_usage_by_user(user_ids, account_ids,
+                                                    start, end, granularities,
+                                                    parameters)
+            if REPORT_ACCOUNT_OVERVIEWS in report_types:
+                yield measure(
+                    REPORT_ACCOUNT_OVERVIEWS,
+                    lambda: reports.get_account_overviews(user_id, start, end),
+                    parameters,
+                )
+
+
+def _run_daily_usage(user_id, account_ids, start, end, granularities,
+                     backends, parameters):
+    """Measure get_daily_usage cold and warm for each granularity/backend."""
+    for granularity in granularities:
+        for backend in backends:
+            reports.invalidate_account_period_usages(account_ids)
+            with override_settings(REPORT_USAGE_BACKEND=backend):
+                for stored_usage in ('cold', 'warm'):
+                    yield measure(
+                        REPORT_DAILY_USAGE,
+                        lambda: reports.get_daily_usage(
+                            user_id, start, end, granularity=granularity),
+                        dict(parameters, granularity=granularity,
+                             backend=backend, stored_usage=stored_usage),
+                    )
+
+
+def _run_daily_usage_by_user(user_ids, account_ids, start, end,
+                             granularities, parameters):
+    """Measure get_daily_usage_by_user cold and warm for each granularity."""
+    for granularity in granularities:
+        reports.invalidate_account_period_usages(account_ids)
+        for stored_usage in ('cold', 'warm'):
+            yield measure(
+                REPORT_DAILY_USAGE_BY_USER,
+                lambda: reports.get_daily_usage_by_user(
+                    start, end, user_ids, granularity=granularity),
+                dict(parameters, granularity=granularity,
+                     stored_usage=stored_usage),
+            )
+
+
+def _next_id(model, using):
+    """Get the id following the largest existing id for a model."""
+    max_id = model._base_manager.using(using).aggregate(Max('id'))['id__max']
+    return (max_id or 0) + 1
+
+
+def _batches(iterable, batch_size):
+    """Yield lists of up to batch_size items from an iterable."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _bulk_insert(objs, batch_size, using):
+    """
+    Insert model instances in batches, bypassing save and signals.
+
+    Unlike bulk_create, this supports multi-table inheritance by inserting
+    each batch into the tables of the model's parents and then the model
+    itself. Every instance must already have its id (and parent pointers)
+    set, and all instances must be of the same model.
+
+    Args:
+        objs (iterable[django.db.models.Model]): the instances to insert
+        batch_size (int): maximum number of instances to insert at once
+        using (str): alias of the database to insert into
+
+    """
+    connection = connections[using]
+    for batch in _batches(objs, batch_size):
+        model = type(batch[0])
+        table_models = list(reversed(model._meta.get_parent_list()))
+        table_models.append(model)
+        with transaction.atomic(using=using):
+            for table_model in table_models:
+                fields = table_model._meta.local_concrete_fields
+                size = max(connection.ops.bulk_batch_size(fields, batch), 1)
+                for offset in range(0, len(batch), size):
+                    table_model._base_manager._insert(
+                        batch[offset:offset + size], fields=fields,
+                        using=using)
+
+
+def _reset_sequences(models, using):
+    """Advance the id sequences of models past the explicitly set ids."""
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
@@ -0,0 +1,137 @@
+"""Caching helpers for report results in the account app."""
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models
+from django.utils.translation import gettext as _
+
+from account.models import Account, InstanceEvent, MachineImage
+
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_KEY_PREFIX = 'report'
+
+
+def get_report_cache():
+    """
+    Get the cache backend configured for report results.
+
+    Returns:
+        django.core.cache.backends.base.BaseCache: the report cache.
+
+    """
+    return caches[settings.REPORT_CACHE_ALIAS]
+
+
+def get_report_watermark(user_id):
+    """
+    Get a watermark that changes whenever a user's report data changes.
+
+    The watermark combines the latest change times and counts for the user's
+    accounts, the events of their instances, and the tags of the images those
+    events reference. Any new event, account change, or image (re)tagging
+    yields a new watermark and thereby invalidates previously cached results.
+
+    Args:
+        user_id (int): user_id for filtering cloud accounts
+
+    Returns:
+        list: JSON-serializable values representing the current data state.
+
+    """
+    accounts = Account.objects.filter(user_id=user_id).aggregate(
+        count=models.Count('id'),
+        updated_at=models.Max('updated_at'),
+    )
+    events = InstanceEvent.objects.filter(
+        instance__account__user_id=user_id
+    ).aggregate(
+        count=models.Count('id'),
+        created_at=models.Max('created_at'),
+    )
+    images = MachineImage.objects.filter(
+        instanceevent__instance__account__user_id=user_id
+    ).aggregate(
+        updated_at=models.Max('updated_at'),
+    )
+    # Tag add/remove does not necessarily touch the image's updated_at, but
+    # every change does alter the image-to-tag through table's rows.
+    image_tags = MachineImage.tags.through.objects.filter(
+        machineimage__instanceevent__instance__account__user_id=user_id
+    ).aggregate(
+        count=models.Count('id', distinct=True),
+        max_id=models.Max('id'),
+    )
+    return [
+        accounts['count'],
+        accounts['updated_at'],
+        events['count'],
+        events['created_at'],
+        images['updated_at'],
+        image_tags['count'],
+        image_tags['max_id'],
+    ]
+
+
+def get_report_cache_key(report_name, user_id, start, end, name_pattern=None,
+                         account_id=None, **kwargs):
+    """
+    Get the cache key for a report with the given parameters.
+
+    Args:
+        report_name (str): short name identifying the type of report
+        user_id (int): user_id for filtering cloud accounts
+        start (datetime.datetime): Start time (inclusive)
+        end (datetime.datetime): End time (exclusive)
+        name_pattern (str): pattern to filter against cloud account names
+        account_id (int): account_id for filtering cloud accounts
+        **kwargs: any additional parameters that alter the report's output
+
+    Returns:
+        str: The cache key, ending in a digest suitable for use as an ETag.
+
+    """
+    params = {
+        'report_name': report_name,
+        'user_id': user_id,
+        'start': start,
+        'end': end,
+        'name_pattern': name_pattern,
+        'account_id': account_id,
+        'watermark': get_report_watermark(user_id),
+    }
+    params.update(kwargs)
+    encoded_params = json.dumps(params, sort_keys=True, default=str)
+    digest = hashlib.sha256(encoded_params.encode('utf-8')).hexdigest()
+    return '{0}:{1}:{2}:{3}'.format(
+        REPORT_CACHE_KEY_PREFIX, report_name, user_id, digest
+    )
+
+
+def get_or_generate_report(cache_key, report_function, *args, **kwargs):
+    """
+    Get a report's results from the cache, or generate and cache them.
+
+    Args:
+        cache_key (str): key as built by get_report_cache_key
+        report_function (callable): function that generates the report
+        *args: positional arguments for report_function
+        **kwargs: keyword arguments for report_function
+
+    Returns:
+        dict: The report results.
+
+    """
+    report_cache = get_report_cache()
+    result = report_cache.get(cache_key)
+    if result is not None:
+        logger.debug(_('Report cache hit for {0}').format(cache_key))
+        return result
+
+    logger.debug(_('Report cache miss for {0}').format(cache_key))
+    result = report_function(*args, **kwargs)
+    report_cache.set(cache_key, result, settings.REPORT_CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,856 @@
+"""Simulated AWS and an in-process worker for load testing image inspection."""
+import collections
+import contextlib
+import heapq
+import itertools
+import json
+import logging
+import random
+import threading
+import types
+import uuid
+from unittest.mock import patch
+
+from botocore.exceptions import ClientError
+from celery.app.task import Task
+from celery.exceptions import Retry
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils.translation import gettext as _
+
+from account import tasks
+from account import util as account_util
+from account.models import AwsAccount, AwsMachineImage, MachineImage
+from util.aws import autoscaling, ec2, sqs, sts
+from util.benchmark import measure
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_USERNAME = 'benchmark-inspection'
+PRIMARY_ACCOUNT_ID = '000000000000'
+QUEUE_URL_PREFIX = 'https://sqs.local/'
+VISIBILITY_TIMEOUT = 30  # seconds, the SQS default
+
+# The periodic tasks that move images through the pipeline, keyed by their
+# CELERY_BEAT_SCHEDULE entries so they run as often as they would in beat.
+PERIODIC_TASKS = collections.OrderedDict((
+    ('poll_pending_aws_resources', tasks.poll_pending_aws_resources),
+    ('check_ready_volumes_queue', tasks.check_ready_volumes_queue),
+    ('persist_inspection_cluster_results',
+     tasks.persist_inspection_cluster_results_task),
+))
+
+InspectionLoadTestResult = collections.namedtuple(
+    'InspectionLoadTestResult', [
+        'benchmark',
+        'images',
+        'inspected',
+        'simulated_seconds',
+        'images_per_hour',
+        'task_runs',
+        'retries',
+        'failures',
+        'api_calls',
+    ])
+
+
+class LocalResource(object):
+    """
+    Lazily loaded stand-in for a boto3 resource.
+
+    Like a real boto3 resource, its attributes are only described (and the
+    describe call counted) the first time one of them is read. Actions are
+    plain attributes and count their own calls.
+    """
+
+    def __init__(self, local_aws, operation, load, **actions):
+        """Initialize the resource with its describe operation and actions."""
+        self._local_aws = local_aws
+        self._operation = operation
+        self._load = load
+        self._data = None
+        self.__dict__.update(actions)
+
+    def __getattr__(self, name):
+        """Describe the resource if needed and get one of its attributes."""
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if self._data is None:
+            self._local_aws.count(self._operation)
+            self._data = self._load()
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class LocalSession(object):
+    """Stand-in for a boto3 session in a customer account."""
+
+    def __init__(self, local_aws, account_id):
+        """Initialize the session for the customer account."""
+        self.local_aws = local_aws
+        self.account_id = account_id
+
+    def client(self, service_name, region_name=None, **kwargs):
+        """Get a stand-in for a boto3 client in the customer account."""
+        if service_name == 'sts':
+            return types.SimpleNamespace(
+                get_caller_identity=lambda: self.local_aws.call(
+                    'sts.GetCallerIdentity', {'Account': self.account_id}))
+        return self.local_aws.client(service_name, region_name)
+
+    def resource(self, service_name, region_name=None, **kwargs):
+        """Get a stand-in for a boto3 resource in the customer account."""
+        return self.local_aws.resource(service_name, region_name)
+
+
+class LocalInspectionAws(object):
+    """
+    In-memory stand-in for the AWS APIs that image inspection calls.
+
+    This implements just enough of boto3's EC2, STS, SQS, CloudWatch, ECS, and
+    Auto Scaling APIs for the inspection tasks to copy snapshots, create and
+    attach volumes, queue them, and scale and run the houndigrade cluster, all
+    against a simulated clock. Snapshot copies, volumes, and cluster instances
+    only become ready after their simulated delays, and a stand-in houndigrade
+    sends each instance's results to the results queue once its inspection
+    time has passed. Every API call is counted by operation.
+    """
+
+    def __init__(self, snapshot_copy_seconds=600, volume_seconds=60,
+                 instance_boot_seconds=180, inspection_seconds=300,
+                 delay_jitter=0.25, rhel_ratio=0.5, snapshot_copy_limit=None,
+                 rng=None):
+        """
+        Initialize the stand-ins with their simulated delays.
+
+        Args:
+            snapshot_copy_seconds (float): time for a snapshot copy to finish
+            volume_seconds (float): time for a new volume to become available
+            instance_boot_seconds (float): time for a new cluster instance to
+                register with ECS
+            inspection_seconds (float): time for houndigrade to inspect an
+                instance's volumes and send its results
+            delay_jitter (float): each delay varies randomly by up to this
+                fraction either way
+            rhel_ratio (float): fraction of images houndigrade finds RHEL on
+            snapshot_copy_limit (int): optional number of snapshot copies
+                that may be in progress at once before AWS refuses more
+            rng (random.Random): optional source of randomness
+        """
+        self.snapshot_copy_seconds = snapshot_copy_seconds
+        self.volume_seconds = volume_seconds
+        self.instance_boot_seconds = instance_boot_seconds
+        self.inspection_seconds = inspection_seconds
+        self.delay_jitter = delay_jitter
+        self.rhel_ratio = rhel_ratio
+        self.snapshot_copy_limit = snapshot_copy_limit
+        self.rng = rng or random.Random()
+
+        self.clock = 0.0
+        self.api_calls = collections.Counter()
+        self.images = {}
+        self.snapshots = {}
+        self.volumes = {}
+        self.groups = collections.defaultdict(list)
+        self.instances = {}
+        self.queues = {}
+        self._ids = itertools.count(1)
+        # Some util.aws and account.util calls are made from thread pools.
+        self._lock = threading.RLock()
+
+    def count(self, operation):
+        """Count one call of an AWS API operation."""
+        with self._lock:
+            self.api_calls[operation] += 1
+
+    def call(self, operation, response=None):
+        """Count one call of an AWS API operation and get its response."""
+        self.count(operation)
+        return response
+
+    def add_customer_image(self, account_id):
+        """
+        Add an available image and its root snapshot to a customer account.
+
+        Args:
+            account_id (str): the customer's AWS account id
+
+        Returns:
+            str: the image's id.
+
+        """
+        ami_id = self._new_id('ami')
+        snapshot_id = self._new_id('snap')
+        self.images[ami_id] = {'owner_id': account_id,
+                               'snapshot_id': snapshot_id}
+        self.snapshots[snapshot_id] = {'owner_id': account_id,
+                                       'ready_at': 0, 'permissions': set()}
+        return ami_id
+
+    def resource(self, service_name, region_name=None, **kwargs):
+        """Get a stand-in for a boto3 service resource."""
+        if service_name == 'ec2':
+            return types.SimpleNamespace(
+                Image=self._ec2_image,
+                Snapshot=self._ec2_snapshot,
+                Volume=self._ec2_volume,
+                create_volume=self._ec2_create_volume,
+            )
+        raise NotImplementedError(service_name)
+
+    def client(self, service_name, region_name=None, **kwargs):
+        """Get a stand-in for a boto3 service client."""
+        if service_name == 'ec2':
+            return types.SimpleNamespace(
+                get_paginator=self._ec2_get_paginator,
+                attach_volume=self._ec2_attach_volume,
+                get_waiter=lambda name: types.SimpleNamespace(
+                    wait=lambda **kwargs: self.count('ec2.DescribeVolumes')),
+                modify_instance_attribute=lambda **kwargs: self.count(
+                    'ec2.ModifyInstanceAttribute'),
+            )
+        if service_name == 'sts':
+            return types.SimpleNamespace(
+                assume_role=self._sts_assume_role,
+                get_caller_identity=lambda: self.call(
+                    'sts.GetCallerIdentity', {'Account': PRIMARY_ACCOUNT_ID}),
+            )
+        if service_name == 'sqs':
+            return types.SimpleNamespace(
+                get_queue_url=self._sqs_get_queue_url,
+                create_queue=self._sqs_create_queue,
+                send_message_batch=self._sqs_send_message_batch,
+                receive_message=self._sqs_receive_message,
+                delete_message_batch=self._sqs_delete_message_batch,
+                get_queue_attributes=self._sqs_get_queue_attributes,
+            )
+        if service_name == 'cloudwatch':
+            return types.SimpleNamespace(
+                get_metric_statistics=self._cloudwatch_get_metric_statistics)
+        if service_name == 'autoscaling':
+            return types.SimpleNamespace(
+                describe_auto_scaling_groups=self._describe_groups,
+                update_auto_scaling_group=self._update_group,
+            )
+        if service_name == 'ecs':
+            return types.SimpleNamespace(
+                list_container_instances=self._ecs_list_container_instances,
+                describe_container_instances=(
+                    self._ecs_describe_container_instances),
+                register_task_definition=lambda family, **kwargs: self.call(
+                    'ecs.RegisterTaskDefinition', {'taskDefinition': {
+                        'taskDefinitionArn': 'arn:aws:ecs:local:task-'
+                                             'definition/{0}:1'.format(family),
+                    }}),
+                start_task=self._ecs_start_task,
+            )
+        raise NotImplementedError(service_name)
+
+    def Session(self, aws_access_key_id=None, **kwargs):
+        """Get a stand-in for a boto3 session in a customer account."""
+        # _sts_assume_role hands out the customer account id as the key id.
+        return LocalSession(self, aws_access_key_id)
+
+    @contextlib.contextmanager
+    def patched(self):
+        """Use these stand-ins in place of boto3 everywhere inspection does."""
+        with patch.object(ec2, 'boto3', self), \
+                patch.object(sts, 'boto3', self), \
+                patch.object(sqs, 'boto3', self), \
+                patch.object(autoscaling, 'boto3', self), \
+                patch.object(account_util, 'boto3', self), \
+                patch.object(tasks, 'boto3', self):
+            yield self
+
+    def _new_id(self, prefix):
+        """Get a new unique AWS-style resource id."""
+        with self._lock:
+            return '{0}-{1:017x}'.format(prefix, next(self._ids))
+
+    def _delay(self, seconds):
+        """Get when something that takes about this long will be done."""
+        jitter = self.rng.uniform(-self.delay_jitter, self.delay_jitter)
+        return self.clock + seconds * (1 + jitter)
+
+    def _not_found(self, code, operation):
+        """Get the ClientError AWS raises for a missing resource."""
+        return ClientError({'Error': {'Code': code, 'Message': code}},
+                           operation)
+
+    def _snapshot_state(self, snapshot):
+        """Get the state of a snapshot at the current time."""
+        return 'completed' if self.clock >= snapshot['ready_at'] \
+            else 'pending'
+
+    def _volume_state(self, volume):
+        """Get the state of a volume at the current time."""
+        if volume['instance_id'] is not None:
+            return 'in-use'
+        return 'available' if self.clock >= volume['ready_at'] \
+            else 'creating'
+
+    def _ec2_image(self, image_id):
+        """Get a stand-in for an EC2 image."""
+        def load():
+            image = self.images[image_id]
+            return {
+                'id': image_id,
+                'name': None,
+                'owner_id': image['owner_id'],
+                'product_codes': None,
+                'state': 'available',
+                'state_reason': None,
+                'root_device_name': '/dev/sda1',
+                'block_device_mappings': [{
+                    'DeviceName': '/dev/sda1',
+                    'Ebs': {'SnapshotId': image['snapshot_id']},
+                }],
+            }
+
+        return LocalResource(self, 'ec2.DescribeImages', load)
+
+    def _ec2_snapshot(self, snapshot_id):
+        """Get a stand-in for an EC2 snapshot."""
+        def load():
+            snapshot = self._get_snapshot(snapshot_id, 'DescribeSnapshots')
+            state = self._snapshot_state(snapshot)
+            return {
+                'snapshot_id': snapshot_id,
+                'owner_id': snapshot['owner_id'],
+                'encrypted': False,
+                'state': state,
+                'progress': '100%' if state == 'completed' else '50%',
+            }
+
+        def modify_attribute(OperationType, UserIds, **kwargs):
+            self.count('ec2.ModifySnapshotAttribute')
+            permissions = self._get_snapshot(
+                snapshot_id, 'ModifySnapshotAttribute')['permissions']
+            if OperationType == 'add':
+                permissions.update(UserIds)
+            else:
+                permissions.difference_update(UserIds)
+
+        def describe_attribute(Attribute):
+            self.count('ec2.DescribeSnapshotAttribute')
+            permissions = self._get_snapshot(
+                snapshot_id, 'DescribeSnapshotAttribute')['permissions']
+            return {'CreateVolumePermissions': [
+                {'UserId': user_id} for user_id in sorted(permissions)
+            ]}
+
+        def copy(SourceRegion):
+            self.count('ec2.CopySnapshot')
+            return {'SnapshotId': self._copy_snapshot(snapshot_id)}
+
+        def delete(DryRun=False):
+            self.count('ec2.DeleteSnapshot')
+            self._get_snapshot(snapshot_id, 'DeleteSnapshot')
+            del self.snapshots[snapshot_id]
+
+        return LocalResource(
+            self, 'ec2.DescribeSnapshots', load,
+            modify_attribute=modify_attribute,
+            describe_attribute=describe_attribute,
+            copy=copy,
+            delete=delete,
+        )
+
+    def _get_snapshot(self, snapshot_id, operation):
+        """Get a snapshot's details or raise AWS's not found error."""
+        if snapshot_id not in self.snapshots:
+            raise self._not_found('InvalidSnapshot.NotFound', operation)
+        return self.snapshots[snapshot_id]
+
+    def _copy_snapshot(self, snapshot_id):
+        """Start copying a snapshot to the primary account."""
+        self._get_snapshot(snapshot_id, 'CopySnapshot')
+        copying_count = len([
+            snapshot for snapshot in self.snapshots.values()
+            if snapshot['owner_id'] == PRIMARY_ACCOUNT_ID and
+            self._snapshot_state(snapshot) == 'pending'
+        ])
+        if self.snapshot_copy_limit is not None and \
+                copying_count >= self.snapshot_copy_limit:
+            raise ClientError({'Error': {
+                'Code': 'ResourceLimitExceeded',
+                'Message': 'Too many snapshot copies in progress',
+            }}, 'CopySnapshot')
+        copy_id = self._new_id('snap')
+        self.snapshots[copy_id] = {
+            'owner_id': PRIMARY_ACCOUNT_ID,
+            'ready_at': self._delay(self.snapshot_copy_seconds),
+            'permissions': set(),
+        }
+        return copy_id
+
+    def _ec2_volume(self, volume_id):
+        """Get a stand-in for an EC2 volume."""
+        def load():
+            if volume_id not in self.volumes:
+                raise self._not_found('InvalidVolume.NotFound',
+                                      'DescribeVolumes')
+            return {'id': volume_id,
+                    'state': self._volume_state(self.volumes[volume_id])}
+
+        return LocalResource(self, 'ec2.DescribeVolumes', load)
+
+    def _ec2_create_volume(self, SnapshotId, AvailabilityZone):
+        """Start creating a volume from a snapshot."""
+        self.count('ec2.CreateVolume')
+        self._get_snapshot(SnapshotId, 'CreateVolume')
+        volume_id = self._new_id('vol')
+        self.volumes[volume_id] = {
+            'ready_at': self._delay(self.volume_seconds),
+            'instance_id': None,
+        }
+        return types.SimpleNamespace(id=volume_id)
+
+    def _ec2_get_paginator(self, operation_name):
+        """Get a stand-in paginator for describing snapshots or volumes."""
+        if operation_name == 'describe_snapshots':
+            operation, results_key, id_key = \
+                'ec2.DescribeSnapshots', 'Snapshots', 'SnapshotId'
+            resources, get_state = self.snapshots, self._snapshot_state
+        else:
+            operation, results_key, id_key = \
+                'ec2.DescribeVolumes', 'Volumes', 'VolumeId'
+            resources, get_state = self.volumes, self._volume_state
+
+        def paginate(Filters):
+            self.count(operation)
+            resource_ids = Filters[0]['Values']
+            yield {results_key: [
+                {id_key: resource_id,
+                 'State': get_state(resources[resource_id])}
+                for resource_id in resource_ids if resource_id in resources
+            ]}
+
+        return types.SimpleNamespace(paginate=paginate)
+
+    def _ec2_attach_volume(self, Device, InstanceId, VolumeId):
+        """Attach a volume to a cluster instance."""
+        self.count('ec2.AttachVolume')
+        with self._lock:
+            self.volumes[VolumeId]['instance_id'] = InstanceId
+
+    def _sts_assume_role(self, RoleArn, **kwargs):
+        """Get stand-in credentials that identify the customer account."""
+        self.count('sts.AssumeRole')
+        account_id = RoleArn.split(':')[4]
+        return {'Credentials': {
+            'AccessKeyId': account_id,
+            'SecretAccessKey': 'local',
+            'SessionToken': 'local',
+        }}
+
+    def _sqs_get_queue_url(self, QueueName):
+        """Get a queue's URL if the queue exists."""
+        self.count('sqs.GetQueueUrl')
+        queue_url = QUEUE_URL_PREFIX + QueueName
+        if queue_url not in self.queues:
+            raise self._not_found(
+                'AWS.SimpleQueueService.NonExistentQueue', 'GetQueueUrl')
+        return {'QueueUrl': queue_url}
+
+    def _sqs_create_queue(self, QueueName):
+        """Create a queue."""
+        self.count('sqs.CreateQueue')
+        queue_url = QUEUE_URL_PREFIX + QueueName
+        with self._lock:
+            self.queues.setdefault(queue_url, [])
+        return {'QueueUrl': queue_url}
+
+    def _send_message(self, queue_url, body, sent_at=None):
+        """Put a message in a queue, optionally as of a future time."""
+        if sent_at is None:
+            sent_at = self.clock
+        message_id = str(uuid.uuid4())
+        with self._lock:
+            self.queues.setdefault(queue_url, []).append({
+                'MessageId': message_id,
+                'Body': body,
+                'sent_at': sent_at,
+                'visible_at': sent_at,
+                'ReceiptHandle': None,
+            })
+        return message_id
+
+    def _sqs_send_message_batch(self, QueueUrl, Entries):
+        """Send a batch of messages to a queue."""
+        self.count('sqs.SendMessageBatch')
+        return {'Successful': [
+            {'Id': entry['Id'],
+             'MessageId': self._send_message(QueueUrl, entry['MessageBody'])}
+            for entry in Entries
+        ]}
+
+    def _visible_messages(self, queue_url):
+        """Get the messages in a queue that may be received now."""
+        return [
+            message for message in self.queues.get(queue_url, [])
+            if message['visible_at'] <= self.clock
+        ]
+
+    def _sqs_receive_message(self, QueueUrl, MaxNumberOfMessages=1,
+                             **kwargs):
+        """Receive messages, hiding them for the visibility timeout."""
+        self.count('sqs.ReceiveMessage')
+        received = []
+        with self._lock:
+            for message in self._visible_messages(
+                    QueueUrl)[:MaxNumberOfMessages]:
+                message['visible_at'] = self.clock + VISIBILITY_TIMEOUT
+                message['ReceiptHandle'] = str(uuid.uuid4())
+                received.append({
+                    'MessageId': message['MessageId'],
+                    'Body': message['Body'],
+                    'ReceiptHandle': message['ReceiptHandle'],
+                })
+        return {'Messages': received} if received else {}
+
+    def _sqs_delete_message_batch(self, QueueUrl, Entries):
+        """Delete received messages from a queue."""
+        self.count('sqs.DeleteMessageBatch')
+        receipt_handles = {entry['ReceiptHandle'] for entry in Entries}
+        with self._lock:
+            self.queues[QueueUrl] = [
+                message for message in self.queues[QueueUrl]
+                if message['ReceiptHandle'] not in receipt_handles
+            ]
+        return {'Successful': [{'Id': entry['Id']} for entry in Entries]}
+
+    def _sqs_get_queue_attributes(self, QueueUrl, AttributeNames):
+        """Get how many messages may be received from a queue now."""
+        self.count('sqs.GetQueueAttributes')
+        return {'Attributes': {
+            'ApproximateNumberOfMessages': str(
+                len(self._visible_messages(QueueUrl))),
+        }}
+
+    def _cloudwatch_get_metric_statistics(self, Dimensions, EndTime,
+                                          **kwargs):
+        """Get the age of the oldest message in a queue."""
+        self.count('cloudwatch.GetMetricStatistics')
+        queue_url = QUEUE_URL_PREFIX + Dimensions[0]['Value']
+        sent_at = [
+            message['sent_at'] for message in self._visible_messages(queue_url)
+        ]
+        if not sent_at:
+            return {'Datapoints': []}
+        return {'Datapoints': [
+            {'Timestamp': EndTime, 'Maximum': self.clock - min(sent_at)},
+        ]}
+
+    def _describe_groups(self, AutoScalingGroupNames, **kwargs):
+        """Describe an Auto Scaling group."""
+        self.count('autoscaling.DescribeAutoScalingGroups')
+        name = AutoScalingGroupNames[0]
+        size = len(self.groups[name])
+        return {'AutoScalingGroups': [{
+            'AutoScalingGroupName': name,
+            'MinSize': size,
+            'MaxSize': size,
+            'DesiredCapacity': size,
+            'Instances': [
+                {'InstanceId': instance_id}
+                for instance_id in self.groups[name]
+            ],
+        }]}
+
+    def _update_group(self, AutoScalingGroupName, DesiredCapacity, **kwargs):
+        """Launch or terminate instances to resize an Auto Scaling group."""
+        self.count('autoscaling.UpdateAutoScalingGroup')
+        instance_ids = self.groups[AutoScalingGroupName]
+        while len(instance_ids) < DesiredCapacity:
+            instance_id = self._new_id('i')
+            self.instances[instance_id] = self._delay(
+                self.instance_boot_seconds)
+            instance_ids.append(instance_id)
+        while len(instance_ids) > DesiredCapacity:
+            instance_id = instance_ids.pop()
+            del self.instances[instance_id]
+            # Attached volumes are deleted when their instance terminates.
+            for volume_id, volume in list(self.volumes.items()):
+                if volume['instance_id'] == instance_id:
+                    del self.volumes[volume_id]
+        return {}
+
+    def _get_cluster_instance_ids(self, cluster):
+        """Get the ids of a cluster's instances that have registered."""
+        for target in account_util.get_inspection_targets():
+            if target.ecs_cluster_name == cluster:
+                return [
+                    instance_id for instance_id in
+                    self.groups[target.autoscaling_group_name]
+                    if self.instances[instance_id] <= self.clock
+                ]
+        return []
+
+    def _ecs_list_container_instances(self, cluster):
+        """List a cluster's registered container instances."""
+        self.count('ecs.ListContainerInstances')
+        return {'containerInstanceArns': [
+            'arn:aws:ecs:local:container-instance/{0}'.format(instance_id)
+            for instance_id in self._get_cluster_instance_ids(cluster)
+        ]}
+
+    def _ecs_describe_container_instances(self, containerInstances, cluster):
+        """Describe container instances."""
+        self.count('ecs.DescribeContainerInstances')
+        return {'containerInstances': [
+            {'containerInstanceArn': arn,
+             'ec2InstanceId': arn.rsplit('/', 1)[1]}
+            for arn in containerInstances
+        ]}
+
+    def _ecs_start_task(self, overrides, **kwargs):
+        """Run houndigrade, which sends its results after inspecting."""
+        self.count('ecs.StartTask')
+        command = overrides['containerOverrides'][0]['command']
+        results = {}
+        for index, argument in enumerate(command):
+            if argument != '-t':
+                continue
+            ami_id, device = command[index + 1:index + 3]
+            results[ami_id] = {device: {device + '1': {
+                'rhel_found': self.rng.random() < self.rhel_ratio,
+            }}}
+        body = json.dumps({tasks.CLOUD_KEY: tasks.CLOUD_TYPE_AWS,
+                           'results': results})
+        self._send_message(
+            QUEUE_URL_PREFIX + settings.HOUNDIGRADE_RESULTS_QUEUE_NAME,
+            body, self._delay(self.inspection_seconds))
+        return {}
+
+
+class LocalWorker(object):
+    """
+    Run Celery tasks in this process on the stand-ins' simulated clock.
+
+    While patched in, every task sent with delay or apply_async (including
+    retries) is scheduled here instead of on the broker, to run once the
+    simulated clock reaches its countdown. Tasks run as they would in a
+    worker, so their automatic retries are scheduled with their usual backoff
+    and counted.
+    """
+
+    def __init__(self, local_aws):
+        """Initialize an empty schedule on the stand-ins' clock."""
+        self.local_aws = local_aws
+        self.task_runs = collections.Counter()
+        self.retries = collections.Counter()
+        self.failures = collections.Counter()
+        self._scheduled = []
+        self._sequence = itertools.count()
+
+    def apply_async(self, task, args=None, kwargs=None, countdown=None,
+                    retries=0, **options):
+        """Schedule a task to run after its countdown."""
+        run_at = self.local_aws.clock + (countdown or 0)
+        heapq.heappush(self._scheduled, (
+            run_at, next(self._sequence), task, tuple(args or ()),
+            dict(kwargs or {}), retries,
+        ))
+
+    def next_run_at(self):
+        """Get when the next scheduled task should run, if any."""
+        return self._scheduled[0][0] if self._scheduled else None
+
+    def run_next(self):
+        """Run the next scheduled task and record how it went."""
+        __, __, task, args, kwargs, retries = heapq.heappop(self._scheduled)
+        self.task_runs[task.name] += 1
+        task.push_request(id=str(uuid.uuid4()), args=args, kwargs=kwargs,
+                          retries=retries, called_directly=False,
+                          is_eager=False)
+        try:
+            task.run(*args, **kwargs)
+        except Retry:
+            self.retries[task.name] += 1
+        except Exception as e:
+            self.failures[task.name] += 1
+            logger.info(_('{0} failed: {1}').format(task.name, repr(e)))
+        finally:
+            task.pop_request()
+
+    @contextlib.contextmanager
+    def patched(self):
+        """Schedule tasks here instead of sending them to the broker."""
+        worker = self
+
+        def apply_async(task, *args, **kwargs):
+            return worker.apply_async(task, *args, **kwargs)
+
+        with patch.object(Task, 'apply_async', apply_async):
+            yield self
+
+
+def prepare_inspection_images(local_aws, image_count, account_count=1,
+                              rng=None):
+    """
+    Create customer accounts with images that are pending inspection.
+
+    Accounts and images are reused if they already exist, so that repeated
+    runs with the same seed do not accumulate them, but reused images are
+    reset to be pending inspection again.
+
+    Args:
+        local_aws (LocalInspectionAws): stand-ins to add the images to
+        image_count (int): number of images to inspect
+        account_count (int): number of customer accounts owning the images
+        rng (random.Random): optional source of randomness
+
+    Returns:
+        list[tuple]: each image's (account arn, ami id).
+
+    """
+    if rng is None:
+        rng = random.Random()
+    user, __ = User.objects.get_or_create(username=BENCHMARK_USERNAME)
+    accounts = []
+    for __ in range(account_count):
+        aws_account_id = '{0:012d}'.format(rng.randrange(10 ** 12))
+        account, __ = AwsAccount.objects.get_or_create(
+            aws_account_id=aws_account_id,
+            defaults={
+                'user': user,
+                'account_arn': 'arn:aws:iam::{0}:role/benchmark'.format(
+                    aws_account_id),
+            },
+        )
+        accounts.append(account)
+
+    images = []
+    for index in range(image_count):
+        account = accounts[index % len(accounts)]
+        ami_id = local_aws.add_customer_image(account.aws_account_id)
+        AwsMachineImage.objects.update_or_create(
+            ec2_ami_id=ami_id,
+            defaults={
+                'account': account,
+                'status': MachineImage.PENDING,
+                'inspection_claimed_at': None,
+                'inspection_json': None,
+                'root_snapshot_id': None,
+            },
+        )
+        images.append((account.account_arn, ami_id))
+    return images
+
+
+def run_inspection_load_test(images=10, account_count=1,
+                             snapshot_copy_seconds=600, volume_seconds=60,
+                             instance_boot_seconds=180,
+                             inspection_seconds=300, delay_jitter=0.25,
+                             rhel_ratio=0.5, snapshot_copy_limit=None,
+                             max_seconds=24 * 60 * 60, seed=None):
+    """
+    Inspect many images at once through the whole inspection pipeline.
+
+    Inspection of every image is started at once, and then the tasks from
+    copy_ami_snapshot through persist_inspection_cluster_results_task run in
+    this process against local AWS stand-ins on a simulated clock, with the
+    periodic tasks running as often as CELERY_BEAT_SCHEDULE says, until every
+    image is inspected or max_seconds of simulated time have passed.
+
+    Throughput is measured in images per simulated hour, which is dominated
+    by the simulated AWS delays, and the benchmark measures how much real
+    time, queries, and memory cloudigrade itself spent. Tasks run as soon as
+    they are due, as if there were always a free worker, and any timeouts
+    based on the real time of day will not expire during a run.
+
+    Args:
+        images (int): number of images to inspect concurrently
+        account_count (int): number of customer accounts owning the images
+        snapshot_copy_seconds (float): time for a snapshot copy to finish
+        volume_seconds (float): time for a new volume to become available
+        instance_boot_seconds (float): time for a new cluster instance to
+            register with ECS
+        inspection_seconds (float): time for houndigrade to inspect an
+            instance's volumes
+        delay_jitter (float): each delay varies randomly by up to this
+            fraction either way
+        rhel_ratio (float): fraction of images houndigrade finds RHEL on
+        snapshot_copy_limit (int): optional number of snapshot copies that
+            may be in progress at once before AWS refuses more
+        max_seconds (float): simulated time to give up after
+        seed (int): optional seed for reproducible delays and results
+
+    Returns:
+        InspectionLoadTestResult: the run's throughput, task runs, retries
+            and failures by task, and API calls by operation.
+
+    """
+    rng = random.Random(seed)
+    local_aws = LocalInspectionAws(
+        snapshot_copy_seconds, volume_seconds, instance_boot_seconds,
+        inspection_seconds, delay_jitter, rhel_ratio, snapshot_copy_limit,
+        rng)
+    worker = LocalWorker(local_aws)
+    arn_ami_ids = prepare_inspection_images(local_aws, images, account_count,
+                                            rng)
+    ami_ids = [ami_id for __, ami_id in arn_ami_ids]
+    region = settings.HOUNDIGRADE_AWS_REGION
+
+    def run_pipeline():
+        with local_aws.patched(), worker.patched():
+            for arn, ami_id in arn_ami_ids:
+                account_util.start_image_inspection(arn, ami_id, region)
+            _run_until_inspected(local_aws, worker, ami_ids, max_seconds)
+
+    benchmark = measure('inspection_pipeline', run_pipeline, {
+        'images': images,
+        'snapshot_copy_seconds': snapshot_copy_seconds,
+        'volume_seconds': volume_seconds,
+        'instance_boot_seconds': instance_boot_seconds,
+        'inspection_seconds': inspection_seconds,
+    }, items=images)
+
+    inspected = AwsMachineImage.objects.filter(
+        ec2_ami_id__in=ami_ids, status=MachineImage.INSPECTED).count()
+    simulated_seconds = local_aws.clock
+    images_per_hour = inspected * 3600 / simulated_seconds \
+        if simulated_seconds else None
+    return InspectionLoadTestResult(
+        benchmark=benchmark,
+        images=images,
+        inspected=inspected,
+        simulated_seconds=simulated_seconds,
+        images_per_hour=images_per_hour,
+        task_runs=dict(worker.task_runs),
+        retries=dict(worker.retries),
+        failures=dict(worker.failures),
+        api_calls=dict(local_aws.api_calls),
+    )
+
+
+def _run_until_inspected(local_aws, worker, ami_ids, max_seconds):
+    """Run due tasks and periodic tasks until the images are inspected."""
+    intervals = {
+        task: settings.CELERY_BEAT_SCHEDULE[name]['schedule']
+        for name, task in PERIODIC_TASKS.items()
+    }
+    next_ticks = dict(intervals)
+    uninspected = AwsMachineImage.objects.filter(
+        ec2_ami_id__in=ami_ids).exclude(status=MachineImage.INSPECTED)
+
+    while True:
+        next_run_at = worker.next_run_at()
+        next_tick = min(next_ticks.values())
+        if next_run_at is not None and next_run_at <= next_tick:
+            local_aws.clock = max(local_aws.clock, next_run_at)
+            worker.run_next()
+            continue
+        # Only check on the images between rounds of periodic tasks, since
+        # results only arrive through persist_inspection_cluster_results_task.
+        if not uninspected.exists() or next_tick > max_seconds:
+            return
+        local_aws.clock = next_tick
+        for task, tick in sorted(next_ticks.items(),
+                                 key=lambda item: item[1]):
+            if tick <= next_tick:
+                task.delay()
+                next_ticks[task] = tick + intervals[task]
@@ -0,0 +1,105 @@
+"""Management command to load test the image inspection pipeline."""
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils.translation import gettext as _
+
+from account import inspection_benchmarks
+from util.benchmark import format_result, get_run_metadata, write_results
+
+
+class Command(BaseCommand):
+    """Inspect many images at once against local AWS stand-ins."""
+
+    help = _(
+        'Start inspecting many images at once and run the whole inspection '
+        'pipeline in this process against local EC2, SQS, ECS, and Auto '
+        'Scaling stand-ins with simulated delays. Reports throughput in '
+        'images per hour, retries by task, and AWS API calls. Results are '
+        'appended as JSON Lines to --output for comparing runs over time.'
+    )
+
+    def add_arguments(self, parser):
+        """Add the command's arguments."""
+        parser.add_argument('--images', type=int, default=50)
+        parser.add_argument('--accounts', type=int, default=5)
+        parser.add_argument('--snapshot-copy-seconds', type=float,
+                            default=600)
+        parser.add_argument('--volume-seconds', type=float, default=60)
+        parser.add_argument('--instance-boot-seconds', type=float,
+                            default=180)
+        parser.add_argument('--inspection-seconds', type=float, default=300)
+        parser.add_argument(
+            '--delay-jitter', type=float, default=0.25,
+            help=_('fraction by which each simulated delay varies'))
+        parser.add_argument('--rhel-ratio', type=float, default=0.5)
+        parser.add_argument(
+            '--snapshot-copy-limit', type=int, default=None,
+            help=_('snapshot copies AWS allows in progress at once'))
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help=_('override HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE'))
+        parser.add_argument(
+            '--max-instances', type=int, default=None,
+            help=_('override HOUNDIGRADE_AWS_MAX_INSTANCES'))
+        parser.add_argument(
+            '--max-hours', type=float, default=24,
+            help=_('simulated hours to give up after'))
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--label', default=None,
+                            help=_('label to identify this run in results'))
+        parser.add_argument('--output', default=None,
+                            help=_('file to append JSON Lines results to'))
+
+    def handle(self, *args, **options):
+        """Run the inspection load test."""
+        overrides = {}
+        if options['batch_size'] is not None:
+            overrides['HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE'] = \
+                options['batch_size']
+        if options['max_instances'] is not None:
+            overrides['HOUNDIGRADE_AWS_MAX_INSTANCES'] = \
+                options['max_instances']
+
+        with override_settings(**overrides):
+            result = inspection_benchmarks.run_inspection_load_test(
+                images=options['images'],
+                account_count=options['accounts'],
+                snapshot_copy_seconds=options['snapshot_copy_seconds'],
+                volume_seconds=options['volume_seconds'],
+                instance_boot_seconds=options['instance_boot_seconds'],
+                inspection_seconds=options['inspection_seconds'],
+                delay_jitter=options['delay_jitter'],
+                rhel_ratio=options['rhel_ratio'],
+                snapshot_copy_limit=options['snapshot_copy_limit'],
+                max_seconds=options['max_hours'] * 60 * 60,
+                seed=options['seed'],
+            )
+
+        self.stdout.write(format_result(result.benchmark))
+        self.stdout.write(_(
+            'Inspected {0} of {1} images in {2:.1f} simulated minutes: '
+            '{3:.1f} images/h'
+        ).format(result.inspected, result.images,
+                 result.simulated_seconds / 60, result.images_per_hour or 0))
+        for task_name, runs in sorted(result.task_runs.items()):
+            self.stdout.write(_('{0}: {1} run(s), {2} retry(s), {3} '
+                                'failure(s)').format(
+                task_name, runs, result.retries.get(task_name, 0),
+                result.failures.get(task_name, 0)))
+        for operation, calls in sorted(result.api_calls.items()):
+            self.stdout.write(_('{0}: {1} call(s)').format(operation, calls))
+
+        if options['output']:
+            metadata = get_run_metadata(
+                options['label'],
+                settings_overrides=overrides,
+                inspected=result.inspected,
+                simulated_seconds=result.simulated_seconds,
+                images_per_hour=result.images_per_hour,
+                task_runs=result.task_runs,
+                retries=result.retries,
+                failures=result.failures,
+                api_calls=result.api_calls,
+            )
+            with open(options['output'], 'a') as stream:
+                write_results([result.benchmark], stream, metadata)
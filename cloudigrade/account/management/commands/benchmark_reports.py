@@ -0,0 +1,112 @@
+"""Management command to benchmark report generation."""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from account import benchmarks, reports
+from util.benchmark import format_result, get_run_metadata, write_results
+
+
+def _comma_separated(value):
+    """Split a comma-separated command line option into a list."""
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _comma_separated_ints(value):
+    """Split a comma-separated command line option into a list of ints."""
+    return [int(item) for item in _comma_separated(value)]
+
+
+class Command(BaseCommand):
+    """Load synthetic data and time each report type and window length."""
+
+    help = _(
+        'Bulk-load synthetic users, accounts, images, instances, and events, '
+        'then time each report type and window length. Results are appended '
+        'as JSON Lines to --output for comparing runs over time.'
+    )
+
+    def add_arguments(self, parser):
+        """Add the command's arguments."""
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--accounts-per-user', type=int, default=2)
+        parser.add_argument('--images-per-account', type=int, default=5)
+        parser.add_argument('--instances-per-account', type=int, default=10)
+        parser.add_argument('--events-per-instance', type=int, default=20)
+        parser.add_argument('--days', type=int, default=90,
+                            help=_('days of history to generate events for'))
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--skip-load', action='store_true',
+                            help=_('reuse previously loaded benchmark data'))
+        parser.add_argument('--load-only', action='store_true',
+                            help=_('load data without running any reports'))
+        parser.add_argument('--windows', type=_comma_separated_ints,
+                            default=[1, 7, 30],
+                            help=_('report window lengths in days'))
+        parser.add_argument('--granularities', type=_comma_separated,
+                            default=[reports.GRANULARITY_DAILY])
+        parser.add_argument('--backends', type=_comma_separated,
+                            default=['python'],
+                            help=_('REPORT_USAGE_BACKEND values to run'))
+        parser.add_argument('--reports', type=_comma_separated,
+                            default=list(benchmarks.REPORT_TYPES))
+        parser.add_argument('--repeat', type=int, default=1)
+        parser.add_argument('--label', default=None,
+                            help=_('label to identify this run in results'))
+        parser.add_argument('--output', default=None,
+                            help=_('file to append JSON Lines results to'))
+
+    def handle(self, *args, **options):
+        """Load the benchmark data and run the report scenarios."""
+        unknown = set(options['reports']) - set(benchmarks.REPORT_TYPES)
+        unknown |= set(options['granularities']) - set(reports.GRANULARITIES)
+        if unknown:
+            raise CommandError(_('Unknown report or granularity: {0}').format(
+                ', '.join(sorted(unknown))))
+
+        end = timezone.now()
+        if options['skip_load']:
+            user_ids = benchmarks.get_benchmark_user_ids()
+            if not user_ids:
+                raise CommandError(_('No benchmark data has been loaded.'))
+            dataset = {'users': len(user_ids)}
+        else:
+            loaded = benchmarks.generate_benchmark_data(
+                users=options['users'],
+                accounts_per_user=options['accounts_per_user'],
+                images_per_account=options['images_per_account'],
+                instances_per_account=options['instances_per_account'],
+                events_per_instance=options['events_per_instance'],
+                batch_size=options['batch_size'],
+                seed=options['seed'],
+                start=end - datetime.timedelta(days=options['days']),
+                end=end,
+            )
+            user_ids = loaded.user_ids
+            dataset = dict(loaded._asdict(), users=len(user_ids))
+            del dataset['user_ids']
+            self.stdout.write(_('Loaded {0}').format(dataset))
+        if options['load_only']:
+            return
+
+        metadata = get_run_metadata(options['label'], dataset=dataset)
+        results = []
+        for result in benchmarks.run_report_benchmarks(
+                user_ids,
+                end=end,
+                windows=options['windows'],
+                granularities=options['granularities'],
+                backends=options['backends'],
+                report_types=options['reports'],
+                repeat=options['repeat']):
+            self.stdout.write(format_result(result))
+            results.append(result)
+
+        if options['output'] == '-':
+            write_results(results, self.stdout, metadata)
+        elif options['output']:
+            with open(options['output'], 'a') as stream:
+                write_results(results, stream, metadata)
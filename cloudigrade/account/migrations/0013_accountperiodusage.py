@@ -0,0 +1,33 @@
+# Generated by Django 2.0.7 on 2026-10-18 21:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0012_instanceevent_machineimage_fkey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountPeriodUsage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('period_start', models.DateTimeField(db_index=True)),
+                ('period_end', models.DateTimeField(db_index=True)),
+                ('rhel_instance_ids', models.TextField(default='[]')),
+                ('openshift_instance_ids', models.TextField(default='[]')),
+                ('rhel_runtime_seconds', models.FloatField(default=0.0)),
+                ('openshift_runtime_seconds', models.FloatField(default=0.0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='account.Account')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='accountperiodusage',
+            unique_together={('account', 'period_start', 'period_end')},
+        ),
+    ]
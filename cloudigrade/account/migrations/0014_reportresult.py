@@ -0,0 +1,35 @@
+# Generated by Django 2.0.7 on 2026-10-18 22:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('account', '0013_accountperiodusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('report_name', models.CharField(max_length=32)),
+                ('cache_key', models.CharField(db_index=True, max_length=256)),
+                ('parameters', models.TextField(default='{}')),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('running', 'running'), ('complete', 'complete'), ('failed', 'failed')], default='pending', max_length=32)),
+                ('result', models.BinaryField(null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('created_at',),
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.0.7 on 2026-10-18 22:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0014_reportresult'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AwsPendingResource',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('resource_type', models.CharField(choices=[('snapshot', 'snapshot'), ('volume', 'volume')], max_length=32)),
+                ('resource_id', models.CharField(db_index=True, max_length=256)),
+                ('region', models.CharField(blank=True, max_length=256, null=True)),
+                ('ready_tasks', models.TextField(default='[]')),
+            ],
+            options={
+                'ordering': ('created_at',),
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.0.7 on 2026-10-18 22:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0015_awspendingresource'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AwsSnapshotCopyRequest',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('arn', models.CharField(max_length=256)),
+                ('ec2_ami_id', models.CharField(max_length=256)),
+                ('customer_snapshot_id', models.CharField(max_length=256)),
+                ('snapshot_region', models.CharField(db_index=True, max_length=256)),
+                ('reference_ami_id', models.CharField(blank=True, max_length=256, null=True)),
+                ('priority', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('queued', 'queued'), ('copying', 'copying')], default='queued', max_length=32)),
+                ('snapshot_copy_id', models.CharField(blank=True, db_index=True, max_length=256, null=True)),
+            ],
+            options={
+                'ordering': ('created_at',),
+                'abstract': False,
+            },
+        ),
+    ]
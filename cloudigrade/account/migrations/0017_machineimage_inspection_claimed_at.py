@@ -0,0 +1,30 @@
+# Generated by Django 2.0.7 on 2026-10-18 22:45
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def claim_images_in_progress(apps, schema_editor):
+    """Claim images already being inspected so they are not restarted."""
+    MachineImage = apps.get_model('account', 'MachineImage')
+    MachineImage.objects.filter(
+        status__in=('preparing', 'inspecting'),
+        inspection_claimed_at__isnull=True,
+    ).update(inspection_claimed_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0016_awssnapshotcopyrequest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='machineimage',
+            name='inspection_claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(claim_images_in_progress,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.0.7 on 2026-10-18 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0017_machineimage_inspection_claimed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnownImage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner_id', models.CharField(blank=True, db_index=True, max_length=16, null=True)),
+                ('product_code', models.CharField(blank=True, db_index=True, max_length=256, null=True)),
+                ('name_pattern', models.CharField(blank=True, max_length=256, null=True)),
+                ('rhel', models.BooleanField(default=False)),
+                ('openshift', models.BooleanField(default=False)),
+            ],
+            options={
+                'ordering': ('created_at',),
+                'abstract': False,
+            },
+        ),
+    ]
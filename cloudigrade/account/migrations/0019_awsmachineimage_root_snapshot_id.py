@@ -0,0 +1,18 @@
+# Generated by Django 2.0.7 on 2026-10-18 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0018_knownimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='awsmachineimage',
+            name='root_snapshot_id',
+            field=models.CharField(blank=True, db_index=True, max_length=256, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.0.7 on 2026-10-18 23:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0019_awsmachineimage_root_snapshot_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='awsmachineimage',
+            name='inspection_region',
+            field=models.CharField(blank=True, max_length=256, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.0.7 on 2026-10-19 00:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0020_awsmachineimage_inspection_region'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportresult',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
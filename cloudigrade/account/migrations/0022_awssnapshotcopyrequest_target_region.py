@@ -0,0 +1,38 @@
+# Generated by Django 2.0.7 on 2026-10-19 01:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def set_target_regions(apps, schema_editor):
+    """Set each existing copy request's target to the primary region."""
+    AwsSnapshotCopyRequest = apps.get_model('account',
+                                            'AwsSnapshotCopyRequest')
+    AwsSnapshotCopyRequest.objects.update(
+        target_region=settings.HOUNDIGRADE_AWS_REGION)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0021_reportresult_started_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='awssnapshotcopyrequest',
+            name='admitted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='awssnapshotcopyrequest',
+            name='target_region',
+            field=models.CharField(db_index=True, max_length=256, null=True),
+        ),
+        migrations.RunPython(set_target_regions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='awssnapshotcopyrequest',
+            name='target_region',
+            field=models.CharField(db_index=True, max_length=256),
+        ),
+    ]
@@ -1,9 +1,12 @@
 """Cloudigrade Account Models."""
+import json
+import zlib
 from abc import abstractmethod
 
 import model_utils
 from django.contrib.auth.models import User
 from django.db import models
+from rest_framework.utils.encoders import JSONEncoder
 
 from account import AWS_PROVIDER_STRING
 from util.models import (BaseModel,
@@ -72,6 +75,7 @@ class MachineImage(BasePolymorphicModel):
     is_encrypted = models.NullBooleanField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES,
                               default=PENDING)
+    inspection_claimed_at = models.DateTimeField(null=True, blank=True)
 
     @property
     def rhel(self):
@@ -179,6 +183,17 @@ class AwsMachineImage(MachineImage):
         null=False,
         blank=False
     )
+    root_snapshot_id = models.CharField(
+        max_length=256,
+        db_index=True,
+        null=True,
+        blank=True,
+    )
+    inspection_region = models.CharField(
+        max_length=256,
+        null=True,
+        blank=True,
+    )
 
 
 class AwsMachineImageCopy(AwsMachineImage):
@@ -208,3 +223,204 @@ class AwsInstanceEvent(InstanceEvent):
 
     subnet = models.CharField(max_length=256, null=False, blank=False)
     instance_type = models.CharField(max_length=64, null=False, blank=False)
+
+
+class AccountPeriodUsage(BaseModel):
+    """
+    Calculated usage for one account over one fully closed period.
+
+    Usage for a period that has completely passed can only change when we
+    receive late events or image tag changes, so we keep the calculated
+    results for reuse in future reports. Any change that could affect a
+    stored period deletes it so that it will be calculated again on demand.
+    """
+
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        db_index=True,
+        null=False,
+    )
+    period_start = models.DateTimeField(null=False, db_index=True)
+    period_end = models.DateTimeField(null=False, db_index=True)
+    rhel_instance_ids = models.TextField(null=False, default='[]')
+    openshift_instance_ids = models.TextField(null=False, default='[]')
+    rhel_runtime_seconds = models.FloatField(null=False, default=0.0)
+    openshift_runtime_seconds = models.FloatField(null=False, default=0.0)
+
+    class Meta:
+        unique_together = (('account', 'period_start', 'period_end'),)
+
+
+class ReportResult(BaseModel):
+    """
+    A report generated asynchronously and its stored results.
+
+    Large reports can take longer to generate than a proxy allows for a single
+    request, so they may instead be requested as a job that a Celery task
+    runs. The results are stored as zlib-compressed JSON for later retrieval.
+
+    A job whose worker dies never finishes, so a job still pending or running
+    after REPORT_JOB_LEASE is considered failed.
+    """
+
+    STATUS = model_utils.Choices(
+        'pending',
+        'running',
+        'complete',
+        'failed',
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_index=True,
+        null=False,
+    )
+    report_name = models.CharField(max_length=32, null=False, blank=False)
+    cache_key = models.CharField(max_length=256, null=False, db_index=True)
+    parameters = models.TextField(null=False, default='{}')
+    status = models.CharField(
+        max_length=32,
+        choices=STATUS,
+        default=STATUS.pending,
+        null=False,
+        blank=False,
+    )
+    result = models.BinaryField(null=True)
+    error = models.TextField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+
+    def set_result(self, result):
+        """
+        Compress and store the report's results.
+
+        Args:
+            result (dict): the report results, as returned by the report
+
+        """
+        encoded_result = json.dumps(result, cls=JSONEncoder)
+        self.result = zlib.compress(encoded_result.encode('utf-8'))
+
+    def get_result(self):
+        """
+        Get the report's stored results.
+
+        Returns:
+            dict: the report results, or None if not yet stored.
+
+        """
+        if self.result is None:
+            return None
+        return json.loads(zlib.decompress(self.result).decode('utf-8'))
+
+
+class AwsPendingResource(BaseModel):
+    """
+    An AWS snapshot or volume that an inspection is waiting on.
+
+    Rather than have each inspection task repeatedly check its own snapshot or
+    volume, we record what we are waiting for and which tasks should run once
+    it is ready. A periodic task then checks all pending resources with a few
+    bulk describe calls and dispatches those tasks.
+    """
+
+    TYPE = model_utils.Choices(
+        'snapshot',
+        'volume',
+    )
+    resource_type = models.CharField(
+        max_length=32,
+        choices=TYPE,
+        null=False,
+        blank=False,
+    )
+    resource_id = models.CharField(
+        max_length=256,
+        db_index=True,
+        null=False,
+        blank=False,
+    )
+    region = models.CharField(max_length=256, null=True, blank=True)
+    ready_tasks = models.TextField(null=False, default='[]')
+
+
+class AwsSnapshotCopyRequest(BaseModel):
+    """
+    A customer snapshot waiting for or undergoing a copy to our AWS account.
+
+    AWS limits how many snapshot copies may run concurrently, so rather than
+    start every copy immediately (and retry blindly when we hit the limit), we
+    queue copy requests and only admit a limited number per region at a time.
+    AWS counts copies against the region they are copied to, so the budget is
+    per target_region. Queued requests are admitted in priority order, and a
+    request is deleted once its copy completes to free up its slot.
+    """
+
+    STATUS = model_utils.Choices(
+        'queued',
+        'copying',
+    )
+    arn = models.CharField(max_length=256, null=False, blank=False)
+    ec2_ami_id = models.CharField(max_length=256, null=False, blank=False)
+    customer_snapshot_id = models.CharField(
+        max_length=256,
+        null=False,
+        blank=False,
+    )
+    snapshot_region = models.CharField(
+        max_length=256,
+        db_index=True,
+        null=False,
+        blank=False,
+    )
+    target_region = models.CharField(
+        max_length=256,
+        db_index=True,
+        null=False,
+        blank=False,
+    )
+    reference_ami_id = models.CharField(max_length=256, null=True, blank=True)
+    priority = models.IntegerField(null=False, default=0)
+    status = models.CharField(
+        max_length=32,
+        choices=STATUS,
+        default=STATUS.queued,
+        null=False,
+        blank=False,
+    )
+    snapshot_copy_id = models.CharField(
+        max_length=256,
+        db_index=True,
+        null=True,
+        blank=True,
+    )
+    admitted_at = models.DateTimeField(null=True, blank=True)
+
+
+class KnownImage(BaseModel):
+    """
+    A published image we already know the contents of without inspecting it.
+
+    Images published by Red Hat (or sold with a RHEL product code) are RHEL
+    by definition, so there is no need to spend a snapshot copy and cluster
+    time inspecting them. Each entry matches images by any combination of
+    owner account ID, product code, and name pattern, and every criterion an
+    entry sets must match. The catalog is refreshed periodically by the
+    refresh_known_images task.
+    """
+
+    owner_id = models.CharField(
+        max_length=16,
+        db_index=True,
+        null=True,
+        blank=True,
+    )
+    product_code = models.CharField(
+        max_length=256,
+        db_index=True,
+        null=True,
+        blank=True,
+    )
+    name_pattern = models.CharField(max_length=256, null=True, blank=True)
+    rhel = models.BooleanField(null=False, default=False)
+    openshift = models.BooleanField(null=False, default=False)
@@ -1,21 +1,59 @@
 """Cloud provider-agnostic report-building functionality."""
+import bisect
 import collections
 import datetime
 import functools
+import json
 import logging
 import operator
 
-from django.db import models
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
 from django.utils.translation import gettext as _
 
-from account.models import Account, Instance, InstanceEvent
+from account import reports_numpy, reports_sql
+from account.models import (Account,
+                            AccountPeriodUsage,
+                            Instance,
+                            InstanceEvent,
+                            User)
 
 logger = logging.getLogger(__name__)
 
+GRANULARITY_HOURLY = 'hourly'
+GRANULARITY_DAILY = 'daily'
+GRANULARITY_WEEKLY = 'weekly'
+GRANULARITY_MONTHLY = 'monthly'
 
-def get_daily_usage(user_id, start, end, name_pattern=None, account_id=None):
+PERIOD_LENGTHS = collections.OrderedDict((
+    (GRANULARITY_HOURLY, relativedelta(hours=1)),
+    (GRANULARITY_DAILY, relativedelta(days=1)),
+    (GRANULARITY_WEEKLY, relativedelta(weeks=1)),
+    (GRANULARITY_MONTHLY, relativedelta(months=1)),
+))
+GRANULARITIES = tuple(PERIOD_LENGTHS.keys())
+
+USAGE_BACKENDS = {
+    'postgresql': reports_sql,
+    'numpy': reports_numpy,
+}
+
+
+def get_daily_usage(user_id, start, end, name_pattern=None, account_id=None,
+                    granularity=GRANULARITY_DAILY):
     """
-    Calculate daily usage over the designated period.
+    Calculate usage over the designated period at the requested granularity.
+
+    Usage for periods that have fully passed is stored per account and reused
+    by later reports, which means only the current period and any periods
+    invalidated by late events or image tag changes need to be calculated
+    again.
+
+    If the REPORT_USAGE_BACKEND setting is "postgresql" or "numpy" and that
+    backend is supported here, the whole calculation is instead performed by
+    the database or by NumPy, respectively.
 
     Args:
         user_id (int): user_id for filtering cloud accounts
@@ -23,22 +61,92 @@ def get_daily_usage(user_id, start, end, name_pattern=None, account_id=None):
         end (datetime.datetime): End time (exclusive)
         name_pattern (str): pattern to filter against cloud account names
         account_id (int): account_id for filtering cloud accounts
+        granularity (str): length of each period in the results; one of
+            GRANULARITIES
 
     Returns:
-        dict: Data structure representing each day in the period and its
-            constituent representative parts in terms of product usage.
+        dict: Data structure representing each period in the report and its
+            constituent representative parts in terms of product usage. For
+            compatibility, the periods are always listed under "daily_usage".
 
     """
     accounts = _filter_accounts(user_id, name_pattern, account_id)
-    events = _get_relevant_events(start, end, accounts)
+    account_ids = list(accounts.values_list('id', flat=True))
+    periods = _get_periods(start, end, granularity)
 
-    instance_events = collections.defaultdict(list)
-    for event in events:
-        instance_events[event.instance].append(event)
-    instance_events = dict(instance_events)
+    usage_backend = _get_usage_backend()
+    if usage_backend is not None:
+        return usage_backend.calculate_daily_usage(account_ids, periods)
+
+    account_period_usages = _get_account_period_usages(account_ids, periods)
+    return _summarize_account_period_usages(
+        account_ids, periods, account_period_usages
+    )
+
+
+def get_daily_usage_by_user(start, end, user_ids=None, name_pattern=None,
+                            granularity=GRANULARITY_DAILY):
+    """
+    Calculate usage over the designated period for each of many users.
+
+    This produces the same results as calling get_daily_usage for each user,
+    but it loads the relevant events for all of the users' accounts at once.
+    Since the results must be grouped by account, this always uses the stored
+    per-account usage regardless of the REPORT_USAGE_BACKEND setting.
+
+    Args:
+        start (datetime.datetime): Start time (inclusive)
+        end (datetime.datetime): End time (exclusive)
+        user_ids (list[int]): Optional ids of users to report on. If not
+            specified, all users are included.
+        name_pattern (str): pattern to filter against cloud account names
+        granularity (str): length of each period in the results; one of
+            GRANULARITIES
+
+    Returns:
+        dict: get_daily_usage results keyed by user id.
+
+    """
+    if user_ids is None:
+        user_ids = User.objects.values_list('id', flat=True)
+    user_ids = list(user_ids)
+    accounts = _filter_accounts(user_ids, name_pattern)
+    user_account_ids = collections.defaultdict(list)
+    for account_id, user_id in accounts.values_list('id', 'user_id'):
+        user_account_ids[user_id].append(account_id)
+    periods = _get_periods(start, end, granularity)
+
+    account_period_usages = _get_account_period_usages(
+        [account_id for account_ids in user_account_ids.values()
+         for account_id in account_ids],
+        periods,
+    )
+    return {
+        user_id: _summarize_account_period_usages(
+            user_account_ids[user_id], periods, account_period_usages
+        )
+        for user_id in user_ids
+    }
+
+
+def _get_usage_backend():
+    """
+    Get the module that should calculate usage instead of this one.
 
-    usage = _calculate_daily_usage(start, end, instance_events)
-    return usage
+    Returns:
+        module: reports_sql or reports_numpy, or None if usage should be
+            calculated here.
+
+    """
+    backend_name = settings.REPORT_USAGE_BACKEND
+    usage_backend = USAGE_BACKENDS.get(backend_name)
+    if usage_backend is None:
+        return None
+    if not usage_backend.is_supported():
+        logger.warning(_('"{0}" report backend is not supported here; '
+                         'falling back to "python".').format(backend_name))
+        return None
+    return usage_backend
 
 
 def _filter_accounts(user_id, name_pattern=None, account_id=None):
@@ -46,7 +154,8 @@ def _filter_accounts(user_id, name_pattern=None, account_id=None):
     Get accounts filtered by user_id and matching name.
 
     Args:
-        user_id (int): required user_id to filter against
+        user_id (int or list[int]): required user_id, or list of user ids, to
+            filter against
         name_pattern (str): optional cloud name pattern to filter against
         account_id (int): optional account_id to filter against
 
@@ -54,7 +163,10 @@ def _filter_accounts(user_id, name_pattern=None, account_id=None):
         PolymorphicQuerySet for the filtered Account objects.
 
     """
-    account_filter = models.Q(user_id=user_id)
+    if isinstance(user_id, (list, tuple, set)):
+        account_filter = models.Q(user_id__in=user_id)
+    else:
+        account_filter = models.Q(user_id=user_id)
 
     if account_id:
         account_filter &= models.Q(id=account_id)
@@ -114,72 +226,364 @@ def _get_relevant_events(start, end, account_ids):
     return events
 
 
-def _calculate_daily_usage(start, end, instance_events):
+def _get_periods(start, end, granularity=GRANULARITY_DAILY):
     """
-    Get all InstanceEvents relevant to the report parameters.
+    Get the start and end times of each period within the reporting period.
+
+    Periods are aligned to start, and a trailing partial period that would
+    extend beyond end is not included. Monthly periods are calendar months
+    long, so they vary from 28 to 31 days.
 
     Args:
         start (datetime.datetime): Start time (inclusive)
         end (datetime.datetime): End time (exclusive)
-        instance_events (list[InstanceEvent]): events to use for calculations
+        granularity (str): length of each period; one of GRANULARITIES
+
+    Returns:
+        list[tuple]: Start (inclusive) and end (exclusive) of each period.
+
     """
+    period_length = PERIOD_LENGTHS[granularity]
     periods = []
-    for day_number in range((end - start).days):
-        period_start = start + datetime.timedelta(days=day_number)
-        period_end = period_start + datetime.timedelta(days=1)
+    period_start = start
+    # Offset each period from start rather than from the previous period so
+    # that months starting on the 31st do not drift to the 28th.
+    period_end = start + period_length
+    while period_end <= end:
         periods.append((period_start, period_end))
+        period_start = period_end
+        period_end = start + period_length * (len(periods) + 1)
+    return periods
+
+
+def _get_account_period_usages(account_ids, periods):
+    """
+    Get usage for each account in each period, reusing stored closed periods.
+
+    Any closed period (one whose end has already passed) that we calculate
+    here is stored for reuse so that future reports can skip it. Only periods
+    that start and end on UTC day boundaries are stored, since reports over
+    arbitrary times would store periods that are never asked for again.
+
+    Args:
+        account_ids (list[int]): the relevant account ids
+        periods (list[tuple]): start and end times of each period
+
+    Returns:
+        dict: Usage dicts keyed by (account_id, period) tuples.
+
+    """
+    usages = {}
+    if not account_ids or not periods:
+        return usages
+
+    now = timezone.now()
+    storable_periods = set([
+        period for period in periods if _is_day_aligned(period)
+    ])
+    usages.update(
+        _get_stored_period_usages(account_ids, storable_periods, now)
+    )
+
+    missing = [
+        (account_id, period)
+        for account_id in account_ids
+        for period in periods
+        if (account_id, period) not in usages
+    ]
+    if not missing:
+        return usages
+
+    missing_account_ids = set([account_id for account_id, __ in missing])
+    missing_start = min([period[0] for __, period in missing])
+    missing_end = max([period[1] for __, period in missing])
+    events = _get_relevant_events(
+        missing_start, missing_end, missing_account_ids
+    )
+
+    account_instance_events = collections.defaultdict(
+        lambda: collections.defaultdict(list)
+    )
+    for event in events:
+        account_instance_events[event.instance.account_id][
+            event.instance].append(event)
+
+    account_missing_periods = collections.OrderedDict()
+    for account_id, period in missing:
+        account_missing_periods.setdefault(account_id, []).append(period)
+
+    image_tags = {}
+    closed_usages = []
+    for account_id, missing_periods in account_missing_periods.items():
+        period_usages = _calculate_period_usages(
+            missing_periods,
+            account_instance_events.get(account_id, {}),
+            image_tags,
+        )
+        for (period_start, period_end), usage in zip(missing_periods,
+                                                     period_usages):
+            usages[(account_id, (period_start, period_end))] = usage
+            if period_end <= now and \
+                    (period_start, period_end) in storable_periods:
+                closed_usages.append(_dump_period_usage(
+                    account_id, period_start, period_end, usage
+                ))
+
+    _save_closed_period_usages(closed_usages)
+    return usages
+
+
+def _get_stored_period_usages(account_ids, periods, now):
+    """
+    Get the stored usage for each account in each closed period.
+
+    Args:
+        account_ids (list[int]): the relevant account ids
+        periods (set[tuple]): start and end times of storable periods
+        now (datetime.datetime): the current time
+
+    Returns:
+        dict: Usage dicts keyed by (account_id, period) tuples.
+
+    """
+    usages = {}
+    if not periods:
+        return usages
+    stored_usages = AccountPeriodUsage.objects.filter(
+        account_id__in=account_ids,
+        period_start__gte=min(periods)[0],
+        period_end__lte=min(max(periods)[1], now),
+    )
+    for stored_usage in stored_usages:
+        period = (stored_usage.period_start, stored_usage.period_end)
+        if period in periods:
+            usages[(stored_usage.account_id, period)] = \
+                _load_period_usage(stored_usage)
+    return usages
+
+
+def _is_day_aligned(period):
+    """Check whether a period starts and ends on UTC day boundaries."""
+    return all([
+        moment.astimezone(datetime.timezone.utc).time() == datetime.time()
+        for moment in period
+    ])
+
+
+def _load_period_usage(stored_usage):
+    """Convert a stored AccountPeriodUsage to a usage dict."""
+    return {
+        'rhel_instance_ids': set(json.loads(stored_usage.rhel_instance_ids)),
+        'openshift_instance_ids': set(
+            json.loads(stored_usage.openshift_instance_ids)
+        ),
+        'rhel_runtime_seconds': stored_usage.rhel_runtime_seconds,
+        'openshift_runtime_seconds': stored_usage.openshift_runtime_seconds,
+    }
+
+
+def _dump_period_usage(account_id, period_start, period_end, usage):
+    """Convert a usage dict to an unsaved AccountPeriodUsage."""
+    return AccountPeriodUsage(
+        account_id=account_id,
+        period_start=period_start,
+        period_end=period_end,
+        rhel_instance_ids=json.dumps(sorted(usage['rhel_instance_ids'])),
+        openshift_instance_ids=json.dumps(
+            sorted(usage['openshift_instance_ids'])
+        ),
+        rhel_runtime_seconds=usage['rhel_runtime_seconds'],
+        openshift_runtime_seconds=usage['openshift_runtime_seconds'],
+    )
+
 
-    image_ids_seen = set()
-    image_ids_seen_with_rhel = set()
-    image_ids_seen_with_openshift = set()
+def _save_closed_period_usages(closed_usages):
+    """
+    Store calculated usages for closed periods.
+
+    Storing is only an optimization, so if a concurrent report already stored
+    any of the same periods, we quietly give up rather than fail the report.
+
+    Args:
+        closed_usages (list[AccountPeriodUsage]): unsaved usages to store
+    """
+    if not closed_usages:
+        return
+    try:
+        with transaction.atomic():
+            AccountPeriodUsage.objects.bulk_create(closed_usages)
+    except IntegrityError:
+        logger.info(_('Closed period usage was already stored by another '
+                      'process; skipping.'))
+
+
+def invalidate_account_period_usages(account_ids, since=None):
+    """
+    Delete stored closed period usages that may no longer be accurate.
+
+    Since an instance's events affect its usage for all later times until its
+    next event, a new event invalidates its day and all the following days.
+
+    Args:
+        account_ids (list[int]): ids of accounts whose usages are affected
+        since (datetime.datetime): Optional earliest affected time. If not
+            specified, all periods for the accounts are invalidated.
+    """
+    stored_usages = AccountPeriodUsage.objects.filter(
+        account_id__in=account_ids
+    )
+    if since is not None:
+        stored_usages = stored_usages.filter(period_end__gt=since)
+    stored_usages.delete()
+
+
+def _calculate_daily_usage(start, end, instance_events,
+                           granularity=GRANULARITY_DAILY):
+    """
+    Calculate usage in each period for the given events.
+
+    Args:
+        start (datetime.datetime): Start time (inclusive)
+        end (datetime.datetime): End time (exclusive)
+        instance_events (dict): lists of InstanceEvents keyed by Instance
+        granularity (str): length of each period; one of GRANULARITIES
+
+    Returns:
+        dict: Data structure representing each day in the period and its
+            constituent representative parts in terms of product usage.
+
+    """
+    periods = _get_periods(start, end, granularity)
+    period_usages = _calculate_period_usages(periods, instance_events, {})
+    return _summarize_period_usages(periods, period_usages)
+
+
+def _calculate_period_usages(periods, instance_events, image_tags):
+    """
+    Calculate usage within each period for the given events.
+
+    Each instance's events are walked once to find the runs between its power
+    on and power off events, and each run is split across the periods it
+    overlaps, so the work grows with the number of events plus the number of
+    periods rather than with their product.
+
+    Args:
+        periods (list[tuple]): sorted, non-overlapping start and end times of
+            each period
+        instance_events (dict): lists of InstanceEvents keyed by Instance
+        image_tags (dict): memo of (rhel, openshift) tuples keyed by image id
+            that is updated as new images are seen
+
+    Returns:
+        list[dict]: For each period, ids of RHEL and OpenShift instances seen
+            running and their total RHEL and OpenShift runtimes in seconds.
+
+    """
+    usages = [
+        {
+            'rhel_instance_ids': set(),
+            'openshift_instance_ids': set(),
+            'rhel_runtime_seconds': 0.0,
+            'openshift_runtime_seconds': 0.0,
+        }
+        for __ in periods
+    ]
+    period_starts = [period_start for period_start, __ in periods]
+    for instance, events in instance_events.items():
+        runtimes = _calculate_instance_runtimes(periods, period_starts, events)
+        if not runtimes:
+            # No runtime? No updates to counters.
+            continue
+
+        # Since all events for AWS have the same image, we can short-
+        # circuit the logic here and look at only 1 event. We may need
+        # to revisit this logic in the future if we add support for a
+        # cloud provider that allows you to change the image on an
+        # existing instance.
+        image = events[0].machineimage
+        if image.id not in image_tags:
+            image_tags[image.id] = (image.rhel, image.openshift)
+        is_rhel, is_openshift = image_tags[image.id]
+        for index, runtime in runtimes.items():
+            usage = usages[index]
+            if is_rhel:
+                usage['rhel_instance_ids'].add(instance.id)
+                usage['rhel_runtime_seconds'] += runtime
+            if is_openshift:
+                usage['openshift_instance_ids'].add(instance.id)
+                usage['openshift_runtime_seconds'] += runtime
+    return usages
+
+
+def _merge_period_usages(usages):
+    """Combine multiple usage dicts for the same period into one."""
+    merged = {
+        'rhel_instance_ids': set(),
+        'openshift_instance_ids': set(),
+        'rhel_runtime_seconds': 0.0,
+        'openshift_runtime_seconds': 0.0,
+    }
+    for usage in usages:
+        merged['rhel_instance_ids'] |= usage['rhel_instance_ids']
+        merged['openshift_instance_ids'] |= usage['openshift_instance_ids']
+        merged['rhel_runtime_seconds'] += usage['rhel_runtime_seconds']
+        merged['openshift_runtime_seconds'] += \
+            usage['openshift_runtime_seconds']
+    return merged
+
+
+def _summarize_account_period_usages(account_ids, periods,
+                                     account_period_usages):
+    """
+    Build the usage report structure for a set of accounts.
+
+    Args:
+        account_ids (list[int]): ids of the accounts to include
+        periods (list[tuple]): start and end times of each period
+        account_period_usages (dict): usage dicts keyed by (account_id,
+            period) tuples, as returned by _get_account_period_usages
+
+    Returns:
+        dict: Data structure representing each period in the report and its
+            constituent representative parts in terms of product usage.
+
+    """
+    period_usages = [
+        _merge_period_usages([
+            account_period_usages[(account_id, period)]
+            for account_id in account_ids
+        ])
+        for period in periods
+    ]
+    return _summarize_period_usages(periods, period_usages)
+
+
+def _summarize_period_usages(periods, period_usages):
+    """
+    Build the usage report structure from each period's usage.
+
+    Args:
+        periods (list[tuple]): start and end times of each period
+        period_usages (list[dict]): usage dicts corresponding to periods
+
+    Returns:
+        dict: Data structure representing each day in the period and its
+            constituent representative parts in terms of product usage.
+
+    """
     instance_ids_seen_with_rhel = set()
     instance_ids_seen_with_openshift = set()
 
     daily_usage = []
-    for period_start, period_end in periods:
-        rhel_instance_count = 0
-        openshift_instance_count = 0
-        rhel_seconds = 0.0
-        openshift_seconds = 0.0
-
-        for instance, events in instance_events.items():
-            runtime = _calculate_instance_usage(
-                period_start,
-                period_end,
-                events,
-            )
-
-            if runtime == 0.0:
-                # No runtime? No updates to counters.
-                continue
-
-            # Since all events for AWS have the same image, we can short-
-            # circuit the logic here and look at only 1 event. We may need
-            # to revisit this logic in the future if we add support for a
-            # cloud provider that allows you to change the image on an
-            # existing instance.
-            image = events[0].machineimage
-            if image.id not in image_ids_seen:
-                image_ids_seen.add(image.id)
-                if image.rhel:
-                    image_ids_seen_with_rhel.add(image.id)
-                if image.openshift:
-                    image_ids_seen_with_openshift.add(image.id)
-            if image.id in image_ids_seen_with_rhel:
-                rhel_instance_count += 1
-                instance_ids_seen_with_rhel.add(instance.id)
-                rhel_seconds += runtime
-            if image.id in image_ids_seen_with_openshift:
-                openshift_instance_count += 1
-                instance_ids_seen_with_openshift.add(instance.id)
-                openshift_seconds += runtime
-
+    for (period_start, __), usage in zip(periods, period_usages):
+        instance_ids_seen_with_rhel |= usage['rhel_instance_ids']
+        instance_ids_seen_with_openshift |= usage['openshift_instance_ids']
         daily_usage.append({
             'date': period_start,
-            'rhel_instances': rhel_instance_count,
-            'openshift_instances': openshift_instance_count,
-            'rhel_runtime_seconds': rhel_seconds,
-            'openshift_runtime_seconds': openshift_seconds,
+            'rhel_instances': len(usage['rhel_instance_ids']),
+            'openshift_instances': len(usage['openshift_instance_ids']),
+            'rhel_runtime_seconds': usage['rhel_runtime_seconds'],
+            'openshift_runtime_seconds': usage['openshift_runtime_seconds'],
         })
 
     return {
@@ -189,54 +593,71 @@ def _calculate_daily_usage(start, end, instance_events):
     }
 
 
-def _calculate_instance_usage(start, end, events):
+def _get_instance_runs(events):
     """
-    Calculate instance usage based on events.
+    Get the times an instance was running based on its events.
 
     Note:
         All given events should belong to the same instance.
 
     Args:
-        start (datetime.datetime): Start time (inclusive)
-        end (datetime.datetime): End time (exclusive)
         events (list[InstanceEvent]): Events for calculating usage
 
     Returns:
-        float: The total seconds running.
+        list[tuple]: Start and end times of each run, in order. The last
+            run's end is None if the instance is still running.
 
     """
+    runs = []
     last_started = None
-    time_running = 0.0
-
-    sorted_events = sorted(events, key=lambda e: e.occurred_at)
-
-    before_start = [event for event in sorted_events
-                    if event.occurred_at < start][-1:]
-    after_start = [event for event in sorted_events
-                   if start <= event.occurred_at < end]
-    sorted_trimmed_events = before_start + after_start
-
-    for event in sorted_trimmed_events:
-        # whichever is later: the first event or the reported period start
-        event_time = max(start, event.occurred_at)
-
-        if not last_started and \
+    # Events at the same time are taken in the order they were recorded.
+    for event in sorted(events, key=lambda e: (e.occurred_at, e.id)):
+        if last_started is None and \
                 event.event_type == InstanceEvent.TYPE.power_on:
             # hold the time only if new event is ON and was previously OFF
-            last_started = event_time
-        elif last_started and \
+            last_started = event.occurred_at
+        elif last_started is not None and \
                 event.event_type == InstanceEvent.TYPE.power_off:
-            # add the time if new event is OFF and was previously ON
-            diff = event_time - last_started
-            time_running += diff.total_seconds()
-            # drop the started time, implying that the instance is now OFF
+            # end the run if new event is OFF and was previously ON
+            runs.append((last_started, event.occurred_at))
             last_started = None
+    if last_started is not None:
+        runs.append((last_started, None))
+    return runs
+
+
+def _calculate_instance_runtimes(periods, period_starts, events):
+    """
+    Calculate an instance's runtime in each period based on its events.
 
-    if last_started:
-        diff = end - last_started
-        time_running += diff.total_seconds()
+    Note:
+        All given events should belong to the same instance.
+
+    Args:
+        periods (list[tuple]): sorted, non-overlapping start and end times of
+            each period
+        period_starts (list[datetime.datetime]): start of each period
+        events (list[InstanceEvent]): Events for calculating usage
 
-    return time_running
+    Returns:
+        dict: Seconds running keyed by the index of each period in which the
+            instance ran.
+
+    """
+    runtimes = collections.OrderedDict()
+    for run_start, run_end in _get_instance_runs(events):
+        index = max(bisect.bisect_right(period_starts, run_start) - 1, 0)
+        for period_start, period_end in periods[index:]:
+            if run_end is not None and run_end <= period_start:
+                break
+            overlap_start = max(run_start, period_start)
+            overlap_end = period_end if run_end is None \
+                else min(run_end, period_end)
+            if overlap_end > overlap_start:
+                runtimes[index] = runtimes.get(index, 0.0) + \
+                    (overlap_end - overlap_start).total_seconds()
+            index += 1
+    return runtimes
 
 
 def validate_event(event, start):
@@ -353,3 +774,10 @@ def get_account_overview(account, start, end):
     }
 
     return cloud_account
+
+
+# Report functions keyed by the names used for report caching and jobs.
+REPORTS = {
+    'accounts': get_account_overviews,
+    'instances': get_daily_usage,
+}
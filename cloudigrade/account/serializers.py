@@ -1,23 +1,31 @@
 """DRF API serializers for the account app."""
+import json
 import logging
 
 from botocore.exceptions import ClientError
 from dateutil import tz
 from django.db import transaction
+from django.utils.http import quote_etag
 from django.utils.translation import gettext as _
 from rest_framework import serializers
 from rest_framework.serializers import (HyperlinkedModelSerializer,
+                                        ModelSerializer,
                                         Serializer)
+from rest_framework.utils.encoders import JSONEncoder
 from rest_polymorphic.serializers import PolymorphicSerializer
 
-from account import reports
+from account import cache, reports
 from account.models import (AwsAccount,
                             AwsInstance,
                             AwsInstanceEvent,
                             AwsMachineImage,
-                            ImageTag)
+                            ImageTag,
+                            ReportResult,
+                            User)
+from account.tasks import generate_report
 from account.util import (create_initial_aws_instance_events,
                           create_new_machine_images,
+                          fail_stale_report_jobs,
                           generate_aws_ami_messages,
                           start_image_inspection)
 from util import aws
@@ -293,8 +301,8 @@ class InstancePolymorphicSerializer(PolymorphicSerializer):
     }
 
 
-class CloudAccountOverviewSerializer(Serializer):
-    """Serialize the cloud accounts overviews for the API."""
+class BaseReportSerializer(Serializer):
+    """Common fields and helpers for serializers that generate reports."""
 
     user_id = serializers.IntegerField(required=False)
     start = serializers.DateTimeField(default_timezone=tz.tzutc())
@@ -302,8 +310,18 @@ class CloudAccountOverviewSerializer(Serializer):
     name_pattern = serializers.CharField(required=False)
     account_id = serializers.IntegerField(required=False)
 
-    def generate(self):
-        """Generate the cloud accounts overviews and return the results."""
+    report_name = None
+
+    def get_report_args(self):
+        """
+        Get the arguments for the report appropriate for the requesting user.
+
+        Only superusers may request reports for a user other than themselves.
+
+        Returns:
+            tuple: user_id, start, end, name_pattern, and account_id.
+
+        """
         start = self.validated_data['start']
         end = self.validated_data['end']
         name_pattern = self.validated_data.get('name_pattern', None)
@@ -315,18 +333,75 @@ class CloudAccountOverviewSerializer(Serializer):
         if user.is_superuser:
             user_id = self.validated_data.get('user_id', user.id)
 
-        return reports.get_account_overviews(user_id, start, end,
-                                             name_pattern, account_id)
+        return user_id, start, end, name_pattern, account_id
+
+    def get_report_kwargs(self):
+        """
+        Get any additional keyword arguments specific to this report.
+
+        Returns:
+            dict: keyword arguments for the report function.
 
+        """
+        return {}
+
+    def get_report_parameters(self):
+        """
+        Get all of the report's arguments as keywords.
+
+        Returns:
+            dict: keyword arguments for the report function.
+
+        """
+        parameter_names = ('user_id', 'start', 'end', 'name_pattern',
+                           'account_id')
+        parameters = dict(zip(parameter_names, self.get_report_args()))
+        parameters.update(self.get_report_kwargs())
+        return parameters
+
+    def get_cache_key(self):
+        """Get the cache key identifying this report's current results."""
+        if not hasattr(self, '_cache_key'):
+            self._cache_key = cache.get_report_cache_key(
+                self.report_name, *self.get_report_args(),
+                **self.get_report_kwargs()
+            )
+        return self._cache_key
 
-class DailyInstanceActivitySerializer(Serializer):
+    def get_etag(self):
+        """Get the quoted ETag identifying this report's current results."""
+        return quote_etag(self.get_cache_key().rsplit(':', 1)[-1])
+
+    def generate_cached(self, report_function):
+        """Get the cached report results, generating them if necessary."""
+        return cache.get_or_generate_report(
+            self.get_cache_key(), report_function, *self.get_report_args(),
+            **self.get_report_kwargs()
+        )
+
+
+class CloudAccountOverviewSerializer(BaseReportSerializer):
+    """Serialize the cloud accounts overviews for the API."""
+
+    report_name = 'accounts'
+
+    def generate(self):
+        """Generate the cloud accounts overviews and return the results."""
+        return self.generate_cached(reports.get_account_overviews)
+
+
+class DailyInstanceActivitySerializer(BaseReportSerializer):
     """Serialize a report of daily instance activity over time for the API."""
 
-    user_id = serializers.IntegerField(required=False)
-    start = serializers.DateTimeField(default_timezone=tz.tzutc())
-    end = serializers.DateTimeField(default_timezone=tz.tzutc())
-    name_pattern = serializers.CharField(required=False)
-    account_id = serializers.IntegerField(required=False)
+    granularity = serializers.ChoiceField(
+        choices=reports.GRANULARITIES, default=reports.GRANULARITY_DAILY
+    )
+
+    report_name = 'instances'
+
+    def get_report_kwargs(self):
+        """Get the requested granularity of the report's periods."""
+        return {'granularity': self.validated_data['granularity']}
 
     def get_overview(self, account):
         """Generate the cloud account overview and return the results."""
@@ -334,19 +409,136 @@ class DailyInstanceActivitySerializer(Serializer):
 
     def generate(self):
         """Generate the usage report and return the results."""
-        start = self.validated_data['start']
-        end = self.validated_data['end']
-        name_pattern = self.validated_data.get('name_pattern', None)
+        return self.generate_cached(reports.get_daily_usage)
+
+
+class UsersDailyInstanceActivitySerializer(Serializer):
+    """Serialize a report of daily instance activity for many users."""
+
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+    start = serializers.DateTimeField(default_timezone=tz.tzutc())
+    end = serializers.DateTimeField(default_timezone=tz.tzutc())
+    name_pattern = serializers.CharField(required=False)
+    granularity = serializers.ChoiceField(
+        choices=reports.GRANULARITIES, default=reports.GRANULARITY_DAILY
+    )
+
+    def generate(self):
+        """Generate the usage report for each user and return the results."""
+        # Query params without any user_ids validate as an empty list.
+        return reports.get_daily_usage_by_user(
+            self.validated_data['start'],
+            self.validated_data['end'],
+            user_ids=self.validated_data.get('user_ids') or None,
+            name_pattern=self.validated_data.get('name_pattern', None),
+            granularity=self.validated_data['granularity'],
+        )
+
+
+REPORT_SERIALIZERS = {
+    serializer_class.report_name: serializer_class
+    for serializer_class in (CloudAccountOverviewSerializer,
+                             DailyInstanceActivitySerializer)
+}
+
+
+class ReportResultSerializer(ModelSerializer):
+    """
+    Serialize an asynchronous report job for the API.
+
+    Creating a job accepts the same parameters as the named report. If the
+    requesting user already has a pending, running, or complete job for an
+    identical report over unchanged data, that job is returned instead of
+    starting another one. Pending or running jobs older than REPORT_JOB_LEASE
+    are marked failed first so that a job lost with its worker is not reused.
+    The user's row is locked while this is decided so that concurrent
+    identical requests do not each start a job.
+    """
+
+    report_name = serializers.ChoiceField(choices=sorted(REPORT_SERIALIZERS))
+    result = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportResult
+        fields = (
+            'created_at',
+            'error',
+            'id',
+            'report_name',
+            'result',
+            'status',
+            'updated_at',
+        )
+        read_only_fields = (
+            'created_at',
+            'error',
+            'id',
+            'status',
+            'updated_at',
+        )
+
+    def get_result(self, report_result):
+        """Get the report's results if the job is complete."""
+        if report_result.status != ReportResult.STATUS.complete:
+            return None
+        return report_result.get_result()
+
+    def create(self, validated_data):
+        """Create a report job, or get an identical existing one."""
+        report_name = validated_data['report_name']
+        report_serializer = REPORT_SERIALIZERS[report_name](
+            data=self.initial_data, context=self.context
+        )
+        report_serializer.is_valid(raise_exception=True)
 
         user = self.context['request'].user
-        user_id = user.id
-        account_id = self.validated_data.get('account_id', None)
+        cache_key = report_serializer.get_cache_key()
+        with transaction.atomic():
+            User.objects.select_for_update().filter(id=user.id).first()
+            fail_stale_report_jobs(user=user, cache_key=cache_key)
+            report_result = ReportResult.objects.filter(
+                user=user,
+                cache_key=cache_key,
+                status__in=(
+                    ReportResult.STATUS.pending,
+                    ReportResult.STATUS.running,
+                    ReportResult.STATUS.complete,
+                ),
+            ).order_by('-created_at').first()
+            if report_result is not None:
+                logger.info(_('Reusing report job {0} for {1}').format(
+                    report_result.id, cache_key))
+                return report_result
+
+            report_result = ReportResult.objects.create(
+                user=user,
+                report_name=report_name,
+                cache_key=cache_key,
+                parameters=json.dumps(
+                    report_serializer.get_report_parameters(), cls=JSONEncoder
+                ),
+            )
+        # The task must not run until the job is visible to its worker.
+        transaction.on_commit(lambda: generate_report.delay(report_result.id))
+        return report_result
 
-        if user.is_superuser:
-            user_id = self.validated_data.get('user_id', user.id)
 
-        return reports.get_daily_usage(user_id, start, end,
-                                       name_pattern, account_id)
+class ReportResultListSerializer(ModelSerializer):
+    """Serialize an asynchronous report job's status without its results."""
+
+    class Meta:
+        model = ReportResult
+        fields = (
+            'created_at',
+            'error',
+            'id',
+            'report_name',
+            'status',
+            'updated_at',
+        )
+        read_only_fields = fields
 
 
 class UserSerializer(Serializer):
@@ -0,0 +1,64 @@
+"""Signal receivers for the account app."""
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+
+from account import reports
+from account.models import (Account, AwsInstanceEvent, Instance,
+                            InstanceEvent, MachineImage)
+
+
+@receiver(post_save, sender=AwsInstanceEvent)
+@receiver(post_save, sender=InstanceEvent)
+def invalidate_usage_for_instance_event(sender, instance, **kwargs):
+    """Invalidate stored usage affected by an added or changed event."""
+    account_ids = Account.objects.filter(
+        instance__id=instance.instance_id
+    ).values_list('id', flat=True)
+    reports.invalidate_account_period_usages(
+        account_ids, since=instance.occurred_at
+    )
+
+
+@receiver(pre_delete, sender=Instance)
+def invalidate_usage_for_instance(sender, instance, **kwargs):
+    """
+    Invalidate stored usage for the account of a removed instance.
+
+    Events are only removed along with their instances, so this is done per
+    instance rather than per event. A receiver on the event models would
+    prevent Django from deleting an instance's events in bulk. Deleting an
+    account deletes its stored usage with it.
+    """
+    reports.invalidate_account_period_usages([instance.account_id])
+
+
+@receiver(m2m_changed, sender=MachineImage.tags.through)
+def invalidate_usage_for_image_tags(sender, instance, action, reverse,
+                                    pk_set, **kwargs):
+    """Invalidate stored usage for every account that ran a retagged image."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        image_ids = [instance.id]
+    elif pk_set:
+        image_ids = list(pk_set)
+    else:
+        # A cleared tag could have belonged to any image.
+        image_ids = MachineImage.objects.values_list('id', flat=True)
+    invalidate_usage_for_images(image_ids)
+
+
+def invalidate_usage_for_images(image_ids):
+    """
+    Invalidate stored usage for every account that ran any of the images.
+
+    Call this directly after any bulk change to image tags that does not send
+    the ``m2m_changed`` signal.
+
+    Args:
+        image_ids (list[int]): ids of images whose tags changed
+    """
+    account_ids = Account.objects.filter(
+        instance__instanceevent__machineimage__id__in=image_ids
+    ).values_list('id', flat=True).distinct()
+    reports.invalidate_account_period_usages(account_ids)
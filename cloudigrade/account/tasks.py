@@ -1,23 +1,51 @@
 """Celery tasks for use in the account app."""
+import collections
+import datetime
 import json
 import logging
+import math
 
 import boto3
 from botocore.exceptions import ClientError
-from celery import shared_task
+from celery import shared_task, signature
+from dateutil import parser as date_parser
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, TextField, Value, When
+from django.utils import timezone
 from django.utils.translation import gettext as _
 
-from account.models import (AwsMachineImage,
-                            ImageTag)
-from account.util import (add_messages_to_queue, create_aws_machine_image_copy,
-                          read_messages_from_queue)
+from account import cache, reports, signals
+from account.models import (AwsAccount,
+                            AwsInstance,
+                            AwsMachineImage,
+                            AwsPendingResource,
+                            AwsSnapshotCopyRequest,
+                            ImageTag,
+                            MachineImage,
+                            ReportResult)
+from account.util import (add_messages_to_queue, admit_snapshot_copies,
+                          claim_report_job, create_aws_machine_image_copy,
+                          delete_messages_from_queue,
+                          get_inspection_target, get_inspection_targets,
+                          get_queue_depth_and_age,
+                          get_stale_image_inspections,
+                          get_stale_snapshot_copies,
+                          index_image_root_snapshot,
+                          propagate_image_inspections, queue_snapshot_copy,
+                          receive_messages_from_queue,
+                          release_snapshot_copy, renew_image_inspection_claim,
+                          replace_known_images,
+                          requeue_snapshot_copy, start_image_inspection)
 from util import aws
 from util.aws import rewrap_aws_errors
 from util.celery import retriable_shared_task
 from util.exceptions import (AwsECSInstanceNotReady,
+                             AwsSnapshotCopyLimitError,
                              AwsSnapshotEncryptedError,
-                             AwsTooManyECSInstances)
+                             AwsTooManyECSInstances,
+                             NotReadyException,
+                             SqsSendError)
 from util.misc import generate_device_name
 
 logger = logging.getLogger(__name__)
@@ -27,6 +55,17 @@ CLOUD_KEY = 'cloud'
 CLOUD_TYPE_AWS = 'aws'
 HOUNDIGRADE_MESSAGE_READ_LEN = 10
 
+# AWS states in which a pending resource is ready for its next tasks or will
+# never become ready, keyed by AwsPendingResource.TYPE.
+PENDING_RESOURCE_READY_STATES = {
+    AwsPendingResource.TYPE.snapshot: ('completed',),
+    AwsPendingResource.TYPE.volume: ('available',),
+}
+PENDING_RESOURCE_FAILED_STATES = {
+    AwsPendingResource.TYPE.snapshot: ('error',),
+    AwsPendingResource.TYPE.volume: ('in-use', 'deleting', 'deleted', 'error'),
+}
+
 
 @retriable_shared_task
 @rewrap_aws_errors
@@ -53,6 +92,11 @@ def copy_ami_snapshot(arn, ami_id, snapshot_region, reference_ami_id=None):
     ami = aws.get_ami(session, ami_id, snapshot_region)
 
     customer_snapshot_id = aws.get_ami_snapshot_id(ami)
+    if reference_ami_id is None and \
+            index_image_root_snapshot(ami_id, customer_snapshot_id):
+        # Another image with the same root snapshot has been or is being
+        # inspected, and its results will be used for this image too.
+        return
     try:
         customer_snapshot = aws.get_snapshot(
             session, customer_snapshot_id, snapshot_region)
@@ -91,17 +135,114 @@ def copy_ami_snapshot(arn, ami_id, snapshot_region, reference_ami_id=None):
 
     aws.add_snapshot_ownership(customer_snapshot)
 
-    snapshot_copy_id = aws.copy_snapshot(customer_snapshot_id, snapshot_region)
+    # AWS limits concurrent snapshot copies, so queue this copy and only start
+    # it (along with any others) if its target region has capacity.
+    copy_request = queue_snapshot_copy(arn, ami_id, customer_snapshot_id,
+                                       snapshot_region, reference_ami_id)
+    _start_admitted_snapshot_copies(copy_request.target_region, copy_request)
+
+
+def _start_admitted_snapshot_copies(target_region, current_request=None):
+    """
+    Start as many queued snapshot copies as the region has capacity for.
+
+    If the current request fails to start, the failure is logged rather than
+    raised so that the other admitted copies are still started. A copy that
+    is not ready yet is retried in a new task.
+
+    Args:
+        target_region (str): The region whose queued copies to start
+        current_request (AwsSnapshotCopyRequest): Optional. A request that
+            should be started in this process if it is admitted rather than
+            in a new task.
+    """
+    for copy_request in admit_snapshot_copies(target_region):
+        if current_request is not None and \
+                copy_request.id == current_request.id:
+            try:
+                _copy_snapshot(copy_request)
+                continue
+            except NotReadyException as e:
+                logger.warning(_('Retrying snapshot copy of {0} in a new '
+                                 'task: {1}').format(
+                    copy_request.customer_snapshot_id, e))
+            except Exception:
+                logger.exception(_('Failed to start snapshot copy of {0}')
+                                 .format(copy_request.customer_snapshot_id))
+                continue
+        start_snapshot_copy.delay(copy_request.id)
+
+
+@retriable_shared_task
+@rewrap_aws_errors
+def start_snapshot_copy(copy_request_id):
+    """
+    Start an admitted copy of a customer snapshot to the primary AWS account.
+
+    Args:
+        copy_request_id (int): The id of the admitted AwsSnapshotCopyRequest
+
+    Returns:
+        None: Run as an asynchronous Celery task.
+
+    """
+    copy_request = AwsSnapshotCopyRequest.objects.filter(
+        id=copy_request_id,
+        status=AwsSnapshotCopyRequest.STATUS.copying,
+        snapshot_copy_id__isnull=True,
+    ).first()
+    if copy_request is None:
+        logger.warning(_('Snapshot copy request {0} is no longer waiting to '
+                         'start').format(copy_request_id))
+        return
+    _copy_snapshot(copy_request)
+
+
+def _copy_snapshot(copy_request):
+    """
+    Copy an admitted customer snapshot and wait for the copy to complete.
+
+    If AWS says too many copies are already in progress, or the copy fails
+    with an error that will not be retried, the request goes back in the queue
+    to be admitted again later. If the copy is not ready yet, the request
+    keeps its slot for the task's retry.
+
+    Args:
+        copy_request (AwsSnapshotCopyRequest): The admitted request
+    """
+    customer_snapshot_id = copy_request.customer_snapshot_id
+    snapshot_region = copy_request.snapshot_region
+    # Snapshots stay in their own region if it has a local cluster.
+    target_region = copy_request.target_region
+    try:
+        snapshot_copy_id = aws.copy_snapshot(customer_snapshot_id,
+                                             snapshot_region, target_region)
+    except AwsSnapshotCopyLimitError:
+        logger.warning(_('{0}: AWS snapshot copy limit reached; requeueing '
+                         'copy of {1}').format('copy_ami_snapshot',
+                                               customer_snapshot_id))
+        requeue_snapshot_copy(copy_request)
+        return
+    except NotReadyException:
+        raise
+    except Exception:
+        logger.warning(_('{0}: failed to copy {1}; requeueing').format(
+            'copy_ami_snapshot', customer_snapshot_id))
+        requeue_snapshot_copy(copy_request)
+        raise
     logger.info(_(
-        '{0}: customer_snapshot_id={1}, snapshot_copy_id={2}').format(
+        '{0}: customer_snapshot_id={1}, snapshot_copy_id={2}, '
+        'snapshot_copy_region={3}').format(
         'copy_ami_snapshot',
         customer_snapshot_id,
-        snapshot_copy_id))
-
-    # Schedule removal of ownership on customer snapshot
-    remove_snapshot_ownership.delay(
-        arn, customer_snapshot_id, snapshot_region, snapshot_copy_id)
-
+        snapshot_copy_id,
+        target_region))
+    copy_request.snapshot_copy_id = snapshot_copy_id
+    copy_request.save()
+
+    arn = copy_request.arn
+    ami_id = copy_request.ec2_ami_id
+    reference_ami_id = copy_request.reference_ami_id
     if reference_ami_id is not None:
         # If a reference ami exists, that means we have been working with a
         # copy in here. That means we need to remove that copy and pass the
@@ -116,9 +257,19 @@ def copy_ami_snapshot(arn, ami_id, snapshot_region, reference_ami_id=None):
         # indicate the relationship between the original AMI and the copy.
         create_aws_machine_image_copy(ami_id, reference_ami_id)
         ami_id = reference_ami_id
-
-    # Create volume from snapshot copy
-    create_volume.delay(ami_id, snapshot_copy_id)
+    renew_image_inspection_claim(ami_id)
+
+    # Once the copy completes, remove ownership on the customer snapshot and
+    # create a volume from the copy.
+    wait_for_aws_resource(
+        AwsPendingResource.TYPE.snapshot,
+        snapshot_copy_id,
+        target_region,
+        remove_snapshot_ownership.s(
+            arn, customer_snapshot_id, snapshot_region, snapshot_copy_id,
+            target_region),
+        create_volume.s(ami_id, snapshot_copy_id, target_region),
+    )
 
 
 @retriable_shared_task
@@ -173,7 +324,8 @@ def copy_ami_to_customer_account(arn, reference_ami_id, snapshot_region,
 def remove_snapshot_ownership(arn,
                               customer_snapshot_id,
                               customer_snapshot_region,
-                              snapshot_copy_id):
+                              snapshot_copy_id,
+                              snapshot_copy_region=None):
     """
     Remove cloudigrade ownership from customer snapshot.
 
@@ -184,10 +336,12 @@ def remove_snapshot_ownership(arn,
             customer_snapshot_id resides
         snapshot_copy_id (str): The id of the snapshot that must
             be ready to continue
+        snapshot_copy_region (str): Optional region where snapshot_copy_id
+            resides. Defaults to the primary account's default region.
     Returns:
         None: Run as an asynchronous Celery task.
     """
-    ec2 = boto3.resource('ec2')
+    ec2 = boto3.resource('ec2', region_name=snapshot_copy_region)
 
     # Wait for snapshot to be ready
     try:
@@ -218,27 +372,38 @@ def remove_snapshot_ownership(arn,
 
 @retriable_shared_task
 @rewrap_aws_errors
-def create_volume(ami_id, snapshot_copy_id):
+def create_volume(ami_id, snapshot_copy_id, snapshot_copy_region=None):
     """
     Create an AWS Volume in the primary AWS account.
 
+    The volume is created in the availability zone of the inspection target
+    for the snapshot's region.
+
     Args:
         ami_id (str): The AWS AMI id for which this request originated
         snapshot_copy_id (str): The id of the snapshot to use for the volume
+        snapshot_copy_region (str): Optional region where snapshot_copy_id
+            resides. Defaults to the default inspection target's region.
     Returns:
         None: Run as an asynchronous Celery task.
     """
-    zone = settings.HOUNDIGRADE_AWS_AVAILABILITY_ZONE
-    volume_id = aws.create_volume(snapshot_copy_id, zone)
-    region = aws.get_region_from_availability_zone(zone)
+    target = get_inspection_target(snapshot_copy_region)
+    zone = target.availability_zone
+    region = target.region
+    volume_id = aws.create_volume(snapshot_copy_id, zone, region)
 
     logger.info(_('{0}: volume_id={1}, volume_region={2}').format(
         'create_volume',
         volume_id,
         region))
 
-    delete_snapshot.delay(snapshot_copy_id, volume_id, region)
-    enqueue_ready_volume.delay(ami_id, volume_id, region)
+    wait_for_aws_resource(
+        AwsPendingResource.TYPE.volume,
+        volume_id,
+        region,
+        delete_snapshot.s(snapshot_copy_id, volume_id, region),
+        enqueue_ready_volume.s(ami_id, volume_id, region),
+    )
 
 
 @retriable_shared_task
@@ -250,11 +415,11 @@ def delete_snapshot(snapshot_copy_id, volume_id, volume_region):
     Args:
         snapshot_copy_id (str): The id of the snapshot to delete
         volume_id (str): The id of the volume that must be ready
-        volume_region (str): The region of the volume
+        volume_region (str): The region of the volume and snapshot
     Returns:
         None: Run as an asynchronous Celery task.
     """
-    ec2 = boto3.resource('ec2')
+    ec2 = boto3.resource('ec2', region_name=volume_region)
 
     # Wait for volume to be ready
     volume = aws.get_volume(
@@ -275,6 +440,9 @@ def enqueue_ready_volume(ami_id, volume_id, volume_region):
     """
     Enqueues information about an AMI and volume for later use.
 
+    The volume is queued for the inspection target in its region. If the
+    message cannot be sent, the task is retried.
+
     Args:
         ami_id (str): The AWS AMI id for which this request originated
         volume_id (str): The id of the volume that must be ready
@@ -286,28 +454,305 @@ def enqueue_ready_volume(ami_id, volume_id, volume_region):
     aws.check_volume_state(volume)
     messages = [{'ami_id': ami_id, 'volume_id': volume_id}]
 
-    queue_name = '{0}ready_volumes'.format(settings.AWS_NAME_PREFIX)
-    add_messages_to_queue(queue_name, messages)
+    queue_name = get_inspection_target(volume_region).ready_volumes_queue_name
+    results = add_messages_to_queue(queue_name, messages)
+    errors = [result.error for result in results if result.error]
+    if errors:
+        raise SqsSendError(_('Failed to queue volume {0} for {1}: {2}').format(
+            volume_id, ami_id, ', '.join(errors)))
+
+
+def wait_for_aws_resource(resource_type, resource_id, region, *ready_tasks):
+    """
+    Run tasks once an AWS snapshot or volume is ready.
+
+    Args:
+        resource_type (str): AwsPendingResource.TYPE of the resource
+        resource_id (str): The AWS id of the snapshot or volume
+        region (str): The region of the resource, or None for the primary
+            account's default region
+        *ready_tasks (celery.canvas.Signature): Tasks to run when ready
+
+    Returns:
+        AwsPendingResource: The resource being waited on.
+
+    """
+    return AwsPendingResource.objects.create(
+        resource_type=resource_type,
+        resource_id=resource_id,
+        region=region,
+        ready_tasks=json.dumps(ready_tasks),
+    )
+
+
+@shared_task
+@rewrap_aws_errors
+def poll_pending_aws_resources():
+    """
+    Check all pending AWS resources and continue with any that are ready.
+
+    Pending resources are checked with one bulk describe call per type and
+    region. Resources that fail or are still not ready after the configured
+    timeout are abandoned. Finished snapshot copies release their slots, and
+    any queued snapshot copies that now fit are started.
+
+    Returns:
+        None: Run as an asynchronous Celery task.
+
+    """
+    pending_resources = collections.defaultdict(list)
+    for resource in AwsPendingResource.objects.all():
+        pending_resources[(resource.resource_type, resource.region)].append(
+            resource)
+    expired_before = timezone.now() - datetime.timedelta(
+        seconds=settings.AWS_PENDING_RESOURCE_TIMEOUT)
+
+    for (resource_type, region), resources in pending_resources.items():
+        if resource_type == AwsPendingResource.TYPE.snapshot:
+            get_states = aws.get_snapshot_states
+        else:
+            get_states = aws.get_volume_states
+        states = get_states(
+            [resource.resource_id for resource in resources], region)
+        logger.info(_('{0} checked {1} pending {2}(s) in {3}').format(
+            'poll_pending_aws_resources', len(resources), resource_type,
+            region))
+        for resource in resources:
+            _check_pending_aws_resource(
+                resource, states.get(resource.resource_id), expired_before)
+
+    # Completed snapshot copies free up slots for queued copies, and copies
+    # that hit AWS's own limit were requeued, so admit what we can now.
+    queued_regions = AwsSnapshotCopyRequest.objects.filter(
+        status=AwsSnapshotCopyRequest.STATUS.queued
+    ).order_by().values_list('target_region', flat=True).distinct()
+    for target_region in list(queued_regions):
+        _start_admitted_snapshot_copies(target_region)
+
+
+def _check_pending_aws_resource(resource, state, expired_before):
+    """
+    Dispatch or abandon a pending AWS resource's tasks based on its state.
+
+    Args:
+        resource (AwsPendingResource): The resource being waited on
+        state (str): The resource's current AWS state, or None if not found
+        expired_before (datetime.datetime): Resources created before this
+            time are abandoned if they are still not ready
+    """
+    if state in PENDING_RESOURCE_READY_STATES[resource.resource_type]:
+        ready_tasks = json.loads(resource.ready_tasks)
+    elif state in PENDING_RESOURCE_FAILED_STATES[resource.resource_type]:
+        logger.error(_('AWS {0} {1} has state {2}; abandoning its tasks')
+                     .format(resource.resource_type, resource.resource_id,
+                             state))
+        ready_tasks = []
+    elif resource.created_at < expired_before:
+        logger.error(_('AWS {0} {1} was not ready in time (state {2}); '
+                       'abandoning its tasks').format(
+            resource.resource_type, resource.resource_id, state))
+        ready_tasks = []
+    else:
+        return
+
+    # Only whichever poller deletes the record may dispatch its tasks.
+    deleted_count, __ = AwsPendingResource.objects.filter(
+        id=resource.id).delete()
+    if not deleted_count:
+        return
+    if resource.resource_type == AwsPendingResource.TYPE.snapshot:
+        release_snapshot_copy(resource.resource_id)
+    for ready_task in ready_tasks:
+        signature(ready_task).delay()
+
+
+@shared_task
+@rewrap_aws_errors
+def reclaim_stale_image_inspections():
+    """
+    Restart inspections whose claims expired without completing.
+
+    An inspection pipeline may die partway (a lost task, an abandoned snapshot
+    or volume, a crashed worker), leaving its image claimed forever. Restart
+    each such inspection using the region of an instance seen running the
+    image; images with no known region go back to pending. Snapshot copy
+    slots left behind by such a pipeline are freed first.
+
+    Returns:
+        None: Run as an asynchronous Celery task.
+
+    """
+    _reclaim_stale_snapshot_copies()
+    for image in get_stale_image_inspections():
+        region = AwsInstance.objects.filter(
+            instanceevent__machineimage_id=image.id
+        ).values_list('region', flat=True).first()
+        if region is None:
+            logger.warning(_('Cannot reclaim inspection of {0} with no known '
+                             'region; resetting it to pending').format(
+                image.ec2_ami_id))
+            AwsMachineImage.objects.filter(id=image.id).update(
+                status=AwsMachineImage.PENDING, inspection_claimed_at=None)
+            continue
+        logger.warning(_('Reclaiming stale inspection of {0} with status {1} '
+                         'claimed at {2}').format(
+            image.ec2_ami_id, image.status, image.inspection_claimed_at))
+        arn = AwsAccount.objects.get(id=image.account_id).account_arn
+        start_image_inspection(arn, image.ec2_ami_id, region)
+
+
+def _reclaim_stale_snapshot_copies():
+    """
+    Free the slots of admitted snapshot copies whose pipeline was lost.
+
+    A stale copy that never started goes back in the queue. A stale copy that
+    started but is not being waited on is released unless AWS says the copy
+    is still in progress, since it then still counts against AWS's limit.
+    Copies that are being waited on are left to poll_pending_aws_resources.
+    """
+    waited_on = set(AwsPendingResource.objects.filter(
+        resource_type=AwsPendingResource.TYPE.snapshot
+    ).values_list('resource_id', flat=True))
+    started_copies = collections.defaultdict(list)
+    target_regions = set()
+    for copy_request in get_stale_snapshot_copies():
+        if copy_request.snapshot_copy_id is None:
+            logger.warning(_('Requeueing snapshot copy of {0} that was '
+                             'admitted at {1} but never started').format(
+                copy_request.customer_snapshot_id, copy_request.admitted_at))
+            requeue_snapshot_copy(copy_request)
+            target_regions.add(copy_request.target_region)
+        elif copy_request.snapshot_copy_id not in waited_on:
+            started_copies[copy_request.target_region].append(copy_request)
+
+    for target_region, copy_requests in started_copies.items():
+        states = aws.get_snapshot_states(
+            [copy_request.snapshot_copy_id for copy_request in copy_requests],
+            target_region)
+        for copy_request in copy_requests:
+            state = states.get(copy_request.snapshot_copy_id)
+            if state == 'pending':
+                continue
+            logger.warning(_('Releasing untracked snapshot copy {0} with '
+                             'state {1}').format(
+                copy_request.snapshot_copy_id, state))
+            release_snapshot_copy(copy_request.snapshot_copy_id)
+            target_regions.add(target_region)
+
+    for target_region in sorted(target_regions):
+        _start_admitted_snapshot_copies(target_region)
 
 
 @shared_task
 @rewrap_aws_errors
-def scale_up_inspection_cluster():
+def refresh_known_images():
+    """
+    Replace the known image catalog with the latest copy from S3.
+
+    The catalog is a JSON list of entries as accepted by replace_known_images.
+    Nothing is changed if no catalog bucket is configured.
+
+    Returns:
+        None: Run as an asynchronous Celery task.
+
+    """
+    if not settings.KNOWN_IMAGES_BUCKET:
+        logger.info(_('No known images catalog is configured'))
+        return
+    content = aws.get_object_content_from_s3(
+        settings.KNOWN_IMAGES_BUCKET, settings.KNOWN_IMAGES_KEY,
+        compression=None)
+    count = replace_known_images(json.loads(content))
+    logger.info(_('Refreshed known images catalog with {0} entries').format(
+        count))
+
+
+@shared_task
+@rewrap_aws_errors
+def check_ready_volumes_queue():
+    """
+    Scale up inspection clusters once enough volumes are waiting.
+
+    Scaling up a cluster is triggered as soon as its ready volumes queue holds
+    at least HOUNDIGRADE_SCALE_UP_QUEUE_DEPTH messages or its oldest message
+    has waited HOUNDIGRADE_SCALE_UP_MESSAGE_AGE seconds. This only looks at
+    the queues; volumes keep arriving in them regardless of any pending
+    scale-up.
+
+    Returns:
+        None: Run as a scheduled Celery task.
+
+    """
+    for target in get_inspection_targets():
+        queue_depth, oldest_age = get_queue_depth_and_age(
+            target.ready_volumes_queue_name)
+        if queue_depth == 0:
+            continue
+        if queue_depth < settings.HOUNDIGRADE_SCALE_UP_QUEUE_DEPTH and \
+                oldest_age < settings.HOUNDIGRADE_SCALE_UP_MESSAGE_AGE:
+            logger.info(_('Not scaling up yet in {0} for {1} volume(s) '
+                          'waiting at most {2} seconds').format(
+                target.region, queue_depth, oldest_age))
+            continue
+
+        batch_size = _get_inspection_batch_size(queue_depth)
+        logger.info(_('Scaling up in {0} for {1} volume(s) waiting at most '
+                      '{2} seconds with batch size {3}').format(
+            target.region, queue_depth, oldest_age, batch_size))
+        scale_up_inspection_cluster.delay(batch_size, target.region)
+
+
+def _get_inspection_batch_size(queue_depth):
+    """
+    Get how many volumes each houndigrade instance should inspect.
+
+    The queued volumes are spread evenly across as many instances as they
+    need, up to HOUNDIGRADE_AWS_MAX_INSTANCES, without exceeding the
+    per-instance limit of HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE.
+
+    Args:
+        queue_depth (int): Number of volumes waiting for inspection
+
+    Returns:
+        int: The number of volumes per instance.
+
+    """
+    max_batch_size = settings.HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE
+    instance_count = min(settings.HOUNDIGRADE_AWS_MAX_INSTANCES,
+                         math.ceil(queue_depth / max_batch_size))
+    if instance_count < 1:
+        return max_batch_size
+    return max(1, min(max_batch_size,
+                      math.ceil(queue_depth / instance_count)))
+
+
+@shared_task
+@rewrap_aws_errors
+def scale_up_inspection_cluster(batch_size=None, region=None):
     """
     Scale up the "houndigrade" inspection cluster.
 
+    Args:
+        batch_size (int): Optional number of volumes each instance should
+            inspect. Defaults to HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE.
+        region (str): Optional region of the inspection target to scale up.
+            Defaults to the default target.
+
     Returns:
         None: Run as a scheduled Celery task.
 
     """
-    queue_name = '{0}ready_volumes'.format(settings.AWS_NAME_PREFIX)
+    if batch_size is None:
+        batch_size = settings.HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE
+    target = get_inspection_target(region)
+    queue_name = target.ready_volumes_queue_name
     scaled_down, auto_scaling_group = aws.is_scaled_down(
-        settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME
+        target.autoscaling_group_name, target.region
     )
     if not scaled_down:
         # Quietly exit and let a future run check the scaling.
         args = {
-            'name': settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME,
+            'name': target.autoscaling_group_name,
             'min_size': auto_scaling_group.get('MinSize'),
             'max_size': auto_scaling_group.get('MinSize'),
             'desired_capacity': auto_scaling_group.get('DesiredCapacity'),
@@ -321,100 +766,148 @@ def scale_up_inspection_cluster():
             logger.info(_('Instance exists: %s'), instance.get('InstanceId'))
         return
 
-    messages = read_messages_from_queue(
+    received = receive_messages_from_queue(
         queue_name,
-        settings.HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE
+        batch_size * settings.HOUNDIGRADE_AWS_MAX_INSTANCES
     )
+    messages = [item.message for item in received if item.error is None]
 
     if len(messages) == 0:
         # Quietly exit and let a future run check for messages.
         logger.info(_('Not scaling up because no new volumes were found.'))
+        if received:
+            # Undecodable messages would never succeed, so drop them.
+            delete_messages_from_queue(
+                queue_name, [item.receipt_handle for item in received]
+            )
         return
 
-    try:
-        aws.scale_up(settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME)
-    except ClientError:
-        # If scale_up fails unexpectedly, requeue messages so they aren't lost.
-        add_messages_to_queue(queue_name, messages)
-        raise
+    # One instance per batch of volumes, up to HOUNDIGRADE_AWS_MAX_INSTANCES.
+    instance_count = len(_shard_inspection_messages(messages, batch_size))
+    logger.info(_('Scaling up to {0} instance(s) to inspect {1} volume(s)')
+                .format(instance_count, len(messages)))
+    # Mark the images as inspecting in this target right away so that results
+    # from other targets do not scale this one down before it starts.
+    _mark_images_inspecting(messages, target.region)
+    # If scale_up fails, the messages are not deleted and will be received
+    # again once their visibility timeout expires.
+    aws.scale_up(target.autoscaling_group_name, instance_count, target.region)
+
+    run_inspection_cluster.delay(messages, batch_size=batch_size,
+                                 region=target.region)
+    delete_messages_from_queue(
+        queue_name, [item.receipt_handle for item in received]
+    )
+
+
+def _mark_images_inspecting(messages, region):
+    """
+    Mark the images of volume messages as being inspected in a region.
 
-    run_inspection_cluster.delay(messages)
+    Args:
+        messages (list): A list of dictionary items containing
+            meta-data (ami_id, volume_id)
+        region (str): The region of the inspection target
+    """
+    AwsMachineImage.objects.filter(
+        ec2_ami_id__in=[message['ami_id'] for message in messages]
+    ).update(status=AwsMachineImage.INSPECTING,
+             inspection_claimed_at=timezone.now(),
+             inspection_region=region)
+
+
+def _shard_inspection_messages(messages, batch_size=None):
+    """
+    Split volume messages into one batch per houndigrade instance.
+
+    Args:
+        messages (list): A list of dictionary items containing
+            meta-data (ami_id, volume_id)
+        batch_size (int): Optional number of messages per batch. Defaults to
+            HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE.
+
+    Returns:
+        list(list): Batches of at most batch_size messages, since each
+            instance can only attach so many volumes.
+
+    """
+    if batch_size is None:
+        batch_size = settings.HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE
+    return [
+        messages[start:start + batch_size]
+        for start in range(0, len(messages), batch_size)
+    ]
 
 
 @retriable_shared_task
 @rewrap_aws_errors
-def run_inspection_cluster(messages, cloud='aws'):
+def run_inspection_cluster(messages, cloud='aws', batch_size=None,
+                           region=None):
     """
     Run task definition for "houndigrade" on the cluster.
 
+    The messages are sharded across the cluster's container instances, and
+    one houndigrade task runs on each instance to inspect its shard's volumes.
+
     Args:
         messages (list): A list of dictionary items containing
             meta-data (ami_id, volume_id)
         cloud (str): String key representing what cloud we're inspecting.
+        batch_size (int): Optional number of volumes per instance. Defaults to
+            HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE.
+        region (str): Optional region of the inspection target to run.
+            Defaults to the default target.
 
     Returns:
         None: Run as an asynchronous Celery task.
 
     """
-    for message in messages:
-        image = AwsMachineImage.objects.get(ec2_ami_id=message['ami_id'])
-        image.status = image.INSPECTING
-        image.save()
+    target = get_inspection_target(region)
+    _mark_images_inspecting(messages, target.region)
 
     task_command = ['-c', cloud]
     if settings.HOUNDIGRADE_DEBUG:
         task_command.extend(['--debug'])
 
-    ecs = boto3.client('ecs')
-    # get ecs container instance id
-    result = ecs.list_container_instances(
-        cluster=settings.HOUNDIGRADE_ECS_CLUSTER_NAME)
+    shards = _shard_inspection_messages(messages, batch_size)
 
-    # verify we have our single container instance
-    num_instances = len(result['containerInstanceArns'])
-    if num_instances == 0:
+    ecs = boto3.client('ecs', region_name=target.region)
+    # get ecs container instance ids
+    result = ecs.list_container_instances(cluster=target.ecs_cluster_name)
+
+    # verify we have exactly one container instance per shard
+    container_instance_arns = result['containerInstanceArns']
+    num_instances = len(container_instance_arns)
+    if num_instances < len(shards):
         raise AwsECSInstanceNotReady
-    elif num_instances > 1:
+    elif num_instances > len(shards):
         raise AwsTooManyECSInstances
 
     result = ecs.describe_container_instances(
-        containerInstances=[result['containerInstanceArns'][0]],
-        cluster=settings.HOUNDIGRADE_ECS_CLUSTER_NAME
+        containerInstances=container_instance_arns,
+        cluster=target.ecs_cluster_name
     )
-    ec2_instance_id = result['containerInstances'][0]['ec2InstanceId']
-
-    # Obtain boto EC2 Instance
-    ec2 = boto3.resource('ec2')
-    ec2_instance = ec2.Instance(ec2_instance_id)
-
-    logger.info(_('{0} attaching volumes').format(
-        'run_inspection_cluster'))
-    # attach volumes
-    for index, message in enumerate(messages):
-        mount_point = generate_device_name(index)
-        volume = ec2.Volume(message['volume_id'])
-        logger.info(_('{0} attaching volume {1} to instance {2}').format(
+    container_instances = result['containerInstances']
+
+    shard_commands = []
+    for container_instance, shard in zip(container_instances, shards):
+        ec2_instance_id = container_instance['ec2InstanceId']
+        device_volumes = [
+            (generate_device_name(index), message['volume_id'])
+            for index, message in enumerate(shard)
+        ]
+        logger.info(_('{0} attaching volumes {1} to instance {2}').format(
             'run_inspection_cluster',
-            message['volume_id'],
+            [volume_id for __, volume_id in device_volumes],
             ec2_instance_id))
+        # Volumes are set to delete when the instance is scaled down.
+        aws.attach_volumes(ec2_instance_id, device_volumes, target.region)
 
-        volume.attach_to_instance(
-            Device=mount_point, InstanceId=ec2_instance_id)
-
-        logger.info(_('{0} modify volume {1} to auto-delete').format(
-            'run_inspection_cluster',
-            message['volume_id']))
-        # Configure volumes to delete when instance is scaled down
-        ec2_instance.modify_attribute(BlockDeviceMappings=[
-            {
-                'DeviceName': mount_point,
-                'Ebs': {
-                    'DeleteOnTermination': True
-                }
-            }
-        ])
-
-        task_command.extend(['-t', message['ami_id'], mount_point])
+        shard_command = list(task_command)
+        for message, (mount_point, __) in zip(shard, device_volumes):
+            shard_command.extend(['-t', message['ami_id'], mount_point])
+        shard_commands.append(
+            (container_instance['containerInstanceArn'], shard_command))
 
     # create task definition
     result = ecs.register_task_definition(
@@ -460,55 +953,121 @@ def run_inspection_cluster(messages, cloud='aws'):
         ],
         requiresCompatibilities=['EC2']
     )
-
-    # release the hounds
-    ecs.run_task(
-        cluster=settings.HOUNDIGRADE_ECS_CLUSTER_NAME,
-        taskDefinition=result['taskDefinition']['taskDefinitionArn'],
-    )
+    task_definition_arn = result['taskDefinition']['taskDefinitionArn']
+
+    # release the hounds, one pack per instance with its attached volumes
+    for container_instance_arn, shard_command in shard_commands:
+        ecs.start_task(
+            cluster=target.ecs_cluster_name,
+            taskDefinition=task_definition_arn,
+            containerInstances=[container_instance_arn],
+            overrides={
+                'containerOverrides': [
+                    {
+                        'name': 'Houndigrade',
+                        'command': shard_command,
+                    }
+                ]
+            },
+        )
 
 
 @retriable_shared_task
 @rewrap_aws_errors
-def scale_down_cluster():
+def scale_down_cluster(region=None):
     """
     Scale down cluster after houndigrade scan.
 
+    Args:
+        region (str): Optional region of the inspection target to scale down.
+            Defaults to the default target.
+
     Returns:
         None: Run as an asynchronous Celery task.
 
     """
-    logger.info(_('Scaling down ECS cluster.'))
-    aws.scale_down(settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME)
+    target = get_inspection_target(region)
+    logger.info(_('Scaling down ECS cluster in {0}.').format(target.region))
+    aws.scale_down(target.autoscaling_group_name, target.region)
 
 
-def persist_aws_inspection_cluster_results(inspection_result):
+def persist_aws_inspection_cluster_results(inspection_result, rhel_tag=None):
     """
     Persist the aws houndigrade inspection result.
 
+    All of the result's images are fetched with one query, their rhel tags are
+    replaced with bulk inserts and deletes on the tags through table, and
+    their inspection JSON and status are set with a single UPDATE, all in one
+    transaction. Since the bulk tag changes do not send m2m_changed, stored
+    usage for images whose rhel tag changed is invalidated directly. The
+    results are then propagated to any uninspected images with the same root
+    snapshots.
+
     Args:
         inspection_result (dict): A dict containing houndigrade results
+        rhel_tag (ImageTag): Optional. The rhel tag, so that callers
+            persisting many results need only look it up once.
     Returns:
-        None
+        list: The image IDs in the results that we do not know about
     """
-    rhel_tag = ImageTag.objects.filter(description='rhel').first()
-    results = inspection_result.get('results', [])
-    for image_id, image_json in results.items():
-        ami = AwsMachineImage.objects.filter(ec2_ami_id=image_id).first()
-        if ami is not None:
-            ami.tags.remove(rhel_tag)
-            rhel_found = any([attribute.get('rhel_found')
-                              for disk_json in list(image_json.values())
-                              for attribute in disk_json.values()])
-            if rhel_found:
-                ami.tags.add(rhel_tag)
-            # Add image inspection JSON
-            ami.inspection_json = json.dumps(image_json)
-            ami.status = ami.INSPECTED
-            ami.save()
-        else:
-            logger.error(
-                _('AwsMachineImage "{0}" is not found.').format(image_id))
+    results = inspection_result.get('results', {})
+    image_ids = {
+        ami_id: image_id for image_id, ami_id in
+        AwsMachineImage.objects.filter(
+            ec2_ami_id__in=list(results.keys())
+        ).values_list('id', 'ec2_ami_id')
+    }
+
+    unknown_ami_ids = [
+        ami_id for ami_id in results.keys() if ami_id not in image_ids
+    ]
+    if unknown_ami_ids:
+        logger.error(_('AwsMachineImage "{0}" is not found.').format(
+            '", "'.join(unknown_ami_ids)))
+    if not image_ids:
+        return unknown_ami_ids
+
+    rhel_image_ids = [
+        image_ids[ami_id] for ami_id, image_json in results.items()
+        if ami_id in image_ids and
+        any([attribute.get('rhel_found')
+             for disk_json in list(image_json.values())
+             for attribute in disk_json.values()])
+    ]
+    if rhel_tag is None:
+        rhel_tag = ImageTag.objects.filter(description='rhel').first()
+    image_tag_model = AwsMachineImage.tags.through
+
+    with transaction.atomic():
+        old_rhel_tags = image_tag_model.objects.filter(
+            machineimage_id__in=image_ids.values(),
+            imagetag_id=rhel_tag.id,
+        )
+        retagged_image_ids = set(
+            old_rhel_tags.values_list('machineimage_id', flat=True)
+        ).symmetric_difference(rhel_image_ids)
+        old_rhel_tags.delete()
+        image_tag_model.objects.bulk_create([
+            image_tag_model(machineimage_id=image_id, imagetag_id=rhel_tag.id)
+            for image_id in rhel_image_ids
+        ])
+        if retagged_image_ids:
+            signals.invalidate_usage_for_images(list(retagged_image_ids))
+        # Add image inspection JSON
+        MachineImage.objects.filter(id__in=image_ids.values()).update(
+            status=MachineImage.INSPECTED,
+            inspection_json=Case(
+                *[
+                    When(id=image_id,
+                         then=Value(json.dumps(results[ami_id])))
+                    for ami_id, image_id in image_ids.items()
+                ],
+                output_field=TextField(),
+            ),
+        )
+    propagate_image_inspections(list(image_ids.values()), rhel_tag)
+
+    return unknown_ami_ids
 
 
 @shared_task
@@ -516,23 +1075,150 @@ def persist_inspection_cluster_results_task():
     """
     Task to run periodically and read houndigrade messages.
 
+    The results queue is long-polled and drained in batches until it is
+    empty. Each batch is deleted from the queue only after its results are
+    persisted, so results are not lost if this task dies part way through.
+    A message that cannot be decoded or persisted is logged and deleted so
+    that it does not block the rest of the queue. The cluster is scaled down
+    once every image sent for inspection has reported back or
+    HOUNDIGRADE_RESULTS_TIMEOUT has passed.
+
     Returns:
         None: Run as an asynchronous Celery task.
 
     """
-    messages = read_messages_from_queue(
-        settings.HOUNDIGRADE_RESULTS_QUEUE_NAME,
-        HOUNDIGRADE_MESSAGE_READ_LEN)
-    logger.info(_('{0} read {1} message(s) for processing').format(
-        'persist_inspection_cluster_results_task', len(messages)))
-    if bool(messages):
-        for message in messages:
-            inspection_result = message
-            if isinstance(message, str):
-                inspection_result = json.loads(message)
-            if inspection_result.get(CLOUD_KEY) == CLOUD_TYPE_AWS:
-                persist_aws_inspection_cluster_results(inspection_result)
-            else:
-                logger.error(_('Unsupported cloud type: "{0}"').format(
-                    message.get(CLOUD_KEY)))
-        scale_down_cluster.delay()
+    message_count = 0
+    rhel_tag = ImageTag.objects.filter(description='rhel').first()
+    try:
+        while True:
+            received = receive_messages_from_queue(
+                settings.HOUNDIGRADE_RESULTS_QUEUE_NAME,
+                HOUNDIGRADE_MESSAGE_READ_LEN,
+                settings.HOUNDIGRADE_RESULTS_WAIT_TIME)
+            logger.info(_('{0} read {1} message(s) for processing').format(
+                'persist_inspection_cluster_results_task', len(received)))
+            for item in received:
+                if item.error is not None:
+                    continue
+                try:
+                    _persist_inspection_cluster_result(item.message,
+                                                       rhel_tag)
+                except Exception:
+                    logger.exception(_('Failed to persist inspection result '
+                                       '{0}').format(item.message))
+            delete_messages_from_queue(
+                settings.HOUNDIGRADE_RESULTS_QUEUE_NAME,
+                [item.receipt_handle for item in received])
+            message_count += len(received)
+            if len(received) < HOUNDIGRADE_MESSAGE_READ_LEN:
+                break
+    finally:
+        _scale_down_cluster_when_inspected(message_count > 0)
+
+
+def _persist_inspection_cluster_result(message, rhel_tag):
+    """
+    Persist one houndigrade result message for its cloud.
+
+    Args:
+        message (object): The decoded message, or its JSON string
+        rhel_tag (ImageTag): The rhel tag
+
+    Raises:
+        ValueError: if the message is not a JSON object
+
+    """
+    inspection_result = message
+    if isinstance(message, str):
+        inspection_result = json.loads(message)
+    if not isinstance(inspection_result, dict):
+        raise ValueError(_('Malformed inspection result: {0}').format(
+            inspection_result))
+    if inspection_result.get(CLOUD_KEY) == CLOUD_TYPE_AWS:
+        persist_aws_inspection_cluster_results(inspection_result, rhel_tag)
+    else:
+        logger.error(_('Unsupported cloud type: "{0}"').format(
+            inspection_result.get(CLOUD_KEY)))
+
+
+def _scale_down_cluster_when_inspected(results_received):
+    """
+    Scale down each inspection cluster that has no outstanding inspections.
+
+    Images still being inspected after HOUNDIGRADE_RESULTS_TIMEOUT are given up
+    on and left for reclaim_stale_image_inspections to restart.
+
+    Args:
+        results_received (bool): Whether any results were just persisted
+    """
+    expired_before = timezone.now() - datetime.timedelta(
+        seconds=settings.HOUNDIGRADE_RESULTS_TIMEOUT)
+    inspecting = AwsMachineImage.objects.filter(
+        status=AwsMachineImage.INSPECTING)
+
+    timed_out = list(inspecting.filter(
+        inspection_claimed_at__lt=expired_before
+    ).values_list('ec2_ami_id', 'inspection_region'))
+    if timed_out:
+        timed_out_ids = [ami_id for ami_id, __ in timed_out]
+        logger.error(_('Inspection results never arrived for {0}').format(
+            timed_out_ids))
+        AwsMachineImage.objects.filter(ec2_ami_id__in=timed_out_ids).update(
+            inspection_claimed_at=None)
+    if not results_received and not timed_out:
+        return
+
+    outstanding_counts = collections.Counter(
+        region or settings.HOUNDIGRADE_AWS_REGION
+        for region in inspecting.filter(
+            inspection_claimed_at__gte=expired_before
+        ).values_list('inspection_region', flat=True)
+    )
+    for target in get_inspection_targets():
+        outstanding_count = outstanding_counts[target.region]
+        if outstanding_count:
+            logger.info(_('Not scaling down {0} while {1} image(s) await '
+                          'inspection results').format(target.region,
+                                                       outstanding_count))
+            continue
+        scale_down_cluster.delay(target.region)
+
+
+@shared_task
+def generate_report(report_result_id):
+    """
+    Generate a report requested as a job and store its results.
+
+    Args:
+        report_result_id (int): id of the ReportResult for the job
+
+    Returns:
+        None: Run as an asynchronous Celery task.
+
+    """
+    report_result = ReportResult.objects.get(id=report_result_id)
+    if not claim_report_job(report_result):
+        logger.info(_('Report job {0} is already {1}; not running it').format(
+            report_result_id, report_result.status))
+        return
+
+    parameters = json.loads(report_result.parameters)
+    parameters['start'] = date_parser.parse(parameters['start'])
+    parameters['end'] = date_parser.parse(parameters['end'])
+    try:
+        result = cache.get_or_generate_report(
+            report_result.cache_key,
+            reports.REPORTS[report_result.report_name],
+            **parameters
+        )
+    except Exception as e:
+        logger.exception(_('Failed to generate report for job {0}').format(
+            report_result_id))
+        report_result.status = ReportResult.STATUS.failed
+        report_result.error = str(e)
+        report_result.save()
+        return
+
+    report_result.set_result(result)
+    report_result.status = ReportResult.STATUS.complete
+    report_result.save()
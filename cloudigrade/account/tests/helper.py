@@ -1,12 +1,16 @@
 """Helper functions for generating test data."""
 import random
 
+from django.utils import timezone
+
 from account.models import (AwsAccount,
                             AwsInstance,
                             AwsInstanceEvent,
                             AwsMachineImage,
+                            AwsSnapshotCopyRequest,
                             ImageTag,
                             InstanceEvent)
+from account.util import get_inspection_target
 from util import aws
 from util.tests import helper
 
@@ -211,3 +215,48 @@ def generate_aws_image(account,
         image.save()
 
     return image
+
+
+def generate_snapshot_copy_request(region=None, priority=0, status=None,
+                                   target_region=None, admitted_at=None,
+                                   snapshot_copy_id=None):
+    """
+    Generate an AwsSnapshotCopyRequest for testing.
+
+    Any optional arguments not provided will be randomly generated.
+
+    Args:
+        region (str): Optional AWS region where the snapshot resides.
+        priority (int): Optional priority of the request.
+        status (str): Optional AwsSnapshotCopyRequest.STATUS of the request.
+        target_region (str): Optional AWS region the snapshot is copied to.
+            Defaults to the region of the snapshot's inspection target.
+        admitted_at (datetime.datetime): Optional time a copying request was
+            admitted. Defaults to now.
+        snapshot_copy_id (str): Optional id of the started snapshot copy.
+
+    Returns:
+        AwsSnapshotCopyRequest: The created AwsSnapshotCopyRequest.
+
+    """
+    if region is None:
+        region = random.choice(helper.SOME_AWS_REGIONS)
+    if status is None:
+        status = AwsSnapshotCopyRequest.STATUS.queued
+    if target_region is None:
+        target_region = get_inspection_target(region).region
+    if admitted_at is None and \
+            status == AwsSnapshotCopyRequest.STATUS.copying:
+        admitted_at = timezone.now()
+
+    return AwsSnapshotCopyRequest.objects.create(
+        arn=helper.generate_dummy_arn(),
+        ec2_ami_id=helper.generate_dummy_image_id(),
+        customer_snapshot_id=helper.generate_dummy_snapshot_id(),
+        snapshot_region=region,
+        target_region=target_region,
+        priority=priority,
+        status=status,
+        admitted_at=admitted_at,
+        snapshot_copy_id=snapshot_copy_id,
+    )
@@ -0,0 +1,133 @@
+"""Collection of tests for the account.benchmarks module."""
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from account import benchmarks, reports
+from account.models import (AwsAccount, AwsInstance, AwsInstanceEvent,
+                            AwsMachineImage, InstanceEvent, MachineImage)
+from account.tests import helper as account_helper
+from util.tests import helper as util_helper
+
+
+class GenerateBenchmarkDataTest(TestCase):
+    """generate_benchmark_data test case."""
+
+    def test_generate_benchmark_data(self):
+        """Test the generated rows are complete and consistent."""
+        start = util_helper.utc_dt(2018, 1, 1, 0, 0, 0)
+        end = util_helper.utc_dt(2018, 2, 1, 0, 0, 0)
+        dataset = benchmarks.generate_benchmark_data(
+            users=2, accounts_per_user=2, images_per_account=3,
+            instances_per_account=2, events_per_instance=4, start=start,
+            end=end, rhel_ratio=1.0, openshift_ratio=0.0, batch_size=3,
+            seed=1)
+
+        self.assertEqual(len(dataset.user_ids), 2)
+        self.assertEqual(dataset.account_count, 4)
+        self.assertEqual(dataset.image_count, 12)
+        self.assertEqual(dataset.instance_count, 8)
+        self.assertEqual(dataset.event_count, 32)
+        self.assertEqual(benchmarks.get_benchmark_user_ids(),
+                         dataset.user_ids)
+        self.assertEqual(
+            AwsAccount.objects.filter(user_id__in=dataset.user_ids).count(),
+            4)
+        self.assertEqual(AwsMachineImage.objects.count(), 12)
+        self.assertEqual(AwsInstance.objects.count(), 8)
+        self.assertEqual(AwsInstanceEvent.objects.count(), 32)
+        self.assertEqual(
+            MachineImage.objects.filter(tags__description='rhel').count(), 12)
+
+        for instance in AwsInstance.objects.all():
+            events = list(InstanceEvent.objects.filter(instance=instance)
+                          .order_by('occurred_at'))
+            self.assertEqual(
+                [event.event_type for event in events],
+                [InstanceEvent.TYPE.power_on, InstanceEvent.TYPE.power_off] *
+                2)
+            self.assertEqual(len({event.machineimage_id for event in events}),
+                             1)
+            self.assertEqual(events[0].machineimage.account_id,
+                             instance.account_id)
+            for event in events:
+                self.assertTrue(start <= event.occurred_at < end)
+
+    def test_generate_benchmark_data_after_existing_rows(self):
+        """Test generated ids follow existing rows and saves still work."""
+        account = account_helper.generate_aws_account()
+        benchmarks.generate_benchmark_data(
+            users=1, accounts_per_user=1, images_per_account=1,
+            instances_per_account=1, events_per_instance=2)
+
+        other_account = account_helper.generate_aws_account()
+        self.assertEqual(AwsAccount.objects.count(), 3)
+        self.assertGreater(other_account.id, account.id + 1)
+
+
+class RunReportBenchmarksTest(TestCase):
+    """run_report_benchmarks test case."""
+
+    def test_run_report_benchmarks(self):
+        """Test every report type is measured for each window."""
+        end = util_helper.utc_dt(2018, 2, 1, 0, 0, 0)
+        dataset = benchmarks.generate_benchmark_data(
+            users=2, accounts_per_user=1, images_per_account=2,
+            instances_per_account=2, events_per_instance=4, end=end, seed=2)
+
+        results = list(benchmarks.run_report_benchmarks(
+            dataset.user_ids, end=end, windows=(1, 7),
+            granularities=(reports.GRANULARITY_DAILY,
+                           reports.GRANULARITY_WEEKLY)))
+
+        scenarios = [
+            (result.scenario, result.parameters['days'],
+             result.parameters.get('granularity'),
+             result.parameters.get('stored_usage'))
+            for result in results
+        ]
+        expected = []
+        for days in (1, 7):
+            for report in (benchmarks.REPORT_DAILY_USAGE,
+                           benchmarks.REPORT_DAILY_USAGE_BY_USER):
+                for granularity in ('daily', 'weekly'):
+                    expected.append((report, days, granularity, 'cold'))
+                    expected.append((report, days, granularity, 'warm'))
+            expected.append(
+                (benchmarks.REPORT_ACCOUNT_OVERVIEWS, days, None, None))
+        self.assertEqual(scenarios, expected)
+        for result in results:
+            self.assertGreater(result.query_count, 0)
+
+
+class BenchmarkReportsCommandTest(TestCase):
+    """benchmark_reports management command test case."""
+
+    def test_benchmark_reports(self):
+        """Test loading data and appending results to an output file."""
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.jsonl')
+            for __ in range(2):
+                call_command(
+                    'benchmark_reports', '--users=1', '--accounts-per-user=1',
+                    '--instances-per-account=2', '--events-per-instance=2',
+                    '--windows=1', '--reports=account_overviews',
+                    f'--output={output}', '--label=test', stdout=io.StringIO())
+            with open(output) as stream:
+                lines = [json.loads(line) for line in stream]
+
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[0]['label'], 'test')
+        self.assertEqual(lines[0]['dataset']['event_count'], 4)
+        self.assertEqual(lines[1]['scenario'],
+                         benchmarks.REPORT_ACCOUNT_OVERVIEWS)
+
+    def test_benchmark_reports_skip_load_without_data(self):
+        """Test reusing benchmark data fails when none was loaded."""
+        with self.assertRaises(CommandError):
+            call_command('benchmark_reports', '--skip-load',
+                         stdout=io.StringIO())
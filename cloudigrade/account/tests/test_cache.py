@@ -0,0 +1,112 @@
+"""Collection of tests for the account.cache module."""
+from unittest.mock import Mock
+
+from django.test import TestCase, override_settings
+
+from account import cache
+from account.models import ImageTag
+from account.tests import helper as account_helper
+from util.tests import helper as util_helper
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'reports': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-reports',
+    },
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ReportCacheTest(TestCase):
+    """Report cache test case."""
+
+    def setUp(self):
+        """Set up commonly used data for each test."""
+        cache.get_report_cache().clear()
+        self.user = util_helper.generate_test_user()
+        self.account = account_helper.generate_aws_account(user=self.user)
+        self.instance = account_helper.generate_aws_instance(self.account)
+        self.image = account_helper.generate_aws_image(self.account)
+        self.start = util_helper.utc_dt(2018, 1, 1, 0, 0, 0)
+        self.end = util_helper.utc_dt(2018, 2, 1, 0, 0, 0)
+
+    def get_key(self, **kwargs):
+        """Get the cache key for the standard test report parameters."""
+        return cache.get_report_cache_key(
+            'instances', self.user.id, self.start, self.end, **kwargs
+        )
+
+    def generate_event(self, powered_time):
+        """Generate and save a power_on event for the test instance."""
+        return account_helper.generate_single_aws_instance_event(
+            self.instance, powered_time, ec2_ami_id=self.image.ec2_ami_id
+        )
+
+    def test_key_is_stable_without_changes(self):
+        """Assert the same parameters and data produce the same key."""
+        self.generate_event(util_helper.utc_dt(2018, 1, 5, 0, 0, 0))
+        self.assertEqual(self.get_key(), self.get_key())
+
+    def test_key_varies_with_parameters(self):
+        """Assert different report parameters produce different keys."""
+        self.assertNotEqual(self.get_key(), self.get_key(name_pattern='x'))
+        self.assertNotEqual(self.get_key(), self.get_key(account_id=1))
+
+    def test_key_changes_with_new_event(self):
+        """Assert a new event for the user's accounts invalidates the key."""
+        self.generate_event(util_helper.utc_dt(2018, 1, 5, 0, 0, 0))
+        old_key = self.get_key()
+        # Even an event in the distant past must invalidate the report.
+        self.generate_event(util_helper.utc_dt(2017, 1, 5, 0, 0, 0))
+        self.assertNotEqual(old_key, self.get_key())
+
+    def test_key_changes_with_tag_change(self):
+        """Assert (un)tagging an image seen in events invalidates the key."""
+        self.generate_event(util_helper.utc_dt(2018, 1, 5, 0, 0, 0))
+        rhel_tag = ImageTag.objects.get(description='rhel')
+        key_untagged = self.get_key()
+
+        self.image.tags.add(rhel_tag)
+        key_tagged = self.get_key()
+        self.assertNotEqual(key_untagged, key_tagged)
+
+        self.image.tags.remove(rhel_tag)
+        key_untagged_again = self.get_key()
+        self.assertNotEqual(key_tagged, key_untagged_again)
+
+        self.image.tags.add(rhel_tag)
+        self.assertNotEqual(key_tagged, self.get_key())
+
+    def test_key_unchanged_by_other_user_event(self):
+        """Assert another user's new event does not invalidate the key."""
+        old_key = self.get_key()
+        other_account = account_helper.generate_aws_account()
+        other_instance = account_helper.generate_aws_instance(other_account)
+        account_helper.generate_single_aws_instance_event(
+            other_instance, util_helper.utc_dt(2018, 1, 5, 0, 0, 0)
+        )
+        self.assertEqual(old_key, self.get_key())
+
+    def test_get_or_generate_report_caches_result(self):
+        """Assert the report function runs only once for the same key."""
+        report_function = Mock(return_value={'hello': 'world'})
+        key = self.get_key()
+        for __ in range(2):
+            result = cache.get_or_generate_report(
+                key, report_function, self.user.id, self.start, self.end
+            )
+            self.assertEqual(result, {'hello': 'world'})
+        report_function.assert_called_once_with(
+            self.user.id, self.start, self.end
+        )
+
+    def test_get_or_generate_report_regenerates_after_change(self):
+        """Assert the report function runs again after the data changes."""
+        report_function = Mock(return_value={'hello': 'world'})
+        cache.get_or_generate_report(self.get_key(), report_function)
+        self.generate_event(util_helper.utc_dt(2018, 1, 5, 0, 0, 0))
+        cache.get_or_generate_report(self.get_key(), report_function)
+        self.assertEqual(report_function.call_count, 2)
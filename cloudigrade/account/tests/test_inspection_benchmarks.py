@@ -0,0 +1,133 @@
+"""Collection of tests for the account.inspection_benchmarks module."""
+import io
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+
+from account import inspection_benchmarks, tasks
+from account.models import AwsMachineImage, MachineImage
+from account.util import receive_messages_from_queue
+from util import aws
+from util.exceptions import SnapshotNotReadyException
+
+
+class LocalInspectionAwsTest(TestCase):
+    """LocalInspectionAws stand-in test case."""
+
+    def test_snapshot_copy_becomes_ready(self):
+        """Test a snapshot copy is only completed after its delay."""
+        local_aws = inspection_benchmarks.LocalInspectionAws(
+            snapshot_copy_seconds=100, delay_jitter=0)
+        ami_id = local_aws.add_customer_image('123456789012')
+
+        with local_aws.patched():
+            session = aws.get_session(
+                'arn:aws:iam::123456789012:role/benchmark')
+            ami = aws.get_ami(session, ami_id, 'us-east-1')
+            snapshot = aws.get_snapshot(
+                session, aws.get_ami_snapshot_id(ami), 'us-east-1')
+            aws.add_snapshot_ownership(snapshot)
+            copy_id = aws.copy_snapshot(snapshot.snapshot_id, 'us-east-1')
+            with self.assertRaises(SnapshotNotReadyException):
+                aws.create_volume(copy_id, 'us-east-1a', 'us-east-1')
+            local_aws.clock = 100
+            states = aws.get_snapshot_states([copy_id], 'us-east-1')
+
+        self.assertEqual(snapshot.owner_id, '123456789012')
+        self.assertEqual(states, {copy_id: 'completed'})
+        self.assertEqual(local_aws.api_calls['ec2.CopySnapshot'], 1)
+        self.assertEqual(local_aws.api_calls['sts.AssumeRole'], 1)
+
+    def test_results_sent_after_inspection(self):
+        """Test houndigrade's results only arrive after its delay."""
+        local_aws = inspection_benchmarks.LocalInspectionAws(
+            inspection_seconds=60, delay_jitter=0, rhel_ratio=1)
+        local_aws.client('ecs').start_task(overrides={'containerOverrides': [{
+            'name': 'Houndigrade',
+            'command': ['-c', 'aws', '-t', 'ami-1', '/dev/xvdba'],
+        }]})
+        queue_name = settings.HOUNDIGRADE_RESULTS_QUEUE_NAME
+
+        with local_aws.patched():
+            self.assertEqual(receive_messages_from_queue(queue_name), [])
+            local_aws.clock = 60
+            received = receive_messages_from_queue(queue_name)
+
+        self.assertEqual(received[0].message['results'], {'ami-1': {
+            '/dev/xvdba': {'/dev/xvdba1': {'rhel_found': True}},
+        }})
+
+
+class RunInspectionLoadTestTest(TestCase):
+    """run_inspection_load_test test case."""
+
+    def test_run_inspection_load_test(self):
+        """Test every image is inspected and the run is reported."""
+        with self.settings(HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE=2,
+                           HOUNDIGRADE_SCALE_UP_QUEUE_DEPTH=2):
+            result = inspection_benchmarks.run_inspection_load_test(
+                images=5, account_count=2, seed=1)
+
+        self.assertEqual(result.inspected, 5)
+        self.assertEqual(AwsMachineImage.objects.filter(
+            status=MachineImage.INSPECTED).count(), 5)
+        self.assertGreater(result.images_per_hour, 0)
+        self.assertEqual(result.benchmark.items, 5)
+        self.assertEqual(result.task_runs['account.tasks.copy_ami_snapshot'],
+                         5)
+        self.assertEqual(result.task_runs['account.tasks.create_volume'], 5)
+        # The cluster's instances take a while to boot, so running
+        # houndigrade on them has to be retried.
+        self.assertGreater(
+            result.retries['account.tasks.run_inspection_cluster'], 0)
+        self.assertEqual(result.failures, {})
+        self.assertEqual(result.api_calls['ec2.CopySnapshot'], 5)
+        self.assertEqual(result.api_calls['ec2.CreateVolume'], 5)
+        self.assertEqual(result.api_calls['ec2.AttachVolume'], 5)
+
+    def test_snapshot_copy_limit(self):
+        """Test copies refused by AWS are requeued rather than failed."""
+        with self.settings(AWS_SNAPSHOT_COPY_CONCURRENCY=5):
+            result = inspection_benchmarks.run_inspection_load_test(
+                images=3, snapshot_copy_limit=1, seed=2)
+
+        self.assertEqual(result.inspected, 3)
+        self.assertGreater(result.api_calls['ec2.CopySnapshot'], 3)
+        self.assertEqual(result.failures, {})
+
+    def test_gives_up_after_max_seconds(self):
+        """Test the run stops if images cannot be inspected in time."""
+        result = inspection_benchmarks.run_inspection_load_test(
+            images=2, snapshot_copy_seconds=10000, max_seconds=600, seed=3)
+
+        self.assertEqual(result.inspected, 0)
+        self.assertLessEqual(result.simulated_seconds, 600)
+        self.assertNotIn(tasks.create_volume.name, result.task_runs)
+
+
+class BenchmarkInspectionCommandTest(TestCase):
+    """benchmark_inspection management command test case."""
+
+    def test_command_appends_json_lines(self):
+        """Test the command reports the run and appends its results."""
+        stdout = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'benchmarks.jsonl')
+            call_command('benchmark_inspection', '--images=2', '--seed=3',
+                         '--label=test', '--output={0}'.format(output),
+                         stdout=stdout)
+            with open(output) as stream:
+                lines = [json.loads(line) for line in stream]
+
+        self.assertIn('images/h', stdout.getvalue())
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]['scenario'], 'inspection_pipeline')
+        self.assertEqual(lines[0]['label'], 'test')
+        self.assertEqual(lines[0]['inspected'], 2)
+        self.assertEqual(
+            lines[0]['task_runs']['account.tasks.copy_ami_snapshot'], 2)
+        self.assertGreater(lines[0]['api_calls']['ec2.CopySnapshot'], 0)
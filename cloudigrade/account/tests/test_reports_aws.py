@@ -1,9 +1,14 @@
 """Collection of tests for the reports module."""
+import datetime
+import json
+from unittest.mock import patch
+
 import faker
 from django.test import TestCase
+from django.utils import timezone
 
 from account import reports
-from account.models import InstanceEvent
+from account.models import AccountPeriodUsage, ImageTag, InstanceEvent
 from account.tests import helper as account_helper
 from util.tests import helper as util_helper
 
@@ -667,6 +672,382 @@ class GetDailyUsageComplexInstancesTest(GetDailyUsageTestBase):
         )), 2)
 
 
+class GetDailyUsageGranularityTest(GetDailyUsageTestBase):
+    """get_daily_usage tests for granularities other than daily."""
+
+    def setUp(self):
+        """Set up instances running across hour, day, and week boundaries."""
+        super().setUp()
+        self.generate_events((
+            (
+                util_helper.utc_dt(2018, 1, 6, 22, 30, 0),
+                util_helper.utc_dt(2018, 1, 8, 1, 0, 0)
+            ),
+        ))
+        self.generate_events((
+            (
+                util_helper.utc_dt(2018, 1, 31, 12, 0, 0),
+                util_helper.utc_dt(2018, 2, 2, 0, 0, 0)
+            ),
+        ), instance=self.instance_2, image=self.image_ocp)
+        self.end = util_helper.utc_dt(2018, 3, 1, 0, 0, 0)
+
+    def test_hourly(self):
+        """Assert hourly periods count partial hours in their own hour."""
+        start = util_helper.utc_dt(2018, 1, 6, 22, 0, 0)
+        end = util_helper.utc_dt(2018, 1, 7, 1, 0, 0)
+        results = reports.get_daily_usage(
+            self.user_1.id, start, end, granularity='hourly')
+        self.assertEqual(
+            [period['date'] for period in results['daily_usage']],
+            [util_helper.utc_dt(2018, 1, 6, hour, 0, 0) for hour in (22, 23)] +
+            [util_helper.utc_dt(2018, 1, 7, 0, 0, 0)],
+        )
+        self.assertEqual(
+            [period['rhel_runtime_seconds']
+             for period in results['daily_usage']],
+            [HOUR / 2, HOUR, HOUR],
+        )
+        self.assertInstancesSeen(results, rhel=1)
+
+    def test_weekly(self):
+        """Assert weekly periods are aligned to start and exclude a partial."""
+        results = reports.get_daily_usage(
+            self.user_1.id, self.start, self.end, granularity='weekly')
+        self.assertEqual(len(results['daily_usage']), 8)
+        self.assertEqual(
+            results['daily_usage'][0]['rhel_runtime_seconds'], HOUR * 25.5)
+        self.assertEqual(
+            results['daily_usage'][1]['rhel_runtime_seconds'], HOUR)
+        self.assertEqual(
+            results['daily_usage'][4]['openshift_runtime_seconds'], DAY * 1.5)
+        self.assertDaysSeen(results, rhel=2, openshift=1)
+        self.assertInstancesSeen(results, rhel=1, openshift=1)
+
+    def test_monthly(self):
+        """Assert monthly periods are whole calendar months."""
+        results = reports.get_daily_usage(
+            self.user_1.id, self.start, self.end, granularity='monthly')
+        self.assertEqual(
+            [period['date'] for period in results['daily_usage']],
+            [self.start, util_helper.utc_dt(2018, 2, 1, 0, 0, 0)],
+        )
+        self.assertEqual(
+            [period['openshift_runtime_seconds']
+             for period in results['daily_usage']],
+            [HOUR * 12, DAY],
+        )
+        self.assertEqual(
+            [period['rhel_instances'] for period in results['daily_usage']],
+            [1, 0],
+        )
+        self.assertTotalRunningTimes(
+            results, rhel=HOUR * 26.5, openshift=HOUR * 36)
+
+    def test_periods_match_daily_totals(self):
+        """Assert coarser periods total the same as daily periods."""
+        daily_results = reports.get_daily_usage(
+            self.user_1.id, self.start, self.end)
+        self.assertTotalRunningTimes(
+            daily_results, rhel=HOUR * 26.5, openshift=HOUR * 36)
+        for granularity in ('weekly', 'monthly'):
+            results = reports.get_daily_usage(
+                self.user_1.id, self.start, self.end, granularity=granularity)
+            self.assertTotalRunningTimes(
+                results, rhel=HOUR * 26.5, openshift=HOUR * 36)
+            self.assertInstancesSeen(results, rhel=1, openshift=1)
+
+
+class GetPeriodsTest(TestCase):
+    """_get_periods test case."""
+
+    def test_monthly_periods_do_not_drift(self):
+        """Assert months starting late in a month keep their day."""
+        periods = reports._get_periods(
+            util_helper.utc_dt(2018, 1, 31, 0, 0, 0),
+            util_helper.utc_dt(2018, 5, 1, 0, 0, 0),
+            'monthly',
+        )
+        self.assertEqual(periods, [
+            (util_helper.utc_dt(2018, 1, 31, 0, 0, 0),
+             util_helper.utc_dt(2018, 2, 28, 0, 0, 0)),
+            (util_helper.utc_dt(2018, 2, 28, 0, 0, 0),
+             util_helper.utc_dt(2018, 3, 31, 0, 0, 0)),
+            (util_helper.utc_dt(2018, 3, 31, 0, 0, 0),
+             util_helper.utc_dt(2018, 4, 30, 0, 0, 0)),
+        ])
+
+    def test_partial_trailing_period_excluded(self):
+        """Assert a period that would extend beyond end is not included."""
+        periods = reports._get_periods(
+            util_helper.utc_dt(2018, 1, 1, 0, 0, 0),
+            util_helper.utc_dt(2018, 1, 1, 2, 30, 0),
+            'hourly',
+        )
+        self.assertEqual(len(periods), 2)
+
+
+class CalculatePeriodUsagesTest(TestCase):
+    """_calculate_period_usages test case."""
+
+    def test_runs_split_across_periods(self):
+        """Assert runs are split across the periods they overlap."""
+        account = account_helper.generate_aws_account()
+        image = account_helper.generate_aws_image(account, is_rhel=True)
+        instance = account_helper.generate_aws_instance(account)
+        events = account_helper.generate_aws_instance_events(
+            instance,
+            (
+                (util_helper.utc_dt(2018, 1, 1, 12, 0, 0),
+                 util_helper.utc_dt(2018, 1, 3, 6, 0, 0)),
+                (util_helper.utc_dt(2018, 1, 4, 18, 0, 0), None),
+            ),
+            ec2_ami_id=image.ec2_ami_id,
+        )
+        periods = [
+            (util_helper.utc_dt(2018, 1, day, 0, 0, 0),
+             util_helper.utc_dt(2018, 1, day + 1, 0, 0, 0))
+            # Periods need not be contiguous.
+            for day in (1, 2, 3, 5, 6)
+        ]
+
+        usages = reports._calculate_period_usages(
+            periods, {instance: events}, {})
+
+        self.assertEqual(
+            [usage['rhel_runtime_seconds'] for usage in usages],
+            [HOURS_10 + HOUR * 2, DAY, HOUR * 6, DAY, DAY],
+        )
+        self.assertEqual(
+            [usage['rhel_instance_ids'] for usage in usages],
+            [{instance.id}] * 5,
+        )
+        self.assertEqual(
+            [usage['openshift_runtime_seconds'] for usage in usages],
+            [0.0] * 5,
+        )
+
+
+class GetUsageBackendTest(TestCase):
+    """_get_usage_backend test case."""
+
+    def test_unsupported_backend_warns(self):
+        """Assert an unsupported configured backend warns and falls back."""
+        with self.settings(REPORT_USAGE_BACKEND='numpy'), \
+                patch.object(reports.reports_numpy, 'is_supported',
+                             return_value=False), \
+                self.assertLogs('account.reports', 'WARNING') as logs:
+            self.assertIsNone(reports._get_usage_backend())
+        self.assertIn('"numpy" report backend is not supported',
+                      logs.output[0])
+
+    def test_python_backend(self):
+        """Assert the python backend calculates usage in reports itself."""
+        with self.settings(REPORT_USAGE_BACKEND='python'):
+            self.assertIsNone(reports._get_usage_backend())
+
+
+class GetDailyUsageByUserTest(GetDailyUsageTestBase):
+    """get_daily_usage_by_user tests."""
+
+    def setUp(self):
+        """Set up activity for instances of accounts of two users."""
+        super().setUp()
+        self.generate_events((
+            (
+                util_helper.utc_dt(2018, 1, 2, 0, 0, 0),
+                util_helper.utc_dt(2018, 1, 4, 0, 0, 0)
+            ),
+        ))
+        instance = account_helper.generate_aws_instance(self.account_3)
+        image = account_helper.generate_aws_image(
+            self.account_3, is_rhel=True, is_openshift=True)
+        self.generate_events((
+            (
+                util_helper.utc_dt(2018, 1, 3, 0, 0, 0),
+                util_helper.utc_dt(2018, 1, 4, 12, 0, 0)
+            ),
+        ), instance=instance, image=image)
+
+    def test_results_match_get_daily_usage(self):
+        """Assert each user's results equal their own get_daily_usage."""
+        results = reports.get_daily_usage_by_user(self.start, self.end)
+        self.assertEqual(
+            set(results.keys()),
+            set([self.user_1.id, self.user_2.id, self.user_super.id]),
+        )
+        for user in (self.user_1, self.user_2, self.user_super):
+            self.assertEqual(
+                results[user.id],
+                reports.get_daily_usage(user.id, self.start, self.end),
+            )
+        self.assertTotalRunningTimes(results[self.user_2.id],
+                                     rhel=DAY * 1.5, openshift=DAY * 1.5)
+        self.assertNoActivityFound(results[self.user_super.id])
+
+    def test_specific_users(self):
+        """Assert only the specified users are included."""
+        results = reports.get_daily_usage_by_user(
+            self.start, self.end, user_ids=[self.user_1.id],
+            granularity='weekly')
+        self.assertEqual(list(results.keys()), [self.user_1.id])
+        self.assertEqual(len(results[self.user_1.id]['daily_usage']), 4)
+        self.assertTotalRunningTimes(results[self.user_1.id], rhel=DAY * 2)
+
+    def test_name_pattern(self):
+        """Assert accounts not matching the name pattern are excluded."""
+        self.account_1.name = 'greatest account ever'
+        self.account_1.save()
+        results = reports.get_daily_usage_by_user(
+            self.start, self.end, name_pattern='greatest')
+        self.assertTotalRunningTimes(results[self.user_1.id], rhel=DAY * 2)
+        self.assertNoActivityFound(results[self.user_2.id])
+
+    def test_events_loaded_once(self):
+        """Assert events for all users are loaded in a single pass."""
+        with patch.object(reports, '_get_relevant_events',
+                          wraps=reports._get_relevant_events) as mock_get:
+            reports.get_daily_usage_by_user(self.start, self.end)
+        mock_get.assert_called_once()
+
+
+class GetDailyUsageClosedPeriodTest(GetDailyUsageTestBase):
+    """get_daily_usage tests for reuse of stored closed period usage."""
+
+    def setUp(self):
+        """Set up a RHEL instance running from the 2nd to 4th of January."""
+        super().setUp()
+        powered_times = (
+            (
+                util_helper.utc_dt(2018, 1, 2, 0, 0, 0),
+                util_helper.utc_dt(2018, 1, 4, 0, 0, 0)
+            ),
+        )
+        self.generate_events(powered_times)
+
+    def test_closed_periods_are_stored(self):
+        """Assert usage is stored for each account and closed day."""
+        reports.get_daily_usage(self.user_1.id, self.start, self.end)
+        self.assertEqual(
+            AccountPeriodUsage.objects.filter(
+                account=self.account_1).count(), 31
+        )
+        self.assertEqual(
+            AccountPeriodUsage.objects.filter(
+                account=self.account_2).count(), 31
+        )
+        stored_usage = AccountPeriodUsage.objects.get(
+            account=self.account_1,
+            period_start=util_helper.utc_dt(2018, 1, 2, 0, 0, 0),
+        )
+        self.assertEqual(stored_usage.rhel_runtime_seconds, DAY)
+        self.assertEqual(json.loads(stored_usage.rhel_instance_ids),
+                         [self.instance_1.id])
+
+    def test_stored_periods_are_reused(self):
+        """Assert stored periods are not calculated again."""
+        first_results = reports.get_daily_usage(
+            self.user_1.id, self.start, self.end)
+        with patch.object(reports, '_calculate_period_usages') as mock_calc, \
+                patch.object(reports, '_get_relevant_events') as mock_events:
+            second_results = reports.get_daily_usage(
+                self.user_1.id, self.start, self.end)
+            mock_calc.assert_not_called()
+            mock_events.assert_not_called()
+        self.assertEqual(first_results, second_results)
+        self.assertInstancesSeen(second_results, rhel=1)
+        self.assertTotalRunningTimes(second_results, rhel=DAY * 2)
+
+    def test_open_period_is_not_stored(self):
+        """Assert usage is not stored for a period that has not ended."""
+        today = timezone.now().replace(hour=0, minute=0, second=0,
+                                       microsecond=0)
+        start = today - datetime.timedelta(days=2)
+        end = today + datetime.timedelta(days=1)
+        reports.get_daily_usage(self.user_1.id, start, end)
+        stored_starts = set(
+            AccountPeriodUsage.objects.filter(
+                account=self.account_1
+            ).values_list('period_start', flat=True)
+        )
+        self.assertEqual(
+            stored_starts,
+            {start, start + datetime.timedelta(days=1)}
+        )
+
+    def test_late_event_invalidates_day_and_following_days(self):
+        """Assert a late event invalidates its day and all later days."""
+        reports.get_daily_usage(self.user_1.id, self.start, self.end)
+        late_time = util_helper.utc_dt(2018, 1, 20, 12, 0, 0)
+        self.generate_events(((late_time, None),))
+        remaining_ends = AccountPeriodUsage.objects.filter(
+            account=self.account_1
+        ).values_list('period_end', flat=True)
+        self.assertEqual(len(remaining_ends), 19)
+        self.assertTrue(all([end <= late_time for end in remaining_ends]))
+        # Other accounts are unaffected.
+        self.assertEqual(
+            AccountPeriodUsage.objects.filter(
+                account=self.account_2).count(), 31
+        )
+
+        results = reports.get_daily_usage(self.user_1.id, self.start, self.end)
+        self.assertTotalRunningTimes(
+            results, rhel=DAY * 2 + DAY * 11 + HOUR * 12
+        )
+        self.assertEqual(
+            AccountPeriodUsage.objects.filter(
+                account=self.account_1).count(), 31
+        )
+
+    def test_deleted_instance_invalidates_account(self):
+        """Assert deleting an instance invalidates its account's usage."""
+        reports.get_daily_usage(self.user_1.id, self.start, self.end)
+        self.instance_1.delete()
+        self.assertFalse(
+            AccountPeriodUsage.objects.filter(
+                account=self.account_1).exists()
+        )
+        # Other accounts are unaffected.
+        self.assertEqual(
+            AccountPeriodUsage.objects.filter(
+                account=self.account_2).count(), 31
+        )
+
+        results = reports.get_daily_usage(self.user_1.id, self.start, self.end)
+        self.assertInstancesSeen(results)
+
+    def test_unaligned_periods_are_not_stored(self):
+        """Assert periods not on UTC day boundaries are not stored."""
+        start = self.start + datetime.timedelta(hours=6)
+        end = self.end + datetime.timedelta(hours=6)
+        reports.get_daily_usage(self.user_1.id, start, end)
+        self.assertFalse(AccountPeriodUsage.objects.exists())
+
+        reports.get_daily_usage(self.user_1.id, self.start, self.end,
+                                granularity=reports.GRANULARITY_HOURLY)
+        self.assertFalse(AccountPeriodUsage.objects.exists())
+
+    def test_image_tag_change_invalidates_account(self):
+        """Assert retagging a running image invalidates the account."""
+        results = reports.get_daily_usage(
+            self.user_1.id, self.start, self.end)
+        self.assertInstancesSeen(results, rhel=1)
+
+        self.image_rhel.tags.add(
+            ImageTag.objects.get(description='openshift'))
+        self.assertFalse(
+            AccountPeriodUsage.objects.filter(
+                account=self.account_1).exists()
+        )
+
+        results = reports.get_daily_usage(
+            self.user_1.id, self.start, self.end)
+        self.assertInstancesSeen(results, rhel=1, openshift=1)
+        self.assertTotalRunningTimes(results, rhel=DAY * 2,
+                                     openshift=DAY * 2)
+
+
 class GetCloudAccountOverview(TestCase):
     """Test that the CloudAccountOverview functions act correctly."""
 
@@ -0,0 +1,111 @@
+"""Collection of tests for the reports_numpy module."""
+import unittest
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from account import reports, reports_numpy
+from account.tests import test_reports_aws
+from util.tests import helper as util_helper
+
+requires_numpy = unittest.skipUnless(
+    reports_numpy.is_supported(), 'requires NumPy'
+)
+use_numpy_backend = override_settings(REPORT_USAGE_BACKEND='numpy')
+
+
+@requires_numpy
+@use_numpy_backend
+class NumpyGetDailyUsageNoReportableActivity(
+        test_reports_aws.GetDailyUsageNoReportableActivity):
+    """Run get_daily_usage no activity tests with the NumPy backend."""
+
+
+@requires_numpy
+@use_numpy_backend
+class NumpyGetDailyUsageBasicInstanceTest(
+        test_reports_aws.GetDailyUsageBasicInstanceTest):
+    """Run get_daily_usage basic instance tests with the NumPy backend."""
+
+
+@requires_numpy
+@use_numpy_backend
+class NumpyGetDailyUsageTwoRhelInstancesTest(
+        test_reports_aws.GetDailyUsageTwoRhelInstancesTest):
+    """Run get_daily_usage two RHEL instance tests with the NumPy backend."""
+
+
+@requires_numpy
+@use_numpy_backend
+class NumpyGetDailyUsageOneRhelOneOpenShiftInstanceTest(
+        test_reports_aws.GetDailyUsageOneRhelOneOpenShiftInstanceTest):
+    """Run get_daily_usage RHEL and OpenShift tests with the NumPy backend."""
+
+
+@requires_numpy
+@use_numpy_backend
+class NumpyGetDailyUsageComplexInstancesTest(
+        test_reports_aws.GetDailyUsageComplexInstancesTest):
+    """Run get_daily_usage complex instance tests with the NumPy backend."""
+
+
+@requires_numpy
+@use_numpy_backend
+class NumpyGetDailyUsageGranularityTest(
+        test_reports_aws.GetDailyUsageGranularityTest):
+    """Run get_daily_usage granularity tests with the NumPy backend."""
+
+
+@requires_numpy
+class NumpyGetDailyUsageParityTest(test_reports_aws.GetDailyUsageTestBase):
+    """Compare complete NumPy and Python get_daily_usage results."""
+
+    def test_results_match_python(self):
+        """Assert the NumPy backend's results equal the Python backend's."""
+        self.generate_events((
+            (util_helper.utc_dt(2017, 12, 20, 0, 0, 0),
+             util_helper.utc_dt(2018, 1, 3, 7, 15, 0)),
+            (util_helper.utc_dt(2018, 1, 5, 22, 0, 0), None),
+            (util_helper.utc_dt(2018, 1, 6, 1, 0, 0),
+             util_helper.utc_dt(2018, 1, 8, 0, 0, 0)),
+        ))
+        self.generate_events((
+            (util_helper.utc_dt(2018, 1, 9, 0, 0, 0),
+             util_helper.utc_dt(2018, 1, 9, 0, 0, 0)),
+            (util_helper.utc_dt(2018, 1, 31, 23, 0, 0), None),
+        ), instance=self.instance_2, image=self.image_rhel_ocp)
+        self.generate_events((
+            (util_helper.utc_dt(2018, 1, 15, 12, 0, 0),
+             util_helper.utc_dt(2018, 2, 3, 0, 0, 0)),
+        ), instance=self.instance_3, image=self.image_ocp)
+        self.generate_events((
+            (util_helper.utc_dt(2018, 1, 15, 12, 0, 0),
+             util_helper.utc_dt(2018, 1, 16, 0, 0, 0)),
+        ), instance=self.instance_4, image=self.image_plain)
+        self.generate_events((
+            (util_helper.utc_dt(2017, 6, 1, 0, 0, 0), None),
+        ), instance=self.instance_5, image=self.image_rhel)
+
+        python_results = reports.get_daily_usage(
+            self.user_1.id, self.start, self.end)
+        with use_numpy_backend:
+            numpy_results = reports.get_daily_usage(
+                self.user_1.id, self.start, self.end)
+        self.assertEqual(numpy_results, python_results)
+
+
+@use_numpy_backend
+class NumpyBackendFallbackTest(TestCase):
+    """Test the NumPy backend is only used when NumPy is installed."""
+
+    def test_python_used_without_numpy(self):
+        """Assert get_daily_usage falls back to Python without NumPy."""
+        user = util_helper.generate_test_user()
+        start = util_helper.utc_dt(2018, 1, 1, 0, 0, 0)
+        end = util_helper.utc_dt(2018, 1, 3, 0, 0, 0)
+        with patch.object(reports_numpy, 'np', None), \
+                patch.object(reports_numpy, 'calculate_daily_usage') as \
+                mock_calculate:
+            results = reports.get_daily_usage(user.id, start, end)
+            mock_calculate.assert_not_called()
+        self.assertEqual(len(results['daily_usage']), 2)
@@ -0,0 +1,138 @@
+"""Collection of tests for the reports_sql module."""
+import unittest
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from account import reports, reports_sql
+from account.tests import test_reports_aws
+from util.tests import helper as util_helper
+
+requires_postgresql = unittest.skipUnless(
+    reports_sql.is_supported(), 'requires a PostgreSQL database'
+)
+use_postgresql_backend = override_settings(REPORT_USAGE_BACKEND='postgresql')
+
+
+@requires_postgresql
+@use_postgresql_backend
+class SqlGetDailyUsageNoReportableActivity(
+        test_reports_aws.GetDailyUsageNoReportableActivity):
+    """Run get_daily_usage no activity tests with the SQL backend."""
+
+
+@requires_postgresql
+@use_postgresql_backend
+class SqlGetDailyUsageBasicInstanceTest(
+        test_reports_aws.GetDailyUsageBasicInstanceTest):
+    """Run get_daily_usage basic instance tests with the SQL backend."""
+
+
+@requires_postgresql
+@use_postgresql_backend
+class SqlGetDailyUsageTwoRhelInstancesTest(
+        test_reports_aws.GetDailyUsageTwoRhelInstancesTest):
+    """Run get_daily_usage two RHEL instance tests with the SQL backend."""
+
+
+@requires_postgresql
+@use_postgresql_backend
+class SqlGetDailyUsageOneRhelOneOpenShiftInstanceTest(
+        test_reports_aws.GetDailyUsageOneRhelOneOpenShiftInstanceTest):
+    """Run get_daily_usage RHEL and OpenShift tests with the SQL backend."""
+
+
+@requires_postgresql
+@use_postgresql_backend
+class SqlGetDailyUsageComplexInstancesTest(
+        test_reports_aws.GetDailyUsageComplexInstancesTest):
+    """Run get_daily_usage complex instance tests with the SQL backend."""
+
+
+@requires_postgresql
+@use_postgresql_backend
+class SqlGetDailyUsageGranularityTest(
+        test_reports_aws.GetDailyUsageGranularityTest):
+    """Run get_daily_usage granularity tests with the SQL backend."""
+
+
+@requires_postgresql
+class SqlGetDailyUsageParityTest(test_reports_aws.GetDailyUsageTestBase):
+    """Compare complete SQL and Python get_daily_usage results."""
+
+    def test_results_match_python(self):
+        """Assert the SQL backend's results equal the Python backend's."""
+        self.generate_events((
+            (util_helper.utc_dt(2017, 12, 20, 0, 0, 0),
+             util_helper.utc_dt(2018, 1, 3, 7, 15, 0)),
+            (util_helper.utc_dt(2018, 1, 5, 22, 0, 0), None),
+            (util_helper.utc_dt(2018, 1, 6, 1, 0, 0),
+             util_helper.utc_dt(2018, 1, 8, 0, 0, 0)),
+        ))
+        self.generate_events((
+            (util_helper.utc_dt(2018, 1, 9, 0, 0, 0),
+             util_helper.utc_dt(2018, 1, 9, 0, 0, 0)),
+            (util_helper.utc_dt(2018, 1, 31, 23, 0, 0), None),
+        ), instance=self.instance_2, image=self.image_rhel_ocp)
+        self.generate_events((
+            (util_helper.utc_dt(2018, 1, 15, 12, 0, 0),
+             util_helper.utc_dt(2018, 2, 3, 0, 0, 0)),
+        ), instance=self.instance_3, image=self.image_ocp)
+        self.generate_events((
+            (util_helper.utc_dt(2018, 1, 15, 12, 0, 0),
+             util_helper.utc_dt(2018, 1, 16, 0, 0, 0)),
+        ), instance=self.instance_4, image=self.image_plain)
+
+        python_results = reports.get_daily_usage(
+            self.user_1.id, self.start, self.end)
+        with use_postgresql_backend:
+            sql_results = reports.get_daily_usage(
+                self.user_1.id, self.start, self.end)
+        self.assertEqual(sql_results, python_results)
+
+    def test_zero_length_runs_match_python(self):
+        """Assert runs that end as they start are seen by neither backend."""
+        tied_time = util_helper.utc_dt(2018, 1, 9, 0, 0, 0)
+        self.generate_events(((tied_time, tied_time),))
+        self.generate_events((
+            (util_helper.utc_dt(2018, 1, 15, 12, 0, 0),
+             util_helper.utc_dt(2018, 1, 15, 12, 0, 0)),
+        ), instance=self.instance_3, image=self.image_ocp)
+
+        python_results = reports.get_daily_usage(
+            self.user_1.id, self.start, self.end)
+        with use_postgresql_backend:
+            sql_results = reports.get_daily_usage(
+                self.user_1.id, self.start, self.end)
+        self.assertEqual(sql_results, python_results)
+        self.assertEqual(sql_results['instances_seen_with_rhel'], 0)
+        self.assertEqual(sql_results['instances_seen_with_openshift'], 0)
+
+
+@use_postgresql_backend
+class SqlBackendFallbackTest(TestCase):
+    """Test the SQL backend is only used when the database supports it."""
+
+    def test_python_used_for_other_databases(self):
+        """Assert non-PostgreSQL databases fall back to Python."""
+        user = util_helper.generate_test_user()
+        start = util_helper.utc_dt(2018, 1, 1, 0, 0, 0)
+        end = util_helper.utc_dt(2018, 1, 3, 0, 0, 0)
+        with patch.object(connection, 'vendor', 'sqlite'), \
+                patch.object(reports_sql, 'calculate_daily_usage') as \
+                mock_calculate:
+            results = reports.get_daily_usage(user.id, start, end)
+            mock_calculate.assert_not_called()
+        self.assertEqual(len(results['daily_usage']), 2)
+
+    def test_sql_used_for_postgresql(self):
+        """Assert PostgreSQL databases use the SQL backend."""
+        user = util_helper.generate_test_user()
+        start = util_helper.utc_dt(2018, 1, 1, 0, 0, 0)
+        end = util_helper.utc_dt(2018, 1, 3, 0, 0, 0)
+        with patch.object(connection, 'vendor', 'postgresql'), \
+                patch.object(reports_sql, 'calculate_daily_usage') as \
+                mock_calculate:
+            results = reports.get_daily_usage(user.id, start, end)
+        self.assertEqual(results, mock_calculate.return_value)
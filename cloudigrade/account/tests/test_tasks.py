@@ -6,11 +6,16 @@ from unittest.mock import MagicMock, Mock, patch
 from botocore.exceptions import ClientError
 from celery.exceptions import Retry
 from django.conf import settings
+from django.db import connection
 from django.test import TestCase
-
-from account import tasks
-from account.models import (AwsAccount, AwsMachineImage, AwsMachineImageCopy,
-                            ImageTag)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from account import reports, tasks
+from account.models import (AwsAccount, AwsInstanceEvent, AwsMachineImage,
+                            AwsMachineImageCopy, AwsPendingResource,
+                            AwsSnapshotCopyRequest, ImageTag, KnownImage,
+                            ReportResult)
 from account.tasks import (copy_ami_snapshot,
                            copy_ami_to_customer_account,
                            create_volume,
@@ -19,15 +24,33 @@ from account.tasks import (copy_ami_snapshot,
                            remove_snapshot_ownership,
                            scale_down_cluster)
 from account.tests import helper as account_helper
+from account.util import SqsReceivedMessage, SqsSendResult
 from util.exceptions import (AwsECSInstanceNotReady, AwsSnapshotCopyLimitError,
                              AwsSnapshotEncryptedError, AwsSnapshotError,
                              AwsSnapshotNotOwnedError, AwsTooManyECSInstances,
                              AwsVolumeError, AwsVolumeNotReadyError,
-                             SnapshotNotReadyException)
+                             SnapshotNotReadyException, SqsSendError)
 from util.tests import helper as util_helper
 from . import helper
 
 
+REGIONAL_TARGETS = {
+    'ap-southeast-2': {
+        'availability_zone': 'ap-southeast-2a',
+        'autoscaling_group_name': 'houndigrade-ap-southeast-2',
+        'ecs_cluster_name': 'inspectigrade-ap-southeast-2',
+    },
+}
+
+
+def received_messages(messages):
+    """Wrap messages as if received from a queue with receipt handles."""
+    return [
+        SqsReceivedMessage(message, 'receipt-{0}'.format(index), None)
+        for index, message in enumerate(messages)
+    ]
+
+
 class AccountCeleryTaskTest(TestCase):
     """Account app Celery task test cases."""
 
@@ -37,6 +60,18 @@ class AccountCeleryTaskTest(TestCase):
             settings.AWS_NAME_PREFIX
         )
 
+    def assertWaitingForResource(self, resource_type, resource_id, region,
+                                 expected_tasks):
+        """Assert the resource is pending with the expected ready tasks."""
+        resource = AwsPendingResource.objects.get(resource_id=resource_id)
+        self.assertEqual(resource.resource_type, resource_type)
+        self.assertEqual(resource.region, region)
+        ready_tasks = [
+            (ready_task['task'], ready_task['args'])
+            for ready_task in json.loads(resource.ready_tasks)
+        ]
+        self.assertEqual(ready_tasks, expected_tasks)
+
     @patch('account.tasks.aws')
     def test_copy_ami_snapshot_success(self, mock_aws):
         """Assert that the snapshot copy task succeeds."""
@@ -61,17 +96,20 @@ class AccountCeleryTaskTest(TestCase):
         mock_aws.get_snapshot.return_value = mock_snapshot
         mock_aws.copy_snapshot.return_value = mock_new_snapshot_id
 
-        with patch.object(tasks, 'create_volume') as mock_create_volume:
-            with patch.object(tasks, 'remove_snapshot_ownership') as \
-                    mock_remove_snapshot_ownership:
-                copy_ami_snapshot(mock_arn, mock_image_id, mock_region)
-                mock_create_volume.delay.assert_called_with(
-                    mock_image_id, mock_new_snapshot_id)
-                mock_remove_snapshot_ownership.delay.assert_called_with(
-                    mock_arn,
-                    mock_snapshot_id,
-                    mock_region,
-                    mock_new_snapshot_id)
+        copy_ami_snapshot(mock_arn, mock_image_id, mock_region)
+        self.assertWaitingForResource(
+            AwsPendingResource.TYPE.snapshot,
+            mock_new_snapshot_id,
+            settings.HOUNDIGRADE_AWS_REGION,
+            [
+                ('account.tasks.remove_snapshot_ownership',
+                 [mock_arn, mock_snapshot_id, mock_region,
+                  mock_new_snapshot_id, settings.HOUNDIGRADE_AWS_REGION]),
+                ('account.tasks.create_volume',
+                 [mock_image_id, mock_new_snapshot_id,
+                  settings.HOUNDIGRADE_AWS_REGION]),
+            ],
+        )
 
         mock_aws.get_session.assert_called_with(mock_arn)
         mock_aws.get_ami.assert_called_with(
@@ -83,9 +121,42 @@ class AccountCeleryTaskTest(TestCase):
         mock_aws.add_snapshot_ownership.assert_called_with(mock_snapshot)
         mock_aws.copy_snapshot.assert_called_with(
             mock_snapshot_id,
-            mock_region
+            mock_region,
+            settings.HOUNDIGRADE_AWS_REGION
         )
 
+    @patch('account.tasks.aws')
+    def test_copy_ami_snapshot_reuses_same_snapshot_inspection(self,
+                                                               mock_aws):
+        """Assert an image whose root snapshot was inspected is not copied."""
+        account = account_helper.generate_aws_account()
+        region = random.choice(util_helper.SOME_AWS_REGIONS)
+        snapshot_id = util_helper.generate_dummy_snapshot_id()
+        inspected_image = account_helper.generate_aws_image(
+            account, is_rhel=True)
+        inspected_image.root_snapshot_id = snapshot_id
+        inspected_image.status = inspected_image.INSPECTED
+        inspected_image.inspection_json = json.dumps({'rhel_found': True})
+        inspected_image.save()
+        image = account_helper.generate_aws_image(account)
+        image.status = image.PREPARING
+        image.inspection_claimed_at = timezone.now()
+        image.save()
+        mock_aws.get_ami_snapshot_id.return_value = snapshot_id
+
+        copy_ami_snapshot(account.account_arn, image.ec2_ami_id, region)
+
+        mock_aws.get_snapshot.assert_not_called()
+        mock_aws.copy_snapshot.assert_not_called()
+        self.assertFalse(AwsSnapshotCopyRequest.objects.exists())
+        image.refresh_from_db()
+        self.assertEqual(image.root_snapshot_id, snapshot_id)
+        self.assertEqual(image.status, image.INSPECTED)
+        self.assertIsNone(image.inspection_claimed_at)
+        self.assertEqual(image.inspection_json,
+                         inspected_image.inspection_json)
+        self.assertTrue(image.rhel)
+
     @patch('account.tasks.aws')
     def test_copy_ami_snapshot_success_with_reference(self, mock_aws):
         """Assert the snapshot copy task succeeds using a reference AMI ID."""
@@ -117,26 +188,26 @@ class AccountCeleryTaskTest(TestCase):
         mock_aws.get_snapshot.return_value = mock_snapshot
         mock_aws.copy_snapshot.return_value = mock_new_snapshot_id
 
-        with patch.object(tasks, 'create_volume') as mock_create_volume, \
-                patch.object(tasks, 'remove_snapshot_ownership') as \
-                mock_remove_snapshot_ownership:
-            tasks.copy_ami_snapshot(
-                arn,
-                new_image_id,
-                region,
-                reference_image_id,
-            )
-            # arn, customer_snapshot_id, snapshot_region, snapshot_copy_id
-            mock_remove_snapshot_ownership.delay.assert_called_with(
-                arn,
-                mock_snapshot_id,
-                region,
-                mock_new_snapshot_id,
-            )
-            mock_create_volume.delay.assert_called_with(
-                reference_image_id,
-                mock_new_snapshot_id,
-            )
+        tasks.copy_ami_snapshot(
+            arn,
+            new_image_id,
+            region,
+            reference_image_id,
+        )
+        self.assertWaitingForResource(
+            AwsPendingResource.TYPE.snapshot,
+            mock_new_snapshot_id,
+            settings.HOUNDIGRADE_AWS_REGION,
+            [
+                # arn, customer_snapshot_id, snapshot_region, snapshot_copy_id
+                ('account.tasks.remove_snapshot_ownership',
+                 [arn, mock_snapshot_id, region, mock_new_snapshot_id,
+                  settings.HOUNDIGRADE_AWS_REGION]),
+                ('account.tasks.create_volume',
+                 [reference_image_id, mock_new_snapshot_id,
+                  settings.HOUNDIGRADE_AWS_REGION]),
+            ],
+        )
 
         mock_aws.get_session.assert_called_with(arn)
         mock_aws.get_ami.assert_called_with(
@@ -148,7 +219,8 @@ class AccountCeleryTaskTest(TestCase):
         mock_aws.add_snapshot_ownership.assert_called_with(mock_snapshot)
         mock_aws.copy_snapshot.assert_called_with(
             mock_snapshot_id,
-            region
+            region,
+            settings.HOUNDIGRADE_AWS_REGION
         )
 
         # Verify that the copy object was stored correctly to reference later.
@@ -198,8 +270,8 @@ class AccountCeleryTaskTest(TestCase):
             mock_create_volume.delay.assert_not_called()
 
     @patch('account.tasks.aws')
-    def test_copy_ami_snapshot_retry_on_copy_limit(self, mock_aws):
-        """Assert that the copy task is retried."""
+    def test_copy_ami_snapshot_requeued_on_copy_limit(self, mock_aws):
+        """Assert the copy is requeued instead of retried at the AWS limit."""
         mock_session = mock_aws.boto3.Session.return_value
         mock_account_id = mock_aws.get_session_account_id.return_value
 
@@ -221,12 +293,214 @@ class AccountCeleryTaskTest(TestCase):
         mock_aws.add_snapshot_ownership.return_value = True
         mock_aws.copy_snapshot.side_effect = AwsSnapshotCopyLimitError()
 
-        with patch.object(tasks, 'create_volume') as mock_create_volume,\
-                patch.object(copy_ami_snapshot, 'retry') as mock_retry:
+        with patch.object(copy_ami_snapshot, 'retry') as mock_retry:
+            copy_ami_snapshot(mock_arn, mock_image_id, mock_region)
+            mock_retry.assert_not_called()
+
+        copy_request = AwsSnapshotCopyRequest.objects.get()
+        self.assertEqual(copy_request.status,
+                         AwsSnapshotCopyRequest.STATUS.queued)
+        self.assertEqual(copy_request.customer_snapshot_id, mock_snapshot_id)
+        self.assertIsNone(copy_request.snapshot_copy_id)
+        self.assertFalse(AwsPendingResource.objects.exists())
+
+    @patch('account.tasks.aws')
+    def test_copy_ami_snapshot_queued_over_budget(self, mock_aws):
+        """Assert the copy waits in the queue when its region is full."""
+        mock_account_id = mock_aws.get_session_account_id.return_value
+        mock_arn = util_helper.generate_dummy_arn()
+        mock_region = random.choice(util_helper.SOME_AWS_REGIONS)
+        mock_image_id = util_helper.generate_dummy_image_id()
+        mock_image = util_helper.generate_mock_image(mock_image_id)
+        mock_snapshot_id = util_helper.generate_dummy_snapshot_id()
+        mock_aws.get_ami.return_value = mock_image
+        mock_aws.get_ami_snapshot_id.return_value = mock_snapshot_id
+        mock_aws.get_snapshot.return_value = \
+            util_helper.generate_mock_snapshot(mock_snapshot_id,
+                                               owner_id=mock_account_id)
+
+        with self.settings(AWS_SNAPSHOT_COPY_CONCURRENCY=1):
+            helper.generate_snapshot_copy_request(
+                region=mock_region,
+                status=AwsSnapshotCopyRequest.STATUS.copying,
+            )
+            copy_ami_snapshot(mock_arn, mock_image_id, mock_region)
+
+        mock_aws.add_snapshot_ownership.assert_called_once()
+        mock_aws.copy_snapshot.assert_not_called()
+        copy_request = AwsSnapshotCopyRequest.objects.get(
+            ec2_ami_id=mock_image_id)
+        self.assertEqual(copy_request.status,
+                         AwsSnapshotCopyRequest.STATUS.queued)
+
+    @patch('account.tasks.aws')
+    def test_start_snapshot_copy(self, mock_aws):
+        """Assert an admitted copy starts and waits for the snapshot copy."""
+        copy_request = helper.generate_snapshot_copy_request(
+            status=AwsSnapshotCopyRequest.STATUS.copying)
+        mock_new_snapshot_id = util_helper.generate_dummy_snapshot_id()
+        mock_aws.copy_snapshot.return_value = mock_new_snapshot_id
+
+        tasks.start_snapshot_copy(copy_request.id)
+
+        mock_aws.copy_snapshot.assert_called_once_with(
+            copy_request.customer_snapshot_id, copy_request.snapshot_region,
+            settings.HOUNDIGRADE_AWS_REGION)
+        copy_request.refresh_from_db()
+        self.assertEqual(copy_request.snapshot_copy_id, mock_new_snapshot_id)
+        self.assertWaitingForResource(
+            AwsPendingResource.TYPE.snapshot,
+            mock_new_snapshot_id,
+            settings.HOUNDIGRADE_AWS_REGION,
+            [
+                ('account.tasks.remove_snapshot_ownership',
+                 [copy_request.arn, copy_request.customer_snapshot_id,
+                  copy_request.snapshot_region, mock_new_snapshot_id,
+                  settings.HOUNDIGRADE_AWS_REGION]),
+                ('account.tasks.create_volume',
+                 [copy_request.ec2_ami_id, mock_new_snapshot_id,
+                  settings.HOUNDIGRADE_AWS_REGION]),
+            ],
+        )
+
+    @patch('account.tasks.aws')
+    def test_start_snapshot_copy_regional(self, mock_aws):
+        """Assert snapshots stay in their region if it has a local cluster."""
+        mock_new_snapshot_id = util_helper.generate_dummy_snapshot_id()
+        mock_aws.copy_snapshot.return_value = mock_new_snapshot_id
+
+        with self.settings(HOUNDIGRADE_AWS_REGIONAL_TARGETS=REGIONAL_TARGETS):
+            copy_request = helper.generate_snapshot_copy_request(
+                region='ap-southeast-2',
+                status=AwsSnapshotCopyRequest.STATUS.copying)
+            tasks.start_snapshot_copy(copy_request.id)
+
+        mock_aws.copy_snapshot.assert_called_once_with(
+            copy_request.customer_snapshot_id, 'ap-southeast-2',
+            'ap-southeast-2')
+        self.assertWaitingForResource(
+            AwsPendingResource.TYPE.snapshot,
+            mock_new_snapshot_id,
+            'ap-southeast-2',
+            [
+                ('account.tasks.remove_snapshot_ownership',
+                 [copy_request.arn, copy_request.customer_snapshot_id,
+                  'ap-southeast-2', mock_new_snapshot_id, 'ap-southeast-2']),
+                ('account.tasks.create_volume',
+                 [copy_request.ec2_ami_id, mock_new_snapshot_id,
+                  'ap-southeast-2']),
+            ],
+        )
+
+    @patch('account.tasks.add_messages_to_queue')
+    @patch('account.tasks.aws')
+    def test_regional_volume_created_and_queued_locally(
+            self, mock_aws, mock_add_messages_to_queue):
+        """Assert a regional volume is created and queued for its cluster."""
+        ami_id = util_helper.generate_dummy_image_id()
+        snapshot_id = util_helper.generate_dummy_snapshot_id()
+        volume_id = util_helper.generate_dummy_volume_id()
+        mock_aws.create_volume.return_value = volume_id
+
+        with self.settings(HOUNDIGRADE_AWS_REGIONAL_TARGETS=REGIONAL_TARGETS,
+                           AWS_NAME_PREFIX='test-'):
+            create_volume(ami_id, snapshot_id, 'ap-southeast-2')
+            enqueue_ready_volume(ami_id, volume_id, 'ap-southeast-2')
+
+        mock_aws.create_volume.assert_called_once_with(
+            snapshot_id, 'ap-southeast-2a', 'ap-southeast-2')
+        mock_add_messages_to_queue.assert_called_once_with(
+            'test-ready_volumes_ap-southeast-2',
+            [{'ami_id': ami_id, 'volume_id': volume_id}])
+
+    @patch('account.tasks.aws')
+    def test_start_snapshot_copy_failure_frees_slot(self, mock_aws):
+        """Assert a copy that fails unexpectedly is requeued."""
+        copy_request = helper.generate_snapshot_copy_request(
+            status=AwsSnapshotCopyRequest.STATUS.copying,
+            admitted_at=timezone.now())
+        mock_aws.copy_snapshot.side_effect = AwsSnapshotError()
+
+        with self.assertRaises(AwsSnapshotError):
+            tasks.start_snapshot_copy(copy_request.id)
+        copy_request.refresh_from_db()
+        self.assertEqual(copy_request.status,
+                         AwsSnapshotCopyRequest.STATUS.queued)
+        self.assertIsNone(copy_request.admitted_at)
+
+    @patch('account.tasks.aws')
+    def test_start_snapshot_copy_retry_after_not_ready(self, mock_aws):
+        """Assert a copy that is not ready keeps its slot and copies later."""
+        copy_request = helper.generate_snapshot_copy_request(
+            status=AwsSnapshotCopyRequest.STATUS.copying)
+        mock_new_snapshot_id = util_helper.generate_dummy_snapshot_id()
+        mock_aws.copy_snapshot.side_effect = [
+            AwsSnapshotNotOwnedError(), mock_new_snapshot_id]
+
+        with patch.object(tasks.start_snapshot_copy, 'retry') as mock_retry:
             mock_retry.side_effect = Retry()
             with self.assertRaises(Retry):
-                copy_ami_snapshot(mock_arn, mock_image_id, mock_region)
-            mock_create_volume.delay.assert_not_called()
+                tasks.start_snapshot_copy(copy_request.id)
+        copy_request.refresh_from_db()
+        self.assertEqual(copy_request.status,
+                         AwsSnapshotCopyRequest.STATUS.copying)
+        self.assertIsNone(copy_request.snapshot_copy_id)
+
+        tasks.start_snapshot_copy(copy_request.id)
+
+        self.assertEqual(mock_aws.copy_snapshot.call_count, 2)
+        copy_request.refresh_from_db()
+        self.assertEqual(copy_request.snapshot_copy_id, mock_new_snapshot_id)
+        self.assertTrue(AwsPendingResource.objects.filter(
+            resource_id=mock_new_snapshot_id).exists())
+
+    @patch('account.tasks.aws')
+    def test_start_snapshot_copy_missing_request(self, mock_aws):
+        """Assert nothing is copied if the request no longer exists."""
+        tasks.start_snapshot_copy(-1)
+        mock_aws.copy_snapshot.assert_not_called()
+
+    @patch('account.tasks.aws')
+    def test_start_snapshot_copy_already_started(self, mock_aws):
+        """Assert a copy that was already started is not copied again."""
+        copy_request = helper.generate_snapshot_copy_request(
+            status=AwsSnapshotCopyRequest.STATUS.copying,
+            snapshot_copy_id=util_helper.generate_dummy_snapshot_id())
+        tasks.start_snapshot_copy(copy_request.id)
+        mock_aws.copy_snapshot.assert_not_called()
+
+    @patch.object(tasks, 'start_snapshot_copy')
+    @patch('account.tasks.aws')
+    def test_start_admitted_snapshot_copies_current_fails(self, mock_aws,
+                                                          mock_start):
+        """Assert other admitted copies start if the current one fails."""
+        current = helper.generate_snapshot_copy_request(
+            priority=2, status=AwsSnapshotCopyRequest.STATUS.queued)
+        other = helper.generate_snapshot_copy_request(
+            priority=1, status=AwsSnapshotCopyRequest.STATUS.queued)
+        mock_aws.copy_snapshot.side_effect = AwsSnapshotError()
+
+        tasks._start_admitted_snapshot_copies(current.target_region, current)
+
+        mock_start.delay.assert_called_once_with(other.id)
+        current.refresh_from_db()
+        self.assertEqual(current.status, AwsSnapshotCopyRequest.STATUS.queued)
+
+    @patch.object(tasks, 'start_snapshot_copy')
+    @patch('account.tasks.aws')
+    def test_start_admitted_snapshot_copies_current_not_ready(self, mock_aws,
+                                                              mock_start):
+        """Assert a current copy that is not ready is retried in a task."""
+        current = helper.generate_snapshot_copy_request(
+            status=AwsSnapshotCopyRequest.STATUS.queued)
+        mock_aws.copy_snapshot.side_effect = AwsSnapshotNotOwnedError()
+
+        tasks._start_admitted_snapshot_copies(current.target_region, current)
+
+        mock_start.delay.assert_called_once_with(current.id)
+        current.refresh_from_db()
+        self.assertEqual(current.status,
+                         AwsSnapshotCopyRequest.STATUS.copying)
 
     @patch('account.tasks.aws')
     def test_copy_ami_snapshot_retry_on_ownership_not_verified(self, mock_aws):
@@ -603,24 +877,21 @@ class AccountCeleryTaskTest(TestCase):
 
         mock_volume = util_helper.generate_mock_volume()
         mock_aws.create_volume.return_value = mock_volume.id
-        mock_aws.get_region_from_availability_zone.return_value = region
 
-        with patch.object(tasks, 'enqueue_ready_volume') as mock_enqueue:
-            with patch.object(tasks, 'delete_snapshot') as \
-                    mock_delete_snapshot:
-                create_volume(ami_id, snapshot_id)
-                mock_enqueue.delay.assert_called_with(
-                    ami_id,
-                    mock_volume.id,
-                    region
-                )
-                mock_delete_snapshot.delay.assert_called_with(
-                    snapshot_id,
-                    mock_volume.id,
-                    region
-                )
-
-        mock_aws.create_volume.assert_called_with(snapshot_id, zone)
+        create_volume(ami_id, snapshot_id)
+        self.assertWaitingForResource(
+            AwsPendingResource.TYPE.volume,
+            mock_volume.id,
+            region,
+            [
+                ('account.tasks.delete_snapshot',
+                 [snapshot_id, mock_volume.id, region]),
+                ('account.tasks.enqueue_ready_volume',
+                 [ami_id, mock_volume.id, region]),
+            ],
+        )
+
+        mock_aws.create_volume.assert_called_with(snapshot_id, zone, region)
 
     @patch('account.tasks.aws')
     def test_create_volume_retry_on_snapshot_not_ready(self, mock_aws):
@@ -712,46 +983,71 @@ class AccountCeleryTaskTest(TestCase):
                 enqueue_ready_volume(ami_id, volume_id, region)
 
     @patch('account.tasks.add_messages_to_queue')
+    @patch('account.tasks.aws')
+    def test_enqueue_ready_volume_send_failure_retries(self, mock_aws,
+                                                       mock_queue):
+        """Assert that the task retries when its message is not sent."""
+        ami_id = util_helper.generate_dummy_image_id()
+        volume_id = util_helper.generate_dummy_volume_id()
+        messages = [{'ami_id': ami_id, 'volume_id': volume_id}]
+        mock_queue.return_value = [
+            SqsSendResult(messages[0], None, 'ServiceUnavailable')]
+
+        with patch.object(enqueue_ready_volume, 'retry') as mock_retry:
+            mock_retry.side_effect = Retry()
+            with self.assertRaises(Retry):
+                enqueue_ready_volume(ami_id, volume_id, 'us-east-1')
+            self.assertIsInstance(mock_retry.call_args[1]['exc'],
+                                  SqsSendError)
+
+    @patch('account.tasks.delete_messages_from_queue')
     @patch('account.tasks.run_inspection_cluster')
-    @patch('account.tasks.read_messages_from_queue')
+    @patch('account.tasks.receive_messages_from_queue')
     @patch('account.tasks.aws')
     def test_scale_up_inspection_cluster_success(
             self,
             mock_aws,
-            mock_read_messages_from_queue,
+            mock_receive_messages_from_queue,
             mock_run_inspection_cluster,
-            mock_add_messages_to_queue
+            mock_delete_messages_from_queue
     ):
         """Assert successful scaling with empty cluster and queued messages."""
-        messages = [Mock()]
+        messages = [{'ami_id': util_helper.generate_dummy_image_id(),
+                     'volume_id': util_helper.generate_dummy_volume_id()}]
         mock_aws.is_scaled_down.return_value = True, dict()
-        mock_read_messages_from_queue.return_value = messages
+        mock_receive_messages_from_queue.return_value = \
+            received_messages(messages)
 
         tasks.scale_up_inspection_cluster()
 
         mock_aws.is_scaled_down.assert_called_once_with(
-            settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME
+            settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME,
+            settings.HOUNDIGRADE_AWS_REGION
         )
-        mock_read_messages_from_queue.assert_called_once_with(
+        mock_receive_messages_from_queue.assert_called_once_with(
             self.ready_volumes_queue_name,
             settings.HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE
         )
         mock_aws.scale_up.assert_called_once_with(
-            settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME
+            settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME, 1,
+            settings.HOUNDIGRADE_AWS_REGION
         )
-        mock_run_inspection_cluster.delay.assert_called_once_with(messages)
-        mock_add_messages_to_queue.assert_not_called()
+        mock_run_inspection_cluster.delay.assert_called_once_with(
+            messages, batch_size=settings.HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE,
+            region=settings.HOUNDIGRADE_AWS_REGION)
+        mock_delete_messages_from_queue.assert_called_once_with(
+            self.ready_volumes_queue_name, ['receipt-0'])
 
-    @patch('account.tasks.add_messages_to_queue')
+    @patch('account.tasks.delete_messages_from_queue')
     @patch('account.tasks.run_inspection_cluster')
-    @patch('account.tasks.read_messages_from_queue')
+    @patch('account.tasks.receive_messages_from_queue')
     @patch('account.tasks.aws')
     def test_scale_up_inspection_cluster_aborts_when_not_scaled_down(
             self,
             mock_aws,
-            mock_read_messages_from_queue,
+            mock_receive_messages_from_queue,
             mock_run_inspection_cluster,
-            mock_add_messages_to_queue
+            mock_delete_messages_from_queue
     ):
         """Assert scale up aborts when not scaled down."""
         mock_aws.is_scaled_down.return_value = False, {'Instances': [Mock()]}
@@ -759,112 +1055,136 @@ class AccountCeleryTaskTest(TestCase):
         tasks.scale_up_inspection_cluster()
 
         mock_aws.is_scaled_down.assert_called_once_with(
-            settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME
+            settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME,
+            settings.HOUNDIGRADE_AWS_REGION
         )
         mock_aws.scale_up.assert_not_called()
-        mock_read_messages_from_queue.assert_not_called()
+        mock_receive_messages_from_queue.assert_not_called()
         mock_run_inspection_cluster.delay.assert_not_called()
-        mock_add_messages_to_queue.assert_not_called()
+        mock_delete_messages_from_queue.assert_not_called()
 
-    @patch('account.tasks.add_messages_to_queue')
+    @patch('account.tasks.delete_messages_from_queue')
+    @patch('account.tasks.run_inspection_cluster')
+    @patch('account.tasks.receive_messages_from_queue')
+    @patch('account.tasks.aws')
+    def test_scale_up_inspection_cluster_drops_undecodable_messages(
+            self,
+            mock_aws,
+            mock_receive_messages_from_queue,
+            mock_run_inspection_cluster,
+            mock_delete_messages_from_queue
+    ):
+        """Assert undecodable messages are deleted without scaling up."""
+        mock_aws.is_scaled_down.return_value = True, dict()
+        mock_receive_messages_from_queue.return_value = [
+            SqsReceivedMessage('garbage', 'receipt-0', ValueError()),
+        ]
+
+        tasks.scale_up_inspection_cluster()
+
+        mock_aws.scale_up.assert_not_called()
+        mock_run_inspection_cluster.delay.assert_not_called()
+        mock_delete_messages_from_queue.assert_called_once_with(
+            self.ready_volumes_queue_name, ['receipt-0'])
+
+    @patch('account.tasks.delete_messages_from_queue')
     @patch('account.tasks.run_inspection_cluster')
-    @patch('account.tasks.read_messages_from_queue')
+    @patch('account.tasks.receive_messages_from_queue')
     @patch('account.tasks.aws')
     def test_scale_up_inspection_cluster_aborts_when_no_messages(
             self,
             mock_aws,
-            mock_read_messages_from_queue,
+            mock_receive_messages_from_queue,
             mock_run_inspection_cluster,
-            mock_add_messages_to_queue
+            mock_delete_messages_from_queue
     ):
         """Assert scale up aborts when not scaled down."""
         mock_aws.is_scaled_down.return_value = True, dict()
-        mock_read_messages_from_queue.return_value = []
+        mock_receive_messages_from_queue.return_value = []
 
         tasks.scale_up_inspection_cluster()
 
         mock_aws.is_scaled_down.assert_called_once_with(
-            settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME
+            settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME,
+            settings.HOUNDIGRADE_AWS_REGION
         )
         mock_aws.scale_up.assert_not_called()
-        mock_read_messages_from_queue.assert_called_once_with(
+        mock_receive_messages_from_queue.assert_called_once_with(
             self.ready_volumes_queue_name,
             settings.HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE
         )
         mock_run_inspection_cluster.delay.assert_not_called()
-        mock_add_messages_to_queue.assert_not_called()
+        mock_delete_messages_from_queue.assert_not_called()
 
-    @patch('account.tasks.add_messages_to_queue')
+    @patch('account.tasks.delete_messages_from_queue')
     @patch('account.tasks.run_inspection_cluster')
-    @patch('account.tasks.read_messages_from_queue')
+    @patch('account.tasks.receive_messages_from_queue')
     @patch('account.tasks.aws')
-    def test_scale_up_inspection_cluster_requeues_on_aws_error(
+    def test_scale_up_inspection_cluster_keeps_messages_on_aws_error(
             self,
             mock_aws,
-            mock_read_messages_from_queue,
+            mock_receive_messages_from_queue,
             mock_run_inspection_cluster,
-            mock_add_messages_to_queue
+            mock_delete_messages_from_queue
     ):
-        """Assert messages requeue when scale_up encounters AWS exception."""
-        messages = [Mock()]
+        """Assert messages stay queued when scale_up raises AWS exception."""
+        messages = [{'ami_id': util_helper.generate_dummy_image_id(),
+                     'volume_id': util_helper.generate_dummy_volume_id()}]
         mock_aws.is_scaled_down.return_value = True, dict()
-        mock_read_messages_from_queue.return_value = messages
+        mock_receive_messages_from_queue.return_value = \
+            received_messages(messages)
         mock_aws.scale_up.side_effect = ClientError({}, Mock())
 
         with self.assertRaises(RuntimeError):
             tasks.scale_up_inspection_cluster()
 
         mock_aws.is_scaled_down.assert_called_once_with(
-            settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME
+            settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME,
+            settings.HOUNDIGRADE_AWS_REGION
         )
         mock_aws.scale_up.assert_called_once_with(
-            settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME
-        )
-        mock_add_messages_to_queue.assert_called_once_with(
-            self.ready_volumes_queue_name,
-            messages
+            settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME, 1,
+            settings.HOUNDIGRADE_AWS_REGION
         )
+        mock_delete_messages_from_queue.assert_not_called()
         mock_run_inspection_cluster.delay.assert_not_called()
 
-    @patch('account.models.MachineImage.objects')
     @patch('account.tasks.boto3')
     @patch('account.tasks.aws')
-    def test_run_inspection_cluster_success(self, mock_aws,
-                                            mock_boto3,
-                                            mock_machine_image_objects):
+    def test_run_inspection_cluster_success(self, mock_aws, mock_boto3):
         """Asserts successful starting of the houndigrade task."""
-        mock_machine_image_objects.get.return_value = \
-            mock_machine_image_objects
-
-        mock_machine_image_objects.INSPECTING.return_value = 'inspecting'
+        account = account_helper.generate_aws_account()
+        image = account_helper.generate_aws_image(account)
+        other_image = account_helper.generate_aws_image(account)
 
         mock_list_container_instances = {
             'containerInstanceArns': [util_helper.generate_dummy_instance_id()]
         }
-        mock_ec2 = Mock()
+        mock_ec2_instance_id = util_helper.generate_dummy_instance_id()
         mock_ecs = MagicMock()
 
         mock_ecs.list_container_instances.return_value = \
             mock_list_container_instances
+        mock_ecs.describe_container_instances.return_value = {
+            'containerInstances': [{
+                'containerInstanceArn':
+                    mock_list_container_instances['containerInstanceArns'][0],
+                'ec2InstanceId': mock_ec2_instance_id,
+            }]
+        }
 
         mock_boto3.client.return_value = mock_ecs
-        mock_boto3.resource.return_value = mock_ec2
-
-        mock_session = mock_aws.boto3.Session.return_value
-        mock_aws.get_session.return_value = mock_session
-
-        mock_ami_id = util_helper.generate_dummy_image_id()
 
         messages = [{
-            'ami_id': mock_ami_id,
+            'ami_id': image.ec2_ami_id,
             'volume_id': util_helper.generate_dummy_volume_id()}]
         tasks.run_inspection_cluster(messages)
 
-        mock_machine_image_objects.get.assert_called_once_with(
-            ec2_ami_id=mock_ami_id)
-
-        self.assertEqual(mock_machine_image_objects.status.return_value,
-                         mock_machine_image_objects.INSPECTING.return_value)
+        image.refresh_from_db()
+        other_image.refresh_from_db()
+        self.assertEqual(image.status, image.INSPECTING)
+        self.assertIsNotNone(image.inspection_claimed_at)
+        self.assertEqual(other_image.status, other_image.PENDING)
 
         mock_ecs.list_container_instances.assert_called_once_with(
             cluster=settings.HOUNDIGRADE_ECS_CLUSTER_NAME)
@@ -874,10 +1194,217 @@ class AccountCeleryTaskTest(TestCase):
             cluster=settings.HOUNDIGRADE_ECS_CLUSTER_NAME
         )
         mock_ecs.register_task_definition.assert_called_once()
-        mock_ecs.run_task.assert_called_once()
+        mock_ecs.start_task.assert_called_once()
 
-        mock_ec2.Volume.assert_called_once_with(messages[0]['volume_id'])
-        mock_ec2.Volume.return_value.attach_to_instance.assert_called_once()
+        mock_aws.attach_volumes.assert_called_once_with(
+            mock_ec2_instance_id,
+            [('/dev/xvdba', messages[0]['volume_id'])],
+            settings.HOUNDIGRADE_AWS_REGION,
+        )
+        mock_boto3.client.assert_called_once_with(
+            'ecs', region_name=settings.HOUNDIGRADE_AWS_REGION)
+
+    @patch('account.tasks.delete_messages_from_queue')
+    @patch('account.tasks.run_inspection_cluster')
+    @patch('account.tasks.receive_messages_from_queue')
+    @patch('account.tasks.aws')
+    def test_scale_up_inspection_cluster_sharded(
+            self,
+            mock_aws,
+            mock_receive_messages_from_queue,
+            mock_run_inspection_cluster,
+            mock_delete_messages_from_queue
+    ):
+        """Assert scaling to one instance per batch of queued messages."""
+        messages = [
+            {'ami_id': util_helper.generate_dummy_image_id(),
+             'volume_id': util_helper.generate_dummy_volume_id()}
+            for __ in range(5)
+        ]
+        mock_aws.is_scaled_down.return_value = True, dict()
+        mock_receive_messages_from_queue.return_value = \
+            received_messages(messages)
+
+        with self.settings(HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE=2,
+                           HOUNDIGRADE_AWS_MAX_INSTANCES=4):
+            tasks.scale_up_inspection_cluster()
+
+        mock_receive_messages_from_queue.assert_called_once_with(
+            self.ready_volumes_queue_name, 8)
+        mock_aws.scale_up.assert_called_once_with(
+            settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME, 3,
+            settings.HOUNDIGRADE_AWS_REGION
+        )
+        mock_run_inspection_cluster.delay.assert_called_once_with(
+            messages, batch_size=2, region=settings.HOUNDIGRADE_AWS_REGION)
+
+    @patch('account.tasks.delete_messages_from_queue')
+    @patch('account.tasks.run_inspection_cluster')
+    @patch('account.tasks.receive_messages_from_queue')
+    @patch('account.tasks.aws')
+    def test_scale_up_inspection_cluster_with_batch_size(
+            self,
+            mock_aws,
+            mock_receive_messages_from_queue,
+            mock_run_inspection_cluster,
+            mock_delete_messages_from_queue,
+    ):
+        """Assert scaling with a batch size smaller than the maximum."""
+        messages = [
+            {'ami_id': util_helper.generate_dummy_image_id(),
+             'volume_id': util_helper.generate_dummy_volume_id()}
+            for __ in range(5)
+        ]
+        mock_aws.is_scaled_down.return_value = True, dict()
+        mock_receive_messages_from_queue.return_value = \
+            received_messages(messages)
+
+        with self.settings(HOUNDIGRADE_AWS_MAX_INSTANCES=2):
+            tasks.scale_up_inspection_cluster(3)
+
+        mock_receive_messages_from_queue.assert_called_once_with(
+            self.ready_volumes_queue_name, 6)
+        mock_aws.scale_up.assert_called_once_with(
+            settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME, 2,
+            settings.HOUNDIGRADE_AWS_REGION
+        )
+        mock_run_inspection_cluster.delay.assert_called_once_with(
+            messages, batch_size=3, region=settings.HOUNDIGRADE_AWS_REGION)
+
+    @patch('account.tasks.scale_up_inspection_cluster')
+    @patch('account.tasks.get_queue_depth_and_age')
+    def test_check_ready_volumes_queue_waits_below_thresholds(
+            self, mock_get_queue_depth_and_age, mock_scale_up):
+        """Assert no scale up while few volumes have waited briefly."""
+        with self.settings(HOUNDIGRADE_SCALE_UP_QUEUE_DEPTH=10,
+                           HOUNDIGRADE_SCALE_UP_MESSAGE_AGE=600):
+            for depth_and_age in ((0, 0), (0, 900), (9, 599)):
+                mock_get_queue_depth_and_age.return_value = depth_and_age
+                tasks.check_ready_volumes_queue()
+
+        mock_get_queue_depth_and_age.assert_called_with(
+            self.ready_volumes_queue_name)
+        mock_scale_up.delay.assert_not_called()
+
+    @patch('account.tasks.scale_up_inspection_cluster')
+    @patch('account.tasks.get_queue_depth_and_age')
+    def test_check_ready_volumes_queue_scales_up_on_depth(
+            self, mock_get_queue_depth_and_age, mock_scale_up):
+        """Assert scale up once enough volumes are waiting."""
+        mock_get_queue_depth_and_age.return_value = (50, 0)
+        with self.settings(HOUNDIGRADE_SCALE_UP_QUEUE_DEPTH=10,
+                           HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE=32,
+                           HOUNDIGRADE_AWS_MAX_INSTANCES=4):
+            tasks.check_ready_volumes_queue()
+
+        # 50 volumes need 2 instances, so spread them 25 per instance.
+        mock_scale_up.delay.assert_called_once_with(
+            25, settings.HOUNDIGRADE_AWS_REGION)
+
+    @patch('account.tasks.scale_up_inspection_cluster')
+    @patch('account.tasks.get_queue_depth_and_age')
+    def test_check_ready_volumes_queue_scales_up_on_age(
+            self, mock_get_queue_depth_and_age, mock_scale_up):
+        """Assert scale up once the oldest volume has waited long enough."""
+        mock_get_queue_depth_and_age.return_value = (3, 600)
+        with self.settings(HOUNDIGRADE_SCALE_UP_QUEUE_DEPTH=10,
+                           HOUNDIGRADE_SCALE_UP_MESSAGE_AGE=600):
+            tasks.check_ready_volumes_queue()
+
+        mock_scale_up.delay.assert_called_once_with(
+            3, settings.HOUNDIGRADE_AWS_REGION)
+
+    @patch('account.tasks.scale_up_inspection_cluster')
+    @patch('account.tasks.get_queue_depth_and_age')
+    def test_check_ready_volumes_queue_scales_up_regional_targets(
+            self, mock_get_queue_depth_and_age, mock_scale_up):
+        """Assert each inspection target scales up from its own queue."""
+        queue_depths = {
+            self.ready_volumes_queue_name: (0, 0),
+            '{0}ready_volumes_ap-southeast-2'.format(
+                settings.AWS_NAME_PREFIX): (3, 600),
+        }
+        mock_get_queue_depth_and_age.side_effect = queue_depths.get
+        with self.settings(HOUNDIGRADE_AWS_REGIONAL_TARGETS=REGIONAL_TARGETS,
+                           HOUNDIGRADE_SCALE_UP_QUEUE_DEPTH=10,
+                           HOUNDIGRADE_SCALE_UP_MESSAGE_AGE=600):
+            tasks.check_ready_volumes_queue()
+
+        self.assertEqual(mock_get_queue_depth_and_age.call_count, 2)
+        mock_scale_up.delay.assert_called_once_with(3, 'ap-southeast-2')
+
+    def test_get_inspection_batch_size(self):
+        """Assert batch sizes spread volumes evenly within the limits."""
+        with self.settings(HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE=10,
+                           HOUNDIGRADE_AWS_MAX_INSTANCES=3):
+            self.assertEqual(tasks._get_inspection_batch_size(0), 10)
+            self.assertEqual(tasks._get_inspection_batch_size(4), 4)
+            self.assertEqual(tasks._get_inspection_batch_size(11), 6)
+            self.assertEqual(tasks._get_inspection_batch_size(25), 9)
+            self.assertEqual(tasks._get_inspection_batch_size(100), 10)
+
+    @patch('account.tasks.boto3')
+    @patch('account.tasks.aws')
+    def test_run_inspection_cluster_sharded(self, mock_aws, mock_boto3):
+        """Assert each instance inspects its own shard of the volumes."""
+        account = account_helper.generate_aws_account()
+        messages = [
+            {'ami_id': account_helper.generate_aws_image(account).ec2_ami_id,
+             'volume_id': util_helper.generate_dummy_volume_id()}
+            for __ in range(3)
+        ]
+        container_instances = [
+            {'containerInstanceArn': util_helper.generate_dummy_arn(),
+             'ec2InstanceId': util_helper.generate_dummy_instance_id()}
+            for __ in range(2)
+        ]
+        mock_ecs = MagicMock()
+        mock_ecs.list_container_instances.return_value = {
+            'containerInstanceArns': [
+                container_instance['containerInstanceArn']
+                for container_instance in container_instances
+            ]
+        }
+        mock_ecs.describe_container_instances.return_value = {
+            'containerInstances': container_instances,
+        }
+        mock_boto3.client.return_value = mock_ecs
+
+        with self.settings(HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE=2,
+                           HOUNDIGRADE_AWS_MAX_INSTANCES=2):
+            tasks.run_inspection_cluster(messages)
+
+        attached = [
+            call[0] for call in mock_aws.attach_volumes.call_args_list
+        ]
+        self.assertEqual(attached, [
+            (container_instances[0]['ec2InstanceId'],
+             [('/dev/xvdba', messages[0]['volume_id']),
+              ('/dev/xvdbb', messages[1]['volume_id'])],
+             settings.HOUNDIGRADE_AWS_REGION),
+            (container_instances[1]['ec2InstanceId'],
+             [('/dev/xvdba', messages[2]['volume_id'])],
+             settings.HOUNDIGRADE_AWS_REGION),
+        ])
+        mock_ecs.register_task_definition.assert_called_once()
+        started = [
+            (call[1]['containerInstances'],
+             call[1]['overrides']['containerOverrides'][0]['command'])
+            for call in mock_ecs.start_task.call_args_list
+        ]
+        self.assertEqual(started, [
+            ([container_instances[0]['containerInstanceArn']],
+             ['-c', 'aws',
+              '-t', messages[0]['ami_id'], '/dev/xvdba',
+              '-t', messages[1]['ami_id'], '/dev/xvdbb']),
+            ([container_instances[1]['containerInstanceArn']],
+             ['-c', 'aws', '-t', messages[2]['ami_id'], '/dev/xvdba']),
+        ])
+        self.assertEqual(
+            AwsMachineImage.objects.filter(
+                status=AwsMachineImage.INSPECTING).count(),
+            3,
+        )
 
     @patch('account.models.MachineImage.objects')
     @patch('account.tasks.boto3')
@@ -923,18 +1450,21 @@ class AccountCeleryTaskTest(TestCase):
             tasks.run_inspection_cluster(messages)
 
     @patch('account.tasks.persist_aws_inspection_cluster_results')
-    @patch('account.tasks.read_messages_from_queue')
+    @patch('account.tasks.delete_messages_from_queue')
+    @patch('account.tasks.receive_messages_from_queue')
     def test_persist_inspect_results_no_messages(
             self,
-            mock_read_messages_from_queue,
+            mock_receive_messages_from_queue,
+            mock_delete_messages_from_queue,
             mock_persist_inspection_results
     ):
         """Assert empty results does not work."""
-        mock_read_messages_from_queue.return_value = []
+        mock_receive_messages_from_queue.return_value = []
         tasks.persist_inspection_cluster_results_task()
-        mock_read_messages_from_queue.assert_called_once_with(
+        mock_receive_messages_from_queue.assert_called_once_with(
             settings.HOUNDIGRADE_RESULTS_QUEUE_NAME,
-            tasks.HOUNDIGRADE_MESSAGE_READ_LEN
+            tasks.HOUNDIGRADE_MESSAGE_READ_LEN,
+            settings.HOUNDIGRADE_RESULTS_WAIT_TIME
         )
         mock_persist_inspection_results.assert_not_called()
 
@@ -979,6 +1509,35 @@ class AccountCeleryTaskTest(TestCase):
         self.assertTrue(machine_image1.rhel)
         self.assertFalse(machine_image1.openshift)
 
+    def test_persist_aws_inspection_cluster_results_updates_usage(self):
+        """Assert stored usage is recalculated once an image is found RHEL."""
+        user = util_helper.generate_test_user()
+        account = helper.generate_aws_account(user=user)
+        instance = helper.generate_aws_instance(account)
+        image = helper.generate_aws_image(account)
+        helper.generate_aws_instance_events(
+            instance,
+            ((util_helper.utc_dt(2018, 1, 1, 0, 0, 0),
+              util_helper.utc_dt(2018, 1, 2, 0, 0, 0)),),
+            ec2_ami_id=image.ec2_ami_id,
+        )
+        start = util_helper.utc_dt(2018, 1, 1, 0, 0, 0)
+        end = util_helper.utc_dt(2018, 1, 3, 0, 0, 0)
+        results = reports.get_daily_usage(user.id, start, end)
+        self.assertEqual(results['instances_seen_with_rhel'], 0)
+
+        tasks.persist_aws_inspection_cluster_results({
+            'cloud': 'aws',
+            'results': {image.ec2_ami_id: {
+                'drive': {'partition': {'rhel_found': True}},
+            }},
+        })
+
+        results = reports.get_daily_usage(user.id, start, end)
+        self.assertEqual(results['instances_seen_with_rhel'], 1)
+        self.assertEqual(results['daily_usage'][0]['rhel_runtime_seconds'],
+                         86400.0)
+
     def test_persist_aws_inspection_cluster_results(self):
         """Assert that non rhel_images are not tagged rhel."""
         ami_id = util_helper.generate_dummy_image_id()
@@ -1019,83 +1578,639 @@ class AccountCeleryTaskTest(TestCase):
         self.assertFalse(machine_image1.rhel)
         self.assertFalse(machine_image1.openshift)
 
+    def test_persist_aws_inspection_cluster_results_bulk(self):
+        """Assert many images are persisted without a query per image."""
+        def inspection_json(rhel_found):
+            return {'drive': {'partition': {'rhel_found': rhel_found}}}
+
+        account = helper.generate_aws_account()
+        was_rhel_image = helper.generate_aws_image(account, is_rhel=True,
+                                                   is_windows=True)
+        rhel_images = [helper.generate_aws_image(account) for __ in range(3)]
+        unknown_ami_id = util_helper.generate_dummy_image_id()
+
+        with CaptureQueriesContext(connection) as single_queries:
+            tasks.persist_aws_inspection_cluster_results({
+                'cloud': 'aws',
+                'results': {was_rhel_image.ec2_ami_id: inspection_json(False)},
+            })
+        results = {
+            image.ec2_ami_id: inspection_json(True) for image in rhel_images
+        }
+        results[unknown_ami_id] = inspection_json(True)
+        with CaptureQueriesContext(connection) as bulk_queries:
+            unknown_ami_ids = tasks.persist_aws_inspection_cluster_results({
+                'cloud': 'aws',
+                'results': results,
+            })
+
+        self.assertEqual(unknown_ami_ids, [unknown_ami_id])
+        self.assertEqual(len(bulk_queries), len(single_queries))
+        self.assertFalse(was_rhel_image.rhel)
+        self.assertTrue(was_rhel_image.tags.filter(
+            description='windows').exists())
+        for image in rhel_images:
+            image.refresh_from_db()
+            self.assertTrue(image.rhel)
+            self.assertEqual(image.status, image.INSPECTED)
+            self.assertEqual(json.loads(image.inspection_json),
+                             inspection_json(True))
+
+    def test_persist_aws_inspection_cluster_results_propagates(self):
+        """Assert results are copied to images with the same root snapshot."""
+        account = helper.generate_aws_account()
+        snapshot_id = util_helper.generate_dummy_snapshot_id()
+        images = [helper.generate_aws_image(account) for __ in range(3)]
+        for image in images:
+            image.root_snapshot_id = snapshot_id
+            image.save()
+        other_image = helper.generate_aws_image(account)
+        image_json = {'drive': {'partition': {'rhel_found': True}}}
+
+        tasks.persist_aws_inspection_cluster_results({
+            'cloud': 'aws',
+            'results': {images[0].ec2_ami_id: image_json},
+        })
+
+        for image in images:
+            image.refresh_from_db()
+            self.assertEqual(image.status, image.INSPECTED)
+            self.assertEqual(json.loads(image.inspection_json), image_json)
+            self.assertTrue(image.rhel)
+        other_image.refresh_from_db()
+        self.assertEqual(other_image.status, other_image.PENDING)
+        self.assertFalse(other_image.rhel)
+
     @patch('account.tasks.persist_aws_inspection_cluster_results')
-    @patch('account.tasks.read_messages_from_queue')
+    @patch('account.tasks.delete_messages_from_queue')
+    @patch('account.tasks.receive_messages_from_queue')
     def test_persist_inspect_results_unknown_cloud(
             self,
-            mock_read_messages_from_queue,
+            mock_receive_messages_from_queue,
+            mock_delete_messages_from_queue,
             mock_persist_inspection_results
     ):
         """Assert no work for unknown cloud."""
         with patch.object(tasks, 'scale_down_cluster') as mock_scale_down:
-            mock_read_messages_from_queue.return_value = [{'cloud': 'unknown'}]
+            mock_receive_messages_from_queue.return_value = \
+                received_messages([{'cloud': 'unknown'}])
             tasks.persist_inspection_cluster_results_task()
-            mock_read_messages_from_queue.assert_called_once_with(
+            mock_receive_messages_from_queue.assert_called_once_with(
                 settings.HOUNDIGRADE_RESULTS_QUEUE_NAME,
-                tasks.HOUNDIGRADE_MESSAGE_READ_LEN
+                tasks.HOUNDIGRADE_MESSAGE_READ_LEN,
+                settings.HOUNDIGRADE_RESULTS_WAIT_TIME
             )
             mock_persist_inspection_results.assert_not_called()
             mock_scale_down.delay.assert_called_once()
 
     @patch('account.tasks.persist_aws_inspection_cluster_results')
-    @patch('account.tasks.read_messages_from_queue')
+    @patch('account.tasks.delete_messages_from_queue')
+    @patch('account.tasks.receive_messages_from_queue')
     def test_persist_inspect_results_aws_cloud_no_images(
             self,
-            mock_read_messages_from_queue,
+            mock_receive_messages_from_queue,
+            mock_delete_messages_from_queue,
             mock_persist_inspection_results
     ):
         """Assert no work for aws cloud without images."""
         with patch.object(tasks, 'scale_down_cluster') as mock_scale_down:
             message = {'cloud': 'aws'}
-            mock_read_messages_from_queue.return_value = [message]
+            mock_receive_messages_from_queue.return_value = \
+                received_messages([message])
             tasks.persist_inspection_cluster_results_task()
-            mock_read_messages_from_queue.assert_called_once_with(
+            mock_receive_messages_from_queue.assert_called_once_with(
                 settings.HOUNDIGRADE_RESULTS_QUEUE_NAME,
-                tasks.HOUNDIGRADE_MESSAGE_READ_LEN
+                tasks.HOUNDIGRADE_MESSAGE_READ_LEN,
+                settings.HOUNDIGRADE_RESULTS_WAIT_TIME
             )
             mock_persist_inspection_results.assert_called_once_with(
-                message)
+                message, ImageTag.objects.get(description='rhel'))
             mock_scale_down.delay.assert_called_once()
 
     @patch('account.tasks.persist_aws_inspection_cluster_results')
-    @patch('account.tasks.read_messages_from_queue')
+    @patch('account.tasks.delete_messages_from_queue')
+    @patch('account.tasks.receive_messages_from_queue')
     def test_persist_inspect_results_aws_cloud_str_message(
             self,
-            mock_read_messages_from_queue,
+            mock_receive_messages_from_queue,
+            mock_delete_messages_from_queue,
             mock_persist_inspection_results
     ):
         """Test case where message is str not python dict."""
         with patch.object(tasks, 'scale_down_cluster') as mock_scale_down:
             message = json.dumps({'cloud': 'aws'})
-            mock_read_messages_from_queue.return_value = [message]
+            mock_receive_messages_from_queue.return_value = \
+                received_messages([message])
             tasks.persist_inspection_cluster_results_task()
-            mock_read_messages_from_queue.assert_called_once_with(
+            mock_receive_messages_from_queue.assert_called_once_with(
                 settings.HOUNDIGRADE_RESULTS_QUEUE_NAME,
-                tasks.HOUNDIGRADE_MESSAGE_READ_LEN
+                tasks.HOUNDIGRADE_MESSAGE_READ_LEN,
+                settings.HOUNDIGRADE_RESULTS_WAIT_TIME
             )
             mock_persist_inspection_results.assert_called_once_with(
-                json.loads(message))
+                json.loads(message), ImageTag.objects.get(description='rhel'))
             mock_scale_down.delay.assert_called_once()
 
-    @patch('account.tasks.read_messages_from_queue')
+    @patch('account.tasks.delete_messages_from_queue')
+    @patch('account.tasks.receive_messages_from_queue')
     def test_persist_inspect_results_aws_cloud_image_not_found(
             self,
-            mock_read_messages_from_queue
+            mock_receive_messages_from_queue,
+            mock_delete_messages_from_queue,
     ):
         """Assert no work for aws cloud with unknown images."""
         with patch.object(tasks, 'scale_down_cluster') as mock_scale_down:
             message = {'cloud': 'aws', 'results': {'fake_image': {}}}
 
-            mock_read_messages_from_queue.return_value = [message]
+            mock_receive_messages_from_queue.return_value = \
+                received_messages([message])
             tasks.persist_inspection_cluster_results_task()
-            mock_read_messages_from_queue.assert_called_once_with(
+            mock_receive_messages_from_queue.assert_called_once_with(
                 settings.HOUNDIGRADE_RESULTS_QUEUE_NAME,
-                tasks.HOUNDIGRADE_MESSAGE_READ_LEN
+                tasks.HOUNDIGRADE_MESSAGE_READ_LEN,
+                settings.HOUNDIGRADE_RESULTS_WAIT_TIME
             )
             mock_scale_down.delay.assert_called_once()
 
+    @patch('account.tasks.persist_aws_inspection_cluster_results')
+    @patch('account.tasks.delete_messages_from_queue')
+    @patch('account.tasks.receive_messages_from_queue')
+    def test_persist_inspect_results_drains_queue(
+            self,
+            mock_receive_messages_from_queue,
+            mock_delete_messages_from_queue,
+            mock_persist_inspection_results
+    ):
+        """Assert results are read in batches until the queue is drained."""
+        full_batch = [{'cloud': 'aws'}] * tasks.HOUNDIGRADE_MESSAGE_READ_LEN
+        mock_receive_messages_from_queue.side_effect = [
+            received_messages(full_batch),
+            received_messages(full_batch),
+            received_messages([{'cloud': 'aws'}]),
+        ]
+        with patch.object(tasks, 'scale_down_cluster') as mock_scale_down:
+            tasks.persist_inspection_cluster_results_task()
+            mock_scale_down.delay.assert_called_once()
+        self.assertEqual(mock_receive_messages_from_queue.call_count, 3)
+        self.assertEqual(mock_persist_inspection_results.call_count,
+                         tasks.HOUNDIGRADE_MESSAGE_READ_LEN * 2 + 1)
+        self.assertEqual(mock_delete_messages_from_queue.call_count, 3)
+        mock_delete_messages_from_queue.assert_called_with(
+            settings.HOUNDIGRADE_RESULTS_QUEUE_NAME, ['receipt-0'])
+
+    @patch('account.tasks.delete_messages_from_queue')
+    @patch('account.tasks.receive_messages_from_queue')
+    def test_persist_inspect_results_looks_up_rhel_tag_once(
+            self,
+            mock_receive_messages_from_queue,
+            mock_delete_messages_from_queue,
+    ):
+        """Assert the rhel tag is looked up once per drain, not per result."""
+        account = helper.generate_aws_account()
+        images = [helper.generate_aws_image(account) for __ in range(3)]
+        mock_receive_messages_from_queue.return_value = received_messages([
+            {
+                'cloud': 'aws',
+                'results': {
+                    image.ec2_ami_id: {
+                        'drive': {'partition': {'rhel_found': True}},
+                    },
+                },
+            }
+            for image in images
+        ])
+
+        with patch.object(tasks, '_scale_down_cluster_when_inspected'), \
+                patch.object(ImageTag.objects, 'filter',
+                             wraps=ImageTag.objects.filter) as mock_filter:
+            tasks.persist_inspection_cluster_results_task()
+
+        mock_filter.assert_called_once_with(description='rhel')
+        for image in images:
+            image.refresh_from_db()
+            self.assertTrue(image.rhel)
+
+    @patch('account.tasks.persist_aws_inspection_cluster_results')
+    @patch('account.tasks.delete_messages_from_queue')
+    @patch('account.tasks.receive_messages_from_queue')
+    def test_persist_inspect_results_drops_bad_messages(
+            self,
+            mock_receive_messages_from_queue,
+            mock_delete_messages_from_queue,
+            mock_persist_inspection_results
+    ):
+        """Assert bad messages are deleted without blocking the others."""
+        good_message = {'cloud': 'aws', 'results': {}}
+        mock_receive_messages_from_queue.return_value = [
+            SqsReceivedMessage('garbage', 'receipt-0', ValueError()),
+            SqsReceivedMessage({'cloud': 'aws'}, 'receipt-1', None),
+            SqsReceivedMessage('not json', 'receipt-2', None),
+            SqsReceivedMessage(['not', 'a', 'result'], 'receipt-3', None),
+            SqsReceivedMessage('"a string"', 'receipt-4', None),
+            SqsReceivedMessage(good_message, 'receipt-5', None),
+        ]
+        mock_persist_inspection_results.side_effect = [RuntimeError(), None]
+
+        with patch.object(tasks, '_scale_down_cluster_when_inspected') \
+                as mock_scale_down:
+            tasks.persist_inspection_cluster_results_task()
+            mock_scale_down.assert_called_once_with(True)
+
+        mock_persist_inspection_results.assert_called_with(
+            good_message, ImageTag.objects.get(description='rhel'))
+        self.assertEqual(mock_persist_inspection_results.call_count, 2)
+        mock_delete_messages_from_queue.assert_called_once_with(
+            settings.HOUNDIGRADE_RESULTS_QUEUE_NAME,
+            ['receipt-{0}'.format(index) for index in range(6)])
+
+    @patch('account.tasks.delete_messages_from_queue')
+    @patch('account.tasks.receive_messages_from_queue')
+    def test_persist_inspect_results_scales_down_on_receive_error(
+            self,
+            mock_receive_messages_from_queue,
+            mock_delete_messages_from_queue,
+    ):
+        """Assert the scale down check runs even if receiving fails."""
+        mock_receive_messages_from_queue.side_effect = ClientError(
+            {'Error': {'Code': 'InternalError'}}, 'ReceiveMessage')
+
+        with patch.object(tasks, '_scale_down_cluster_when_inspected') \
+                as mock_scale_down:
+            with self.assertRaises(ClientError):
+                tasks.persist_inspection_cluster_results_task()
+            mock_scale_down.assert_called_once_with(False)
+        mock_delete_messages_from_queue.assert_not_called()
+
+    @patch('account.tasks.delete_messages_from_queue')
+    @patch('account.tasks.receive_messages_from_queue')
+    def test_persist_inspect_results_waits_for_outstanding_images(
+            self,
+            mock_receive_messages_from_queue,
+            mock_delete_messages_from_queue,
+    ):
+        """Assert no scale down while inspected images have not reported."""
+        account = helper.generate_aws_account()
+        reported_image = helper.generate_aws_image(account)
+        waiting_image = helper.generate_aws_image(account)
+        AwsMachineImage.objects.filter(
+            id__in=(reported_image.id, waiting_image.id)
+        ).update(status=AwsMachineImage.INSPECTING,
+                 inspection_claimed_at=timezone.now())
+        mock_receive_messages_from_queue.return_value = received_messages([
+            {'cloud': 'aws', 'results': {reported_image.ec2_ami_id: {}}},
+        ])
+
+        with patch.object(tasks, 'scale_down_cluster') as mock_scale_down:
+            tasks.persist_inspection_cluster_results_task()
+            mock_scale_down.delay.assert_not_called()
+
+        reported_image.refresh_from_db()
+        self.assertEqual(reported_image.status, reported_image.INSPECTED)
+
+    @patch('account.tasks.delete_messages_from_queue')
+    @patch('account.tasks.receive_messages_from_queue')
+    def test_persist_inspect_results_times_out(
+            self,
+            mock_receive_messages_from_queue,
+            mock_delete_messages_from_queue,
+    ):
+        """Assert scale down once images have not reported in time."""
+        account = helper.generate_aws_account()
+        image = helper.generate_aws_image(account)
+        AwsMachineImage.objects.filter(id=image.id).update(
+            status=AwsMachineImage.INSPECTING,
+            inspection_claimed_at=util_helper.utc_dt(2018, 1, 1, 0, 0, 0))
+        mock_receive_messages_from_queue.return_value = []
+
+        with patch.object(tasks, 'scale_down_cluster') as mock_scale_down, \
+                patch.object(tasks, 'logger') as mock_logger:
+            tasks.persist_inspection_cluster_results_task()
+            mock_scale_down.delay.assert_called_once()
+            mock_logger.error.assert_called_once()
+
+        # The image is left for reclaim_stale_image_inspections to restart.
+        image.refresh_from_db()
+        self.assertEqual(image.status, image.INSPECTING)
+        self.assertIsNone(image.inspection_claimed_at)
+
+    @patch('account.tasks.delete_messages_from_queue')
+    @patch('account.tasks.receive_messages_from_queue')
+    def test_persist_inspect_results_scales_down_idle_targets(
+            self,
+            mock_receive_messages_from_queue,
+            mock_delete_messages_from_queue,
+    ):
+        """Assert only targets without outstanding images scale down."""
+        account = helper.generate_aws_account()
+        reported_image = helper.generate_aws_image(account)
+        waiting_image = helper.generate_aws_image(account)
+        AwsMachineImage.objects.filter(id=reported_image.id).update(
+            status=AwsMachineImage.INSPECTING,
+            inspection_claimed_at=timezone.now(),
+            inspection_region=settings.HOUNDIGRADE_AWS_REGION)
+        AwsMachineImage.objects.filter(id=waiting_image.id).update(
+            status=AwsMachineImage.INSPECTING,
+            inspection_claimed_at=timezone.now(),
+            inspection_region='ap-southeast-2')
+        mock_receive_messages_from_queue.return_value = received_messages([
+            {'cloud': 'aws', 'results': {reported_image.ec2_ami_id: {}}},
+        ])
+
+        with patch.object(tasks, 'scale_down_cluster') as mock_scale_down, \
+                self.settings(
+                    HOUNDIGRADE_AWS_REGIONAL_TARGETS=REGIONAL_TARGETS):
+            tasks.persist_inspection_cluster_results_task()
+            mock_scale_down.delay.assert_called_once_with(
+                settings.HOUNDIGRADE_AWS_REGION)
+
     @patch('account.tasks.aws')
     def test_scale_down_cluster_success(self, mock_aws):
         """Test the scale down cluster function."""
         mock_aws.scale_down.return_value = None
         scale_down_cluster()
+
+
+class PollPendingAwsResourcesTaskTest(TestCase):
+    """poll_pending_aws_resources Celery task test cases."""
+
+    def setUp(self):
+        """Set up pending snapshots and volumes."""
+        self.region = random.choice(util_helper.SOME_AWS_REGIONS)
+        self.snapshot_id = util_helper.generate_dummy_snapshot_id()
+        self.volume_id = util_helper.generate_dummy_volume_id()
+        self.ami_id = util_helper.generate_dummy_image_id()
+        self.snapshot = tasks.wait_for_aws_resource(
+            AwsPendingResource.TYPE.snapshot,
+            self.snapshot_id,
+            None,
+            tasks.create_volume.s(self.ami_id, self.snapshot_id),
+        )
+        self.volume = tasks.wait_for_aws_resource(
+            AwsPendingResource.TYPE.volume,
+            self.volume_id,
+            self.region,
+            tasks.delete_snapshot.s(
+                self.snapshot_id, self.volume_id, self.region),
+            tasks.enqueue_ready_volume.s(
+                self.ami_id, self.volume_id, self.region),
+        )
+
+    def poll(self, snapshot_states, volume_states):
+        """Poll with the given AWS states and return the dispatched tasks."""
+        with patch.object(tasks, 'aws') as mock_aws, \
+                patch.object(tasks, 'signature') as mock_signature:
+            mock_aws.get_snapshot_states.return_value = snapshot_states
+            mock_aws.get_volume_states.return_value = volume_states
+            tasks.poll_pending_aws_resources()
+        mock_aws.get_snapshot_states.assert_called_once_with(
+            [self.snapshot_id], None)
+        mock_aws.get_volume_states.assert_called_once_with(
+            [self.volume_id], self.region)
+        return [
+            (call[0][0]['task'], call[0][0]['args'])
+            for call in mock_signature.call_args_list
+        ]
+
+    def test_ready_resources_dispatch_tasks(self):
+        """Assert ready resources dispatch their tasks and are removed."""
+        dispatched = self.poll(
+            {self.snapshot_id: 'completed'},
+            {self.volume_id: 'available'},
+        )
+        self.assertEqual(dispatched, [
+            ('account.tasks.create_volume', [self.ami_id, self.snapshot_id]),
+            ('account.tasks.delete_snapshot',
+             [self.snapshot_id, self.volume_id, self.region]),
+            ('account.tasks.enqueue_ready_volume',
+             [self.ami_id, self.volume_id, self.region]),
+        ])
+        self.assertFalse(AwsPendingResource.objects.exists())
+
+    def test_not_ready_resources_keep_waiting(self):
+        """Assert resources that are not ready (or not found) are kept."""
+        dispatched = self.poll(
+            {self.snapshot_id: 'pending'},
+            {},
+        )
+        self.assertEqual(dispatched, [])
+        self.assertEqual(AwsPendingResource.objects.count(), 2)
+
+    def test_failed_resources_are_abandoned(self):
+        """Assert resources in a failed state are removed without tasks."""
+        with patch.object(tasks, 'logger') as mock_logger:
+            dispatched = self.poll(
+                {self.snapshot_id: 'error'},
+                {self.volume_id: 'in-use'},
+            )
+            self.assertEqual(mock_logger.error.call_count, 2)
+        self.assertEqual(dispatched, [])
+        self.assertFalse(AwsPendingResource.objects.exists())
+
+    def test_expired_resources_are_abandoned(self):
+        """Assert resources still not ready after the timeout are removed."""
+        AwsPendingResource.objects.filter(id=self.snapshot.id).update(
+            created_at=util_helper.utc_dt(2018, 1, 1, 0, 0, 0))
+        with patch.object(tasks, 'logger') as mock_logger:
+            dispatched = self.poll(
+                {self.snapshot_id: 'pending'},
+                {self.volume_id: 'creating'},
+            )
+            mock_logger.error.assert_called_once()
+        self.assertEqual(dispatched, [])
+        self.assertEqual(
+            list(AwsPendingResource.objects.values_list('id', flat=True)),
+            [self.volume.id],
+        )
+
+    def test_completed_snapshot_copy_admits_queued_copy(self):
+        """Assert a completed snapshot copy frees its slot for a queued one."""
+        copying = helper.generate_snapshot_copy_request(
+            status=AwsSnapshotCopyRequest.STATUS.copying)
+        copying.snapshot_copy_id = self.snapshot_id
+        copying.save()
+        queued = helper.generate_snapshot_copy_request(
+            region=copying.snapshot_region)
+
+        with self.settings(AWS_SNAPSHOT_COPY_CONCURRENCY=1), \
+                patch.object(tasks, 'start_snapshot_copy') as mock_start:
+            self.poll({self.snapshot_id: 'completed'}, {})
+            mock_start.delay.assert_called_once_with(queued.id)
+
+        self.assertEqual(
+            list(AwsSnapshotCopyRequest.objects.values_list('id', 'status')),
+            [(queued.id, AwsSnapshotCopyRequest.STATUS.copying)],
+        )
+
+
+class ReclaimStaleImageInspectionsTaskTest(TestCase):
+    """reclaim_stale_image_inspections Celery task test cases."""
+
+    def setUp(self):
+        """Set up an account with an instance and images."""
+        self.account = account_helper.generate_aws_account()
+        self.instance = account_helper.generate_aws_instance(self.account)
+        self.image = account_helper.generate_aws_image(self.account)
+        account_helper.generate_single_aws_instance_event(
+            self.instance, util_helper.utc_dt(2018, 1, 1, 0, 0, 0),
+            ec2_ami_id=self.image.ec2_ami_id)
+        self.image.status = self.image.INSPECTING
+        self.image.inspection_claimed_at = util_helper.utc_dt(
+            2018, 1, 1, 0, 0, 0)
+        self.image.save()
+
+    @patch.object(tasks, 'start_image_inspection')
+    def test_stale_inspection_restarted(self, mock_start):
+        """Assert a stale inspection restarts in its instance's region."""
+        fresh_image = account_helper.generate_aws_image(self.account)
+        fresh_image.status = fresh_image.PREPARING
+        fresh_image.inspection_claimed_at = timezone.now()
+        fresh_image.save()
+        account_helper.generate_aws_image(self.account)
+
+        tasks.reclaim_stale_image_inspections()
+
+        mock_start.assert_called_once_with(
+            self.account.account_arn, self.image.ec2_ami_id,
+            self.instance.region)
+
+    @patch.object(tasks, 'start_snapshot_copy')
+    @patch.object(tasks, 'aws')
+    def test_stale_snapshot_copies_freed(self, mock_aws, mock_start_copy):
+        """Assert lost snapshot copies are requeued or release their slots."""
+        AwsMachineImage.objects.all().update(
+            inspection_claimed_at=timezone.now())
+        long_ago = util_helper.utc_dt(2018, 1, 1, 0, 0, 0)
+        region = settings.HOUNDIGRADE_AWS_REGION
+        unstarted = helper.generate_snapshot_copy_request(
+            status=AwsSnapshotCopyRequest.STATUS.copying,
+            admitted_at=long_ago, priority=1)
+        missing, in_progress, waited_on = [
+            helper.generate_snapshot_copy_request(
+                status=AwsSnapshotCopyRequest.STATUS.copying,
+                admitted_at=long_ago,
+                snapshot_copy_id=util_helper.generate_dummy_snapshot_id())
+            for __ in range(3)
+        ]
+        fresh = helper.generate_snapshot_copy_request(
+            status=AwsSnapshotCopyRequest.STATUS.copying)
+        tasks.wait_for_aws_resource(
+            AwsPendingResource.TYPE.snapshot, waited_on.snapshot_copy_id,
+            region)
+        mock_aws.get_snapshot_states.return_value = {
+            in_progress.snapshot_copy_id: 'pending'}
+
+        with self.settings(AWS_SNAPSHOT_COPY_CONCURRENCY=4):
+            tasks.reclaim_stale_image_inspections()
+
+        mock_aws.get_snapshot_states.assert_called_once_with(
+            [missing.snapshot_copy_id, in_progress.snapshot_copy_id], region)
+        # The requeued copy is admitted again into the freed slots.
+        mock_start_copy.delay.assert_called_once_with(unstarted.id)
+        self.assertEqual(
+            set(AwsSnapshotCopyRequest.objects.values_list('id', flat=True)),
+            {unstarted.id, in_progress.id, waited_on.id, fresh.id},
+        )
+
+    @patch.object(tasks, 'start_image_inspection')
+    def test_stale_inspection_without_region_reset(self, mock_start):
+        """Assert a stale inspection with no known region becomes pending."""
+        AwsInstanceEvent.objects.all().delete()
+
+        tasks.reclaim_stale_image_inspections()
+
+        mock_start.assert_not_called()
+        self.image.refresh_from_db()
+        self.assertEqual(self.image.status, self.image.PENDING)
+        self.assertIsNone(self.image.inspection_claimed_at)
+
+
+class RefreshKnownImagesTaskTest(TestCase):
+    """refresh_known_images Celery task test cases."""
+
+    @patch('account.tasks.aws')
+    def test_refresh_known_images(self, mock_aws):
+        """Assert the known image catalog is replaced from S3."""
+        mock_aws.get_object_content_from_s3.return_value = json.dumps([
+            {'owner_id': '309956199498', 'name_pattern': 'RHEL-*',
+             'tags': ['rhel']},
+        ])
+
+        with self.settings(KNOWN_IMAGES_BUCKET='catalog-bucket',
+                           KNOWN_IMAGES_KEY='known_images.json'):
+            tasks.refresh_known_images()
+
+        mock_aws.get_object_content_from_s3.assert_called_once_with(
+            'catalog-bucket', 'known_images.json', compression=None)
+        known_image = KnownImage.objects.get()
+        self.assertEqual(known_image.owner_id, '309956199498')
+        self.assertTrue(known_image.rhel)
+
+    @patch('account.tasks.aws')
+    def test_refresh_known_images_not_configured(self, mock_aws):
+        """Assert the catalog is left alone when no bucket is configured."""
+        KnownImage.objects.create(product_code='rhel-code', rhel=True)
+
+        with self.settings(KNOWN_IMAGES_BUCKET=None):
+            tasks.refresh_known_images()
+
+        mock_aws.get_object_content_from_s3.assert_not_called()
+        self.assertEqual(KnownImage.objects.count(), 1)
+
+
+class GenerateReportTaskTest(TestCase):
+    """generate_report Celery task test cases."""
+
+    def setUp(self):
+        """Set up a pending report job."""
+        self.user = util_helper.generate_test_user()
+        self.report_result = ReportResult.objects.create(
+            user=self.user,
+            report_name='instances',
+            cache_key='report:instances:{0}:abc'.format(self.user.id),
+            parameters=json.dumps({
+                'user_id': self.user.id,
+                'start': '2018-01-01T00:00:00Z',
+                'end': '2018-01-03T00:00:00Z',
+                'name_pattern': None,
+                'account_id': None,
+                'granularity': 'daily',
+            }),
+        )
+
+    def test_generate_report_stores_result(self):
+        """Assert the report runs with the job's parameters and is stored."""
+        tasks.generate_report(self.report_result.id)
+        self.report_result.refresh_from_db()
+        self.assertEqual(self.report_result.status,
+                         ReportResult.STATUS.complete)
+        result = self.report_result.get_result()
+        self.assertEqual(
+            [day['date'] for day in result['daily_usage']],
+            ['2018-01-01T00:00:00Z', '2018-01-02T00:00:00Z'],
+        )
+        self.assertEqual(result['instances_seen_with_rhel'], 0)
+
+    @patch.dict('account.reports.REPORTS')
+    def test_generate_report_failure(self):
+        """Assert a report that raises an exception marks the job failed."""
+        reports.REPORTS['instances'] = Mock(side_effect=Exception('oops'))
+        with patch.object(tasks, 'logger') as mock_logger:
+            tasks.generate_report(self.report_result.id)
+            mock_logger.exception.assert_called_once()
+        self.report_result.refresh_from_db()
+        self.assertEqual(self.report_result.status,
+                         ReportResult.STATUS.failed)
+        self.assertEqual(self.report_result.error, 'oops')
+        self.assertIsNone(self.report_result.get_result())
+
+    def test_generate_report_not_pending(self):
+        """Assert a job that is no longer pending is not run again."""
+        ReportResult.objects.filter(id=self.report_result.id).update(
+            status=ReportResult.STATUS.failed)
+        with patch.object(tasks.cache, 'get_or_generate_report') as \
+                mock_generate:
+            tasks.generate_report(self.report_result.id)
+            mock_generate.assert_not_called()
+        self.report_result.refresh_from_db()
+        self.assertEqual(self.report_result.status,
+                         ReportResult.STATUS.failed)
@@ -1,16 +1,22 @@
 """Collection of tests for utils in the account app."""
+import json
 import random
 import uuid
 from unittest.mock import Mock, patch
 
+import jsonpickle
 from botocore.exceptions import ClientError
 from django.test import TestCase
 from rest_framework.serializers import ValidationError
 
-from account import AWS_PROVIDER_STRING, util
+from account import AWS_PROVIDER_STRING, reports, util
 from account.models import (AwsAccount,
                             AwsMachineImage,
-                            ImageTag)
+                            AwsSnapshotCopyRequest,
+                            ImageTag,
+                            KnownImage,
+                            ReportResult)
+from account.tests import helper as account_helper
 from account.util import convert_param_to_int
 from util import aws
 from util.tests import helper as util_helper
@@ -81,6 +87,489 @@ class AccountUtilTest(TestCase):
                 description='windows').first(),
                 ami.tags.filter(description='windows').first())
 
+    def test_create_new_machine_images_with_known_product_code(self):
+        """Test that new images with known product codes skip inspection."""
+        account = account_helper.generate_aws_account()
+        KnownImage.objects.create(product_code='rhel-code', rhel=True)
+        region = random.choice(util_helper.SOME_AWS_REGIONS)
+        known_instance = util_helper.generate_dummy_describe_instance(
+            state=aws.InstanceState.running)
+        known_instance['ProductCodes'] = [
+            {'ProductCodeId': 'rhel-code', 'ProductCodeType': 'marketplace'}]
+        other_instance = util_helper.generate_dummy_describe_instance(
+            state=aws.InstanceState.running)
+
+        util.create_new_machine_images(
+            account, {region: [known_instance, other_instance]})
+
+        known_ami = AwsMachineImage.objects.get(
+            ec2_ami_id=known_instance['ImageId'])
+        self.assertEqual(known_ami.status, known_ami.INSPECTED)
+        self.assertTrue(known_ami.rhel)
+        self.assertFalse(known_ami.openshift)
+        other_ami = AwsMachineImage.objects.get(
+            ec2_ami_id=other_instance['ImageId'])
+        self.assertEqual(other_ami.status, other_ami.PENDING)
+
+    def test_find_known_image(self):
+        """Test known images match only when all their criteria match."""
+        owner_id = util_helper.generate_dummy_aws_account_id()
+        KnownImage.objects.create()
+        by_owner_and_name = KnownImage.objects.create(
+            owner_id=owner_id, name_pattern='RHEL-7.*', rhel=True)
+        by_product_code = KnownImage.objects.create(
+            product_code='ocp-code', rhel=True, openshift=True)
+
+        self.assertEqual(
+            util.find_known_image(owner_id, [], 'RHEL-7.5_HVM-x86_64'),
+            by_owner_and_name)
+        self.assertIsNone(util.find_known_image(owner_id, [], 'RHEL-6.9'))
+        self.assertIsNone(util.find_known_image(owner_id))
+        self.assertIsNone(util.find_known_image(
+            util_helper.generate_dummy_aws_account_id(), [], 'RHEL-7.5'))
+        self.assertEqual(
+            util.find_known_image(product_codes=['ocp-code']),
+            by_product_code)
+        self.assertIsNone(util.find_known_image())
+
+    def test_replace_known_images(self):
+        """Test the known image catalog is replaced with new entries."""
+        KnownImage.objects.create(product_code='old-code', rhel=True)
+
+        count = util.replace_known_images([
+            {'owner_id': '309956199498', 'name_pattern': 'RHEL-*',
+             'tags': ['rhel']},
+            {'product_code': 'ocp-code', 'tags': ['rhel', 'openshift']},
+        ])
+
+        self.assertEqual(count, 2)
+        self.assertFalse(
+            KnownImage.objects.filter(product_code='old-code').exists())
+        known_image = KnownImage.objects.get(product_code='ocp-code')
+        self.assertTrue(known_image.rhel)
+        self.assertTrue(known_image.openshift)
+
+    def test_claim_image_inspection(self):
+        """Test only one claim on a pending image succeeds."""
+        account = account_helper.generate_aws_account()
+        image = account_helper.generate_aws_image(account)
+        other_copy = AwsMachineImage.objects.get(id=image.id)
+
+        self.assertTrue(util.claim_image_inspection(image))
+        self.assertFalse(util.claim_image_inspection(other_copy))
+
+        self.assertEqual(image.status, image.PREPARING)
+        self.assertEqual(other_copy.status, image.PREPARING)
+        self.assertIsNotNone(other_copy.inspection_claimed_at)
+
+    def test_claim_image_inspection_inspected(self):
+        """Test an inspected image cannot be claimed."""
+        account = account_helper.generate_aws_account()
+        image = account_helper.generate_aws_image(account)
+        image.status = image.INSPECTED
+        image.save()
+
+        self.assertFalse(util.claim_image_inspection(image))
+        self.assertEqual(image.status, image.INSPECTED)
+
+    def test_claim_image_inspection_reclaims_expired_claim(self):
+        """Test an image can be claimed again once its lease expires."""
+        account = account_helper.generate_aws_account()
+        image = account_helper.generate_aws_image(account)
+        self.assertTrue(util.claim_image_inspection(image))
+        self.assertTrue(util.renew_image_inspection_claim(image.ec2_ami_id))
+
+        self.assertFalse(util.claim_image_inspection(image))
+        self.assertEqual(list(util.get_stale_image_inspections()), [])
+        with self.settings(INSPECTION_CLAIM_LEASE=-1):
+            self.assertEqual(
+                [stale.id for stale in util.get_stale_image_inspections()],
+                [image.id],
+            )
+            self.assertTrue(util.claim_image_inspection(image))
+
+    def test_claim_report_job(self):
+        """Test only one worker can start a pending report job."""
+        report_result = ReportResult.objects.create(
+            user=util_helper.generate_test_user(), report_name='instances',
+            cache_key='report:instances')
+        other_copy = ReportResult.objects.get(id=report_result.id)
+
+        self.assertTrue(util.claim_report_job(report_result))
+        self.assertFalse(util.claim_report_job(other_copy))
+
+        self.assertEqual(report_result.status, ReportResult.STATUS.running)
+        self.assertIsNotNone(report_result.started_at)
+
+    def test_fail_stale_report_jobs(self):
+        """Test unfinished jobs are failed once their lease expires."""
+        user = util_helper.generate_test_user()
+        pending, running, complete = [
+            ReportResult.objects.create(
+                user=user, report_name='instances', cache_key='report:a')
+            for __ in range(3)
+        ]
+        util.claim_report_job(running)
+        ReportResult.objects.filter(id=complete.id).update(
+            status=ReportResult.STATUS.complete)
+
+        self.assertEqual(util.fail_stale_report_jobs(), 0)
+        with self.settings(REPORT_JOB_LEASE=-1):
+            self.assertEqual(
+                util.fail_stale_report_jobs(cache_key='report:b'), 0)
+            self.assertEqual(util.fail_stale_report_jobs(), 2)
+
+        statuses = dict(ReportResult.objects.values_list('id', 'status'))
+        self.assertEqual(statuses, {
+            pending.id: ReportResult.STATUS.failed,
+            running.id: ReportResult.STATUS.failed,
+            complete.id: ReportResult.STATUS.complete,
+        })
+
+    @patch('account.tasks.copy_ami_snapshot')
+    def test_start_image_inspection_only_once(self, mock_copy):
+        """Test concurrent inspection starts only copy the snapshot once."""
+        account = account_helper.generate_aws_account()
+        image = account_helper.generate_aws_image(account)
+        region = random.choice(util_helper.SOME_AWS_REGIONS)
+
+        for __ in range(2):
+            started = util.start_image_inspection(
+                account.account_arn, image.ec2_ami_id, region)
+            self.assertEqual(started.status, image.PREPARING)
+
+        mock_copy.delay.assert_called_once_with(
+            account.account_arn, image.ec2_ami_id, region)
+
+    @patch('account.util.aws')
+    @patch('account.tasks.copy_ami_snapshot')
+    def test_start_image_inspection_known_image(self, mock_copy, mock_aws):
+        """Test known images are marked inspected without copying them."""
+        account = account_helper.generate_aws_account()
+        image = account_helper.generate_aws_image(account)
+        region = random.choice(util_helper.SOME_AWS_REGIONS)
+        owner_id = util_helper.generate_dummy_aws_account_id()
+        known_image = KnownImage.objects.create(
+            owner_id=owner_id, name_pattern='RHEL-*', rhel=True)
+        mock_ec2_image = util_helper.generate_mock_image(image.ec2_ami_id)
+        mock_ec2_image.owner_id = owner_id
+        mock_ec2_image.product_codes = None
+        mock_ec2_image.name = 'RHEL-7.5_HVM_GA-x86_64'
+        mock_aws.get_ami.return_value = mock_ec2_image
+
+        started = util.start_image_inspection(
+            account.account_arn, image.ec2_ami_id, region)
+
+        mock_aws.get_session.assert_called_once_with(account.account_arn)
+        mock_aws.get_ami.assert_called_once_with(
+            mock_aws.get_session.return_value, image.ec2_ami_id, region)
+        mock_copy.delay.assert_not_called()
+        image.refresh_from_db()
+        self.assertEqual(started.status, image.INSPECTED)
+        self.assertEqual(image.status, image.INSPECTED)
+        self.assertIsNone(image.inspection_claimed_at)
+        self.assertTrue(image.rhel)
+        self.assertEqual(image.inspection_json,
+                         '{{"known_image": {0}}}'.format(known_image.id))
+
+    @patch('account.util.aws')
+    @patch('account.tasks.copy_ami_snapshot')
+    def test_start_image_inspection_describe_error(self, mock_copy, mock_aws):
+        """Test inspection starts normally if the image cannot be checked."""
+        account = account_helper.generate_aws_account()
+        image = account_helper.generate_aws_image(account)
+        region = random.choice(util_helper.SOME_AWS_REGIONS)
+        KnownImage.objects.create(product_code='rhel-code', rhel=True)
+        mock_aws.get_ami.side_effect = ClientError(
+            {'Error': {'Code': 'InvalidAMIID.NotFound'}}, 'DescribeImages')
+
+        started = util.start_image_inspection(
+            account.account_arn, image.ec2_ami_id, region)
+
+        self.assertEqual(started.status, image.PREPARING)
+        mock_copy.delay.assert_called_once_with(
+            account.account_arn, image.ec2_ami_id, region)
+
+    def test_propagate_image_inspections_updates_usage(self):
+        """Test stored usage is recalculated for images given results."""
+        user = util_helper.generate_test_user()
+        account = account_helper.generate_aws_account(user=user)
+        snapshot_id = util_helper.generate_dummy_snapshot_id()
+        inspected_image = account_helper.generate_aws_image(
+            account, is_rhel=True)
+        running_image = account_helper.generate_aws_image(account)
+        for image in (inspected_image, running_image):
+            image.root_snapshot_id = snapshot_id
+            image.save()
+        AwsMachineImage.objects.filter(id=inspected_image.id).update(
+            status=AwsMachineImage.INSPECTED)
+        account_helper.generate_aws_instance_events(
+            account_helper.generate_aws_instance(account),
+            ((util_helper.utc_dt(2018, 1, 1, 0, 0, 0),
+              util_helper.utc_dt(2018, 1, 2, 0, 0, 0)),),
+            ec2_ami_id=running_image.ec2_ami_id,
+        )
+        start = util_helper.utc_dt(2018, 1, 1, 0, 0, 0)
+        end = util_helper.utc_dt(2018, 1, 3, 0, 0, 0)
+        results = reports.get_daily_usage(user.id, start, end)
+        self.assertEqual(results['instances_seen_with_rhel'], 0)
+
+        self.assertEqual(
+            util.propagate_image_inspections([inspected_image.id]),
+            [running_image.id])
+
+        results = reports.get_daily_usage(user.id, start, end)
+        self.assertEqual(results['instances_seen_with_rhel'], 1)
+
+    def test_propagate_image_inspections_keeps_openshift(self):
+        """Test propagation copies rhel but leaves each image's openshift."""
+        account = account_helper.generate_aws_account()
+        snapshot_id = util_helper.generate_dummy_snapshot_id()
+        inspected_image = account_helper.generate_aws_image(
+            account, is_rhel=True)
+        openshift_image = account_helper.generate_aws_image(
+            account, is_openshift=True)
+        for image in (inspected_image, openshift_image):
+            image.root_snapshot_id = snapshot_id
+            image.save()
+        AwsMachineImage.objects.filter(id=inspected_image.id).update(
+            status=AwsMachineImage.INSPECTED, inspection_json='{}')
+
+        self.assertEqual(
+            util.propagate_image_inspections([inspected_image.id]),
+            [openshift_image.id])
+
+        openshift_image.refresh_from_db()
+        self.assertEqual(openshift_image.status, AwsMachineImage.INSPECTED)
+        self.assertEqual(openshift_image.inspection_json, '{}')
+        self.assertTrue(openshift_image.rhel)
+        self.assertTrue(openshift_image.openshift)
+
+    def test_index_image_root_snapshot_keeps_openshift(self):
+        """Test reused inspections do not copy the source's openshift tag."""
+        account = account_helper.generate_aws_account()
+        snapshot_id = util_helper.generate_dummy_snapshot_id()
+        inspected_image = account_helper.generate_aws_image(
+            account, is_openshift=True)
+        image = account_helper.generate_aws_image(account, is_rhel=True)
+        inspected_image.root_snapshot_id = snapshot_id
+        inspected_image.save()
+        AwsMachineImage.objects.filter(id=inspected_image.id).update(
+            status=AwsMachineImage.INSPECTED, inspection_json='{}')
+
+        self.assertTrue(util.index_image_root_snapshot(
+            image.ec2_ami_id, snapshot_id))
+
+        image.refresh_from_db()
+        self.assertEqual(image.status, AwsMachineImage.INSPECTED)
+        self.assertFalse(image.rhel)
+        self.assertFalse(image.openshift)
+        inspected_image.refresh_from_db()
+        self.assertTrue(inspected_image.openshift)
+
+    def test_index_image_root_snapshot_waits_for_earlier_image(self):
+        """Test only later images wait on an inspection of their snapshot."""
+        account = account_helper.generate_aws_account()
+        snapshot_id = util_helper.generate_dummy_snapshot_id()
+        earlier_image = account_helper.generate_aws_image(account)
+        later_image = account_helper.generate_aws_image(account)
+        for image in (earlier_image, later_image):
+            self.assertTrue(util.claim_image_inspection(image))
+
+        self.assertFalse(util.index_image_root_snapshot(
+            earlier_image.ec2_ami_id, snapshot_id))
+        self.assertTrue(util.index_image_root_snapshot(
+            later_image.ec2_ami_id, snapshot_id))
+        self.assertFalse(util.index_image_root_snapshot(
+            earlier_image.ec2_ami_id, snapshot_id))
+
+        with self.settings(INSPECTION_CLAIM_LEASE=-1):
+            self.assertFalse(util.index_image_root_snapshot(
+                later_image.ec2_ami_id, snapshot_id))
+        later_image.refresh_from_db()
+        self.assertEqual(later_image.root_snapshot_id, snapshot_id)
+        self.assertEqual(later_image.status, later_image.PREPARING)
+
+    def test_queue_snapshot_copy_prioritizes_by_instances(self):
+        """Test snapshot copies are prioritized by instances using images."""
+        account = account_helper.generate_aws_account()
+        image = account_helper.generate_aws_image(account)
+        for __ in range(3):
+            instance = account_helper.generate_aws_instance(account)
+            account_helper.generate_single_aws_instance_event(
+                instance, util_helper.utc_dt(2018, 1, 1, 0, 0, 0),
+                ec2_ami_id=image.ec2_ami_id)
+        region = random.choice(util_helper.SOME_AWS_REGIONS)
+        snapshot_id = util_helper.generate_dummy_snapshot_id()
+
+        copy_request = util.queue_snapshot_copy(
+            account.account_arn, image.ec2_ami_id, snapshot_id, region)
+        unused_request = util.queue_snapshot_copy(
+            account.account_arn, util_helper.generate_dummy_image_id(),
+            snapshot_id, region)
+
+        self.assertEqual(copy_request.priority, 3)
+        self.assertEqual(copy_request.status,
+                         AwsSnapshotCopyRequest.STATUS.queued)
+        self.assertEqual(copy_request.target_region,
+                         util.get_inspection_target(region).region)
+        self.assertEqual(unused_request.priority, 0)
+
+    def test_admit_snapshot_copies_by_priority_within_budget(self):
+        """Test only the highest priority copies fitting the budget start."""
+        region = random.choice(util_helper.SOME_AWS_REGIONS)
+        account_helper.generate_snapshot_copy_request(
+            target_region=region,
+            status=AwsSnapshotCopyRequest.STATUS.copying)
+        low = account_helper.generate_snapshot_copy_request(
+            target_region=region, priority=1)
+        # The budget is shared by copies from any source region.
+        high = account_helper.generate_snapshot_copy_request(
+            region='{0}-source'.format(region), target_region=region,
+            priority=5)
+        account_helper.generate_snapshot_copy_request(
+            target_region=region, priority=2)
+        other_region = account_helper.generate_snapshot_copy_request(
+            region=region, target_region='{0}-other'.format(region),
+            priority=10)
+
+        with self.settings(AWS_SNAPSHOT_COPY_CONCURRENCY=3):
+            admitted = util.admit_snapshot_copies(region)
+            self.assertEqual(util.admit_snapshot_copies(region), [])
+
+        self.assertEqual(len(admitted), 2)
+        self.assertEqual(admitted[0].id, high.id)
+        self.assertIsNotNone(admitted[0].admitted_at)
+        self.assertEqual(
+            AwsSnapshotCopyRequest.objects.filter(
+                target_region=region,
+                status=AwsSnapshotCopyRequest.STATUS.copying).count(),
+            3,
+        )
+        low.refresh_from_db()
+        other_region.refresh_from_db()
+        self.assertEqual(low.status, AwsSnapshotCopyRequest.STATUS.queued)
+        self.assertEqual(other_region.status,
+                         AwsSnapshotCopyRequest.STATUS.queued)
+
+    def test_requeue_and_release_snapshot_copy(self):
+        """Test requeued and released copies free their slots."""
+        region = random.choice(util_helper.SOME_AWS_REGIONS)
+        requeued = account_helper.generate_snapshot_copy_request(
+            target_region=region,
+            status=AwsSnapshotCopyRequest.STATUS.copying)
+        released = account_helper.generate_snapshot_copy_request(
+            target_region=region,
+            status=AwsSnapshotCopyRequest.STATUS.copying)
+        released.snapshot_copy_id = util_helper.generate_dummy_snapshot_id()
+        released.save()
+
+        util.requeue_snapshot_copy(requeued)
+        self.assertEqual(
+            util.release_snapshot_copy(released.snapshot_copy_id), region)
+        self.assertIsNone(
+            util.release_snapshot_copy(released.snapshot_copy_id))
+
+        requeued.refresh_from_db()
+        self.assertEqual(requeued.status, AwsSnapshotCopyRequest.STATUS.queued)
+        self.assertIsNone(requeued.admitted_at)
+        self.assertFalse(
+            AwsSnapshotCopyRequest.objects.filter(id=released.id).exists())
+
+    def test_stale_inspection_with_live_copy_not_reclaimed(self):
+        """Test an image waiting on its snapshot copy is not reclaimed."""
+        account = account_helper.generate_aws_account()
+        image = account_helper.generate_aws_image(account)
+        copied_image = account_helper.generate_aws_image(account)
+        for claimed_image in (image, copied_image):
+            self.assertTrue(util.claim_image_inspection(claimed_image))
+        copy_request = account_helper.generate_snapshot_copy_request()
+        AwsSnapshotCopyRequest.objects.filter(id=copy_request.id).update(
+            ec2_ami_id=image.ec2_ami_id)
+        account_helper.generate_snapshot_copy_request()
+        AwsSnapshotCopyRequest.objects.exclude(id=copy_request.id).update(
+            reference_ami_id=copied_image.ec2_ami_id)
+
+        with self.settings(INSPECTION_CLAIM_LEASE=-1):
+            self.assertEqual(list(util.get_stale_image_inspections()), [])
+            AwsSnapshotCopyRequest.objects.all().delete()
+            self.assertEqual(
+                {stale.id for stale in util.get_stale_image_inspections()},
+                {image.id, copied_image.id},
+            )
+
+    def test_admit_and_requeue_snapshot_copy_renew_claim(self):
+        """Test admitting or requeueing a copy renews its image's claim."""
+        account = account_helper.generate_aws_account()
+        image = account_helper.generate_aws_image(account)
+        self.assertTrue(util.claim_image_inspection(image))
+        long_ago = util_helper.utc_dt(2018, 1, 1, 0, 0, 0)
+        AwsMachineImage.objects.filter(id=image.id).update(
+            inspection_claimed_at=long_ago)
+        region = random.choice(util_helper.SOME_AWS_REGIONS)
+        copy_request = util.queue_snapshot_copy(
+            account.account_arn, image.ec2_ami_id,
+            util_helper.generate_dummy_snapshot_id(), region)
+
+        admitted = util.admit_snapshot_copies(copy_request.target_region)
+        image.refresh_from_db()
+        self.assertEqual([admitted_copy.id for admitted_copy in admitted],
+                         [copy_request.id])
+        self.assertGreater(image.inspection_claimed_at, long_ago)
+
+        AwsMachineImage.objects.filter(id=image.id).update(
+            inspection_claimed_at=long_ago)
+        util.requeue_snapshot_copy(copy_request)
+        image.refresh_from_db()
+        self.assertGreater(image.inspection_claimed_at, long_ago)
+
+    def test_get_stale_snapshot_copies(self):
+        """Test copies admitted longer ago than their lease are stale."""
+        stale = account_helper.generate_snapshot_copy_request(
+            status=AwsSnapshotCopyRequest.STATUS.copying,
+            admitted_at=util_helper.utc_dt(2018, 1, 1, 0, 0, 0))
+        account_helper.generate_snapshot_copy_request(
+            status=AwsSnapshotCopyRequest.STATUS.copying)
+        account_helper.generate_snapshot_copy_request()
+
+        self.assertEqual(
+            [copy_request.id
+             for copy_request in util.get_stale_snapshot_copies()],
+            [stale.id],
+        )
+
+    def test_get_inspection_target(self):
+        """Test regions with local clusters get their own targets."""
+        regional_targets = {
+            'ap-southeast-2': {
+                'availability_zone': 'ap-southeast-2a',
+                'autoscaling_group_name': 'houndigrade-ap-southeast-2',
+                'ecs_cluster_name': 'inspectigrade-ap-southeast-2',
+            },
+        }
+        with self.settings(HOUNDIGRADE_AWS_REGION='us-east-1',
+                           HOUNDIGRADE_AWS_AVAILABILITY_ZONE='us-east-1b',
+                           HOUNDIGRADE_AWS_REGIONAL_TARGETS=regional_targets,
+                           AWS_NAME_PREFIX='test-'):
+            targets = util.get_inspection_targets()
+            local_target = util.get_inspection_target('ap-southeast-2')
+            default_target = util.get_inspection_target('eu-west-1')
+
+        self.assertEqual([target.region for target in targets],
+                         ['us-east-1', 'ap-southeast-2'])
+        self.assertEqual(local_target.region, 'ap-southeast-2')
+        self.assertEqual(local_target.availability_zone, 'ap-southeast-2a')
+        self.assertEqual(local_target.autoscaling_group_name,
+                         'houndigrade-ap-southeast-2')
+        self.assertEqual(local_target.ecs_cluster_name,
+                         'inspectigrade-ap-southeast-2')
+        self.assertEqual(local_target.ready_volumes_queue_name,
+                         'test-ready_volumes_ap-southeast-2')
+        self.assertEqual(default_target, targets[0])
+        self.assertEqual(default_target.availability_zone, 'us-east-1b')
+        self.assertEqual(default_target.ready_volumes_queue_name,
+                         'test-ready_volumes')
+
     def test_generate_aws_ami_messages(self):
         """Test that messages are formatted correctly."""
         region = random.choice(util_helper.SOME_AWS_REGIONS)
@@ -129,7 +618,7 @@ class AccountUtilTest(TestCase):
     def test_sqs_wrap_message(self):
         """Test SQS message wrapping."""
         message_decoded = {'hello': 'world'}
-        message_encoded = '{"hello": "world"}'
+        message_encoded = '{"schema_version":1,"message":{"hello":"world"}}'
         with patch.object(util, 'uuid') as mock_uuid:
             wrapped_id = uuid.uuid4()
             mock_uuid.uuid4.return_value = wrapped_id
@@ -147,6 +636,42 @@ class AccountUtilTest(TestCase):
         actual_unwrapped = util._sqs_unwrap_message(message_wrapped)
         self.assertEqual(actual_unwrapped, message_decoded)
 
+    def test_sqs_message_body_round_trip(self):
+        """Test small messages are encoded uncompressed and decoded."""
+        message = {'ami_id': 'ami-1234', 'volume_id': 'vol-5678'}
+        body = util._sqs_encode_message_body(message)
+        self.assertEqual(json.loads(body), {
+            'schema_version': util.SQS_MESSAGE_SCHEMA_VERSION,
+            'message': message,
+        })
+        self.assertEqual(util._sqs_decode_message_body(body), message)
+
+    def test_sqs_message_body_compresses_large_messages(self):
+        """Test large messages are compressed and decoded."""
+        message = {
+            'cloud': 'aws',
+            'results': {
+                f'ami-{index}': {'rhel_found': True, 'paths': ['/etc'] * 20}
+                for index in range(100)
+            },
+        }
+        body = util._sqs_encode_message_body(message)
+        self.assertIn('compressed_message', json.loads(body))
+        self.assertLess(len(body), len(json.dumps(message)))
+        self.assertEqual(util._sqs_decode_message_body(body), message)
+
+    def test_sqs_message_body_decodes_legacy_jsonpickle(self):
+        """Test bodies encoded by jsonpickle are still decoded."""
+        message = {'ami_id': 'ami-1234', 'devices': ('/dev/xvdba',)}
+        body = jsonpickle.encode(message)
+        self.assertEqual(util._sqs_decode_message_body(body), message)
+
+    def test_sqs_message_body_unsupported_version(self):
+        """Test bodies from a newer schema version are rejected."""
+        body = json.dumps({'schema_version': 99, 'message': {}})
+        with self.assertRaises(ValueError):
+            util._sqs_decode_message_body(body)
+
     def create_messages(self, count=1):
         """
         Create lists of messages for testing.
@@ -186,14 +711,150 @@ class AccountUtilTest(TestCase):
         mock_queue_url = Mock()
         mock_sqs.get_queue_url.return_value = {'QueueUrl': mock_queue_url}
 
+        mock_sqs.send_message_batch.return_value = {
+            'Successful': [{'Id': wrapped_messages[0]['Id'],
+                            'MessageId': 'sent-message'}],
+        }
+
         with patch.object(util, '_sqs_wrap_message') as mock_sqs_wrap_message:
             mock_sqs_wrap_message.return_value = wrapped_messages[0]
-            util.add_messages_to_queue(queue_name, messages)
+            results = util.add_messages_to_queue(queue_name, messages)
             mock_sqs_wrap_message.assert_called_once_with(messages[0])
 
         mock_sqs.send_message_batch.assert_called_with(
             QueueUrl=mock_queue_url, Entries=wrapped_messages
         )
+        self.assertEqual(results, [
+            util.SqsSendResult(messages[0], 'sent-message', None)])
+
+    @staticmethod
+    def send_message_batch_succeeds(QueueUrl, Entries):
+        """Report every entry in a send_message_batch call as sent."""
+        return {'Successful': [
+            {'Id': entry['Id'], 'MessageId': 'sent-' + entry['Id']}
+            for entry in Entries
+        ]}
+
+    @patch('account.util.boto3')
+    def test_add_messages_to_queue_full_batches(self, mock_boto3):
+        """Test that every message is sent in batches of ten."""
+        messages, __, __ = self.create_messages(25)
+        mock_sqs = mock_boto3.client.return_value
+        mock_sqs.get_queue_url.return_value = {'QueueUrl': 'queue-url'}
+        mock_sqs.send_message_batch.side_effect = \
+            self.send_message_batch_succeeds
+
+        results = util.add_messages_to_queue('Test Queue', messages)
+
+        batch_sizes = sorted(
+            len(call[1]['Entries'])
+            for call in mock_sqs.send_message_batch.call_args_list
+        )
+        self.assertEqual(batch_sizes, [5, 10, 10])
+        self.assertEqual([result.message for result in results], messages)
+        for result in results:
+            self.assertIsNotNone(result.message_id)
+            self.assertIsNone(result.error)
+
+    @patch('account.util.boto3')
+    def test_add_messages_to_queue_payload_limit(self, mock_boto3):
+        """Test that batches stay under the payload limit."""
+        large_message = 'x' * (util.SQS_SEND_BATCH_MAX_BYTES // 3)
+        too_large_message = 'x' * util.SQS_SEND_BATCH_MAX_BYTES
+        messages = [large_message] * 4 + [too_large_message]
+        mock_sqs = mock_boto3.client.return_value
+        mock_sqs.get_queue_url.return_value = {'QueueUrl': 'queue-url'}
+        mock_sqs.send_message_batch.side_effect = \
+            self.send_message_batch_succeeds
+
+        # Disable compression so the payloads keep their size.
+        with patch.object(util, 'SQS_MESSAGE_COMPRESS_MIN_BYTES',
+                          util.SQS_SEND_BATCH_MAX_BYTES * 2):
+            results = util.add_messages_to_queue('Test Queue', messages)
+
+        batch_sizes = sorted(
+            len(call[1]['Entries'])
+            for call in mock_sqs.send_message_batch.call_args_list
+        )
+        self.assertEqual(batch_sizes, [2, 2])
+        self.assertEqual([result.error for result in results],
+                         [None] * 4 + ['MessageTooLong'])
+
+    @patch('account.util.time')
+    @patch('account.util.boto3')
+    def test_add_messages_to_queue_retries_failures(self, mock_boto3,
+                                                    mock_time):
+        """Test that transient failures are retried and others are not."""
+        messages, __, __ = self.create_messages(3)
+        mock_sqs = mock_boto3.client.return_value
+        mock_sqs.get_queue_url.return_value = {'QueueUrl': 'queue-url'}
+
+        def send_message_batch(QueueUrl, Entries):
+            if len(Entries) == 3:
+                return {
+                    'Successful': [{'Id': Entries[0]['Id'],
+                                    'MessageId': 'sent-0'}],
+                    'Failed': [
+                        {'Id': Entries[1]['Id'], 'Code': 'InternalError',
+                         'SenderFault': False},
+                        {'Id': Entries[2]['Id'], 'Code': 'InvalidMessage',
+                         'SenderFault': True},
+                    ],
+                }
+            return self.send_message_batch_succeeds(QueueUrl, Entries)
+
+        mock_sqs.send_message_batch.side_effect = send_message_batch
+
+        results = util.add_messages_to_queue('Test Queue', messages)
+
+        self.assertEqual(mock_sqs.send_message_batch.call_count, 2)
+        retried_entries = mock_sqs.send_message_batch.call_args[1]['Entries']
+        self.assertEqual(len(retried_entries), 1)
+        mock_time.sleep.assert_called_once_with(util.SQS_SEND_RETRY_DELAY)
+        self.assertEqual(results[0].message_id, 'sent-0')
+        self.assertIsNone(results[1].error)
+        self.assertIsNotNone(results[1].message_id)
+        self.assertIsNone(results[2].message_id)
+        self.assertEqual(results[2].error, 'InvalidMessage')
+
+    @patch('account.util.boto3')
+    def test_add_messages_to_queue_batch_error(self, mock_boto3):
+        """Test that a batch whose request fails does not hide the others."""
+        messages, __, __ = self.create_messages(15)
+        mock_sqs = mock_boto3.client.return_value
+        mock_sqs.get_queue_url.return_value = {'QueueUrl': 'queue-url'}
+
+        def send_message_batch(QueueUrl, Entries):
+            if len(Entries) == 5:
+                raise ClientError({'Error': {'Code': 'ServiceUnavailable'}},
+                                  'SendMessageBatch')
+            return self.send_message_batch_succeeds(QueueUrl, Entries)
+
+        mock_sqs.send_message_batch.side_effect = send_message_batch
+
+        results = util.add_messages_to_queue('Test Queue', messages)
+
+        self.assertEqual([result.error for result in results],
+                         [None] * 10 + ['ServiceUnavailable'] * 5)
+        for result in results[:10]:
+            self.assertIsNotNone(result.message_id)
+
+    @patch('account.util.aws')
+    @patch('account.util.boto3')
+    def test_get_queue_depth_and_age(self, mock_boto3, mock_aws):
+        """Test getting the queue's message count and oldest message age."""
+        queue_name = 'ready_volumes'
+        mock_queue_url = Mock()
+        mock_boto3.client.return_value.get_queue_url.return_value = {
+            'QueueUrl': mock_queue_url
+        }
+        mock_aws.get_approximate_message_count.return_value = 12
+        mock_aws.get_oldest_message_age.return_value = 345
+
+        self.assertEqual(util.get_queue_depth_and_age(queue_name), (12, 345))
+        mock_aws.get_approximate_message_count.assert_called_once_with(
+            mock_queue_url)
+        mock_aws.get_oldest_message_age.assert_called_once_with(queue_name)
 
     @patch('account.util.boto3')
     def test_read_single_message_from_queue(self, mock_boto3):
@@ -213,6 +874,24 @@ class AccountUtilTest(TestCase):
                                                       requested_count)
         self.assertEqual(set(read_messages), set(messages[:requested_count]))
 
+    @patch('account.util.boto3')
+    def test_read_messages_from_queue_long_polls(self, mock_boto3):
+        """Test that reading messages can wait for messages to arrive."""
+        queue_name = 'Test Queue'
+        mock_sqs = mock_boto3.client.return_value
+        mock_sqs.receive_message.return_value = {'Messages': []}
+        mock_queue_url = Mock()
+        mock_sqs.get_queue_url.return_value = {'QueueUrl': mock_queue_url}
+
+        read_messages = util.read_messages_from_queue(queue_name, 5, 20)
+
+        self.assertEqual(read_messages, [])
+        mock_sqs.receive_message.assert_called_once_with(
+            QueueUrl=mock_queue_url,
+            MaxNumberOfMessages=5,
+            WaitTimeSeconds=20,
+        )
+
     @patch('account.util.boto3')
     def test_read_messages_from_queue_until_empty(self, mock_boto3):
         """Test that all messages are read from a message queue."""
@@ -269,11 +948,122 @@ class AccountUtilTest(TestCase):
             }
         }
         exception = ClientError(error_response, Mock())
-        mock_sqs.delete_message.side_effect = exception
+        mock_sqs.delete_message_batch.side_effect = exception
         read_messages = util.read_messages_from_queue(queue_name,
                                                       requested_count)
         self.assertEqual(set(read_messages), set())
 
+    @patch('account.util.boto3')
+    def test_read_messages_from_queue_skips_undeleted(self, mock_boto3):
+        """Test only messages that were deleted are returned as read."""
+        messages, __, wrapped_messages = self.create_messages(3)
+        mock_sqs = mock_boto3.client.return_value
+        mock_sqs.receive_message.side_effect = [
+            {'Messages': wrapped_messages},
+            {'Messages': []},
+        ]
+        mock_sqs.delete_message_batch.return_value = {
+            'Failed': [{'Id': '1', 'Code': 'ReceiptHandleIsInvalid'}],
+        }
+
+        read_messages = util.read_messages_from_queue('Test Queue', 5)
+
+        self.assertEqual(read_messages, [messages[0], messages[2]])
+
+    @patch('account.util.boto3')
+    def test_receive_messages_from_queue_undecodable(self, mock_boto3):
+        """Test an undecodable message is returned with its error."""
+        messages, __, wrapped_messages = self.create_messages(2)
+        wrapped_messages[0]['Body'] = 'not json'
+        mock_sqs = mock_boto3.client.return_value
+        mock_sqs.receive_message.side_effect = [
+            {'Messages': wrapped_messages},
+            {'Messages': []},
+        ]
+
+        received = util.receive_messages_from_queue('Test Queue', 5)
+
+        self.assertEqual(len(received), 2)
+        self.assertEqual(received[0].message, 'not json')
+        self.assertEqual(received[0].receipt_handle,
+                         wrapped_messages[0]['ReceiptHandle'])
+        self.assertIsInstance(received[0].error, ValueError)
+        self.assertEqual(received[1].message, messages[1])
+        self.assertIsNone(received[1].error)
+
+    @patch('account.util.boto3')
+    def test_read_messages_from_queue_deletes_undecodable(self, mock_boto3):
+        """Test reading deletes but does not return undecodable messages."""
+        messages, __, wrapped_messages = self.create_messages(2)
+        wrapped_messages[1]['Body'] = 'not json'
+        mock_sqs = mock_boto3.client.return_value
+        mock_sqs.receive_message.side_effect = [
+            {'Messages': wrapped_messages},
+            {'Messages': []},
+        ]
+        mock_sqs.delete_message_batch.return_value = {}
+
+        read_messages = util.read_messages_from_queue('Test Queue', 5)
+
+        self.assertEqual(read_messages, [messages[0]])
+        entries = mock_sqs.delete_message_batch.call_args[1]['Entries']
+        self.assertEqual(
+            [entry['ReceiptHandle'] for entry in entries],
+            [wrapped['ReceiptHandle'] for wrapped in wrapped_messages],
+        )
+
+    @patch('account.util.boto3')
+    def test_receive_messages_from_queue_does_not_delete(self, mock_boto3):
+        """Test receiving returns receipt handles and deletes nothing."""
+        messages, __, wrapped_messages = self.create_messages(3)
+        mock_sqs = mock_boto3.client.return_value
+        mock_sqs.receive_message.side_effect = [
+            {'Messages': wrapped_messages[:2]},
+            {'Messages': wrapped_messages[2:]},
+            {'Messages': []},
+        ]
+
+        received = util.receive_messages_from_queue('Test Queue', 5, 20)
+
+        self.assertEqual([item.message for item in received], messages)
+        self.assertEqual(
+            [item.receipt_handle for item in received],
+            [wrapped['ReceiptHandle'] for wrapped in wrapped_messages],
+        )
+        mock_sqs.delete_message.assert_not_called()
+        mock_sqs.delete_message_batch.assert_not_called()
+        # Only the first receive waits; later ones collect what is waiting.
+        wait_times = [
+            call[1]['WaitTimeSeconds']
+            for call in mock_sqs.receive_message.call_args_list
+        ]
+        self.assertEqual(wait_times, [20, 0, 0])
+
+    @patch('account.util.boto3')
+    def test_delete_messages_from_queue_in_batches(self, mock_boto3):
+        """Test messages are deleted in batches of the maximum size."""
+        receipt_handles = [str(uuid.uuid4()) for __ in range(25)]
+        mock_sqs = mock_boto3.client.return_value
+        mock_sqs.delete_message_batch.return_value = {}
+
+        deleted = util.delete_messages_from_queue('Test Queue',
+                                                  receipt_handles)
+
+        self.assertEqual(deleted, receipt_handles)
+        batch_sizes = [
+            len(call[1]['Entries'])
+            for call in mock_sqs.delete_message_batch.call_args_list
+        ]
+        self.assertEqual(batch_sizes, [10, 10, 5])
+        mock_sqs.delete_message.assert_not_called()
+
+    @patch('account.util.boto3')
+    def test_delete_messages_from_queue_nothing(self, mock_boto3):
+        """Test deleting no messages makes no AWS calls."""
+        self.assertEqual(util.delete_messages_from_queue('Test Queue', []),
+                         [])
+        mock_boto3.client.assert_not_called()
+
     def test_convert_param_to_int_with_int(self):
         """Test that convert_param_to_int returns int with int."""
         result = convert_param_to_int('test_field', 42)
@@ -16,7 +16,10 @@ from account.models import (AwsAccount,
                             AwsInstanceEvent,
                             AwsMachineImage,
                             ImageTag,
-                            InstanceEvent)
+                            InstanceEvent,
+                            ReportResult,
+                            User)
+from account.tasks import generate_report
 from account.tests import helper as account_helper
 from account.views import (AccountViewSet,
                            CloudAccountOverviewViewSet,
@@ -1282,7 +1285,8 @@ class DailyInstanceActivityViewSetTest(TestCase):
         self.end = util_helper.utc_dt(2018, 2, 1, 0, 0, 0)
 
     def get_report_response(self, as_user, start, end, user_id=None,
-                            name_pattern=None, account_id=None):
+                            name_pattern=None, account_id=None,
+                            granularity=None):
         """
         Get the daily instance activity API response for the given inputs.
 
@@ -1293,6 +1297,7 @@ class DailyInstanceActivityViewSetTest(TestCase):
             user_id (int): Optional user_id request arg
             name_pattern (string): Optional name_pattern request arg
             account_id (int): optional account_id to filter against
+            granularity (string): Optional granularity request arg
 
         Returns:
             Response for this request.
@@ -1308,6 +1313,8 @@ class DailyInstanceActivityViewSetTest(TestCase):
             data['name_pattern'] = name_pattern
         if account_id:
             data['account_id'] = account_id
+        if granularity:
+            data['granularity'] = granularity
 
         client = APIClient()
         client.force_authenticate(user=as_user)
@@ -1421,6 +1428,311 @@ class DailyInstanceActivityViewSetTest(TestCase):
             self.multi_account_user.id, None, self.u3_second_account.id)
         self.assertActivityForRhelInstance(response)
 
+    def test_report_with_granularity(self):
+        """Assert the report has one entry for each requested period."""
+        response = self.get_report_response(self.user, self.start, self.end,
+                                            granularity='weekly')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['daily_usage']), 4)
+        self.assertActivityForRhelInstance(response)
+
+    def test_report_with_invalid_granularity(self):
+        """Assert an unknown granularity is rejected."""
+        response = self.get_report_response(self.user, self.start, self.end,
+                                            granularity='fortnightly')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('granularity', response.json())
+
+    def test_report_includes_etag(self):
+        """Assert the report response includes a stable ETag."""
+        response_1 = self.get_report_response(self.user, self.start, self.end)
+        response_2 = self.get_report_response(self.user, self.start, self.end)
+        self.assertEqual(response_1.status_code, 200)
+        self.assertIn('ETag', response_1)
+        self.assertEqual(response_1['ETag'], response_2['ETag'])
+
+    def test_report_if_none_match_returns_not_modified(self):
+        """Assert a matching If-None-Match gets a 304 without a report."""
+        response = self.get_report_response(self.user, self.start, self.end)
+        etag = response['ETag']
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        data = {'start': self.start, 'end': self.end}
+        with patch.object(views.serializers.reports,
+                          'get_daily_usage') as mock_get_daily_usage:
+            response = client.get('/api/v1/report/instances/', data,
+                                  HTTP_IF_NONE_MATCH=etag)
+            mock_get_daily_usage.assert_not_called()
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_report_etag_changes_with_new_event(self):
+        """Assert a new event changes the ETag so clients see new data."""
+        response = self.get_report_response(self.user, self.start, self.end)
+        etag = response['ETag']
+        account_helper.generate_single_aws_instance_event(
+            self.u1a1_instance_rhel,
+            util_helper.utc_dt(2018, 1, 10, 0, 0, 0),
+            event_type=InstanceEvent.TYPE.power_on,
+            ec2_ami_id=self.image_rhel.ec2_ami_id,
+        )
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        data = {'start': self.start, 'end': self.end}
+        response = client.get('/api/v1/report/instances/', data,
+                              HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class UsersDailyInstanceActivityViewSetTest(TestCase):
+    """UsersDailyInstanceActivityViewSet test case."""
+
+    def setUp(self):
+        """Set up users with RHEL activity."""
+        self.user_1 = util_helper.generate_test_user()
+        self.user_2 = util_helper.generate_test_user()
+        self.super_user = util_helper.generate_test_user(is_superuser=True)
+        for user in (self.user_1, self.user_2):
+            account = account_helper.generate_aws_account(user=user)
+            instance = account_helper.generate_aws_instance(account)
+            image = account_helper.generate_aws_image(account, is_rhel=True)
+            account_helper.generate_aws_instance_events(
+                instance,
+                ((util_helper.utc_dt(2018, 1, 1, 0, 0, 0),
+                  util_helper.utc_dt(2018, 1, 2, 0, 0, 0)),),
+                ec2_ami_id=image.ec2_ami_id,
+            )
+        self.data = {
+            'start': '2018-01-01T00:00:00Z',
+            'end': '2018-01-03T00:00:00Z',
+        }
+
+    def get_report_response(self, as_user, data):
+        """Get the multi-user report API response."""
+        client = APIClient()
+        client.force_authenticate(user=as_user)
+        return client.get('/api/v1/report/users/', data)
+
+    def test_superuser_gets_all_users(self):
+        """Assert superusers get results for every user."""
+        response = self.get_report_response(self.super_user, self.data)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual(
+            set(results.keys()),
+            set([str(user.id) for user in
+                 (self.user_1, self.user_2, self.super_user)]),
+        )
+        self.assertEqual(
+            results[str(self.user_1.id)]['instances_seen_with_rhel'], 1)
+        self.assertEqual(
+            results[str(self.super_user.id)]['instances_seen_with_rhel'], 0)
+
+    def test_superuser_filters_users(self):
+        """Assert superusers can limit the results to specific users."""
+        data = dict(self.data, user_ids=[self.user_1.id, self.user_2.id])
+        response = self.get_report_response(self.super_user, data)
+        self.assertEqual(
+            set(response.json().keys()),
+            set([str(self.user_1.id), str(self.user_2.id)]),
+        )
+
+    def test_non_superuser_forbidden(self):
+        """Assert regular users cannot get the multi-user report."""
+        response = self.get_report_response(self.user_1, self.data)
+        self.assertEqual(response.status_code, 403)
+
+    def test_missing_dates(self):
+        """Assert the report requires start and end."""
+        response = self.get_report_response(self.super_user, {})
+        self.assertEqual(response.status_code, 400)
+
+
+class ReportResultViewSetTest(TestCase):
+    """ReportResultViewSet test case."""
+
+    def setUp(self):
+        """Set up a user with some RHEL activity."""
+        self.user = util_helper.generate_test_user()
+        self.other_user = util_helper.generate_test_user()
+        self.super_user = util_helper.generate_test_user(is_superuser=True)
+        account = account_helper.generate_aws_account(user=self.user)
+        instance = account_helper.generate_aws_instance(account)
+        image = account_helper.generate_aws_image(account, is_rhel=True)
+        account_helper.generate_aws_instance_events(
+            instance,
+            ((util_helper.utc_dt(2018, 1, 1, 0, 0, 0),
+              util_helper.utc_dt(2018, 1, 2, 0, 0, 0)),),
+            ec2_ami_id=image.ec2_ami_id,
+        )
+        self.data = {
+            'report_name': 'instances',
+            'start': '2018-01-01T00:00:00Z',
+            'end': '2018-01-03T00:00:00Z',
+        }
+
+    def create_job(self, as_user, data):
+        """Create a report job, running its task immediately."""
+        client = APIClient()
+        client.force_authenticate(user=as_user)
+        with patch('account.serializers.transaction.on_commit') as on_commit, \
+                patch('account.serializers.generate_report') as mock_task:
+            mock_task.delay.side_effect = generate_report
+            on_commit.side_effect = lambda function: function()
+            response = client.post('/api/v1/report/jobs/', data,
+                                   format='json')
+        return response, mock_task
+
+    def get_job(self, as_user, job_id):
+        """Get a report job."""
+        client = APIClient()
+        client.force_authenticate(user=as_user)
+        return client.get('/api/v1/report/jobs/{0}/'.format(job_id))
+
+    def test_create_job_runs_report(self):
+        """Assert creating a job runs the report and stores its result."""
+        response, mock_task = self.create_job(self.user, self.data)
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['id']
+        mock_task.delay.assert_called_once_with(job_id)
+
+        response = self.get_job(self.user, job_id)
+        self.assertEqual(response.status_code, 200)
+        job = response.json()
+        self.assertEqual(job['status'], ReportResult.STATUS.complete)
+        self.assertEqual(job['result']['instances_seen_with_rhel'], 1)
+        self.assertEqual(
+            job['result']['daily_usage'][0]['rhel_runtime_seconds'], 86400.0)
+
+    def test_job_result_matches_synchronous_report(self):
+        """Assert a job's result is identical to the synchronous report."""
+        response, __ = self.create_job(self.user, self.data)
+        job = self.get_job(self.user, response.json()['id']).json()
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        report_data = dict(self.data)
+        del report_data['report_name']
+        report = client.get('/api/v1/report/instances/', report_data)
+        self.assertEqual(job['result'], report.json())
+
+    def test_identical_job_is_reused(self):
+        """Assert an identical request gets the existing job."""
+        response, __ = self.create_job(self.user, self.data)
+        job_id = response.json()['id']
+        response, mock_task = self.create_job(self.user, self.data)
+        self.assertEqual(response.json()['id'], job_id)
+        mock_task.delay.assert_not_called()
+
+    def test_different_job_is_not_reused(self):
+        """Assert requests with different parameters get different jobs."""
+        response, __ = self.create_job(self.user, self.data)
+        job_id = response.json()['id']
+        data = dict(self.data, granularity='hourly')
+        response, mock_task = self.create_job(self.user, data)
+        self.assertNotEqual(response.json()['id'], job_id)
+        mock_task.delay.assert_called_once()
+
+    def test_failed_job_is_not_reused(self):
+        """Assert a failed job does not prevent a new attempt."""
+        response, __ = self.create_job(self.user, self.data)
+        job_id = response.json()['id']
+        ReportResult.objects.filter(id=job_id).update(
+            status=ReportResult.STATUS.failed)
+        response, __ = self.create_job(self.user, self.data)
+        self.assertNotEqual(response.json()['id'], job_id)
+
+    def test_stale_job_is_not_reused(self):
+        """Assert a job lost with its worker does not block a new attempt."""
+        with patch('account.serializers.generate_report'):
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            response = client.post('/api/v1/report/jobs/', self.data,
+                                   format='json')
+        job_id = response.json()['id']
+        with self.settings(REPORT_JOB_LEASE=-1):
+            response, mock_task = self.create_job(self.user, self.data)
+        self.assertNotEqual(response.json()['id'], job_id)
+        mock_task.delay.assert_called_once()
+        self.assertEqual(ReportResult.objects.get(id=job_id).status,
+                         ReportResult.STATUS.failed)
+
+    def test_stale_job_is_failed(self):
+        """Assert polling a job lost with its worker reports it failed."""
+        with patch('account.serializers.generate_report'):
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            response = client.post('/api/v1/report/jobs/', self.data,
+                                   format='json')
+        job_id = response.json()['id']
+        self.assertEqual(self.get_job(self.user, job_id).json()['status'],
+                         ReportResult.STATUS.pending)
+        with self.settings(REPORT_JOB_LEASE=-1):
+            job = self.get_job(self.user, job_id).json()
+        self.assertEqual(job['status'], ReportResult.STATUS.failed)
+        self.assertIsNotNone(job['error'])
+
+    def test_create_job_invalid_report_parameters(self):
+        """Assert the report's own parameters are validated."""
+        data = dict(self.data, granularity='fortnightly')
+        response, mock_task = self.create_job(self.user, data)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('granularity', response.json())
+        mock_task.delay.assert_not_called()
+
+    def test_create_job_invalid_report_name(self):
+        """Assert an unknown report name is rejected."""
+        data = dict(self.data, report_name='everything')
+        response, __ = self.create_job(self.user, data)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('report_name', response.json())
+
+    def test_other_user_cannot_get_job(self):
+        """Assert users cannot see other users' jobs, but superusers can."""
+        response, __ = self.create_job(self.user, self.data)
+        job_id = response.json()['id']
+        self.assertEqual(self.get_job(self.other_user, job_id).status_code,
+                         404)
+        self.assertEqual(self.get_job(self.super_user, job_id).status_code,
+                         200)
+
+    def test_pending_job_has_no_result(self):
+        """Assert a job that has not finished has no result."""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with patch('account.serializers.generate_report'):
+            response = client.post('/api/v1/report/jobs/', self.data,
+                                   format='json')
+        job = self.get_job(self.user, response.json()['id']).json()
+        self.assertEqual(job['status'], ReportResult.STATUS.pending)
+        self.assertIsNone(job['result'])
+
+    def test_list_jobs_omits_results(self):
+        """Assert listing jobs returns their status but not their results."""
+        response, __ = self.create_job(self.user, self.data)
+        job_id = response.json()['id']
+        self.create_job(self.other_user, self.data)
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get('/api/v1/report/jobs/')
+
+        self.assertEqual(response.status_code, 200)
+        jobs = response.json()['results']
+        self.assertEqual([job['id'] for job in jobs], [job_id])
+        self.assertEqual(jobs[0]['status'], ReportResult.STATUS.complete)
+        self.assertNotIn('result', jobs[0])
+
+    def test_create_job_locks_user(self):
+        """Assert concurrent identical requests are serialized per user."""
+        with patch.object(User.objects, 'select_for_update',
+                          wraps=User.objects.select_for_update) as mock_lock:
+            self.create_job(self.user, self.data)
+        mock_lock.assert_called_once_with()
+
 
 class UserViewSetTest(TestCase):
     """UserViewSet test case."""
@@ -1,25 +1,45 @@
 """Various utility functions for the account app."""
+import base64
 import collections
+import datetime
+import fnmatch
+import json
 import logging
-import math
+import time
 import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
 import jsonpickle
 from botocore.exceptions import ClientError
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Q, TextField, Value, When
 from django.utils import timezone
 from django.utils.translation import gettext as _
 from rest_framework.serializers import ValidationError
 
-from account import AWS_PROVIDER_STRING
+from account import AWS_PROVIDER_STRING, signals
 from account.models import (AwsInstance, AwsInstanceEvent, AwsMachineImage,
-                            AwsMachineImageCopy, ImageTag, InstanceEvent)
+                            AwsMachineImageCopy, AwsSnapshotCopyRequest,
+                            ImageTag, InstanceEvent, KnownImage,
+                            MachineImage, ReportResult)
+from util import aws
 from util.aws import is_instance_windows
+from util.exceptions import AwsImageError, NotReadyException
 
 logger = logging.getLogger(__name__)
 
 SQS_SEND_BATCH_SIZE = 10  # boto3 supports sending up to 10 items.
+SQS_SEND_BATCH_MAX_BYTES = 256 * 1024  # SQS limits a whole batch to 256 KB.
+SQS_SEND_MAX_WORKERS = 8
+SQS_SEND_MAX_ATTEMPTS = 4
+SQS_SEND_RETRY_DELAY = 0.5  # seconds, doubled after each failed attempt
 SQS_RECEIVE_BATCH_SIZE = 10  # boto3 supports receiving of up to 10 items.
+SQS_DELETE_BATCH_SIZE = 10  # boto3 supports deleting up to 10 items.
+SQS_MESSAGE_SCHEMA_VERSION = 1
+SQS_MESSAGE_COMPRESS_MIN_BYTES = 8 * 1024
 
 
 def create_initial_aws_instance_events(account, instances_data):
@@ -125,6 +145,12 @@ def create_new_machine_images(account, instances_data):
             instance['ImageId']
             for instance in instances
             if is_instance_windows(instance)}
+        product_codes = collections.defaultdict(set)
+        for instance in instances:
+            product_codes[instance['ImageId']].update(
+                product_code['ProductCodeId']
+                for product_code in instance.get('ProductCodes', [])
+            )
         seen_amis = set([instance['ImageId'] for instance in instances])
         known_amis = AwsMachineImage.objects.filter(
             ec2_ami_id__in=list(seen_amis)
@@ -135,6 +161,11 @@ def create_new_machine_images(account, instances_data):
             ami, __ = save_machine_images(account, ami_id)
             if ami_id in windows_instances:
                 tag_windows(ami)
+                continue
+            known_image = find_known_image(
+                product_codes=product_codes[ami_id])
+            if known_image is not None:
+                tag_known_image(ami, known_image)
 
         saved_amis.extend(new_amis)
     return saved_amis
@@ -182,6 +213,10 @@ def start_image_inspection(arn, ami_id, region):
     """
     Start image inspection of the provided image.
 
+    Inspection only starts if this call claims the image (see
+    claim_image_inspection), so concurrent callers cannot start more than one
+    inspection of the same image.
+
     Args:
         arn (str):  The AWS Resource Number for the account with the snapshot
         ami_id (str): The AWS ID for the machine image
@@ -192,8 +227,15 @@ def start_image_inspection(arn, ami_id, region):
 
     """
     ami = AwsMachineImage.objects.get(ec2_ami_id=ami_id)
-    ami.status = ami.PREPARING
-    ami.save()
+    if not claim_image_inspection(ami):
+        logger.info(_('Not starting inspection of {0} with status {1}; '
+                      'it is already claimed or inspected').format(
+            ami_id, ami.status))
+        return ami
+
+    known_image = _find_known_aws_image(arn, ami_id, region)
+    if known_image is not None:
+        return tag_known_image(ami, known_image)
 
     # Local import to get around a circular import issue
     from account.tasks import copy_ami_snapshot
@@ -203,6 +245,370 @@ def start_image_inspection(arn, ami_id, region):
     return ami
 
 
+def find_known_image(owner_id=None, product_codes=(), name=None):
+    """
+    Find the known image catalog entry, if any, that matches an image.
+
+    Args:
+        owner_id (str): The AWS account ID that owns the image, if known
+        product_codes (iterable): The image's product code IDs
+        name (str): The image's name, if known
+
+    Returns:
+        KnownImage: The first matching catalog entry, or None.
+
+    """
+    candidates = KnownImage.objects.filter(
+        Q(owner_id__isnull=True) | Q(owner_id=owner_id),
+        Q(product_code__isnull=True) | Q(product_code__in=product_codes),
+    ).exclude(
+        owner_id__isnull=True,
+        product_code__isnull=True,
+        name_pattern__isnull=True,
+    ).order_by('id')
+    for known_image in candidates:
+        if known_image.name_pattern is None:
+            return known_image
+        if name is not None and fnmatch.fnmatchcase(
+                name, known_image.name_pattern):
+            return known_image
+    return None
+
+
+def _find_known_aws_image(arn, ami_id, region):
+    """
+    Describe an AWS image and find its known image catalog entry, if any.
+
+    Args:
+        arn (str): The AWS Resource Number for the account with the image
+        ami_id (str): The AWS ID for the machine image
+        region (str): The region the image resides in
+
+    Returns:
+        KnownImage: The matching catalog entry, or None.
+
+    """
+    if not KnownImage.objects.exists():
+        return None
+    try:
+        session = aws.get_session(arn)
+        ec2_image = aws.get_ami(session, ami_id, region)
+        product_codes = [
+            product_code['ProductCodeId']
+            for product_code in ec2_image.product_codes or []
+        ]
+        return find_known_image(ec2_image.owner_id, product_codes,
+                                ec2_image.name)
+    except (ClientError, AwsImageError, NotReadyException) as e:
+        logger.info(_('Could not check {0} against known images: {1}')
+                    .format(ami_id, e))
+        return None
+
+
+def tag_known_image(ami, known_image):
+    """
+    Tag an image from its known image catalog entry and mark it inspected.
+
+    Args:
+        ami (AwsMachineImage): Object representing the image.
+        known_image (KnownImage): The catalog entry the image matched.
+
+    Returns:
+        AwsMachineImage: Updated object.
+
+    """
+    descriptions = [
+        description
+        for description, tagged in (('rhel', known_image.rhel),
+                                    ('openshift', known_image.openshift))
+        if tagged
+    ]
+    ami.tags.add(*ImageTag.objects.filter(description__in=descriptions))
+    ami.status = ami.INSPECTED
+    ami.inspection_claimed_at = None
+    ami.inspection_json = json.dumps({'known_image': known_image.id})
+    ami.save()
+    logger.info(_('Marked {0} inspected from known image {1}').format(
+        ami.ec2_ami_id, known_image.id))
+
+    return ami
+
+
+def replace_known_images(catalog):
+    """
+    Replace the known image catalog with new entries.
+
+    Args:
+        catalog (list): dicts with optional owner_id, product_code,
+            name_pattern, and tags (a list of 'rhel' and/or 'openshift') keys
+
+    Returns:
+        int: The number of entries now in the catalog.
+
+    """
+    known_images = [
+        KnownImage(
+            owner_id=entry.get('owner_id'),
+            product_code=entry.get('product_code'),
+            name_pattern=entry.get('name_pattern'),
+            rhel='rhel' in entry.get('tags', []),
+            openshift='openshift' in entry.get('tags', []),
+        )
+        for entry in catalog
+    ]
+    with transaction.atomic():
+        KnownImage.objects.all().delete()
+        KnownImage.objects.bulk_create(known_images)
+    return len(known_images)
+
+
+def _stale_inspection_claims():
+    """
+    Get a filter for images whose inspection claim has expired.
+
+    Returns:
+        Q: Matches images still preparing or inspecting whose claim is older
+            than INSPECTION_CLAIM_LEASE.
+
+    """
+    expired_before = timezone.now() - datetime.timedelta(
+        seconds=settings.INSPECTION_CLAIM_LEASE)
+    return Q(status__in=(MachineImage.PREPARING, MachineImage.INSPECTING)) & (
+        Q(inspection_claimed_at__isnull=True) |
+        Q(inspection_claimed_at__lt=expired_before)
+    )
+
+
+def claim_image_inspection(image):
+    """
+    Atomically claim an image so that only one inspection of it runs.
+
+    An image can be claimed if it is pending inspection or if a previous
+    claim's lease has expired without the inspection completing. The claim is
+    a single conditional UPDATE, so of several concurrent callers exactly one
+    succeeds.
+
+    Args:
+        image (MachineImage): The image to claim
+
+    Returns:
+        bool: True if this call claimed the image, else False.
+
+    """
+    now = timezone.now()
+    claimed = MachineImage.objects.filter(id=image.id).filter(
+        Q(status=MachineImage.PENDING) | _stale_inspection_claims()
+    ).update(status=MachineImage.PREPARING, inspection_claimed_at=now)
+    if claimed:
+        image.status = MachineImage.PREPARING
+        image.inspection_claimed_at = now
+    else:
+        image.refresh_from_db(fields=['status', 'inspection_claimed_at'])
+    return bool(claimed)
+
+
+def renew_image_inspection_claim(ami_id):
+    """
+    Renew the lease on an image's inspection claim as the inspection advances.
+
+    Args:
+        ami_id (str): The AWS ID of the claimed machine image
+
+    Returns:
+        bool: True if the image's claim was renewed, else False.
+
+    """
+    return bool(_renew_image_inspection_claims([ami_id]))
+
+
+def _renew_image_inspection_claims(ami_ids):
+    """Renew the inspection claims of several images at once."""
+    return AwsMachineImage.objects.filter(
+        ec2_ami_id__in=ami_ids,
+        status__in=(MachineImage.PREPARING, MachineImage.INSPECTING),
+    ).update(inspection_claimed_at=timezone.now())
+
+
+def get_stale_image_inspections():
+    """
+    Get images whose inspection was claimed but has not advanced in time.
+
+    An image whose snapshot copy is still queued or copying is not stale,
+    however long the copy has waited, since restarting its inspection would
+    only queue a duplicate copy.
+
+    Returns:
+        QuerySet: AwsMachineImage objects with expired inspection claims.
+
+    """
+    copy_requests = AwsSnapshotCopyRequest.objects.all()
+    return AwsMachineImage.objects.filter(_stale_inspection_claims()).exclude(
+        ec2_ami_id__in=copy_requests.values('ec2_ami_id')
+    ).exclude(
+        ec2_ami_id__in=copy_requests.filter(
+            reference_ami_id__isnull=False).values('reference_ami_id')
+    )
+
+
+def index_image_root_snapshot(ami_id, root_snapshot_id):
+    """
+    Record an image's root snapshot and reuse inspections of the same snapshot.
+
+    Images backed by the same root snapshot have the same contents, so only
+    one of them needs inspecting. If another such image was already inspected,
+    its results are copied to this image. If another such image (claimed
+    before this one) is being inspected now, its results will be propagated
+    to this image by propagate_image_inspections when they arrive.
+
+    Args:
+        ami_id (str): The AWS ID for the machine image
+        root_snapshot_id (str): The id of the image's root volume snapshot
+
+    Returns:
+        bool: True if this image needs no inspection of its own, else False.
+
+    """
+    image_id = AwsMachineImage.objects.filter(
+        ec2_ami_id=ami_id).values_list('id', flat=True).first()
+    if image_id is None:
+        return False
+    AwsMachineImage.objects.filter(id=image_id).update(
+        root_snapshot_id=root_snapshot_id)
+    if not root_snapshot_id:
+        return False
+
+    same_snapshot = AwsMachineImage.objects.filter(
+        root_snapshot_id=root_snapshot_id).exclude(id=image_id)
+    inspected_id = same_snapshot.filter(
+        status=MachineImage.INSPECTED,
+        inspection_json__isnull=False,
+    ).values_list('id', flat=True).first()
+    if inspected_id is not None:
+        _copy_image_inspections({image_id: inspected_id})
+        logger.info(_('Reused inspection of image {0} for {1} with the same '
+                      'root snapshot {2}').format(
+            inspected_id, ami_id, root_snapshot_id))
+        return True
+
+    # Only wait on images claimed before this one so that two images with the
+    # same snapshot never wait on each other.
+    inspecting_id = same_snapshot.filter(
+        id__lt=image_id,
+        status__in=(MachineImage.PREPARING, MachineImage.INSPECTING),
+    ).exclude(
+        _stale_inspection_claims()
+    ).values_list('id', flat=True).first()
+    if inspecting_id is not None:
+        logger.info(_('Waiting for inspection of image {0} for {1} with the '
+                      'same root snapshot {2}').format(
+            inspecting_id, ami_id, root_snapshot_id))
+        return True
+    return False
+
+
+def propagate_image_inspections(image_ids, rhel_tag=None):
+    """
+    Copy inspection results to uninspected images with the same root snapshot.
+
+    Args:
+        image_ids (list): ids of freshly inspected images
+        rhel_tag (ImageTag): Optional. The rhel tag, if the caller has
+            already looked it up.
+
+    Returns:
+        list: ids of the images that received copied results
+
+    """
+    sources = {}
+    for image_id, root_snapshot_id in AwsMachineImage.objects.filter(
+            id__in=image_ids,
+            root_snapshot_id__isnull=False,
+    ).exclude(root_snapshot_id='').values_list('id', 'root_snapshot_id'):
+        sources.setdefault(root_snapshot_id, image_id)
+    if not sources:
+        return []
+
+    targets = {
+        image_id: sources[root_snapshot_id]
+        for image_id, root_snapshot_id in AwsMachineImage.objects.filter(
+            root_snapshot_id__in=list(sources.keys())
+        ).exclude(
+            status=MachineImage.INSPECTED
+        ).values_list('id', 'root_snapshot_id')
+    }
+    if targets:
+        _copy_image_inspections(targets, rhel_tag)
+        logger.info(_('Propagated inspection results to {0} images with '
+                      'the same root snapshots').format(len(targets)))
+    return list(targets.keys())
+
+
+def _copy_image_inspections(sources, rhel_tag=None):
+    """
+    Copy the inspection results of images to other images.
+
+    Only what inspection produces is copied: the status, the inspection JSON,
+    and the presence of the rhel tag. Other tags, such as openshift, are set
+    per image and are left alone. The rhel tag is added or removed with bulk
+    writes to the tags through table, which do not send m2m_changed, so stored
+    usage for any image whose rhel tag changed is invalidated directly.
+
+    Args:
+        sources (dict): ids of the images to update mapped to the ids of the
+            inspected images to copy from
+        rhel_tag (ImageTag): Optional. The rhel tag, if the caller has
+            already looked it up.
+    """
+    image_tag_model = MachineImage.tags.through
+    source_ids = set(sources.values())
+    if rhel_tag is None:
+        rhel_tag = ImageTag.objects.filter(description='rhel').first()
+    rhel_image_ids = set()
+    if rhel_tag is not None:
+        rhel_image_ids = set(image_tag_model.objects.filter(
+            imagetag_id=rhel_tag.id,
+            machineimage_id__in=source_ids.union(sources.keys()),
+        ).values_list('machineimage_id', flat=True))
+    inspection_jsons = dict(MachineImage.objects.filter(
+        id__in=source_ids).values_list('id', 'inspection_json'))
+    tagged_image_ids = [
+        image_id for image_id, source_id in sources.items()
+        if source_id in rhel_image_ids and image_id not in rhel_image_ids
+    ]
+    untagged_image_ids = [
+        image_id for image_id, source_id in sources.items()
+        if source_id not in rhel_image_ids and image_id in rhel_image_ids
+    ]
+
+    with transaction.atomic():
+        if untagged_image_ids:
+            image_tag_model.objects.filter(
+                imagetag_id=rhel_tag.id,
+                machineimage_id__in=untagged_image_ids,
+            ).delete()
+        if tagged_image_ids:
+            image_tag_model.objects.bulk_create([
+                image_tag_model(machineimage_id=image_id,
+                                imagetag_id=rhel_tag.id)
+                for image_id in tagged_image_ids
+            ])
+        if tagged_image_ids or untagged_image_ids:
+            signals.invalidate_usage_for_images(
+                tagged_image_ids + untagged_image_ids)
+        MachineImage.objects.filter(id__in=list(sources.keys())).update(
+            status=MachineImage.INSPECTED,
+            inspection_claimed_at=None,
+            inspection_json=Case(
+                *[
+                    When(id=image_id,
+                         then=Value(inspection_jsons[source_id]))
+                    for image_id, source_id in sources.items()
+                ],
+                output_field=TextField(),
+            ),
+        )
+
+
 def create_aws_machine_image_copy(copy_ami_id, reference_ami_id):
     """
     Create an AwsMachineImageCopy given the copy and reference AMI IDs.
@@ -217,6 +623,288 @@ def create_aws_machine_image_copy(copy_ami_id, reference_ami_id):
                                        reference_awsmachineimage=reference)
 
 
+def queue_snapshot_copy(arn, ami_id, customer_snapshot_id, snapshot_region,
+                        reference_ami_id=None):
+    """
+    Queue a customer snapshot to be copied when its target region has capacity.
+
+    The snapshot is copied to the region of its inspection target. Images that
+    have been seen on more instances are copied first.
+
+    Args:
+        arn (str): The AWS Resource Number for the account with the snapshot
+        ami_id (str): The AWS ID for the machine image
+        customer_snapshot_id (str): The id of the snapshot to copy
+        snapshot_region (str): The region the snapshot resides in
+        reference_ami_id (str): Optional. The id of the original image from
+            which this image was copied.
+
+    Returns:
+        AwsSnapshotCopyRequest: The queued copy request.
+
+    """
+    priority = InstanceEvent.objects.filter(
+        machineimage__in=AwsMachineImage.objects.filter(
+            ec2_ami_id=reference_ami_id or ami_id)
+    ).values('instance_id').distinct().count()
+    return AwsSnapshotCopyRequest.objects.create(
+        arn=arn,
+        ec2_ami_id=ami_id,
+        customer_snapshot_id=customer_snapshot_id,
+        snapshot_region=snapshot_region,
+        target_region=get_inspection_target(snapshot_region).region,
+        reference_ami_id=reference_ami_id,
+        priority=priority,
+    )
+
+
+def admit_snapshot_copies(target_region):
+    """
+    Admit queued snapshot copies up to the region's concurrency budget.
+
+    The inspection claims of the admitted copies' images are renewed.
+
+    Args:
+        target_region (str): The region whose queued copies to admit
+
+    Returns:
+        list(AwsSnapshotCopyRequest): Newly admitted copy requests, which the
+            caller is now responsible for starting.
+
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        copy_requests = list(
+            AwsSnapshotCopyRequest.objects.select_for_update()
+            .filter(target_region=target_region)
+            .order_by('-priority', 'created_at', 'id')
+        )
+        copying_count = len([
+            copy_request for copy_request in copy_requests
+            if copy_request.status == AwsSnapshotCopyRequest.STATUS.copying
+        ])
+        available = settings.AWS_SNAPSHOT_COPY_CONCURRENCY - copying_count
+        if available <= 0:
+            return []
+        admitted = [
+            copy_request for copy_request in copy_requests
+            if copy_request.status == AwsSnapshotCopyRequest.STATUS.queued
+        ][:available]
+        AwsSnapshotCopyRequest.objects.filter(
+            id__in=[copy_request.id for copy_request in admitted]
+        ).update(status=AwsSnapshotCopyRequest.STATUS.copying,
+                 admitted_at=now)
+    for copy_request in admitted:
+        copy_request.status = AwsSnapshotCopyRequest.STATUS.copying
+        copy_request.admitted_at = now
+    _renew_image_inspection_claims([
+        copy_request.reference_ami_id or copy_request.ec2_ami_id
+        for copy_request in admitted
+    ])
+    if admitted:
+        logger.info(_('Admitted {0} snapshot copies to {1} ({2} in flight)')
+                    .format(len(admitted), target_region,
+                            copying_count + len(admitted)))
+    return admitted
+
+
+def requeue_snapshot_copy(copy_request):
+    """
+    Return an admitted snapshot copy to the queue, freeing its slot.
+
+    The image's inspection claim is renewed so that it is not reclaimed while
+    the copy waits to be admitted again.
+
+    Args:
+        copy_request (AwsSnapshotCopyRequest): The request to requeue
+    """
+    AwsSnapshotCopyRequest.objects.filter(id=copy_request.id).update(
+        status=AwsSnapshotCopyRequest.STATUS.queued,
+        snapshot_copy_id=None,
+        admitted_at=None,
+    )
+    renew_image_inspection_claim(
+        copy_request.reference_ami_id or copy_request.ec2_ami_id)
+
+
+def get_stale_snapshot_copies():
+    """
+    Get admitted snapshot copies that have held their slots for too long.
+
+    A copy's slot is normally freed when its copy completes, but if the worker
+    starting or tracking the copy dies, nothing would ever free it.
+
+    Returns:
+        QuerySet: AwsSnapshotCopyRequest objects copying since before
+            AWS_SNAPSHOT_COPY_LEASE ago.
+
+    """
+    expired_before = timezone.now() - datetime.timedelta(
+        seconds=settings.AWS_SNAPSHOT_COPY_LEASE)
+    return AwsSnapshotCopyRequest.objects.filter(
+        Q(admitted_at__isnull=True) | Q(admitted_at__lt=expired_before),
+        status=AwsSnapshotCopyRequest.STATUS.copying,
+    )
+
+
+def release_snapshot_copy(snapshot_copy_id):
+    """
+    Forget a finished snapshot copy, freeing its slot.
+
+    Args:
+        snapshot_copy_id (str): The id of our copy of the snapshot
+
+    Returns:
+        str: The region whose slot was freed, or None if the snapshot copy
+            was not scheduled.
+
+    """
+    copy_request = AwsSnapshotCopyRequest.objects.filter(
+        snapshot_copy_id=snapshot_copy_id).first()
+    if copy_request is None:
+        return None
+    copy_request.delete()
+    return copy_request.target_region
+
+
+InspectionTarget = collections.namedtuple('InspectionTarget', [
+    'region',
+    'availability_zone',
+    'autoscaling_group_name',
+    'ecs_cluster_name',
+    'ready_volumes_queue_name',
+])
+
+
+def get_inspection_targets():
+    """
+    Get every houndigrade cluster that can inspect volumes.
+
+    The default cluster in HOUNDIGRADE_AWS_AVAILABILITY_ZONE is always a
+    target, and HOUNDIGRADE_AWS_REGIONAL_TARGETS adds clusters local to other
+    regions. Each target has its own ready volumes queue.
+
+    Returns:
+        list(InspectionTarget): The default target followed by any regional
+            targets.
+
+    """
+    default_region = settings.HOUNDIGRADE_AWS_REGION
+    targets = collections.OrderedDict()
+    targets[default_region] = InspectionTarget(
+        region=default_region,
+        availability_zone=settings.HOUNDIGRADE_AWS_AVAILABILITY_ZONE,
+        autoscaling_group_name=settings.HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME,
+        ecs_cluster_name=settings.HOUNDIGRADE_ECS_CLUSTER_NAME,
+        ready_volumes_queue_name='{0}ready_volumes'.format(
+            settings.AWS_NAME_PREFIX),
+    )
+    for region, target in sorted(
+            settings.HOUNDIGRADE_AWS_REGIONAL_TARGETS.items()):
+        if region in targets:
+            # Keep using the default queue if the default region is overridden.
+            queue_name = targets[region].ready_volumes_queue_name
+        else:
+            queue_name = '{0}ready_volumes_{1}'.format(
+                settings.AWS_NAME_PREFIX, region)
+        targets[region] = InspectionTarget(
+            region=region,
+            availability_zone=target['availability_zone'],
+            autoscaling_group_name=target['autoscaling_group_name'],
+            ecs_cluster_name=target['ecs_cluster_name'],
+            ready_volumes_queue_name=queue_name,
+        )
+    return list(targets.values())
+
+
+def get_inspection_target(region=None):
+    """
+    Get the houndigrade cluster that should inspect volumes from a region.
+
+    Args:
+        region (str): The region of the snapshot or volume to inspect
+
+    Returns:
+        InspectionTarget: The target local to the region if there is one,
+            else the default target.
+
+    """
+    targets = get_inspection_targets()
+    for target in targets:
+        if target.region == region:
+            return target
+    return targets[0]
+
+
+def _stale_report_jobs():
+    """
+    Get a filter for report jobs whose worker is presumed dead.
+
+    Returns:
+        Q: Matches jobs pending since before REPORT_JOB_LEASE ago or running
+            since before REPORT_JOB_LEASE ago.
+
+    """
+    expired_before = timezone.now() - datetime.timedelta(
+        seconds=settings.REPORT_JOB_LEASE)
+    return (
+        Q(status=ReportResult.STATUS.pending,
+          created_at__lt=expired_before) |
+        Q(status=ReportResult.STATUS.running,
+          started_at__lt=expired_before)
+    )
+
+
+def fail_stale_report_jobs(**filters):
+    """
+    Mark report jobs that have not finished within their lease as failed.
+
+    Args:
+        **filters: Optional field lookups limiting which jobs are checked
+
+    Returns:
+        int: the number of jobs marked failed.
+
+    """
+    failed = ReportResult.objects.filter(**filters).filter(
+        _stale_report_jobs()
+    ).update(
+        status=ReportResult.STATUS.failed,
+        error=_('Report job did not finish in time'),
+        updated_at=timezone.now(),
+    )
+    if failed:
+        logger.warning(_('Marked {0} stale report job(s) failed').format(
+            failed))
+    return failed
+
+
+def claim_report_job(report_result):
+    """
+    Atomically start a pending report job so that only one worker runs it.
+
+    Args:
+        report_result (ReportResult): The job to claim
+
+    Returns:
+        bool: True if this call claimed the job, else False.
+
+    """
+    now = timezone.now()
+    claimed = ReportResult.objects.filter(
+        id=report_result.id,
+        status=ReportResult.STATUS.pending,
+    ).update(
+        status=ReportResult.STATUS.running,
+        started_at=now,
+        updated_at=now,
+    )
+    if claimed:
+        report_result.status = ReportResult.STATUS.running
+        report_result.started_at = now
+    return bool(claimed)
+
+
 def generate_aws_ami_messages(instances_data, ami_list):
     """
     Format information about the machine image for messaging.
@@ -284,7 +972,7 @@ def _sqs_wrap_message(message):
     return {
         'Id': str(uuid.uuid4()),
         # Yes, the outgoing message uses MessageBody, not Body.
-        'MessageBody': jsonpickle.encode(message),
+        'MessageBody': _sqs_encode_message_body(message),
     }
 
 
@@ -299,44 +987,258 @@ def _sqs_unwrap_message(sqs_message):
         object: the unwrapped and decoded message object
 
     """
-    return jsonpickle.decode(
-        # Yes, the response has Body, not MessageBody.
-        sqs_message['Body']
-    )
+    # Yes, the response has Body, not MessageBody.
+    return _sqs_decode_message_body(sqs_message['Body'])
+
+
+def _sqs_encode_message_body(message):
+    """
+    Encode a message as a versioned JSON message body.
+
+    The message is wrapped with its schema version so that the format can
+    change without breaking readers. Large messages (typically inspection
+    results) are zlib-compressed and base64-encoded to keep them well under
+    the SQS payload limit.
+
+    Args:
+        message (object): JSON-serializable message to encode
+
+    Returns:
+        str: the encoded message body
+
+    """
+    encoded = json.dumps(message, separators=(',', ':'))
+    if len(encoded) < SQS_MESSAGE_COMPRESS_MIN_BYTES:
+        envelope = {
+            'schema_version': SQS_MESSAGE_SCHEMA_VERSION,
+            'message': message,
+        }
+    else:
+        compressed = zlib.compress(encoded.encode('utf-8'))
+        envelope = {
+            'schema_version': SQS_MESSAGE_SCHEMA_VERSION,
+            'compressed_message': base64.b64encode(compressed).decode('ascii'),
+        }
+    return json.dumps(envelope, separators=(',', ':'))
+
+
+def _sqs_decode_message_body(body):
+    """
+    Decode a message body as encoded by _sqs_encode_message_body.
+
+    Bodies without a schema version are legacy jsonpickle-encoded messages
+    (or plain JSON from houndigrade) and are decoded with jsonpickle.
+
+    Args:
+        body (str): the message body to decode
+
+    Returns:
+        object: the decoded message object
+
+    Raises:
+        ValueError: if the body has an unsupported schema version
+
+    """
+    envelope = json.loads(body)
+    if not isinstance(envelope, dict) or 'schema_version' not in envelope:
+        return jsonpickle.decode(body)
+    if envelope['schema_version'] != SQS_MESSAGE_SCHEMA_VERSION:
+        raise ValueError(_('Unsupported message schema version: {0}').format(
+            envelope['schema_version']))
+    if 'compressed_message' in envelope:
+        compressed = base64.b64decode(envelope['compressed_message'])
+        return json.loads(zlib.decompress(compressed).decode('utf-8'))
+    return envelope['message']
+
+
+SqsSendResult = collections.namedtuple('SqsSendResult', [
+    'message',
+    'message_id',
+    'error',
+])
+
+
+def _sqs_batch_entries(entries):
+    """
+    Group wrapped messages into batches that SQS will accept.
+
+    Each batch holds up to SQS_SEND_BATCH_SIZE entries whose bodies total at
+    most SQS_SEND_BATCH_MAX_BYTES.
+
+    Args:
+        entries (list[dict]): wrapped messages, as from _sqs_wrap_message
+
+    Returns:
+        tuple(list, list): the batches of entries, and the entries that are
+            too large to send at all.
+
+    """
+    batches, oversized = [], []
+    batch, batch_bytes = [], 0
+    for entry in entries:
+        entry_bytes = len(entry['MessageBody'].encode('utf-8'))
+        if entry_bytes > SQS_SEND_BATCH_MAX_BYTES:
+            oversized.append(entry)
+            continue
+        if len(batch) == SQS_SEND_BATCH_SIZE or \
+                batch_bytes + entry_bytes > SQS_SEND_BATCH_MAX_BYTES:
+            batches.append(batch)
+            batch, batch_bytes = [], 0
+        batch.append(entry)
+        batch_bytes += entry_bytes
+    if batch:
+        batches.append(batch)
+    return batches, oversized
+
+
+def _sqs_send_batch(sqs, queue_url, batch):
+    """
+    Send one batch of messages, retrying entries that fail transiently.
+
+    Entries that SQS says failed through no fault of ours are sent again after
+    an exponentially growing delay, up to SQS_SEND_MAX_ATTEMPTS times. If the
+    whole request fails, the entries not yet sent are recorded as failed with
+    the request's error code.
+
+    Args:
+        sqs (botocore.client.SQS): the SQS client
+        queue_url (str): the URL of the queue to send to
+        batch (list[dict]): the wrapped messages to send
+
+    Returns:
+        dict: for each entry Id, a (message id, error) tuple where exactly one
+            is None.
+
+    """
+    outcomes = {}
+    for attempt in range(SQS_SEND_MAX_ATTEMPTS):
+        if attempt:
+            time.sleep(SQS_SEND_RETRY_DELAY * 2 ** (attempt - 1))
+        try:
+            response = sqs.send_message_batch(QueueUrl=queue_url,
+                                              Entries=batch)
+        except ClientError as e:
+            error_code = e.response.get('Error', {}).get('Code', 'Unknown')
+            logger.warning(_('Failed to send a batch of {0} message(s): {1}')
+                           .format(len(batch), e))
+            for entry in batch:
+                outcomes[entry['Id']] = (None, error_code)
+            break
+        for success in response.get('Successful', []):
+            outcomes[success['Id']] = (success['MessageId'], None)
+        retry_ids = set()
+        for failure in response.get('Failed', []):
+            outcomes[failure['Id']] = (None, failure['Code'])
+            if not failure.get('SenderFault'):
+                retry_ids.add(failure['Id'])
+        batch = [entry for entry in batch if entry['Id'] in retry_ids]
+        if not batch:
+            break
+    return outcomes
 
 
 def add_messages_to_queue(queue_name, messages):
     """
     Send messages to an SQS queue.
 
+    Messages are sent in batches as full as SQS allows, and the batches are
+    sent concurrently. Messages that fail to send are logged, and callers that
+    depend on delivery must check the results for errors.
+
     Args:
         queue_name (str): The queue to add messages to
         messages (list[dict]): A list of message dictionaries. The message
             dicts will be serialized as JSON strings.
+
+    Returns:
+        list(SqsSendResult): The outcome for each message, in order. Sent
+            messages have their SQS message_id, and the others an error.
+
     """
+    if not messages:
+        return []
     queue_url = _get_sqs_queue_url(queue_name)
     sqs = boto3.client('sqs')
 
     wrapped_messages = [_sqs_wrap_message(message) for message in messages]
-    batch_count = math.ceil(len(messages) / SQS_SEND_BATCH_SIZE)
+    batches, oversized = _sqs_batch_entries(wrapped_messages)
+
+    outcomes = {
+        entry['Id']: (None, 'MessageTooLong') for entry in oversized
+    }
+    if batches:
+        max_workers = min(len(batches), SQS_SEND_MAX_WORKERS)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            sends = [
+                executor.submit(_sqs_send_batch, sqs, queue_url, batch)
+                for batch in batches
+            ]
+            for send in sends:
+                outcomes.update(send.result())
+
+    results = [
+        SqsSendResult(message, *outcomes[entry['Id']])
+        for message, entry in zip(messages, wrapped_messages)
+    ]
+    failed_count = len([result for result in results if result.error])
+    if failed_count:
+        logger.error(_('Failed to send {0} of {1} message(s) to {2}').format(
+            failed_count, len(results), queue_name))
+    return results
+
+
+def get_queue_depth_and_age(queue_name):
+    """
+    Get how many messages are waiting in a queue and how long they've waited.
+
+    Args:
+        queue_name (str): the name of the target SQS queue
+
+    Returns:
+        tuple(int, int): approximate number of messages in the queue and
+            approximate age in seconds of its oldest message.
+
+    """
+    queue_url = _get_sqs_queue_url(queue_name)
+    return (
+        aws.get_approximate_message_count(queue_url),
+        aws.get_oldest_message_age(queue_name),
+    )
 
-    for batch_num in range(batch_count):
-        start_pos = batch_num * SQS_SEND_BATCH_SIZE
-        end_pos = start_pos + SQS_SEND_BATCH_SIZE - 1
-        batch = wrapped_messages[start_pos:end_pos]
-        sqs.send_message_batch(QueueUrl=queue_url, Entries=batch)
 
+SqsReceivedMessage = collections.namedtuple('SqsReceivedMessage', [
+    'message',
+    'receipt_handle',
+    'error',
+])
 
-def read_messages_from_queue(queue_name, max_count=1):
+
+def receive_messages_from_queue(queue_name, max_count=1, wait_time=0):
     """
-    Read messages (up to max_count) from an SQS queue.
+    Receive messages (up to max_count) from an SQS queue without deleting them.
+
+    Received messages are hidden from other readers for the queue's visibility
+    timeout. The caller should delete them with delete_messages_from_queue
+    only after it has finished processing them; any it does not delete will
+    be delivered again, so a crash part way through cannot lose them.
+
+    Only the first receive long-polls for up to wait_time seconds. Once some
+    messages have arrived, we only collect what is already waiting so that
+    draining the queue never ends with a full wait on an empty queue.
+
+    A message whose body cannot be decoded is returned with its raw body as
+    the message and the decoding exception as its error, so that the caller
+    can still delete it instead of receiving it again forever.
 
     Args:
-        queue_name (str): The queue to read messages from
-        max_count (int): Max number of messages to read
+        queue_name (str): The queue to receive messages from
+        max_count (int): Max number of messages to receive
+        wait_time (int): Optional seconds to long-poll for messages to arrive
+            if the queue is empty
 
     Returns:
-        list[object]: The de-queued messages.
+        list[SqsReceivedMessage]: The received messages, their receipt
+            handles, and any errors decoding them.
 
     """
     queue_url = _get_sqs_queue_url(queue_name)
@@ -350,33 +1252,108 @@ def read_messages_from_queue(queue_name, max_count=1):
         # conditions at the end that break us out when we reach the true end.
         new_messages = sqs.receive_message(
             QueueUrl=queue_url,
-            MaxNumberOfMessages=max_batch_size
+            MaxNumberOfMessages=max_batch_size,
+            WaitTimeSeconds=0 if sqs_messages else wait_time,
         ).get('Messages', [])
         if len(new_messages) == 0:
             break
         sqs_messages.extend(new_messages)
         if len(sqs_messages) >= max_count:
             break
-    messages = []
+    received = []
     for sqs_message in sqs_messages:
         try:
-            unwrapped = _sqs_unwrap_message(sqs_message)
-            sqs.delete_message(
-                QueueUrl=queue_url,
-                ReceiptHandle=sqs_message['ReceiptHandle'],
+            message = _sqs_unwrap_message(sqs_message)
+        except Exception as e:
+            # Legacy bodies are decoded with jsonpickle, which can raise
+            # almost anything for a malformed body.
+            logger.error(_('Failed to decode message {0} from {1}: {2}')
+                         .format(sqs_message.get('MessageId'), queue_url, e))
+            received.append(SqsReceivedMessage(
+                sqs_message['Body'], sqs_message['ReceiptHandle'], e))
+            continue
+        received.append(SqsReceivedMessage(
+            message, sqs_message['ReceiptHandle'], None))
+    return received
+
+
+def delete_messages_from_queue(queue_name, receipt_handles):
+    """
+    Delete received messages from an SQS queue in batches.
+
+    Messages that could not be deleted are logged and left in the queue to be
+    delivered again after their visibility timeout.
+
+    Args:
+        queue_name (str): The queue the messages were received from
+        receipt_handles (list[str]): Receipt handles of the messages to delete
+
+    Returns:
+        list[str]: The receipt handles that were deleted.
+
+    """
+    if not receipt_handles:
+        return []
+    queue_url = _get_sqs_queue_url(queue_name)
+    sqs = boto3.client('sqs')
+    deleted = []
+    for offset in range(0, len(receipt_handles), SQS_DELETE_BATCH_SIZE):
+        batch = receipt_handles[offset:offset + SQS_DELETE_BATCH_SIZE]
+        entries = [
+            {'Id': str(index), 'ReceiptHandle': receipt_handle}
+            for index, receipt_handle in enumerate(batch)
+        ]
+        try:
+            response = sqs.delete_message_batch(
+                QueueUrl=queue_url, Entries=entries
             )
-            messages.append(unwrapped)
         except ClientError as e:
-            # I'm not sure exactly what exceptions could land here, but we
-            # probably should log them, stop attempting further deletes, and
-            # return what we have received (and thus deleted!) so far.
             log_message = _(
-                'Unexpected error when attempting to read from {0}: {1}'
+                'Unexpected error when attempting to delete from {0}: {1}'
             ).format(queue_url, getattr(e, 'response', {}).get('Error'))
             logger.error(log_message)
             logger.exception(e)
-            break
-    return messages
+            continue
+        failed_ids = set()
+        for failure in response.get('Failed', []):
+            failed_ids.add(failure['Id'])
+            logger.error(_('Failed to delete message from {0}: {1}').format(
+                queue_url, failure.get('Code')))
+        deleted.extend(
+            entry['ReceiptHandle'] for entry in entries
+            if entry['Id'] not in failed_ids
+        )
+    return deleted
+
+
+def read_messages_from_queue(queue_name, max_count=1, wait_time=0):
+    """
+    Read and delete messages (up to max_count) from an SQS queue.
+
+    Messages are deleted as soon as they are read, so anything the caller has
+    not finished processing is lost if it crashes. Prefer
+    receive_messages_from_queue with delete_messages_from_queue when that
+    matters. Messages that cannot be decoded are deleted but not returned.
+
+    Args:
+        queue_name (str): The queue to read messages from
+        max_count (int): Max number of messages to read
+        wait_time (int): Optional seconds to long-poll for messages to arrive
+            if the queue is empty
+
+    Returns:
+        list[object]: The de-queued messages.
+
+    """
+    received = receive_messages_from_queue(queue_name, max_count, wait_time)
+    deleted = set(delete_messages_from_queue(
+        queue_name, [item.receipt_handle for item in received]
+    ))
+    # Only return what was deleted so nothing is processed twice.
+    return [
+        item.message for item in received
+        if item.receipt_handle in deleted and item.error is None
+    ]
 
 
 def convert_param_to_int(name, value):
@@ -1,7 +1,8 @@
 """DRF API views for the account app."""
 from django.contrib.auth import get_user_model
 from django.http import HttpResponseForbidden, HttpResponseNotFound
-from rest_framework import mixins, viewsets
+from django.utils.cache import get_conditional_response
+from rest_framework import mixins, status, viewsets
 from rest_framework.response import Response
 
 from account import serializers
@@ -9,8 +10,9 @@ from account.models import (Account,
                             Instance,
                             InstanceEvent,
                             MachineImage,
+                            ReportResult,
                             User)
-from account.util import convert_param_to_int
+from account.util import convert_param_to_int, fail_stale_report_jobs
 from util.aws.sts import _get_primary_account_id
 
 
@@ -129,38 +131,114 @@ class SysconfigViewSet(viewsets.ViewSet):
         return Response(response)
 
 
-class CloudAccountOverviewViewSet(viewsets.GenericViewSet):
-    """Generate an object with a list of Cloud Accounts summary details."""
+class BaseReportViewSet(viewsets.GenericViewSet):
+    """
+    Generate a report with support for conditional requests.
 
-    serializer_class = serializers.CloudAccountOverviewSerializer
+    Responses include an ETag derived from the report's parameters and the
+    current state of its underlying data, and requests whose If-None-Match
+    header matches that ETag get a "304 Not Modified" response without the
+    report being regenerated.
+    """
 
     def list(self, request, *args, **kwargs):
-        """Get overview of accounts filtered to appropriate user."""
+        """
+        Run the report and return the results.
+
+        Note: this is called "list" to simplify DRF router integration. By
+        using the "list" name, this method automatically gets mapped to the
+        GET handler for the "/" end of the URI (effectively "/api/v1/report/").
+        """
         serializer = self.get_serializer(data=request.query_params)
         serializer.is_valid(raise_exception=True)
+        etag = serializer.get_etag()
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
         result = serializer.generate()
-        return Response(result)
+        return Response(result, headers={'ETag': etag})
 
 
-class DailyInstanceActivityViewSet(viewsets.GenericViewSet):
+class CloudAccountOverviewViewSet(BaseReportViewSet):
+    """Generate an object with a list of Cloud Accounts summary details."""
+
+    serializer_class = serializers.CloudAccountOverviewSerializer
+
+
+class DailyInstanceActivityViewSet(BaseReportViewSet):
     """Generate a report of daily instance activity within a time frame."""
 
     serializer_class = serializers.DailyInstanceActivitySerializer
 
-    def list(self, request, *args, **kwargs):
-        """
-        Run the daily instance activity report and return the results.
 
-        Note: this is called "list" to simplify DRF router integration. By
-        using the "list" name, this method automatically gets mapped to the
-        GET handler for the "/" end of the URI (effectively "/api/v1/report/").
-        """
+class UsersDailyInstanceActivityViewSet(viewsets.GenericViewSet):
+    """
+    Generate a report of daily instance activity for many users at once.
+
+    This is only available to superusers. Results are keyed by user id and
+    include all users unless "user_ids" are specified.
+    """
+
+    serializer_class = serializers.UsersDailyInstanceActivitySerializer
+
+    def list(self, request, *args, **kwargs):
+        """Run the report and return the results."""
+        if not request.user.is_superuser:
+            return HttpResponseForbidden()
         serializer = self.get_serializer(data=request.query_params)
         serializer.is_valid(raise_exception=True)
         result = serializer.generate()
         return Response(result)
 
 
+class ReportResultViewSet(mixins.CreateModelMixin,
+                          mixins.RetrieveModelMixin,
+                          mixins.ListModelMixin,
+                          viewsets.GenericViewSet):
+    """
+    Create, retrieve, or list asynchronous report jobs.
+
+    Creating a job accepts a "report_name" of "accounts" or "instances" and
+    the same parameters as the corresponding report. Poll the job until its
+    status is "complete" to get the report's results. Listing jobs returns
+    only their status, not their results.
+    """
+
+    queryset = ReportResult.objects.all()
+    serializer_class = serializers.ReportResultSerializer
+
+    def get_queryset(self):
+        """Get the queryset filtered to appropriate user."""
+        user = self.request.user
+        queryset = self.queryset
+        if self.action == 'list':
+            queryset = queryset.defer('result')
+        if not user.is_superuser:
+            return queryset.filter(user=user)
+        return queryset
+
+    def get_serializer_class(self):
+        """Get the serializer, which only includes results for one job."""
+        if self.action == 'list':
+            return serializers.ReportResultListSerializer
+        return self.serializer_class
+
+    def create(self, request, *args, **kwargs):
+        """Create the job and respond that it was accepted."""
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        """Get the job, first failing it if its worker has been lost."""
+        report_result = self.get_object()
+        if fail_stale_report_jobs(id=report_result.id):
+            report_result.refresh_from_db()
+        serializer = self.get_serializer(report_result)
+        return Response(serializer.data)
+
+
 class UserViewSet(viewsets.ReadOnlyModelViewSet):
     """List all users and their basic metadata."""
 
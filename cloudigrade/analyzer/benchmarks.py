@@ -0,0 +1,437 @@
+"""Synthetic CloudTrail logs and timed scenarios for benchmarking ingestion."""
+import collections
+import contextlib
+import datetime
+import gzip
+import io
+import json
+import random
+import types
+import uuid
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from account.models import AwsAccount
+from analyzer import tasks
+from util import aws
+from util.aws import s3, sqs, sts
+from util.benchmark import combine_results, measure
+
+BENCHMARK_USERNAME = 'benchmark-cloudtrail'
+BENCHMARK_BUCKET = 'benchmark-cloudtrail'
+BENCHMARK_QUEUE_URL = 'https://sqs.local/benchmark-cloudtrail'
+BENCHMARK_INSTANCE_TYPES = ('t2.micro', 't2.large', 'm5.xlarge', 'c5.xlarge')
+BENCHMARK_REGIONS = ('us-east-1', 'us-east-2', 'eu-west-1', 'ap-northeast-1')
+
+# Relative weights of each CloudTrail eventName in generated logs. Most EC2
+# API calls in a real trail are read-only calls that the analyzer ignores.
+DEFAULT_EVENT_MIX = collections.OrderedDict((
+    ('RunInstances', 1),
+    ('StartInstances', 3),
+    ('StopInstances', 3),
+    ('TerminateInstances', 1),
+    (tasks.CREATE_TAG, 1),
+    (tasks.DELETE_TAG, 1),
+    ('DescribeInstances', 10),
+))
+
+STAGE_DOWNLOAD = 'download'
+STAGE_PARSE_INSTANCE_EVENTS = 'parse_instance_events'
+STAGE_PARSE_AMI_TAG_EVENTS = 'parse_ami_tag_events'
+STAGE_SAVE_RESULTS = 'save_results'
+
+
+class LocalAws(object):
+    """
+    In-memory stand-in for the AWS APIs that analyze_log calls.
+
+    This implements just enough of the boto3 S3, SQS, STS, and EC2 resources
+    for util.aws to fetch and decompress log files, receive and delete queue
+    messages, assume customer roles, and describe instances, so that all of
+    the real cloudigrade code runs without any network calls.
+    """
+
+    def __init__(self):
+        """Initialize empty buckets, queues, and instances."""
+        self.objects = {}
+        self.queues = collections.defaultdict(collections.deque)
+        self.instances = {}
+        self.inspections = []
+
+    def add_log_file(self, bucket, key, log, queue_url=None):
+        """
+        Store a gzipped log file, optionally announcing it on a queue.
+
+        Args:
+            bucket (str): the S3 bucket to store the file in
+            key (str): the S3 object key to store the file as
+            log (dict): the CloudTrail log to store
+            queue_url (str): optional queue to send an S3 event message to
+
+        Returns:
+            int: the size of the gzipped file in bytes.
+
+        """
+        content = gzip.compress(json.dumps(log).encode('utf-8'))
+        self.objects[(bucket, key)] = content
+        if queue_url:
+            body = {'Records': [
+                {'s3': {'bucket': {'name': bucket}, 'object': {'key': key}}},
+            ]}
+            self.queues[queue_url].append(types.SimpleNamespace(
+                message_id=str(uuid.uuid4()),
+                body=json.dumps(body),
+                _receipt_handle=str(uuid.uuid4()),
+            ))
+        return len(content)
+
+    def add_instance(self, instance_id, image_id, instance_type, subnet_id,
+                     platform=''):
+        """Add an EC2 instance that may be described by the analyzer."""
+        self.instances[instance_id] = types.SimpleNamespace(
+            instance_id=instance_id,
+            image_id=image_id,
+            instance_type=instance_type,
+            subnet_id=subnet_id,
+            platform=platform,
+        )
+
+    def resource(self, service_name, region_name=None, **kwargs):
+        """Get a stand-in for a boto3 service resource."""
+        if service_name == 's3':
+            return types.SimpleNamespace(Object=self._get_s3_object)
+        if service_name == 'sqs':
+            return types.SimpleNamespace(Queue=self._get_sqs_queue)
+        if service_name == 'ec2':
+            return types.SimpleNamespace(Instance=self.instances.__getitem__)
+        raise NotImplementedError(service_name)
+
+    def client(self, service_name, region_name=None, **kwargs):
+        """Get a stand-in for a boto3 service client."""
+        if service_name == 'sts':
+            return types.SimpleNamespace(assume_role=self._assume_role)
+        raise NotImplementedError(service_name)
+
+    def Session(self, **kwargs):
+        """Get a stand-in for a boto3 session in a customer account."""
+        return self
+
+    def start_image_inspection(self, arn, ami_id, region):
+        """Record an image inspection instead of starting it."""
+        self.inspections.append((arn, ami_id, region))
+
+    @contextlib.contextmanager
+    def patched(self):
+        """Use these stand-ins in place of boto3 and image inspection."""
+        with patch.object(s3, 'boto3', self), \
+                patch.object(sqs, 'boto3', self), \
+                patch.object(sts, 'boto3', self), \
+                patch.object(tasks, 'start_image_inspection',
+                             self.start_image_inspection):
+            yield self
+
+    def _get_s3_object(self, bucket, key):
+        """Get a stand-in for an S3 object."""
+        content = self.objects[(bucket, key)]
+        return types.SimpleNamespace(
+            get=lambda: {'Body': io.BytesIO(content)}
+        )
+
+    def _get_sqs_queue(self, queue_url):
+        """Get a stand-in for an SQS queue."""
+        queue = self.queues[queue_url]
+
+        def receive_messages(MaxNumberOfMessages=1, **kwargs):
+            count = min(MaxNumberOfMessages, len(queue))
+            return [queue.popleft() for __ in range(count)]
+
+        def delete_messages(Entries):
+            return {'Successful': [{'Id': entry['Id']} for entry in Entries]}
+
+        return types.SimpleNamespace(receive_messages=receive_messages,
+                                     delete_messages=delete_messages)
+
+    def _assume_role(self, **kwargs):
+        """Get stand-in temporary credentials for a customer role."""
+        return {'Credentials': {
+            'AccessKeyId': 'local',
+            'SecretAccessKey': 'local',
+            'SessionToken': 'local',
+        }}
+
+
+def generate_cloudtrail_log(accounts, record_count, event_mix=None,
+                            start=None, error_ratio=0.01, rng=None):
+    """
+    Generate a CloudTrail log of EC2 API calls.
+
+    Args:
+        accounts (list[dict]): each customer account's "aws_account_id",
+            "region", "instance_ids", and "image_ids" to generate calls about,
+            as returned by prepare_benchmark_accounts
+        record_count (int): number of records to generate
+        event_mix (dict): relative weights of each eventName. Defaults to
+            DEFAULT_EVENT_MIX.
+        start (datetime.datetime): time of the first record. Defaults to now.
+        error_ratio (float): fraction of records that report an errorCode
+        rng (random.Random): optional source of randomness
+
+    Returns:
+        dict: the CloudTrail log, with its "Records".
+
+    """
+    if event_mix is None:
+        event_mix = DEFAULT_EVENT_MIX
+    if start is None:
+        start = timezone.now()
+    if rng is None:
+        rng = random.Random()
+    event_names = list(event_mix.keys())
+    weights = list(event_mix.values())
+
+    records = []
+    for index in range(record_count):
+        account = rng.choice(accounts)
+        event_name = rng.choices(event_names, weights)[0]
+        occurred_at = start + datetime.timedelta(seconds=index)
+        record = {
+            'eventVersion': '1.05',
+            'userIdentity': {
+                'type': 'AssumedRole',
+                'accountId': account['aws_account_id'],
+            },
+            'eventTime': occurred_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'eventSource': 'ec2.amazonaws.com',
+            'eventName': event_name,
+            'awsRegion': account['region'],
+            'sourceIPAddress': '10.0.0.1',
+            'requestID': str(uuid.UUID(int=rng.getrandbits(128))),
+            'eventID': str(uuid.UUID(int=rng.getrandbits(128))),
+            'eventType': 'AwsApiCall',
+            'recipientAccountId': account['aws_account_id'],
+            'requestParameters': None,
+            'responseElements': None,
+        }
+        if event_name in tasks.ec2_instance_event_map:
+            instance_ids = rng.sample(account['instance_ids'],
+                                      min(rng.randint(1, 3),
+                                          len(account['instance_ids'])))
+            record['responseElements'] = {'instancesSet': {'items': [
+                {'instanceId': instance_id} for instance_id in instance_ids
+            ]}}
+        elif event_name in tasks.ec2_ami_tag_event_list:
+            record['requestParameters'] = {
+                'resourcesSet': {'items': [
+                    {'resourceId': rng.choice(account['image_ids'])},
+                ]},
+                'tagSet': {'items': [
+                    {'key': tasks.AWS_OPENSHIFT_TAG, 'value': ''},
+                ]},
+            }
+            record['responseElements'] = {'_return': True}
+        if rng.random() < error_ratio:
+            record['errorCode'] = 'Client.UnauthorizedOperation'
+            record['responseElements'] = None
+        records.append(record)
+    return {'Records': records}
+
+
+def prepare_benchmark_accounts(local_aws, account_count=5,
+                               instances_per_account=50,
+                               images_per_account=5, windows_ratio=0.05,
+                               rng=None):
+    """
+    Create customer accounts and their stand-in EC2 instances.
+
+    Accounts are reused if they already exist, so that repeated benchmark
+    runs with the same seed do not accumulate accounts.
+
+    Args:
+        local_aws (LocalAws): stand-ins to add the accounts' instances to
+        account_count (int): number of customer accounts
+        instances_per_account (int): number of EC2 instances in each account
+        images_per_account (int): number of images each account's instances
+            may run
+        windows_ratio (float): fraction of instances running Windows
+        rng (random.Random): optional source of randomness
+
+    Returns:
+        list[dict]: each account's "aws_account_id", "region",
+            "instance_ids", and "image_ids", as for generate_cloudtrail_log.
+
+    """
+    if rng is None:
+        rng = random.Random()
+    user, __ = User.objects.get_or_create(username=BENCHMARK_USERNAME)
+    accounts = []
+    for __ in range(account_count):
+        aws_account_id = '{0:012d}'.format(rng.randrange(10 ** 12))
+        AwsAccount.objects.get_or_create(
+            aws_account_id=aws_account_id,
+            defaults={
+                'user': user,
+                'account_arn': 'arn:aws:iam::{0}:role/benchmark'.format(
+                    aws_account_id),
+            },
+        )
+        image_ids = [
+            'ami-{0:017x}'.format(rng.getrandbits(68))
+            for __ in range(images_per_account)
+        ]
+        instance_ids = []
+        for __ in range(instances_per_account):
+            instance_id = 'i-{0:017x}'.format(rng.getrandbits(68))
+            local_aws.add_instance(
+                instance_id,
+                image_id=rng.choice(image_ids),
+                instance_type=rng.choice(BENCHMARK_INSTANCE_TYPES),
+                subnet_id='subnet-{0:08x}'.format(rng.getrandbits(32)),
+                platform='windows' if rng.random() < windows_ratio else '',
+            )
+            instance_ids.append(instance_id)
+        accounts.append({
+            'aws_account_id': aws_account_id,
+            'region': rng.choice(BENCHMARK_REGIONS),
+            'instance_ids': instance_ids,
+            'image_ids': image_ids,
+        })
+    return accounts
+
+
+def run_ingestion_benchmarks(files=1, records_per_file=1000, event_mix=None,
+                             account_count=5, instances_per_account=50,
+                             images_per_account=5, windows_ratio=0.05,
+                             seed=None):
+    """
+    Time each stage of ingesting generated CloudTrail log files.
+
+    For each file, the download (including decompression), both parsing
+    stages, and saving the results are measured separately, followed by a
+    combined result for the whole file. A final result combines all files.
+    Each result counts the file's records as its items, so its throughput is
+    in records per second.
+
+    Args:
+        files (int): number of log files to ingest
+        records_per_file (int): number of records in each file
+        event_mix (dict): relative weights of each eventName. Defaults to
+            DEFAULT_EVENT_MIX.
+        account_count (int): number of customer accounts
+        instances_per_account (int): number of EC2 instances in each account
+        images_per_account (int): number of images each account's instances
+            may run
+        windows_ratio (float): fraction of instances running Windows
+        seed (int): optional seed for reproducible logs
+
+    Yields:
+        BenchmarkResult: the measurements of each stage and file.
+
+    """
+    rng = random.Random(seed)
+    local_aws = LocalAws()
+    accounts = prepare_benchmark_accounts(
+        local_aws, account_count, instances_per_account, images_per_account,
+        windows_ratio, rng)
+    file_results = []
+    with local_aws.patched():
+        for file_index in range(files):
+            key = 'AWSLogs/benchmark/{0}.json.gz'.format(file_index)
+            log = generate_cloudtrail_log(accounts, records_per_file,
+                                          event_mix, rng=rng)
+            size = local_aws.add_log_file(BENCHMARK_BUCKET, key, log)
+            parameters = {
+                'file': file_index,
+                'records': records_per_file,
+                'gzipped_bytes': size,
+            }
+            stage_results = list(_run_ingestion_stages(key, parameters,
+                                                       records_per_file))
+            yield from stage_results
+            file_result = combine_results('ingest_file', stage_results,
+                                          parameters, records_per_file)
+            yield file_result
+            file_results.append(file_result)
+
+    yield combine_results('ingest', file_results, {
+        'files': files,
+        'records_per_file': records_per_file,
+        'inspections_started': len(local_aws.inspections),
+    }, files * records_per_file)
+
+
+def run_analyze_log_benchmark(files=10, records_per_file=1000,
+                              event_mix=None, account_count=5,
+                              instances_per_account=50, images_per_account=5,
+                              windows_ratio=0.05, seed=None):
+    """
+    Time the analyze_log task as it drains a queue of new log files.
+
+    Each generated file is announced on a stand-in SQS queue, and analyze_log
+    is run until the queue is empty, just as the periodic task would be.
+
+    Args:
+        files (int): number of log files to queue
+        records_per_file (int): number of records in each file
+        event_mix (dict): relative weights of each eventName. Defaults to
+            DEFAULT_EVENT_MIX.
+        account_count (int): number of customer accounts
+        instances_per_account (int): number of EC2 instances in each account
+        images_per_account (int): number of images each account's instances
+            may run
+        windows_ratio (float): fraction of instances running Windows
+        seed (int): optional seed for reproducible logs
+
+    Returns:
+        BenchmarkResult: the measurements, counting records as items.
+
+    """
+    rng = random.Random(seed)
+    local_aws = LocalAws()
+    accounts = prepare_benchmark_accounts(
+        local_aws, account_count, instances_per_account, images_per_account,
+        windows_ratio, rng)
+    for file_index in range(files):
+        key = 'AWSLogs/benchmark/queued-{0}.json.gz'.format(file_index)
+        log = generate_cloudtrail_log(accounts, records_per_file, event_mix,
+                                      rng=rng)
+        local_aws.add_log_file(BENCHMARK_BUCKET, key, log,
+                               BENCHMARK_QUEUE_URL)
+
+    def drain_queue():
+        while local_aws.queues[BENCHMARK_QUEUE_URL]:
+            tasks.analyze_log()
+
+    with local_aws.patched(), \
+            override_settings(CLOUDTRAIL_EVENT_URL=BENCHMARK_QUEUE_URL):
+        return measure('analyze_log', drain_queue, {
+            'files': files,
+            'records_per_file': records_per_file,
+        }, items=files * records_per_file)
+
+
+def _run_ingestion_stages(key, parameters, records):
+    """Measure each stage of ingesting one log file."""
+    outputs = {}
+
+    def download():
+        outputs['log'] = aws.get_object_content_from_s3(BENCHMARK_BUCKET, key)
+
+    def parse_instance_events():
+        outputs['instances'] = tasks._parse_log_for_ec2_instance_events(
+            outputs['log'])
+
+    def parse_ami_tag_events():
+        tasks._parse_log_for_ami_tag_events(outputs['log'])
+
+    def save_results():
+        tasks._save_results(outputs['instances'])
+
+    for stage, function in ((STAGE_DOWNLOAD, download),
+                            (STAGE_PARSE_INSTANCE_EVENTS,
+                             parse_instance_events),
+                            (STAGE_PARSE_AMI_TAG_EVENTS, parse_ami_tag_events),
+                            (STAGE_SAVE_RESULTS, save_results)):
+        yield measure(stage, function, parameters, items=records)
@@ -0,0 +1,101 @@
+"""Management command to benchmark CloudTrail log ingestion."""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.translation import gettext as _
+
+from analyzer import benchmarks
+from util.benchmark import (format_result, get_items_per_second,
+                            get_run_metadata, write_results)
+
+MODE_STAGES = 'stages'
+MODE_ANALYZE_LOG = 'analyze_log'
+
+
+def _event_mix(value):
+    """Parse an event mix like "RunInstances=1,StopInstances=3"."""
+    event_mix = {}
+    for item in value.split(','):
+        event_name, __, weight = item.partition('=')
+        try:
+            event_mix[event_name.strip()] = float(weight)
+        except ValueError:
+            raise CommandError(_('Invalid event weight: {0}').format(item))
+    return event_mix
+
+
+class Command(BaseCommand):
+    """Time ingesting generated CloudTrail logs against local stand-ins."""
+
+    help = _(
+        'Generate gzipped CloudTrail logs and time ingesting them against '
+        'local S3, SQS, and EC2 stand-ins. Results are appended as JSON Lines '
+        'to --output for comparing runs over time.'
+    )
+
+    def add_arguments(self, parser):
+        """Add the command's arguments."""
+        parser.add_argument('--files', type=int, default=2)
+        parser.add_argument('--records-per-file', type=int, default=100)
+        parser.add_argument(
+            '--event-mix', type=_event_mix, default=None,
+            help=_('relative weight of each eventName, for example '
+                   '"RunInstances=1,StopInstances=3,DescribeInstances=10"'))
+        parser.add_argument('--accounts', type=int, default=5)
+        parser.add_argument('--instances-per-account', type=int, default=50)
+        parser.add_argument('--images-per-account', type=int, default=5)
+        parser.add_argument('--windows-ratio', type=float, default=0.05)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument(
+            '--mode', choices=(MODE_STAGES, MODE_ANALYZE_LOG),
+            default=MODE_STAGES,
+            help=_('time each ingestion stage of each file, or time the '
+                   'analyze_log task draining a queue of files'))
+        parser.add_argument(
+            '--target-rate', type=float, default=None,
+            help=_('records per second that ingestion must keep up with'))
+        parser.add_argument('--label', default=None,
+                            help=_('label to identify this run in results'))
+        parser.add_argument('--output', default=None,
+                            help=_('file to append JSON Lines results to'))
+
+    def handle(self, *args, **options):
+        """Run the ingestion benchmark."""
+        arguments = {
+            'files': options['files'],
+            'records_per_file': options['records_per_file'],
+            'event_mix': options['event_mix'],
+            'account_count': options['accounts'],
+            'instances_per_account': options['instances_per_account'],
+            'images_per_account': options['images_per_account'],
+            'windows_ratio': options['windows_ratio'],
+            'seed': options['seed'],
+        }
+        if options['mode'] == MODE_ANALYZE_LOG:
+            results = [benchmarks.run_analyze_log_benchmark(**arguments)]
+        else:
+            results = list(benchmarks.run_ingestion_benchmarks(**arguments))
+        for result in results:
+            self.stdout.write(format_result(result))
+
+        # The last result is always the overall one.
+        overall = results[-1]
+        target_rate = options['target_rate']
+        if target_rate is not None:
+            rate = get_items_per_second(overall) or 0
+            if rate >= target_rate:
+                self.stdout.write(_(
+                    'Ingestion keeps up: {0:.1f} >= {1:.1f} records/s'
+                ).format(rate, target_rate))
+            else:
+                self.stdout.write(_(
+                    'Ingestion falls behind: {0:.1f} < {1:.1f} records/s'
+                ).format(rate, target_rate))
+
+        if options['output']:
+            metadata = get_run_metadata(
+                options['label'],
+                mode=options['mode'],
+                target_rate=target_rate,
+                event_mix=options['event_mix'] or benchmarks.DEFAULT_EVENT_MIX,
+            )
+            with open(options['output'], 'a') as stream:
+                write_results(results, stream, metadata)
@@ -0,0 +1,146 @@
+"""Collection of tests for the analyzer.benchmarks module."""
+import collections
+import io
+import json
+import os
+import random
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from account.models import AwsAccount, AwsInstance, AwsInstanceEvent
+from analyzer import benchmarks, tasks
+from util import aws
+
+
+class LocalAwsTest(TestCase):
+    """LocalAws stand-in test case."""
+
+    def test_log_files_and_queue(self):
+        """Test logs are read through util.aws from the stand-ins."""
+        local_aws = benchmarks.LocalAws()
+        log = {'Records': [{'eventName': 'RunInstances'}]}
+        local_aws.add_log_file('bucket', 'key.json.gz', log, 'queue-url')
+
+        with local_aws.patched():
+            messages = aws.receive_message_from_queue('queue-url')
+            extracted = aws.extract_sqs_message(messages[0])
+            content = aws.get_object_content_from_s3(
+                extracted[0]['bucket']['name'], extracted[0]['object']['key'])
+            aws.delete_message_from_queue('queue-url', messages)
+
+        self.assertEqual(json.loads(content), log)
+        self.assertEqual(len(local_aws.queues['queue-url']), 0)
+
+    def test_instances(self):
+        """Test instances are described through a customer session."""
+        local_aws = benchmarks.LocalAws()
+        local_aws.add_instance('i-1', 'ami-1', 't2.micro', 'subnet-1',
+                               'windows')
+
+        with local_aws.patched():
+            session = aws.get_session(
+                'arn:aws:iam::123456789012:role/benchmark')
+            instance = aws.get_ec2_instance(session, 'i-1')
+
+        self.assertEqual(instance.image_id, 'ami-1')
+        self.assertTrue(aws.is_instance_windows(instance))
+
+
+class GenerateCloudTrailLogTest(TestCase):
+    """generate_cloudtrail_log test case."""
+
+    def test_generate_cloudtrail_log(self):
+        """Test records follow the event mix and reference the accounts."""
+        rng = random.Random(1)
+        local_aws = benchmarks.LocalAws()
+        accounts = benchmarks.prepare_benchmark_accounts(
+            local_aws, account_count=2, instances_per_account=3,
+            images_per_account=2, rng=rng)
+        event_mix = {'StartInstances': 1, tasks.CREATE_TAG: 1}
+
+        log = benchmarks.generate_cloudtrail_log(
+            accounts, 200, event_mix, error_ratio=0, rng=rng)
+
+        records = log['Records']
+        self.assertEqual(len(records), 200)
+        counts = collections.Counter(record['eventName'] for record in records)
+        self.assertEqual(set(counts), set(event_mix))
+        self.assertEqual(AwsAccount.objects.count(), 2)
+        for record in records:
+            self.assertTrue(tasks._is_valid_event(
+                record, list(event_mix.keys())))
+            account = [account for account in accounts
+                       if account['aws_account_id'] ==
+                       record['userIdentity']['accountId']][0]
+            if record['eventName'] == 'StartInstances':
+                for item in record['responseElements']['instancesSet'][
+                        'items']:
+                    self.assertIn(item['instanceId'],
+                                  account['instance_ids'])
+            else:
+                resources = record['requestParameters']['resourcesSet']
+                self.assertIn(resources['items'][0]['resourceId'],
+                              account['image_ids'])
+
+
+class RunIngestionBenchmarksTest(TestCase):
+    """run_ingestion_benchmarks test case."""
+
+    def test_run_ingestion_benchmarks(self):
+        """Test each stage of each file is measured and results are saved."""
+        results = list(benchmarks.run_ingestion_benchmarks(
+            files=2, records_per_file=50, account_count=2,
+            instances_per_account=5, seed=1))
+
+        self.assertEqual(
+            [result.scenario for result in results],
+            [benchmarks.STAGE_DOWNLOAD,
+             benchmarks.STAGE_PARSE_INSTANCE_EVENTS,
+             benchmarks.STAGE_PARSE_AMI_TAG_EVENTS,
+             benchmarks.STAGE_SAVE_RESULTS,
+             'ingest_file'] * 2 + ['ingest'],
+        )
+        overall = results[-1]
+        self.assertEqual(overall.items, 100)
+        self.assertAlmostEqual(
+            overall.seconds, sum(result.seconds for result in results[:-1]
+                                 if result.scenario != 'ingest_file'))
+        self.assertGreater(overall.query_count, 0)
+        self.assertGreater(AwsInstance.objects.count(), 0)
+        self.assertGreater(AwsInstanceEvent.objects.count(), 0)
+
+    def test_run_analyze_log_benchmark(self):
+        """Test analyze_log drains the queue of generated files."""
+        result = benchmarks.run_analyze_log_benchmark(
+            files=3, records_per_file=20, account_count=1,
+            instances_per_account=3, seed=2)
+
+        self.assertEqual(result.scenario, 'analyze_log')
+        self.assertEqual(result.items, 60)
+        self.assertGreater(AwsInstanceEvent.objects.count(), 0)
+
+
+class BenchmarkIngestionCommandTest(TestCase):
+    """benchmark_ingestion management command test case."""
+
+    def test_benchmark_ingestion(self):
+        """Test results are appended and compared to the target rate."""
+        stdout = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.jsonl')
+            call_command(
+                'benchmark_ingestion', '--files=1', '--records-per-file=20',
+                '--event-mix=StartInstances=2,StopInstances=1',
+                '--target-rate=0.001', f'--output={output}', stdout=stdout)
+            with open(output) as stream:
+                lines = [json.loads(line) for line in stream]
+
+        self.assertIn('Ingestion keeps up', stdout.getvalue())
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(lines[-1]['scenario'], 'ingest')
+        self.assertEqual(lines[-1]['items'], 20)
+        self.assertGreater(lines[-1]['items_per_second'], 0)
+        self.assertEqual(lines[-1]['event_mix'],
+                         {'StartInstances': 2, 'StopInstances': 1})
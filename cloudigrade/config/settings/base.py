@@ -38,14 +38,40 @@ HOUNDIGRADE_AWS_AUTOSCALING_GROUP_NAME = env(
     default='EC2ContainerService-inspectigrade-test-bws-us-east-1b-'
             'EcsInstanceAsg-JG9NX9WHX6NU'
 )
+# region of HOUNDIGRADE_AWS_AVAILABILITY_ZONE
+HOUNDIGRADE_AWS_REGION = env('HOUNDIGRADE_AWS_REGION',
+                             default=HOUNDIGRADE_AWS_AVAILABILITY_ZONE[:-1])
 HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE = env.int(
     'HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE',
     default=32
 )
+# Scale up as soon as this many volumes are waiting or the oldest has waited
+# this many seconds.
+HOUNDIGRADE_SCALE_UP_QUEUE_DEPTH = env.int(
+    'HOUNDIGRADE_SCALE_UP_QUEUE_DEPTH',
+    default=HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE
+)
+HOUNDIGRADE_SCALE_UP_MESSAGE_AGE = env.int(
+    'HOUNDIGRADE_SCALE_UP_MESSAGE_AGE',
+    default=15 * 60
+)
+# Volumes are sharded across up to this many houndigrade instances, each of
+# which inspects at most HOUNDIGRADE_AWS_VOLUME_BATCH_SIZE volumes.
+HOUNDIGRADE_AWS_MAX_INSTANCES = env.int(
+    'HOUNDIGRADE_AWS_MAX_INSTANCES',
+    default=1
+)
 HOUNDIGRADE_ECS_CLUSTER_NAME = env(
     'HOUNDIGRADE_ECS_CLUSTER_NAME',
     default='inspectigrade-test-bws-us-east-1b'
 )
+# Inspection clusters local to source regions, as JSON mapping each region to
+# its availability_zone, autoscaling_group_name, and ecs_cluster_name. Images
+# from other regions have their snapshots copied to the default cluster above.
+HOUNDIGRADE_AWS_REGIONAL_TARGETS = env.json(
+    'HOUNDIGRADE_AWS_REGIONAL_TARGETS',
+    default={}
+)
 HOUNDIGRADE_ECS_FAMILY_NAME = env(
     'HOUNDIGRADE_ECS_FAMILY_NAME',
     default='Houndigrade'
@@ -60,6 +86,20 @@ HOUNDIGRADE_ECS_IMAGE_TAG = env(
 )
 HOUNDIGRADE_DEBUG = env.bool('HOUNDIGRADE_DEBUG', default=False)
 HOUNDIGRADE_EXCHANGE_NAME = env('HOUNDIGRADE_EXCHANGE_NAME', default='')
+# seconds to wait for a snapshot or volume before abandoning its inspection
+AWS_PENDING_RESOURCE_TIMEOUT = env.int('AWS_PENDING_RESOURCE_TIMEOUT',
+                                       default=60 * 60)
+# seconds an image inspection may go without progress before it is restarted
+INSPECTION_CLAIM_LEASE = env.int('INSPECTION_CLAIM_LEASE',
+                                 default=6 * 60 * 60)
+# maximum concurrent snapshot copies we start per destination region
+AWS_SNAPSHOT_COPY_CONCURRENCY = env.int('AWS_SNAPSHOT_COPY_CONCURRENCY',
+                                        default=5)
+# seconds an admitted snapshot copy may go untracked before its slot is freed
+AWS_SNAPSHOT_COPY_LEASE = env.int('AWS_SNAPSHOT_COPY_LEASE', default=60 * 60)
+# S3 location of the JSON catalog of images we need not inspect
+KNOWN_IMAGES_BUCKET = env('KNOWN_IMAGES_BUCKET', default=None)
+KNOWN_IMAGES_KEY = env('KNOWN_IMAGES_KEY', default='known_images.json')
 
 # Default apps go here
 DJANGO_APPS = [
@@ -141,6 +181,43 @@ DATABASES = {
     }
 }
 
+# Caches
+# https://docs.djangoproject.com/en/2.0/topics/cache/
+
+CACHES = {
+    'default': env.cache('DJANGO_CACHE_URL', default='locmemcache://'),
+    'reports': env.cache('REPORT_CACHE_URL', default='locmemcache://reports'),
+    # Must be shared by every process (memcached or Redis, not locmem) for the
+    # web process to expose metrics recorded by the Celery workers.
+    'metrics': env.cache('TASK_METRICS_CACHE_URL',
+                         default='locmemcache://metrics'),
+}
+REPORT_CACHE_ALIAS = env('REPORT_CACHE_ALIAS', default='reports')
+REPORT_CACHE_TIMEOUT = env.int('REPORT_CACHE_TIMEOUT', default=60 * 60)
+# seconds a report job may stay pending or running before it is failed
+REPORT_JOB_LEASE = env.int('REPORT_JOB_LEASE', default=60 * 60)
+
+# Task metrics
+
+# Dotted path of the util.metrics.MetricsSink class that Celery task metrics
+# are sent to; util.metrics.NullMetricsSink turns them off. They are off by
+# default unless TASK_METRICS_CACHE_URL names a cache every process shares,
+# since the local memory cache would hide the workers' metrics from the web.
+TASK_METRICS_SINK = env(
+    'TASK_METRICS_SINK',
+    default='util.metrics.CacheMetricsSink'
+    if env('TASK_METRICS_CACHE_URL', default=None)
+    else 'util.metrics.NullMetricsSink',
+)
+TASK_METRICS_CACHE_ALIAS = env('TASK_METRICS_CACHE_ALIAS', default='metrics')
+
+# Reports
+
+# "python" calculates usage in the application; "postgresql" calculates it in
+# the database and "numpy" calculates it with vectorized NumPy operations.
+# Both fall back to "python" if the database engine or NumPy is unavailable.
+REPORT_USAGE_BACKEND = env('REPORT_USAGE_BACKEND', default='python')
+
 # Password validation
 # https://docs.djangoproject.com/en/2.0/ref/settings/#auth-password-validators
 
@@ -233,6 +310,12 @@ AWS_NAME_PREFIX = env('AWS_NAME_PREFIX',
 HOUNDIGRADE_RESULTS_QUEUE_NAME = env('HOUNDIGRADE_RESULTS_QUEUE_NAME',
                                       default=AWS_NAME_PREFIX + \
                                               'inspection_results')
+# seconds to long-poll the results queue for more results
+HOUNDIGRADE_RESULTS_WAIT_TIME = env.int('HOUNDIGRADE_RESULTS_WAIT_TIME',
+                                        default=20)
+# seconds to wait for an image's results before scaling down without them
+HOUNDIGRADE_RESULTS_TIMEOUT = env.int('HOUNDIGRADE_RESULTS_TIMEOUT',
+                                      default=2 * 60 * 60)
 
 CLOUDTRAIL_EVENT_URL = env(
     'CLOUDTRAIL_EVENT_URL',
@@ -253,6 +336,8 @@ CELERY_TASK_ROUTES = {
         {'queue': 'copy_ami_snapshot'},
     'account.tasks.copy_ami_to_customer_account':
         {'queue': 'copy_ami_to_customer_account'},
+    'account.tasks.start_snapshot_copy':
+        {'queue': 'start_snapshot_copy'},
     'account.tasks.remove_snapshot_ownership':
         {'queue': 'remove_snapshot_ownership'},
     'account.tasks.create_volume':
@@ -261,6 +346,8 @@ CELERY_TASK_ROUTES = {
         {'queue': 'enqueue_ready_volumes'},
     'account.tasks.delete_snapshot':
         {'queue': 'delete_snapshot'},
+    'account.tasks.check_ready_volumes_queue':
+        {'queue': 'check_ready_volumes_queue'},
     'account.tasks.scale_up_inspection_cluster':
         {'queue': 'scale_up_inspection_cluster'},
     'account.tasks.run_inspection_cluster':
@@ -269,19 +356,45 @@ CELERY_TASK_ROUTES = {
         {'queue': 'persist_inspection_cluster_results_task'},
     'account.tasks.scale_down_cluster':
         {'queue': 'scale_down_cluster'},
+    'account.tasks.generate_report':
+        {'queue': 'generate_report'},
+    'account.tasks.poll_pending_aws_resources':
+        {'queue': 'poll_pending_aws_resources'},
+    'account.tasks.reclaim_stale_image_inspections':
+        {'queue': 'reclaim_stale_image_inspections'},
+    'account.tasks.refresh_known_images':
+        {'queue': 'refresh_known_images'},
     'analyzer.tasks.analyze_log':
         {'queue': 'analyze_log'},
 }
 CELERY_BEAT_SCHEDULE = {
-    'scale_up_inspection_cluster_every_60_min': {
-        'task': 'account.tasks.scale_up_inspection_cluster',
+    'poll_pending_aws_resources': {
+        'task': 'account.tasks.poll_pending_aws_resources',
+        # seconds
+        'schedule': env.int('POLL_PENDING_AWS_RESOURCES_SCHEDULE', default=60),
+    },
+    'reclaim_stale_image_inspections': {
+        'task': 'account.tasks.reclaim_stale_image_inspections',
+        # seconds
+        'schedule': env.int('RECLAIM_STALE_IMAGE_INSPECTIONS_SCHEDULE',
+                            default=15 * 60),
+    },
+    'refresh_known_images': {
+        'task': 'account.tasks.refresh_known_images',
+        # seconds
+        'schedule': env.int('REFRESH_KNOWN_IMAGES_SCHEDULE',
+                            default=24 * 60 * 60),
+    },
+    'check_ready_volumes_queue': {
+        'task': 'account.tasks.check_ready_volumes_queue',
         # seconds
-        'schedule': env.int('SCALE_UP_INSPECTION_CLUSTER_SCHEDULE', default=60 * 60),
+        'schedule': env.int('CHECK_READY_VOLUMES_QUEUE_SCHEDULE', default=60),
     },
     'persist_inspection_cluster_results': {
         'task': 'account.tasks.persist_inspection_cluster_results_task',
         # seconds
-        'schedule': env.int('SCALE_UP_INSPECTION_CLUSTER_SCHEDULE', default=60 * 60),
+        'schedule': env.int('PERSIST_INSPECTION_CLUSTER_RESULTS_SCHEDULE',
+                            default=60),
     },
     'analyze_log_every_2_mins': {
         'task': 'analyzer.tasks.analyze_log',
@@ -9,3 +9,14 @@ DATABASES['default'] = env.db(default='sqlite:////db.sqlite3')
 AWS_NAME_PREFIX = env('AWS_NAME_PREFIX', default='cloudigrade-test-')
 CELERY_BROKER_TRANSPORT_OPTIONS['queue_name_prefix'] = AWS_NAME_PREFIX
 CLOUDTRAIL_NAME_PREFIX = AWS_NAME_PREFIX
+
+# Report results are cached by user_id, but user ids can be reused across
+# tests after rollback, so tests that exercise caching must opt in to it.
+CACHES['reports'] = {
+    'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+}
+
+# Tests record and collect task metrics in one process, so the local memory
+# metrics cache is enough for them.
+TASK_METRICS_SINK = env('TASK_METRICS_SINK',
+                        default='util.metrics.CacheMetricsSink')
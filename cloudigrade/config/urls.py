@@ -10,8 +10,11 @@ from account.views import (AccountViewSet,
                            InstanceEventViewSet,
                            InstanceViewSet,
                            MachineImageViewSet,
+                           ReportResultViewSet,
                            SysconfigViewSet,
-                           UserViewSet)
+                           UserViewSet,
+                           UsersDailyInstanceActivityViewSet)
+from util.views import metrics
 
 router = routers.DefaultRouter()
 router.register(r'account', AccountViewSet)
@@ -24,11 +27,15 @@ router.register(r'report/accounts', CloudAccountOverviewViewSet,
 router.register(r'user', UserViewSet)
 router.register(r'report/instances', DailyInstanceActivityViewSet,
                 base_name='report-instances')
+router.register(r'report/jobs', ReportResultViewSet)
+router.register(r'report/users', UsersDailyInstanceActivityViewSet,
+                base_name='report-users')
 
 urlpatterns = [
     url(r'^api/v1/', include(router.urls)),
     url(r'^api-auth/', include('rest_framework.urls')),
     url(r'^healthz/', include('health_check.urls')),
+    url(r'^metrics/$', metrics, name='metrics'),
     url(r'^auth/', include('dj_auth.urls')),
     url(r'^auth/', include('dj_auth.urls.authtoken')),
     path('admin/', admin.site.urls),
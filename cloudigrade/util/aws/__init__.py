@@ -6,6 +6,7 @@ from util.aws.autoscaling import (describe_auto_scaling_group,
 from util.aws.cloudtrail import configure_cloudtrail
 from util.aws.ec2 import (InstanceState,
                           add_snapshot_ownership,
+                          attach_volumes,
                           check_snapshot_state,
                           check_volume_state,
                           copy_ami,
@@ -16,12 +17,15 @@ from util.aws.ec2 import (InstanceState,
                           get_ec2_instance,
                           get_running_instances,
                           get_snapshot,
+                          get_snapshot_states,
                           get_volume,
+                          get_volume_states,
                           is_instance_windows,
                           remove_snapshot_ownership)
 from util.aws.helper import (get_region_from_availability_zone, get_regions,
                              rewrap_aws_errors, verify_account_access)
 from util.aws.s3 import get_object_content_from_s3
 from util.aws.sqs import (delete_message_from_queue, extract_sqs_message,
-                          receive_message_from_queue)
+                          get_approximate_message_count,
+                          get_oldest_message_age, receive_message_from_queue)
 from util.aws.sts import get_session, get_session_account_id
@@ -4,18 +4,20 @@ import boto3
 from util.exceptions import AwsAutoScalingGroupNotFound
 
 
-def describe_auto_scaling_group(name):
+def describe_auto_scaling_group(name, region=None):
     """
     Describe the named Auto Scaling group.
 
     Args:
         name (str): Auto Scaling group name
+        region (str): Optional region of the group; defaults to the primary
+            account's default region
 
     Returns:
         dict: Details describing the Auto Scaling group
 
     """
-    autoscaling = boto3.client('autoscaling')
+    autoscaling = boto3.client('autoscaling', region_name=region)
     groups = autoscaling.describe_auto_scaling_groups(
         AutoScalingGroupNames=[name],
         MaxRecords=1
@@ -25,12 +27,13 @@ def describe_auto_scaling_group(name):
     return groups[0]
 
 
-def is_scaled_down(name):
+def is_scaled_down(name, region=None):
     """
     Check if the Auto Scaling group is spun down with zero instances.
 
     Args:
         name: Auto Scaling group name
+        region (str): Optional region of the group
 
     Returns:
         tuple(bool, dict): the bool is True if group indicates zero size and
@@ -38,7 +41,7 @@ def is_scaled_down(name):
             that were described to make that determination.
 
     """
-    auto_scaling_group = describe_auto_scaling_group(name)
+    auto_scaling_group = describe_auto_scaling_group(name, region)
     scaled_down = auto_scaling_group['MinSize'] == 0 and \
         auto_scaling_group['MaxSize'] == 0 and \
         auto_scaling_group['DesiredCapacity'] == 0 and \
@@ -46,7 +49,7 @@ def is_scaled_down(name):
     return scaled_down, auto_scaling_group
 
 
-def set_scale(name, min_size, max_size, desired_capacity):
+def set_scale(name, min_size, max_size, desired_capacity, region=None):
     """
     Set the Auto Scaling group to have exactly `count` instances.
 
@@ -55,12 +58,13 @@ def set_scale(name, min_size, max_size, desired_capacity):
         min_size (int): group min size
         max_size (int): group max size
         desired_capacity (int): group desired capacity
+        region (str): Optional region of the group
 
     Returns:
         dict: AWS response metadata
 
     """
-    autoscaling = boto3.client('autoscaling')
+    autoscaling = boto3.client('autoscaling', region_name=region)
     response = autoscaling.update_auto_scaling_group(
         AutoScalingGroupName=name,
         MinSize=min_size,
@@ -70,29 +74,32 @@ def set_scale(name, min_size, max_size, desired_capacity):
     return response
 
 
-def scale_up(name):
+def scale_up(name, count=1, region=None):
     """
-    Set the Auto Scaling group to have exactly 1 instance.
+    Set the Auto Scaling group to have exactly `count` instances.
 
     Args:
         name: Auto Scaling group name
+        count (int): Optional number of instances; defaults to 1
+        region (str): Optional region of the group
 
     Returns:
         dict: AWS response metadata
 
     """
-    return set_scale(name, 1, 1, 1)
+    return set_scale(name, count, count, count, region)
 
 
-def scale_down(name):
+def scale_down(name, region=None):
     """
     Set the Auto Scaling group to have exactly 0 instance.
 
     Args:
         name: Auto Scaling group name
+        region (str): Optional region of the group
 
     Returns:
         dict: AWS response metadata
 
     """
-    return set_scale(name, 0, 0, 0,)
+    return set_scale(name, 0, 0, 0, region)
@@ -1,6 +1,7 @@
 """Helper utility module to wrap up common AWS EC2 operations."""
 import enum
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
 from botocore.exceptions import ClientError
@@ -16,6 +17,11 @@ from util.exceptions import (AwsImageError, AwsSnapshotCopyLimitError,
 
 logger = logging.getLogger(__name__)
 
+# Number of resource ids to include in each bulk describe call's filter.
+DESCRIBE_FILTER_BATCH_SIZE = 200
+# Maximum number of volume attachment requests to have in flight at once.
+ATTACH_VOLUMES_MAX_WORKERS = 16
+
 
 class InstanceState(enum.Enum):
     """
@@ -287,7 +293,7 @@ def remove_snapshot_ownership(snapshot):
             raise AwsSnapshotOwnedError(message)
 
 
-def copy_snapshot(snapshot_id, source_region):
+def copy_snapshot(snapshot_id, source_region, destination_region=None):
     """
     Copy a machine image snapshot to a primary AWS account.
 
@@ -296,12 +302,15 @@ def copy_snapshot(snapshot_id, source_region):
     Args:
         snapshot_id (str): The id of the snapshot to modify
         source_region (str): The region the source snapshot resides in
+        destination_region (str): Optional region to copy the snapshot into.
+            Defaults to the primary account's default region.
 
     Returns:
         str: The id of the newly copied snapshot
 
     """
-    snapshot = boto3.resource('ec2').Snapshot(snapshot_id)
+    snapshot = boto3.resource(
+        'ec2', region_name=destination_region).Snapshot(snapshot_id)
     try:
         response = snapshot.copy(SourceRegion=source_region)
     except ClientError as e:
@@ -313,19 +322,21 @@ def copy_snapshot(snapshot_id, source_region):
         return response.get('SnapshotId')
 
 
-def create_volume(snapshot_id, zone):
+def create_volume(snapshot_id, zone, region=None):
     """
     Create a volume on the primary AWS account for the given snapshot.
 
     Args:
         snapshot_id (str): The id of the snapshot to use for the volume
         zone (str): The availability zone in which to create the volume
+        region (str): Optional region of the snapshot and zone. Defaults to
+            the primary account's default region.
 
     Returns:
         str: The id of the newly created volume
 
     """
-    ec2 = boto3.resource('ec2')
+    ec2 = boto3.resource('ec2', region_name=region)
     snapshot = ec2.Snapshot(snapshot_id)
     check_snapshot_state(snapshot)
     volume = ec2.create_volume(SnapshotId=snapshot_id, AvailabilityZone=zone)
@@ -373,6 +384,118 @@ def check_volume_state(volume):
     return
 
 
+def attach_volumes(instance_id, device_volumes, region=None):
+    """
+    Attach volumes to an instance and delete them when it terminates.
+
+    The attachment requests are issued concurrently, all attachments are
+    waited on together, and then DeleteOnTermination is set for every device
+    with a single modify_instance_attribute call.
+
+    Args:
+        instance_id (str): The id of the instance to attach volumes to
+        device_volumes (list(tuple)): (device name, volume id) pairs to attach
+        region (str): Optional region of the instance and volumes. Defaults
+            to the primary account's default region.
+
+    Returns:
+        None
+
+    """
+    if not device_volumes:
+        return
+    ec2 = boto3.client('ec2', region_name=region)
+    max_workers = min(len(device_volumes), ATTACH_VOLUMES_MAX_WORKERS)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        attachments = [
+            executor.submit(ec2.attach_volume, Device=device,
+                            InstanceId=instance_id, VolumeId=volume_id)
+            for device, volume_id in device_volumes
+        ]
+        for attachment in attachments:
+            attachment.result()
+
+    volume_ids = [volume_id for __, volume_id in device_volumes]
+    logger.info(_('Waiting for {0} volume(s) to attach to instance {1}')
+                .format(len(volume_ids), instance_id))
+    ec2.get_waiter('volume_in_use').wait(VolumeIds=volume_ids)
+
+    ec2.modify_instance_attribute(
+        InstanceId=instance_id,
+        BlockDeviceMappings=[
+            {
+                'DeviceName': device,
+                'Ebs': {
+                    'DeleteOnTermination': True
+                }
+            }
+            for device, __ in device_volumes
+        ],
+    )
+
+
+def get_snapshot_states(snapshot_ids, region=None):
+    """
+    Get the states of many snapshots in the primary account at once.
+
+    Snapshots are described in batches using a filter rather than by id so
+    that a snapshot that does not exist (or is not yet visible) does not fail
+    the whole request.
+
+    Args:
+        snapshot_ids (list[str]): The ids of the snapshots to check
+        region (str): The AWS region the snapshots exist in. If not specified,
+            the primary account's default region is used.
+
+    Returns:
+        dict: Snapshot states keyed by snapshot id. Snapshots that were not
+            found are omitted.
+
+    """
+    ec2 = boto3.client('ec2', region_name=region)
+    return _get_resource_states(
+        ec2.get_paginator('describe_snapshots'), 'snapshot-id', snapshot_ids,
+        'Snapshots', 'SnapshotId'
+    )
+
+
+def get_volume_states(volume_ids, region=None):
+    """
+    Get the states of many volumes in the primary account at once.
+
+    Args:
+        volume_ids (list[str]): The ids of the volumes to check
+        region (str): The AWS region the volumes exist in. If not specified,
+            the primary account's default region is used.
+
+    Returns:
+        dict: Volume states keyed by volume id. Volumes that were not found are
+            omitted.
+
+    """
+    ec2 = boto3.client('ec2', region_name=region)
+    return _get_resource_states(
+        ec2.get_paginator('describe_volumes'), 'volume-id', volume_ids,
+        'Volumes', 'VolumeId'
+    )
+
+
+def _get_resource_states(paginator, filter_name, resource_ids, results_key,
+                         id_key):
+    """Describe resources in batches and get their states keyed by id."""
+    resource_ids = list(resource_ids)
+    states = {}
+    for start in range(0, len(resource_ids), DESCRIBE_FILTER_BATCH_SIZE):
+        filters = [{
+            'Name': filter_name,
+            'Values': resource_ids[start:start + DESCRIBE_FILTER_BATCH_SIZE],
+        }]
+        for page in paginator.paginate(Filters=filters):
+            for resource in page.get(results_key, []):
+                states[resource[id_key]] = resource['State']
+    return states
+
+
 def is_instance_windows(instance_data):
     """
     Check to see if the instance has the windows platform set.
@@ -1,4 +1,5 @@
 """Helper utility module to wrap up common AWS SQS operations."""
+import datetime
 import json
 import logging
 
@@ -68,6 +69,59 @@ def delete_message_from_queue(queue_url, messages):
     return response
 
 
+def get_approximate_message_count(queue_url):
+    """
+    Get the approximate number of visible messages in an SQS queue.
+
+    Args:
+        queue_url (str): The AWS assigned URL for the queue.
+
+    Returns:
+        int: Approximate number of messages available for retrieval.
+
+    """
+    region = settings.SQS_DEFAULT_REGION
+    sqs = boto3.client('sqs', region_name=region)
+    attributes = sqs.get_queue_attributes(
+        QueueUrl=queue_url,
+        AttributeNames=['ApproximateNumberOfMessages'],
+    )['Attributes']
+    return int(attributes.get('ApproximateNumberOfMessages', 0))
+
+
+def get_oldest_message_age(queue_name, period=300):
+    """
+    Get the approximate age of the oldest message in an SQS queue.
+
+    SQS does not expose this as a queue attribute, so we read the queue's
+    ApproximateAgeOfOldestMessage metric from CloudWatch.
+
+    Args:
+        queue_name (str): The name of the queue.
+        period (int): Optional seconds of recent metric data to consider.
+
+    Returns:
+        int: Age in seconds of the oldest message, or 0 if unknown.
+
+    """
+    region = settings.SQS_DEFAULT_REGION
+    cloudwatch = boto3.client('cloudwatch', region_name=region)
+    end_time = datetime.datetime.utcnow()
+    datapoints = cloudwatch.get_metric_statistics(
+        Namespace='AWS/SQS',
+        MetricName='ApproximateAgeOfOldestMessage',
+        Dimensions=[{'Name': 'QueueName', 'Value': queue_name}],
+        StartTime=end_time - datetime.timedelta(seconds=period),
+        EndTime=end_time,
+        Period=60,
+        Statistics=['Maximum'],
+    )['Datapoints']
+    if not datapoints:
+        return 0
+    latest = max(datapoints, key=lambda datapoint: datapoint['Timestamp'])
+    return int(latest['Maximum'])
+
+
 def extract_sqs_message(message, service='s3'):
     """
     Parse SQS message for service-specific content.
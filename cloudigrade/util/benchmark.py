@@ -0,0 +1,184 @@
+"""Utilities for timing and comparing benchmark scenarios."""
+import collections
+import json
+import platform
+import time
+import tracemalloc
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+BenchmarkResult = collections.namedtuple('BenchmarkResult', [
+    'scenario',
+    'parameters',
+    'seconds',
+    'query_count',
+    'peak_memory_bytes',
+    'items',
+])
+BenchmarkResult.__new__.__defaults__ = (None,)
+
+
+def measure(scenario, function, parameters=None, items=None,
+            using=DEFAULT_DB_ALIAS):
+    """
+    Run a function once and measure its time, queries, and peak memory.
+
+    Peak memory is the most memory allocated by Python at once while the
+    function ran, as traced by tracemalloc. Tracing slows the function down
+    somewhat, so compare the timings only with other runs of this function.
+
+    Args:
+        scenario (str): name of the scenario being measured
+        function (callable): function to call with no arguments
+        parameters (dict): optional scenario parameters to record
+        items (int): optional number of items the function processes, for
+            calculating its throughput
+        using (str): alias of the database whose queries should be counted
+
+    Returns:
+        BenchmarkResult: the measurements.
+
+    """
+    query_count = 0
+
+    def count_query(execute, sql, params, many, context):
+        nonlocal query_count
+        query_count += 1
+        return execute(sql, params, many, context)
+
+    tracemalloc.start()
+    try:
+        with connections[using].execute_wrapper(count_query):
+            started = time.perf_counter()
+            function()
+            seconds = time.perf_counter() - started
+        __, peak_memory_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return BenchmarkResult(
+        scenario=scenario,
+        parameters=parameters or {},
+        seconds=seconds,
+        query_count=query_count,
+        peak_memory_bytes=peak_memory_bytes,
+        items=items,
+    )
+
+
+def get_items_per_second(result):
+    """
+    Get the throughput of a benchmark result.
+
+    Args:
+        result (BenchmarkResult): the result
+
+    Returns:
+        float: items processed per second, or None if the result has no
+            item count or took no measurable time.
+
+    """
+    if result.items is None or not result.seconds:
+        return None
+    return result.items / result.seconds
+
+
+def combine_results(scenario, results, parameters=None, items=None):
+    """
+    Combine the results of consecutive stages into one overall result.
+
+    Times and query counts are summed, and the peak memory is the largest
+    peak of any stage.
+
+    Args:
+        scenario (str): name of the combined scenario
+        results (list[BenchmarkResult]): the stage results to combine
+        parameters (dict): optional parameters of the combined scenario
+        items (int): optional number of items processed by all the stages
+
+    Returns:
+        BenchmarkResult: the combined result.
+
+    """
+    return BenchmarkResult(
+        scenario=scenario,
+        parameters=parameters or {},
+        seconds=sum(result.seconds for result in results),
+        query_count=sum(result.query_count for result in results),
+        peak_memory_bytes=max(
+            (result.peak_memory_bytes for result in results), default=0),
+        items=items,
+    )
+
+
+def get_run_metadata(label=None, using=DEFAULT_DB_ALIAS, **extra):
+    """
+    Describe the environment of a benchmark run.
+
+    Args:
+        label (str): optional label to tell this run apart from others
+        using (str): alias of the database being benchmarked
+        **extra: any other details to record, such as dataset sizes
+
+    Returns:
+        dict: the run's metadata.
+
+    """
+    metadata = {
+        'run_at': timezone.now().isoformat(),
+        'label': label,
+        'database': connections[using].vendor,
+        'python': platform.python_version(),
+    }
+    metadata.update(extra)
+    return metadata
+
+
+def write_results(results, stream, metadata=None):
+    """
+    Write benchmark results as JSON Lines.
+
+    Each result is written as one JSON object on its own line, including the
+    run's metadata, so results from many runs can be appended to the same file
+    and compared over time.
+
+    Args:
+        results (iterable[BenchmarkResult]): the results to write
+        stream (file): text stream to write the results to
+        metadata (dict): optional run metadata to include with each result
+
+    """
+    for result in results:
+        line = dict(metadata or {})
+        line.update(result._asdict())
+        line['items_per_second'] = get_items_per_second(result)
+        stream.write(json.dumps(line, sort_keys=True) + '\n')
+
+
+def format_result(result):
+    """
+    Format a benchmark result as one human-readable line.
+
+    Args:
+        result (BenchmarkResult): the result to format
+
+    Returns:
+        str: the formatted result.
+
+    """
+    parameters = ' '.join(
+        '{0}={1}'.format(key, value)
+        for key, value in sorted(result.parameters.items())
+    )
+    formatted = '{0} [{1}]: {2:.3f}s, {3} queries, {4:.1f} MiB peak'.format(
+        result.scenario,
+        parameters,
+        result.seconds,
+        result.query_count,
+        result.peak_memory_bytes / (1024 * 1024),
+    )
+    items_per_second = get_items_per_second(result)
+    if items_per_second is not None:
+        formatted += ', {0:.1f} items/s'.format(items_per_second)
+    return formatted
@@ -1,9 +1,21 @@
 """Utility module to aid Celery functionality."""
-from celery import shared_task
+import logging
+import time
+
+from celery import shared_task, states
+from celery.signals import before_task_publish, task_postrun, task_prerun
 from celery.utils.time import get_exponential_backoff_interval
+from dateutil import parser as date_parser
+from django.utils.translation import gettext as _
 
+from util import metrics
 from util.exceptions import NotReadyException
 
+logger = logging.getLogger(__name__)
+
+# Message header with the time (in seconds since the epoch) a task was sent.
+SENT_AT_HEADER = 'cloudigrade_sent_at'
+
 
 def retriable_shared_task(original_function=None,
                           retry_max_elapsed_backoff=None,
@@ -12,6 +24,7 @@ def retriable_shared_task(original_function=None,
                           retry_backoff=True,
                           retry_jitter=True,
                           retry_backoff_max=120,
+                          track_metrics=True,
                           **kwargs):
     """
     Decorate function to be a shared task with our standard retry settings.
@@ -37,6 +50,9 @@ def retriable_shared_task(original_function=None,
         retry_max_elapsed_backoff (int): Max elapsed time in seconds to allow
             across all retries. If specified, max_retries input is ignored and
             recalculated to accommodate this value.
+        track_metrics (bool): Whether to record the task's duration, queue
+            wait time, and successes, failures, and retries by exception type
+            in the TASK_METRICS_SINK.
 
     Returns:
         function: The decorated function as a shared task.
@@ -54,6 +70,7 @@ def retriable_shared_task(original_function=None,
             retry_backoff=retry_backoff,
             retry_jitter=retry_jitter,
             retry_backoff_max=retry_backoff_max,
+            track_metrics=track_metrics,
             **kwargs
         )
 
@@ -85,3 +102,78 @@ def calculate_max_retries(retry_max_elapsed_backoff, retry_backoff_max):
         if (elapsed_time < retry_max_elapsed_backoff):
             max_retries += 1
     return max_retries
+
+
+@before_task_publish.connect
+def _add_sent_at_header(headers=None, **kwargs):
+    """Record when each task message is sent, for its queue wait time."""
+    if headers is not None:
+        headers[SENT_AT_HEADER] = time.time()
+
+
+@task_prerun.connect
+def _record_task_started(task=None, **kwargs):
+    """Record how long a task waited and start timing it."""
+    if not getattr(task, 'track_metrics', False):
+        return
+    task.request.metrics_started_at = time.monotonic()
+    queue_wait = get_queue_wait(task.request)
+    if queue_wait is not None:
+        _record_metric(task, 'observe', metrics.TASK_QUEUE_WAIT,
+                       {'task': task.name}, queue_wait)
+
+
+@task_postrun.connect
+def _record_task_finished(task=None, retval=None, state=None, **kwargs):
+    """Record how long a task ran and whether it succeeded."""
+    if not getattr(task, 'track_metrics', False):
+        return
+    started_at = getattr(task.request, 'metrics_started_at', None)
+    if started_at is not None:
+        _record_metric(task, 'observe', metrics.TASK_DURATION,
+                       {'task': task.name}, time.monotonic() - started_at)
+    if state == states.SUCCESS:
+        _record_metric(task, 'increment', metrics.TASK_SUCCESSES,
+                       {'task': task.name})
+    elif state == states.RETRY:
+        # The Retry's exc is what the task raised to be retried.
+        exception = getattr(retval, 'exc', None) or retval
+        _record_metric(task, 'increment', metrics.TASK_RETRIES,
+                       {'task': task.name,
+                        'exception': type(exception).__name__})
+    elif state == states.FAILURE:
+        _record_metric(task, 'increment', metrics.TASK_FAILURES,
+                       {'task': task.name,
+                        'exception': type(retval).__name__})
+
+
+def get_queue_wait(request):
+    """
+    Get how long a task waited in its queue after it was due to run.
+
+    A task is due when it is sent or, if it was sent with a countdown or ETA
+    (as retries are), once that time has passed.
+
+    Args:
+        request (celery.app.task.Context): the task's request
+
+    Returns:
+        float: seconds the task waited, or None if its message did not record
+            when it was sent.
+
+    """
+    due_at = getattr(request, SENT_AT_HEADER, None)
+    if due_at is None:
+        return None
+    if request.eta:
+        due_at = max(due_at, date_parser.parse(request.eta).timestamp())
+    return max(0, time.time() - due_at)
+
+
+def _record_metric(task, method, metric, labels, *args):
+    """Record a task metric, without letting the sink break the task."""
+    try:
+        getattr(metrics.get_metrics_sink(), method)(metric, labels, *args)
+    except Exception as e:
+        logger.warning(_('Could not record {0} for {1}: {2}').format(
+            metric.name, task.name, repr(e)))
@@ -79,6 +79,10 @@ class AwsTooManyECSInstances(NotReadyException):
     """Raise when there are too many AWS ECS Container Instances."""
 
 
+class SqsSendError(NotReadyException):
+    """Raise when messages could not be sent to an SQS queue."""
+
+
 def api_exception_handler(exc, context):
     """
     Log exception and return an appropriately formatted response.
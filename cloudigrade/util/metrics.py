@@ -0,0 +1,315 @@
+"""Metrics about Celery tasks, collected across processes for Prometheus."""
+import collections
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+COUNTER = 'counter'
+HISTOGRAM = 'histogram'
+
+Metric = collections.namedtuple('Metric', [
+    'name',
+    'type',
+    'help',
+    'buckets',
+])
+Metric.__new__.__defaults__ = (None,)
+
+# One series of a metric's values for one set of labels. A counter's value is
+# a number, and a histogram's value is a HistogramValue.
+MetricSeries = collections.namedtuple('MetricSeries', [
+    'metric',
+    'labels',
+    'value',
+])
+
+# bucket_counts are the observations in each bucket (not cumulative), with
+# one more count at the end for observations above the largest bucket.
+HistogramValue = collections.namedtuple('HistogramValue', [
+    'bucket_counts',
+    'count',
+    'sum',
+])
+
+TASK_DURATION = Metric(
+    'cloudigrade_task_duration_seconds', HISTOGRAM,
+    'Time spent running a Celery task.',
+    (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+TASK_QUEUE_WAIT = Metric(
+    'cloudigrade_task_queue_wait_seconds', HISTOGRAM,
+    'Time a Celery task waited in its queue after it was due to run.',
+    (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600),
+)
+TASK_SUCCESSES = Metric(
+    'cloudigrade_task_successes_total', COUNTER,
+    'Celery task runs that succeeded.',
+)
+TASK_FAILURES = Metric(
+    'cloudigrade_task_failures_total', COUNTER,
+    'Celery task runs that failed, by exception type.',
+)
+TASK_RETRIES = Metric(
+    'cloudigrade_task_retries_total', COUNTER,
+    'Celery task runs that will be retried, by exception type.',
+)
+TASK_METRICS = (
+    TASK_DURATION,
+    TASK_QUEUE_WAIT,
+    TASK_SUCCESSES,
+    TASK_FAILURES,
+    TASK_RETRIES,
+)
+
+# Histogram sums are stored as integers so they can be incremented atomically.
+SUM_SCALE = 10 ** 6
+
+_sinks = {}
+
+
+class MetricsSink(object):
+    """
+    Base class for somewhere to send metrics.
+
+    Set TASK_METRICS_SINK to the dotted path of a subclass to change where
+    metrics go. Sinks that cannot report the metrics they have collected (for
+    example, because they push them elsewhere) may leave collect as it is.
+    """
+
+    def increment(self, metric, labels, amount=1):
+        """
+        Increment a counter.
+
+        Args:
+            metric (Metric): the counter
+            labels (dict): the labels of the series to increment
+            amount (int): how much to increment by
+        """
+        raise NotImplementedError
+
+    def observe(self, metric, labels, value):
+        """
+        Record an observation in a histogram.
+
+        Args:
+            metric (Metric): the histogram
+            labels (dict): the labels of the series to observe
+            value (float): the observed value
+        """
+        raise NotImplementedError
+
+    def collect(self, metrics):
+        """
+        Get the current values of every series of some metrics.
+
+        Args:
+            metrics (iterable[Metric]): the metrics to collect
+
+        Returns:
+            list[MetricSeries]: the series of those metrics.
+
+        """
+        return []
+
+
+class NullMetricsSink(MetricsSink):
+    """Metrics sink that ignores all metrics."""
+
+    def increment(self, metric, labels, amount=1):
+        """Ignore a counter increment."""
+
+    def observe(self, metric, labels, value):
+        """Ignore a histogram observation."""
+
+
+class CacheMetricsSink(MetricsSink):
+    """
+    Metrics sink that keeps metrics in a Django cache.
+
+    Every value is incremented atomically with cache.incr, so any number of
+    worker processes can share one series as long as they share the cache.
+    The cache at TASK_METRICS_CACHE_ALIAS must be a shared backend such as
+    memcached or Redis for the web process to expose the workers' metrics;
+    the local memory cache only sees metrics from its own process.
+
+    The cache cannot list its own keys, so the series that exist are also
+    kept in a registry. Each process only reads the registry for a series it
+    records every registry_check_seconds, and only writes it if the series is
+    missing. A series that two processes add at the same moment, or that is
+    lost when the cache evicts the registry, may briefly be missing from the
+    registry, but it is added again at the next check.
+    """
+
+    key_prefix = 'task_metrics'
+    registry_check_seconds = 5 * 60
+
+    def __init__(self, alias=None):
+        """Initialize the sink with its cache."""
+        self.cache = caches[alias or settings.TASK_METRICS_CACHE_ALIAS]
+        # When this process last found each series in the registry.
+        self._registry_checked_at = {}
+
+    def increment(self, metric, labels, amount=1):
+        """Increment a counter in the cache."""
+        series_key = self._register(metric, labels)
+        self._incr(series_key, amount)
+
+    def observe(self, metric, labels, value):
+        """Record an observation in a histogram in the cache."""
+        series_key = self._register(metric, labels)
+        self._incr('{0}:bucket:{1}'.format(
+            series_key, _get_bucket_index(metric.buckets, value)))
+        self._incr('{0}:count'.format(series_key))
+        self._incr('{0}:sum'.format(series_key),
+                   int(round(value * SUM_SCALE)))
+
+    def collect(self, metrics):
+        """Get the series of some metrics from the cache."""
+        metrics = {metric.name: metric for metric in metrics}
+        series = []
+        for name, labels in self._get_registry():
+            if name not in metrics:
+                continue
+            series.append(self._get_series(metrics[name], labels))
+        return series
+
+    def _get_series(self, metric, labels):
+        """Get one series' value from the cache."""
+        series_key = self._get_series_key(metric, labels)
+        if metric.type == COUNTER:
+            value = self.cache.get(series_key, 0)
+        else:
+            bucket_keys = [
+                '{0}:bucket:{1}'.format(series_key, index)
+                for index in range(len(metric.buckets) + 1)
+            ]
+            count_key = '{0}:count'.format(series_key)
+            sum_key = '{0}:sum'.format(series_key)
+            values = self.cache.get_many(bucket_keys + [count_key, sum_key])
+            value = HistogramValue(
+                bucket_counts=[values.get(key, 0) for key in bucket_keys],
+                count=values.get(count_key, 0),
+                sum=values.get(sum_key, 0) / SUM_SCALE,
+            )
+        return MetricSeries(metric, labels, value)
+
+    def _get_series_key(self, metric, labels):
+        """Get the cache key of a series, which is safe for any backend."""
+        digest = hashlib.md5(
+            _encode_series(metric.name, labels).encode('utf-8')).hexdigest()
+        return '{0}:{1}'.format(self.key_prefix, digest)
+
+    def _get_registry(self):
+        """Get the (name, labels) of every series in the cache."""
+        registry = self.cache.get('{0}:registry'.format(self.key_prefix), [])
+        return [
+            (name, dict(labels)) for name, labels in
+            (json.loads(series) for series in registry)
+        ]
+
+    def _register(self, metric, labels):
+        """Add a series to the registry if needed and get its cache key."""
+        series = _encode_series(metric.name, labels)
+        now = time.monotonic()
+        checked_at = self._registry_checked_at.get(series)
+        if checked_at is None or \
+                now - checked_at >= self.registry_check_seconds:
+            registry_key = '{0}:registry'.format(self.key_prefix)
+            registry = self.cache.get(registry_key, [])
+            if series not in registry:
+                self.cache.set(registry_key, registry + [series], None)
+            self._registry_checked_at[series] = now
+        return self._get_series_key(metric, labels)
+
+    def _incr(self, key, amount=1):
+        """Atomically increment a value in the cache, creating it if needed."""
+        try:
+            self.cache.incr(key, amount)
+        except ValueError:
+            # add does nothing if another process created the key first.
+            self.cache.add(key, 0, None)
+            self.cache.incr(key, amount)
+
+
+def _encode_series(name, labels):
+    """Encode a series' name and labels as a string."""
+    return json.dumps([name, sorted(labels.items())])
+
+
+def _get_bucket_index(buckets, value):
+    """Get the index of the smallest histogram bucket holding a value."""
+    for index, upper_bound in enumerate(buckets):
+        if value <= upper_bound:
+            return index
+    return len(buckets)
+
+
+def get_metrics_sink():
+    """
+    Get the metrics sink configured by TASK_METRICS_SINK.
+
+    Returns:
+        MetricsSink: the sink, shared by everything in this process.
+
+    """
+    path = settings.TASK_METRICS_SINK
+    if path not in _sinks:
+        _sinks[path] = import_string(path)()
+    return _sinks[path]
+
+
+def render_prometheus(series):
+    """
+    Format metrics in the Prometheus text exposition format.
+
+    Args:
+        series (iterable[MetricSeries]): the series to format
+
+    Returns:
+        str: the formatted metrics.
+
+    """
+    by_metric = collections.OrderedDict()
+    for item in series:
+        by_metric.setdefault(item.metric, []).append(item)
+
+    lines = []
+    for metric, items in by_metric.items():
+        lines.append('# HELP {0} {1}'.format(metric.name, metric.help))
+        lines.append('# TYPE {0} {1}'.format(metric.name, metric.type))
+        for item in sorted(items, key=lambda item: sorted(
+                item.labels.items())):
+            if metric.type == COUNTER:
+                lines.append('{0}{1} {2}'.format(
+                    metric.name, _format_labels(item.labels), item.value))
+                continue
+            cumulative_count = 0
+            upper_bounds = [str(bucket) for bucket in metric.buckets]
+            for upper_bound, count in zip(upper_bounds + ['+Inf'],
+                                          item.value.bucket_counts):
+                cumulative_count += count
+                lines.append('{0}_bucket{1} {2}'.format(
+                    metric.name,
+                    _format_labels(item.labels, le=upper_bound),
+                    cumulative_count))
+            lines.append('{0}_sum{1} {2}'.format(
+                metric.name, _format_labels(item.labels), item.value.sum))
+            lines.append('{0}_count{1} {2}'.format(
+                metric.name, _format_labels(item.labels), item.value.count))
+    return ''.join('{0}\n'.format(line) for line in lines)
+
+
+def _format_labels(labels, **extra):
+    """Format a series' labels for the Prometheus text exposition format."""
+    items = sorted(labels.items()) + list(extra.items())
+    if not items:
+        return ''
+    return '{{{0}}}'.format(','.join(
+        '{0}="{1}"'.format(name, str(value).replace('\\', '\\\\')
+                           .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in items
+    ))
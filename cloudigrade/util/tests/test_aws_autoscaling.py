@@ -24,7 +24,8 @@ class UtilAwsAutoScalingTest(TestCase):
         name = str(uuid.uuid4())
         described_group = autoscaling.describe_auto_scaling_group(name)
         self.assertEqual(described_group, mock_group)
-        mock_boto3.client.assert_called_once_with('autoscaling')
+        mock_boto3.client.assert_called_once_with(
+            'autoscaling', region_name=None)
 
     @patch('util.aws.autoscaling.boto3')
     def test_describe_auto_scaling_group_not_found(self, mock_boto3):
@@ -38,7 +39,8 @@ class UtilAwsAutoScalingTest(TestCase):
         name = str(uuid.uuid4())
         with self.assertRaises(AwsAutoScalingGroupNotFound):
             autoscaling.describe_auto_scaling_group(name)
-        mock_boto3.client.assert_called_once_with('autoscaling')
+        mock_boto3.client.assert_called_once_with(
+            'autoscaling', region_name=None)
 
     @patch('util.aws.autoscaling.describe_auto_scaling_group')
     def test_is_scaled_down(self, mock_describe):
@@ -108,7 +110,8 @@ class UtilAwsAutoScalingTest(TestCase):
         )
 
         self.assertEqual(actual_response, expected_response)
-        mock_boto3.client.assert_called_once_with('autoscaling')
+        mock_boto3.client.assert_called_once_with(
+            'autoscaling', region_name=None)
         client.update_auto_scaling_group.assert_called_once_with(
             AutoScalingGroupName=name,
             MinSize=min_size,
@@ -122,12 +125,20 @@ class UtilAwsAutoScalingTest(TestCase):
         name = str(uuid.uuid4())
         actual_response = autoscaling.scale_up(name)
         self.assertEqual(actual_response, mock_set_scale.return_value)
-        mock_set_scale.assert_called_once_with(name, 1, 1, 1)
+        mock_set_scale.assert_called_once_with(name, 1, 1, 1, None)
+
+    @patch('util.aws.autoscaling.set_scale')
+    def test_scale_up_count(self, mock_set_scale):
+        """Assert scale_up sets the scale to exactly the given count."""
+        name = str(uuid.uuid4())
+        actual_response = autoscaling.scale_up(name, 3)
+        self.assertEqual(actual_response, mock_set_scale.return_value)
+        mock_set_scale.assert_called_once_with(name, 3, 3, 3, None)
 
     @patch('util.aws.autoscaling.set_scale')
     def test_scale_down(self, mock_set_scale):
         """Assert scale_down sets the scale to exactly 0."""
         name = str(uuid.uuid4())
-        actual_response = autoscaling.scale_down(name)
+        actual_response = autoscaling.scale_down(name, 'us-west-2')
         self.assertEqual(actual_response, mock_set_scale.return_value)
-        mock_set_scale.assert_called_once_with(name, 0, 0, 0)
+        mock_set_scale.assert_called_once_with(name, 0, 0, 0, 'us-west-2')
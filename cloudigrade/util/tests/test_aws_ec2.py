@@ -314,9 +314,13 @@ class UtilAwsEc2Test(TestCase):
 
         actual_copied_snapshot_id = ec2.copy_snapshot(
             mock_snapshot.snapshot_id,
+            mock_region,
             mock_region
         )
         self.assertEqual(actual_copied_snapshot_id, mock_copied_snapshot_id)
+        mock_boto3.resource.assert_called_once_with(
+            'ec2', region_name=mock_region)
+        mock_snapshot.copy.assert_called_once_with(SourceRegion=mock_region)
 
     @patch('util.aws.ec2.boto3')
     def test_copy_snapshot_limit_reached(self, mock_boto3):
@@ -371,7 +375,8 @@ class UtilAwsEc2Test(TestCase):
     @patch('util.aws.ec2.boto3')
     def test_create_volume_snapshot_ready(self, mock_boto3):
         """Test that volume creation starts when snapshot is ready."""
-        zone = helper.generate_dummy_availability_zone()
+        region = random.choice(helper.SOME_AWS_REGIONS)
+        zone = helper.generate_dummy_availability_zone(region)
         mock_snapshot = helper.generate_mock_snapshot()
         mock_volume = helper.generate_mock_volume()
 
@@ -379,13 +384,13 @@ class UtilAwsEc2Test(TestCase):
         mock_ec2.Snapshot.return_value = mock_snapshot
         mock_ec2.create_volume.return_value = mock_volume
 
-        volume_id = ec2.create_volume(mock_snapshot.snapshot_id, zone)
+        volume_id = ec2.create_volume(mock_snapshot.snapshot_id, zone, region)
 
         mock_ec2.create_volume.assert_called_with(
             SnapshotId=mock_snapshot.snapshot_id,
             AvailabilityZone=zone)
 
-        mock_boto3.resource.assert_called_once_with('ec2')
+        mock_boto3.resource.assert_called_once_with('ec2', region_name=region)
         self.assertEqual(volume_id, mock_volume.id)
 
     @patch('util.aws.ec2.boto3')
@@ -400,7 +405,7 @@ class UtilAwsEc2Test(TestCase):
         with self.assertRaises(SnapshotNotReadyException):
             ec2.create_volume(mock_snapshot.snapshot_id, zone)
 
-        mock_boto3.resource.assert_called_once_with('ec2')
+        mock_boto3.resource.assert_called_once_with('ec2', region_name=None)
         mock_ec2.create_volume.assert_not_called()
 
     @patch('util.aws.ec2.boto3')
@@ -415,7 +420,7 @@ class UtilAwsEc2Test(TestCase):
         with self.assertRaises(AwsSnapshotError):
             ec2.create_volume(mock_snapshot.snapshot_id, zone)
 
-        mock_boto3.resource.assert_called_once_with('ec2')
+        mock_boto3.resource.assert_called_once_with('ec2', region_name=None)
         mock_ec2.create_volume.assert_not_called()
 
     @patch('util.aws.ec2.boto3')
@@ -435,6 +440,107 @@ class UtilAwsEc2Test(TestCase):
 
         self.assertEqual(actual_volume, mock_volume)
 
+    @patch('util.aws.ec2.boto3')
+    def test_attach_volumes(self, mock_boto3):
+        """Test volumes are attached and set to delete on termination."""
+        instance_id = helper.generate_dummy_instance_id()
+        device_volumes = [
+            ('/dev/xvdba', helper.generate_dummy_volume_id()),
+            ('/dev/xvdbb', helper.generate_dummy_volume_id()),
+        ]
+        region = random.choice(helper.SOME_AWS_REGIONS)
+        mock_client = mock_boto3.client.return_value
+
+        ec2.attach_volumes(instance_id, device_volumes, region)
+
+        mock_boto3.client.assert_called_once_with('ec2', region_name=region)
+        self.assertEqual(mock_client.attach_volume.call_count, 2)
+        for device, volume_id in device_volumes:
+            mock_client.attach_volume.assert_any_call(
+                Device=device, InstanceId=instance_id, VolumeId=volume_id)
+        mock_client.get_waiter.assert_called_once_with('volume_in_use')
+        mock_client.get_waiter.return_value.wait.assert_called_once_with(
+            VolumeIds=[volume_id for __, volume_id in device_volumes])
+        mock_client.modify_instance_attribute.assert_called_once_with(
+            InstanceId=instance_id,
+            BlockDeviceMappings=[
+                {'DeviceName': '/dev/xvdba',
+                 'Ebs': {'DeleteOnTermination': True}},
+                {'DeviceName': '/dev/xvdbb',
+                 'Ebs': {'DeleteOnTermination': True}},
+            ],
+        )
+
+    @patch('util.aws.ec2.boto3')
+    def test_attach_volumes_failure(self, mock_boto3):
+        """Test a failed attachment stops before modifying the instance."""
+        mock_client = mock_boto3.client.return_value
+        mock_client.attach_volume.side_effect = ClientError(
+            {'Error': {'Code': 'VolumeInUse'}}, 'AttachVolume')
+
+        with self.assertRaises(ClientError):
+            ec2.attach_volumes(
+                helper.generate_dummy_instance_id(),
+                [('/dev/xvdba', helper.generate_dummy_volume_id())],
+            )
+        mock_client.modify_instance_attribute.assert_not_called()
+
+    @patch('util.aws.ec2.boto3')
+    def test_get_snapshot_states(self, mock_boto3):
+        """Test snapshot states are described in batches and keyed by id."""
+        snapshot_ids = [
+            helper.generate_dummy_snapshot_id()
+            for __ in range(ec2.DESCRIBE_FILTER_BATCH_SIZE + 1)
+        ]
+        missing_id = snapshot_ids.pop()
+        snapshot_ids.append(helper.generate_dummy_snapshot_id())
+        mock_paginator = mock_boto3.client.return_value.get_paginator
+        mock_paginate = mock_paginator.return_value.paginate
+        mock_paginate.side_effect = [
+            [{'Snapshots': [
+                {'SnapshotId': snapshot_id, 'State': 'pending'}
+                for snapshot_id in snapshot_ids[:-1]
+            ]}],
+            [{'Snapshots': [
+                {'SnapshotId': snapshot_ids[-1], 'State': 'completed'}
+            ]}],
+        ]
+
+        states = ec2.get_snapshot_states(snapshot_ids)
+
+        mock_boto3.client.assert_called_once_with('ec2', region_name=None)
+        mock_paginator.assert_called_once_with('describe_snapshots')
+        self.assertEqual(mock_paginate.call_count, 2)
+        self.assertEqual(
+            mock_paginate.call_args_list[1][1]['Filters'],
+            [{'Name': 'snapshot-id', 'Values': snapshot_ids[-1:]}],
+        )
+        self.assertEqual(len(states), len(snapshot_ids))
+        self.assertEqual(states[snapshot_ids[0]], 'pending')
+        self.assertEqual(states[snapshot_ids[-1]], 'completed')
+        self.assertNotIn(missing_id, states)
+
+    @patch('util.aws.ec2.boto3')
+    def test_get_volume_states(self, mock_boto3):
+        """Test volume states are described in the given region."""
+        region = random.choice(helper.SOME_AWS_REGIONS)
+        volume_id = helper.generate_dummy_volume_id()
+        missing_id = helper.generate_dummy_volume_id()
+        mock_paginator = mock_boto3.client.return_value.get_paginator
+        mock_paginate = mock_paginator.return_value.paginate
+        mock_paginate.return_value = [
+            {'Volumes': [{'VolumeId': volume_id, 'State': 'available'}]},
+        ]
+
+        states = ec2.get_volume_states([volume_id, missing_id], region)
+
+        mock_boto3.client.assert_called_once_with('ec2', region_name=region)
+        mock_paginator.assert_called_once_with('describe_volumes')
+        mock_paginate.assert_called_once_with(Filters=[
+            {'Name': 'volume-id', 'Values': [volume_id, missing_id]},
+        ])
+        self.assertEqual(states, {volume_id: 'available'})
+
     def test_check_volume_state_available(self):
         """Test that a volue is available."""
         mock_volume = helper.generate_mock_volume(state='available')
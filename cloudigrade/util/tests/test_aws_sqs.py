@@ -85,3 +85,47 @@ class UtilAwsSqsTest(TestCase):
         )
 
         self.assertEqual(mock_response, actual_response)
+
+    def test_get_approximate_message_count(self):
+        """Assert the queue's approximate message count is returned."""
+        mock_queue_url = 'https://123.abc'
+
+        with patch.object(sqs, 'boto3') as mock_boto3:
+            mock_client = mock_boto3.client.return_value
+            mock_client.get_queue_attributes.return_value = {
+                'Attributes': {'ApproximateNumberOfMessages': '42'}
+            }
+            count = sqs.get_approximate_message_count(mock_queue_url)
+            mock_client.get_queue_attributes.assert_called_once_with(
+                QueueUrl=mock_queue_url,
+                AttributeNames=['ApproximateNumberOfMessages'],
+            )
+
+        self.assertEqual(count, 42)
+
+    def test_get_oldest_message_age(self):
+        """Assert the latest oldest message age datapoint is returned."""
+        with patch.object(sqs, 'boto3') as mock_boto3:
+            mock_client = mock_boto3.client.return_value
+            mock_client.get_metric_statistics.return_value = {
+                'Datapoints': [
+                    {'Timestamp': helper.utc_dt(2018, 1, 1, 0, 1, 0),
+                     'Maximum': 600.0},
+                    {'Timestamp': helper.utc_dt(2018, 1, 1, 0, 0, 0),
+                     'Maximum': 540.0},
+                ]
+            }
+            age = sqs.get_oldest_message_age('ready_volumes')
+            mock_boto3.client.assert_called_once_with(
+                'cloudwatch', region_name=sqs.settings.SQS_DEFAULT_REGION)
+
+        self.assertEqual(age, 600)
+
+    def test_get_oldest_message_age_without_data(self):
+        """Assert the age is 0 when CloudWatch has no recent data."""
+        with patch.object(sqs, 'boto3') as mock_boto3:
+            mock_client = mock_boto3.client.return_value
+            mock_client.get_metric_statistics.return_value = {'Datapoints': []}
+            age = sqs.get_oldest_message_age('ready_volumes')
+
+        self.assertEqual(age, 0)
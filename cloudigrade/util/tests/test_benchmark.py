@@ -0,0 +1,75 @@
+"""Collection of tests for the util.benchmark module."""
+import io
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from util import benchmark
+
+
+class BenchmarkTest(TestCase):
+    """Benchmark utility functions test case."""
+
+    def test_measure(self):
+        """Test measuring a function's time, queries, and memory."""
+        def function():
+            list(User.objects.all())
+            list(User.objects.all())
+            return [0] * 100000
+
+        result = benchmark.measure('users', function, {'size': 1})
+
+        self.assertEqual(result.scenario, 'users')
+        self.assertEqual(result.parameters, {'size': 1})
+        self.assertGreater(result.seconds, 0)
+        self.assertEqual(result.query_count, 2)
+        self.assertGreater(result.peak_memory_bytes, 100000 * 8)
+
+    def test_write_results(self):
+        """Test results are written as JSON Lines with run metadata."""
+        results = [
+            benchmark.BenchmarkResult('a', {'days': 1}, 1.5, 3, 1024),
+            benchmark.BenchmarkResult('b', {}, 0.5, 1, 2048),
+        ]
+        metadata = benchmark.get_run_metadata('nightly', dataset={'users': 2})
+        stream = io.StringIO()
+
+        benchmark.write_results(results, stream, metadata)
+
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[0]['scenario'], 'a')
+        self.assertEqual(lines[0]['parameters'], {'days': 1})
+        self.assertEqual(lines[0]['query_count'], 3)
+        self.assertEqual(lines[1]['peak_memory_bytes'], 2048)
+        for line in lines:
+            self.assertEqual(line['label'], 'nightly')
+            self.assertEqual(line['dataset'], {'users': 2})
+            self.assertEqual(line['run_at'], metadata['run_at'])
+
+    def test_format_result(self):
+        """Test formatting a result as a readable line."""
+        result = benchmark.BenchmarkResult(
+            'daily_usage', {'days': 7, 'backend': 'python'}, 1.23456, 12,
+            3 * 1024 * 1024)
+        self.assertEqual(
+            benchmark.format_result(result),
+            'daily_usage [backend=python days=7]: 1.235s, 12 queries, '
+            '3.0 MiB peak',
+        )
+
+    def test_combine_results(self):
+        """Test combining stage results into an overall throughput."""
+        results = [
+            benchmark.BenchmarkResult('a', {}, 1.5, 3, 1024, 10),
+            benchmark.BenchmarkResult('b', {}, 0.5, 1, 2048, 10),
+        ]
+
+        combined = benchmark.combine_results('ab', results, {'files': 1}, 10)
+
+        self.assertEqual(combined, benchmark.BenchmarkResult(
+            'ab', {'files': 1}, 2.0, 4, 2048, 10))
+        self.assertEqual(benchmark.get_items_per_second(combined), 5.0)
+        self.assertIsNone(benchmark.get_items_per_second(results[0]._replace(
+            items=None)))
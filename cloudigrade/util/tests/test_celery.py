@@ -1,13 +1,42 @@
 """Collection of tests for ``util.celery`` module."""
+import datetime
+import time
 from unittest.mock import patch
 
+from celery.app.task import Context
+from celery.exceptions import Retry
+from django.core.cache import caches
 from django.test import TestCase
 
-from util import celery
+from util import celery, metrics
 from util.celery import calculate_max_retries
 from util.exceptions import NotReadyException
 
 
+@celery.retriable_shared_task(name='util.tests.test_celery.add')
+def add(a, b):
+    """Add two numbers."""
+    return a + b
+
+
+@celery.retriable_shared_task(name='util.tests.test_celery.not_ready')
+def not_ready():
+    """Ask to be retried because something is not ready."""
+    raise Retry(exc=NotReadyException())
+
+
+@celery.retriable_shared_task(name='util.tests.test_celery.broken')
+def broken():
+    """Fail."""
+    raise ValueError
+
+
+@celery.retriable_shared_task(name='util.tests.test_celery.untracked',
+                              track_metrics=False)
+def untracked():
+    """Do nothing without recording metrics."""
+
+
 class UtilCeleryTest(TestCase):
     """Celery utility functions test case."""
 
@@ -36,6 +65,7 @@ class UtilCeleryTest(TestCase):
             'retry_backoff': True,
             'retry_jitter': True,
             'retry_backoff_max': 120,
+            'track_metrics': True,
         }
         self.assertDictEqual(kwargs, expected_kwargs)
 
@@ -66,6 +96,7 @@ class UtilCeleryTest(TestCase):
             'retry_backoff': True,
             'retry_jitter': True,
             'retry_backoff_max': 120,
+            'track_metrics': True,
         }
         self.assertDictEqual(kwargs, expected_kwargs)
 
@@ -101,6 +132,7 @@ class UtilCeleryTest(TestCase):
             'retry_backoff': True,
             'retry_jitter': True,
             'retry_backoff_max': 10,
+            'track_metrics': True,
         }
         self.assertDictEqual(kwargs, expected_kwargs)
 
@@ -140,3 +172,92 @@ class UtilCeleryTest(TestCase):
         """
         max_retries = calculate_max_retries(60, 10)
         self.assertEqual(8, max_retries)
+
+
+class TaskMetricsTest(TestCase):
+    """Celery task metrics test case."""
+
+    def setUp(self):
+        """Start each test without any metrics."""
+        caches['metrics'].clear()
+        # The shared sink would otherwise remember its series as registered.
+        metrics._sinks.clear()
+
+    def get_series(self):
+        """Get the recorded metrics keyed by metric name and labels."""
+        return {
+            (series.metric.name, tuple(sorted(series.labels.items()))):
+                series.value
+            for series in metrics.get_metrics_sink().collect(
+                metrics.TASK_METRICS)
+        }
+
+    def test_success(self):
+        """Test a successful run's duration and success are recorded."""
+        self.assertEqual(add.apply((1, 2)).get(), 3)
+
+        series = self.get_series()
+        labels = (('task', add.name),)
+        self.assertEqual(
+            series[(metrics.TASK_SUCCESSES.name, labels)], 1)
+        self.assertEqual(
+            series[(metrics.TASK_DURATION.name, labels)].count, 1)
+
+    def test_retry(self):
+        """Test a retry is recorded by the exception it was retried for."""
+        not_ready.apply()
+
+        labels = (('exception', 'NotReadyException'), ('task', not_ready.name))
+        self.assertEqual(
+            self.get_series()[(metrics.TASK_RETRIES.name, labels)], 1)
+
+    def test_failure(self):
+        """Test a failure is recorded by its exception."""
+        broken.apply()
+        broken.apply()
+
+        labels = (('exception', 'ValueError'), ('task', broken.name))
+        self.assertEqual(
+            self.get_series()[(metrics.TASK_FAILURES.name, labels)], 2)
+
+    def test_untracked(self):
+        """Test nothing is recorded for tasks that opt out."""
+        untracked.apply()
+
+        self.assertEqual(self.get_series(), {})
+
+    @patch('util.celery.metrics.get_metrics_sink')
+    def test_broken_sink(self, mock_get_metrics_sink):
+        """Test a failing sink does not break the task."""
+        mock_get_metrics_sink.return_value.increment.side_effect = \
+            ConnectionError
+
+        self.assertEqual(add.apply((1, 2)).get(), 3)
+
+    def test_sent_at_header(self):
+        """Test task messages are stamped with the time they were sent."""
+        headers = {}
+
+        celery._add_sent_at_header(headers=headers)
+
+        self.assertAlmostEqual(headers[celery.SENT_AT_HEADER], time.time(),
+                               delta=1)
+
+    def test_get_queue_wait(self):
+        """Test queue wait is measured from when the task was sent."""
+        request = Context({celery.SENT_AT_HEADER: time.time() - 10})
+
+        self.assertAlmostEqual(celery.get_queue_wait(request), 10, delta=1)
+
+    def test_get_queue_wait_eta(self):
+        """Test queue wait is measured from the ETA of a delayed task."""
+        eta = datetime.datetime.now(datetime.timezone.utc) - \
+            datetime.timedelta(seconds=10)
+        request = Context({celery.SENT_AT_HEADER: time.time() - 60,
+                           'eta': eta.isoformat()})
+
+        self.assertAlmostEqual(celery.get_queue_wait(request), 10, delta=1)
+
+    def test_get_queue_wait_unknown(self):
+        """Test queue wait is unknown if the message has no sent time."""
+        self.assertIsNone(celery.get_queue_wait(Context()))
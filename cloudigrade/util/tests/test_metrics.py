@@ -0,0 +1,125 @@
+"""Collection of tests for ``util.metrics`` module."""
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from util import metrics
+
+COUNTER = metrics.Metric('test_total', metrics.COUNTER, 'A test counter.')
+HISTOGRAM = metrics.Metric('test_seconds', metrics.HISTOGRAM,
+                           'A test histogram.', (1, 10))
+
+
+class CacheMetricsSinkTest(TestCase):
+    """CacheMetricsSink test case."""
+
+    def setUp(self):
+        """Start each test without any metrics."""
+        caches['metrics'].clear()
+        self.sink = metrics.CacheMetricsSink()
+
+    def test_counter(self):
+        """Test counters are incremented by series."""
+        self.sink.increment(COUNTER, {'task': 'a'})
+        self.sink.increment(COUNTER, {'task': 'a'}, 2)
+        self.sink.increment(COUNTER, {'task': 'b'})
+
+        series = self.sink.collect([COUNTER])
+
+        values = {item.labels['task']: item.value for item in series}
+        self.assertEqual(values, {'a': 3, 'b': 1})
+
+    def test_histogram(self):
+        """Test histogram observations are counted in their buckets."""
+        for value in (0.5, 1, 5, 20):
+            self.sink.observe(HISTOGRAM, {'task': 'a'}, value)
+
+        series = self.sink.collect([HISTOGRAM])
+
+        self.assertEqual(len(series), 1)
+        self.assertEqual(series[0].value, metrics.HistogramValue(
+            bucket_counts=[2, 1, 1], count=4, sum=26.5))
+
+    def test_shared_between_sinks(self):
+        """Test sinks sharing a cache see each other's metrics."""
+        metrics.CacheMetricsSink().increment(COUNTER, {'task': 'a'})
+        metrics.CacheMetricsSink().increment(COUNTER, {'task': 'a'})
+
+        series = self.sink.collect([COUNTER])
+
+        self.assertEqual(series[0].value, 2)
+
+    def test_registry_written_only_when_series_missing(self):
+        """Test recording a known series does not touch the registry."""
+        registry_key = 'task_metrics:registry'
+        with patch.object(self.sink, 'cache', wraps=self.sink.cache) as \
+                mock_cache:
+            for __ in range(3):
+                self.sink.increment(COUNTER, {'task': 'a'})
+            registry_gets = [call for call in mock_cache.get.call_args_list
+                             if call[0][0] == registry_key]
+            registry_sets = [call for call in mock_cache.set.call_args_list
+                             if call[0][0] == registry_key]
+
+        self.assertEqual(len(registry_gets), 1)
+        self.assertEqual(len(registry_sets), 1)
+        self.assertEqual(self.sink.collect([COUNTER])[0].value, 3)
+
+    def test_lost_series_registered_again(self):
+        """Test a series missing from the registry is added at next check."""
+        self.sink.increment(COUNTER, {'task': 'a'})
+        caches['metrics'].delete('task_metrics:registry')
+        self.sink.increment(COUNTER, {'task': 'a'})
+        self.assertEqual(self.sink.collect([COUNTER]), [])
+
+        with patch.object(metrics.CacheMetricsSink, 'registry_check_seconds',
+                          0):
+            self.sink.increment(COUNTER, {'task': 'a'})
+
+        self.assertEqual(self.sink.collect([COUNTER])[0].value, 3)
+
+    def test_collect_only_requested_metrics(self):
+        """Test collect skips series of other metrics."""
+        self.sink.increment(COUNTER, {'task': 'a'})
+
+        self.assertEqual(self.sink.collect([HISTOGRAM]), [])
+
+
+class GetMetricsSinkTest(TestCase):
+    """get_metrics_sink test case."""
+
+    @override_settings(TASK_METRICS_SINK='util.metrics.NullMetricsSink')
+    def test_configured_sink(self):
+        """Test the sink is the configured class and is reused."""
+        sink = metrics.get_metrics_sink()
+
+        self.assertIsInstance(sink, metrics.NullMetricsSink)
+        self.assertIs(metrics.get_metrics_sink(), sink)
+        sink.increment(COUNTER, {})
+        self.assertEqual(sink.collect([COUNTER]), [])
+
+
+class RenderPrometheusTest(TestCase):
+    """render_prometheus test case."""
+
+    def test_render_prometheus(self):
+        """Test counters and cumulative histograms are formatted."""
+        text = metrics.render_prometheus([
+            metrics.MetricSeries(COUNTER, {'task': 'say "hi"'}, 3),
+            metrics.MetricSeries(HISTOGRAM, {'task': 'a'},
+                                 metrics.HistogramValue([2, 1, 1], 4, 26.5)),
+        ])
+
+        self.assertEqual(text, '\n'.join([
+            '# HELP test_total A test counter.',
+            '# TYPE test_total counter',
+            'test_total{task="say \\"hi\\""} 3',
+            '# HELP test_seconds A test histogram.',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{task="a",le="1"} 2',
+            'test_seconds_bucket{task="a",le="10"} 3',
+            'test_seconds_bucket{task="a",le="+Inf"} 4',
+            'test_seconds_sum{task="a"} 26.5',
+            'test_seconds_count{task="a"} 4',
+        ]) + '\n')
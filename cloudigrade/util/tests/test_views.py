@@ -0,0 +1,30 @@
+"""Collection of tests for ``util.views`` module."""
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+
+from util import metrics
+
+
+class MetricsViewTest(TestCase):
+    """metrics view test case."""
+
+    def setUp(self):
+        """Start each test without any metrics."""
+        caches['metrics'].clear()
+        # The shared sink would otherwise remember its series as registered.
+        metrics._sinks.clear()
+
+    def test_metrics(self):
+        """Test task metrics are exposed for Prometheus without logging in."""
+        metrics.get_metrics_sink().increment(
+            metrics.TASK_SUCCESSES, {'task': 'account.tasks.create_volume'})
+
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(
+            'cloudigrade_task_successes_total'
+            '{task="account.tasks.create_volume"} 1',
+            response.content.decode('utf-8'))
@@ -0,0 +1,15 @@
+"""Views for the util app."""
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from util.metrics import TASK_METRICS, get_metrics_sink, render_prometheus
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@require_GET
+def metrics(request):
+    """Expose Celery task metrics in the Prometheus text format."""
+    series = get_metrics_sink().collect(TASK_METRICS)
+    return HttpResponse(render_prometheus(series),
+                        content_type=PROMETHEUS_CONTENT_TYPE)